@@ -1,3 +1,5 @@
+import hashlib
+
 
 default_pid_colors = {2212:'rgb(153,55,255)', # protons (purple)
                       13:'rgb(255,0,0)', # muons (red)
@@ -16,3 +18,17 @@ def get_pid_color( pid ):
         return default_pid_colors[0]
     else:
         return default_pid_colors[pid]
+
+def get_hashed_rgb( *key ):
+    """
+    Color picked from a hash of key, e.g. (tree name, cluster index).
+
+    Unlike a random color, the same key gets the same color in every call, process and run,
+    so plots made from the same data are identical (and can be cached).
+
+    Returns
+    -------
+    (r,g,b) ints in [0,254]
+    """
+    digest = hashlib.md5( repr(key).encode('utf-8') ).digest()
+    return digest[0]%255, digest[1]%255, digest[2]%255
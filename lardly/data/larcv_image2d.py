@@ -2,30 +2,44 @@ from __future__ import print_function
 import os,sys
 import numpy as np
 import plotly.graph_objs as go
+from .larcv_sparseimg import make_sparse_pixel_trace, image2d_nonzero_pixels
+from .larcv_imageprep import get_prepared_image
 
-def visualize_larcv_image2d( image2d, minz=0.0, maxz=200.0, reverse_ticks=False, downsample=None, dump_metainfo=False ):
-    from larcv import larcv
-    larcv.load_pyutil()
-    
-    meta = image2d.meta()
+# suggested sparse_threshold: images with a smaller fraction of nonzero pixels
+# are drawn as a scattergl of those pixels
+DEFAULT_SPARSE_THRESHOLD = 0.05
+
+def visualize_larcv_image2d( image2d, minz=0.0, maxz=200.0, reverse_ticks=False, downsample=None, dump_metainfo=False,
+                             sparse_threshold=None, entry_cache=None, cache_key=None ):
+    """
+    Heatmap of a larcv::Image2D, or, if sparse_threshold is given and the image is sparse,
+    a scattergl of its nonzero pixels.
+
+    The image itself is not modified.
+
+    Parameters
+    ----------
+
+    sparse_threshold : float or None
+       largest fraction of nonzero pixels drawn as a scattergl, e.g. DEFAULT_SPARSE_THRESHOLD.
+       None (default) always makes a heatmap.
+    entry_cache : EntryCache or None
+    cache_key : tuple or None
+       e.g. (producer, plane). With an entry cache, the prepared image is reused by later
+       calls for the same entry (e.g. with other minz/maxz).
+    """
+    prepared = get_prepared_image( image2d, entry_cache=entry_cache, key=cache_key )
     if dump_metainfo:
-        print("meta: ",meta.dump())
-    imgnp = np.transpose( larcv.as_ndarray( image2d ), (1,0) )
-    if meta.plane() in [0,1]:
-        imgnp = imgnp[:,0:2400]
-        maxx = 2400.0
-    else:
-        maxx = meta.max_x()
-    #print("image shape: ",imgnp.shape," maxx=",maxx)
-    xaxis = np.linspace( meta.min_x(), maxx, endpoint=False, num=int(maxx/meta.pixel_width()) )
-    yaxis = np.linspace( meta.min_y(), meta.max_y(), endpoint=False, num=meta.rows() )
-    #print(type(imgnp),type(xaxis),type(yaxis))
-
-    imgnp[ imgnp<minz ] = 0
-    imgnp[ imgnp>maxz ] = maxz
-
-    if reverse_ticks:
-        imgnp = np.flip( imgnp, axis=0 )
+        print("meta: ",image2d.meta().dump())
+
+    imgnp = prepared.clipped( minz, maxz, reverse_ticks=reverse_ticks )
+    xaxis = prepared.xaxis
+    yaxis = prepared.yaxis
+
+    if sparse_threshold is not None and imgnp.size>0 \
+       and prepared.nonzero_fraction( minz ) < sparse_threshold:
+        x, y, values = image2d_nonzero_pixels( imgnp, xaxis, yaxis, minz=minz )
+        return make_sparse_pixel_trace( x, y, values, minz=minz, maxz=maxz, colorscale="Jet" )
 
     heatmap = {
         #"type":"heatmapgl",
@@ -0,0 +1,142 @@
+from __future__ import print_function
+import os,sys
+from functools import lru_cache
+import numpy as np
+
+# planes 0 and 1 only have 2400 wires; the rest of their image columns are empty
+NWIRES_UV = 2400
+
+def image2d_as_ndarray( image2d ):
+    """
+    The (col,row) pixel array of a larcv::Image2D.
+
+    Objects that provide their own as_ndarray(), like the images of the mock IO backend,
+    are used without importing larcv.
+    """
+    if hasattr( image2d, "as_ndarray" ):
+        return image2d.as_ndarray()
+    from larcv import larcv
+    larcv.load_pyutil()
+    return larcv.as_ndarray( image2d )
+
+@lru_cache(maxsize=64)
+def get_meta_axes( min_x, max_x, pixel_width, min_y, max_y, rows ):
+    """
+    Wire and tick of each image column and row, made once per meta.
+
+    Returns
+    -------
+    (xaxis, yaxis) read-only numpy arrays
+    """
+    xaxis = np.linspace( min_x, max_x, endpoint=False, num=int(max_x/pixel_width) )
+    yaxis = np.linspace( min_y, max_y, endpoint=False, num=rows )
+    xaxis.setflags(write=False)
+    yaxis.setflags(write=False)
+    return xaxis, yaxis
+
+class PreparedImage:
+    """
+    Pixels of a larcv::Image2D as a (tick,wire) array, ready to plot.
+
+    The array from larcv.as_ndarray is kept as a read-only transposed view: nothing is
+    copied until a clipped or quantized version is asked for. The quantized copy is
+    made once and kept.
+    """
+    def __init__( self, image2d ):
+        meta = image2d.meta()
+        self.plane = meta.plane()
+        imgnp = image2d_as_ndarray( image2d )
+        imgnp.setflags(write=False)
+        view = imgnp.T
+        if self.plane in [0,1]:
+            view = view[:,0:NWIRES_UV]
+            max_x = float(NWIRES_UV)
+        else:
+            max_x = meta.max_x()
+        self.view = view
+        self.calib = { "x0":meta.min_x(), "dx":meta.pixel_width(),
+                       "y0":meta.min_y(), "dy":meta.pixel_height() }
+        self.xaxis, self.yaxis = get_meta_axes( meta.min_x(), max_x, meta.pixel_width(),
+                                                meta.min_y(), meta.max_y(), meta.rows() )
+        self._nonzero = {}
+        self._quantized = {}
+
+    @property
+    def shape( self ):
+        return self.view.shape
+
+    def nonzero_fraction( self, minz=0.0 ):
+        """
+        Fraction of pixels that are not zero and at or above minz, i.e. that
+        clipped(minz) keeps. Counted once per minz.
+        """
+        if self.view.size==0:
+            return 0.0
+        minz = float(minz)
+        if minz not in self._nonzero:
+            self._nonzero[minz] = np.count_nonzero( (self.view!=0) & (self.view>=minz) )
+        return self._nonzero[minz]/float(self.view.size)
+
+    def clipped( self, minz=0.0, maxz=200.0, reverse_ticks=False ):
+        """
+        New array with values below minz set to 0 and above maxz set to maxz,
+        flipped along the tick axis if reverse_ticks.
+        """
+        z = np.where( self.view<minz, 0, np.minimum(self.view,maxz) ).astype( self.view.dtype, copy=False )
+        if reverse_ticks:
+            z = z[::-1]
+        return z
+
+    def quantized( self, bits=8 ):
+        """
+        Copy of the pixels as unsigned integers, made once per number of bits.
+
+        Values are mapped linearly from [min,max] of the image onto [0,2^bits-1].
+
+        Parameters
+        ----------
+
+        bits : int
+           8 or 16
+
+        Returns
+        -------
+        dict with
+           'data'   : read-only uint8/uint16 array with the shape of the image
+           'scale'  : float, value = data*scale + offset
+           'offset' : float
+        """
+        if bits not in (8,16):
+            raise ValueError("quantization must be 8 or 16 bits")
+        if bits not in self._quantized:
+            dtype = np.uint8 if bits==8 else np.uint16
+            levels = float( np.iinfo(dtype).max )
+            lo = float(self.view.min()) if self.view.size>0 else 0.0
+            hi = float(self.view.max()) if self.view.size>0 else 0.0
+            scale = (hi-lo)/levels if hi>lo else 1.0
+            data = np.rint( (self.view-lo)*(1.0/scale) ).astype(dtype)
+            data.setflags(write=False)
+            self._quantized[bits] = { "data":data, "scale":scale, "offset":lo }
+        return self._quantized[bits]
+
+def dequantize( quantized, z=None ):
+    """ float32 values of (a window of) a quantized image """
+    if z is None:
+        z = quantized["data"]
+    return z.astype(np.float32)*np.float32(quantized["scale"]) + np.float32(quantized["offset"])
+
+def get_prepared_image( image2d, entry_cache=None, key=None ):
+    """
+    PreparedImage of a larcv::Image2D, kept in an entry cache if one is given.
+
+    Parameters
+    ----------
+
+    entry_cache : EntryCache or None
+       per-entry cache (see lardly.ubdl.io.entry_cache)
+    key : tuple or None
+       identifies the image within the entry, e.g. (producer, plane). Needed to use the cache.
+    """
+    if entry_cache is None or key is None:
+        return PreparedImage( image2d )
+    return entry_cache.get( ("prepared_image",)+tuple(key), lambda: PreparedImage( image2d ) )
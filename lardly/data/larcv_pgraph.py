@@ -39,9 +39,8 @@ def visualize2d_larcv_pgraph( event_pgraph, event_contour_pixels=None, color=Non
         color = "rgb(255,165,0)"
     else:
         color = "rgb({},{},{})".format(color[0],color[1],color[2])
-    import ROOT
-    from ROOT import std
-    from larlite import larutil
+    from lardly.geometry import get_geometry
+    geo = get_geometry()
 
     traces2d = {0:[],1:[],2:[]}
 
@@ -57,21 +56,14 @@ def visualize2d_larcv_pgraph( event_pgraph, event_contour_pixels=None, color=Non
         hovertext.append("vtx[{}]".format(vtx_idx))
 
         roi = pgraph.ParticleArray().at(0)
-        vertex = std.vector("double")(3,0)
-        vertex[0] = roi.X()
-        vertex[1] = roi.Y()
-        vertex[2] = roi.Z()
+        vertex = np.array( [[roi.X(), roi.Y(), roi.Z()]] )
 
-        vertex_tick = 3200 + roi.X()/larutil.LArProperties.GetME().DriftVelocity()/0.5
+        vertex_tick = float(geo.x_to_tick( roi.X() ))
 
         print("vertex[{}]: nparticle={} nclusters={} tick={}".format(vtx_idx,nparticles,nclusters,vertex_tick))        
 
         for p in range(3):
-            wire = larutil.Geometry.GetME().NearestWire( vertex, p )
-            if wire<0:
-                wire=0
-            elif wire>=3456:
-                wire=3455
+            wire = geo.nearest_wire( vertex, p )[0]
             vertex_np[vtx_idx,p,0] = wire
             vertex_np[vtx_idx,p,1] = vertex_tick
             #print("vertex[{}] plane={} wire={}".format(vtx_idx,p,wire))
@@ -0,0 +1,133 @@
+from __future__ import print_function
+import os,sys
+import numpy as np
+
+def make_sparse_pixel_trace( x, y, values, minz=0.0, maxz=200.0, colorscale="Jet", marker_size=3, name="" ):
+    """
+    Scattergl of pixels, colored by value like a heatmap with the same colorscale.
+
+    Parameters
+    ----------
+
+    x : array with shape (N,)
+       wire of each pixel
+    y : array with shape (N,)
+       tick of each pixel
+    values : array with shape (N,)
+       pixel values
+    minz, maxz : float
+       color range; values outside get the end colors
+    marker_size : int
+       marker size in screen pixels
+
+    Returns
+    -------
+    dict, plotly scattergl trace
+    """
+    return {
+        "type":"scattergl",
+        "x":np.asarray(x),
+        "y":np.asarray(y),
+        "mode":"markers",
+        "name":name,
+        "marker":{"color":np.asarray(values,dtype=np.float32),
+                  "colorscale":colorscale,
+                  "cmin":minz,
+                  "cmax":maxz,
+                  "symbol":"square",
+                  "size":marker_size},
+        "hovertemplate":"wire: %{x}<br>tick: %{y}<br>value: %{marker.color:.1f}<extra></extra>",
+    }
+
+def image2d_nonzero_pixels( imgnp, xaxis, yaxis, minz=0.0 ):
+    """
+    Wire, tick and value of the nonzero pixels of a dense (tick,wire) array that are at or above minz.
+
+    Returns
+    -------
+    (x, y, values) arrays
+    """
+    rows, cols = np.nonzero( (imgnp!=0) & (imgnp>=minz) )
+    return xaxis[cols], yaxis[rows], imgnp[rows,cols]
+
+def sparseimg_to_ndarray( sparseimg ):
+    """
+    Pixels of a larcv::SparseImage as an array with shape (npixels, 2+nfeatures).
+
+    Columns are (row, col, feature 0, feature 1, ...).
+    """
+    from larcv import larcv
+    nfeatures = sparseimg.nfeatures()
+    try:
+        pixels = larcv.as_sparseimg_ndarray( sparseimg )
+    except AttributeError:
+        # older pyutil without the sparse image converter
+        pixels = np.asarray( sparseimg.pixellist(), dtype=np.float32 )
+    return np.asarray( pixels, dtype=np.float32 ).reshape( -1, 2+nfeatures )
+
+def find_sparseimg_plane( sparseimg_v, plane ):
+    """
+    Find the sparse image and feature holding a wire plane.
+
+    Parameters
+    ----------
+
+    sparseimg_v : std::vector<larcv::SparseImage>
+    plane : int
+
+    Returns
+    -------
+    (sparseimg, feature index), or (None, None) if no feature has a meta for the plane
+    """
+    for i in range(sparseimg_v.size()):
+        sparseimg = sparseimg_v.at(i)
+        for ifeat in range(sparseimg.nfeatures()):
+            if sparseimg.meta(ifeat).plane()==plane:
+                return sparseimg, ifeat
+    return None, None
+
+def sparseimg_pixels( sparseimg, feature=0, reverse_ticks=False, pixels=None ):
+    """
+    Wire, tick and value of the pixels of one feature of a larcv::SparseImage.
+
+    Positions follow the heatmap of the dense image: column c is at min_x + c*pixel_width
+    and row r at min_y + r*pixel_height (or row rows-1-r if reverse_ticks).
+    Pixels whose value for the feature is zero are dropped.
+
+    Parameters
+    ----------
+
+    pixels : array or None
+       output of sparseimg_to_ndarray, if already made
+
+    Returns
+    -------
+    (x, y, values) arrays
+    """
+    if pixels is None:
+        pixels = sparseimg_to_ndarray( sparseimg )
+    meta = sparseimg.meta(feature)
+    values = pixels[:,2+feature]
+    keep = values!=0
+    row = pixels[keep,0]
+    col = pixels[keep,1]
+    if reverse_ticks:
+        row = (meta.rows()-1) - row
+    x = meta.min_x() + col*meta.pixel_width()
+    y = meta.min_y() + row*meta.pixel_height()
+    return x, y, values[keep]
+
+def visualize_larcv_sparseimg( sparseimg, feature=0, minz=0.0, maxz=200.0, reverse_ticks=False,
+                               colorscale="Jet", marker_size=3 ):
+    """
+    Scattergl of one feature of a larcv::SparseImage. The image is never made dense.
+
+    Returns
+    -------
+    dict, plotly scattergl trace
+    """
+    x, y, values = sparseimg_pixels( sparseimg, feature=feature, reverse_ticks=reverse_ticks )
+    keep = values>=minz
+    return make_sparse_pixel_trace( x[keep], y[keep], values[keep], minz=minz, maxz=maxz,
+                                    colorscale=colorscale, marker_size=marker_size,
+                                    name="plane %d"%(sparseimg.meta(feature).plane()) )
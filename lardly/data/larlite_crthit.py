@@ -1,11 +1,11 @@
 import os,sys
 import numpy as np
+from lardly.geometry import get_geometry
 
 def visualize_larlite_crthit( larlite_crthit, notimeshift=False ):
 
     if not notimeshift:
-        from larlite import larutil
-        dv = larutil.LArProperties.GetME().DriftVelocity()    
+        dv = get_geometry().drift_velocity
         t_usec = larlite_crthit.ts2_ns*0.001
         dx = t_usec*dv
     else:
@@ -40,8 +40,7 @@ def visualize_larlite_event_crthit( larlite_event_crthit, name="", window=[-500.
             num_in_win += 1
             hit_index.append(ipt)
         
-    from larlite import larutil
-    dv = larutil.LArProperties.GetME().DriftVelocity()    
+    dv = get_geometry().drift_velocity
     
     xyz = np.zeros( (num_in_win,4 ) )
     for ipt,idx in enumerate(hit_index):
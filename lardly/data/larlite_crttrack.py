@@ -1,35 +1,39 @@
 import os,sys
 import numpy as np
+from .polyline import make_polyline_trace
+from lardly.geometry import get_geometry
 
-def visualize_larlite_crttrack( larlite_crttrack, notimeshift=False, marker_color='rgb(0,230,0)', line_color='rgb(10,50,50)' ):
-
+def get_larlite_crttrack_points( larlite_crttrack, notimeshift=False, dv=None ):
+    """ return the (2,3) end points of a crttrack and (2,3) customdata with columns: t us, tick, CRT plane """
     if notimeshift:
         dx = 0.0
-        t_usec = 0.0
     else:
-        from larlite import larutil
-        dv = larutil.LArProperties.GetME().DriftVelocity()    
+        if dv is None:
+            dv = get_geometry().drift_velocity
         t_usec = 0.5*(larlite_crttrack.ts2_ns_h1+larlite_crttrack.ts2_ns_h2)*0.001 # convert to microseconds
         dx = t_usec*dv
-    
-    xyz = np.zeros( (2,4 ) )
+
+    xyz = np.zeros( (2,3) )
     xyz[0,0] = larlite_crttrack.x1_pos + dx
     xyz[0,1] = larlite_crttrack.y1_pos
     xyz[0,2] = larlite_crttrack.z1_pos
-    xyz[0,3] = larlite_crttrack.ts2_ns_h1*0.001
     xyz[1,0] = larlite_crttrack.x2_pos + dx
     xyz[1,1] = larlite_crttrack.y2_pos
     xyz[1,2] = larlite_crttrack.z2_pos
-    xyz[1,3] = larlite_crttrack.ts2_ns_h2*0.001
 
     customdata = np.zeros( (2,3) ) # columns: t1 us, tick1, plane1
     customdata[0][0] = larlite_crttrack.ts2_ns_h1*0.001
-    customdata[0][1] = 3200 + larlite_crttrack.ts2_ns_h1*0.001/0.5 # tpc tick
     customdata[0][2] = larlite_crttrack.plane1
 
     customdata[1][0] = larlite_crttrack.ts2_ns_h2*0.001
-    customdata[1][1] = 3200 + larlite_crttrack.ts2_ns_h2*0.001/0.5 # tpc tick
     customdata[1][2] = larlite_crttrack.plane2
+    customdata[:,1] = get_geometry().usec_to_tick( customdata[:,0] ) # tpc tick
+
+    return xyz, customdata
+
+def visualize_larlite_crttrack( larlite_crttrack, notimeshift=False, marker_color='rgb(0,230,0)', line_color='rgb(10,50,50)' ):
+
+    xyz, customdata = get_larlite_crttrack_points( larlite_crttrack, notimeshift=notimeshift )
     hovertemplate = """
     <b>x</b>: %{x}<br>
     <b>y</b>: %{y}<br>
@@ -58,17 +62,52 @@ def visualize_larlite_event_crttrack( larlite_event_crttrack, name="",
                                       window=[-500.0,2700],
                                       notimeshift=False,
                                       marker_color='rgb(0,230,0)',
-                                      line_color='rgb(10,50,50)' ):
+                                      line_color='rgb(10,50,50)',
+                                      batch=False,
+                                      track_ids=None ):
+    """
+    Plot the crttracks in a container.
 
-    from larlite import larutil
-    dv = larutil.LArProperties.GetME().DriftVelocity()    
-    
-    ntracks = larlite_event_crttrack.size()
+    If `batch` is False, a list with one trace per track is returned.
+    If `batch` is True, a list with a single lines+markers trace holding all tracks is returned
+    (or an empty list if there are no tracks). The first customdata column is then the track index
+    (or the value in `track_ids`), followed by t us, tick and CRT plane.
+    `larlite_event_crttrack` can also be a python list of larlite::crttrack.
+    """
 
-    crttracks_v = []
-    for itrack in range(ntracks):
-        crttrack = larlite_event_crttrack.at(itrack)
+    dv = get_geometry().drift_velocity
 
+    if type(larlite_event_crttrack) is list:
+        crttrack_v = larlite_event_crttrack
+    else:
+        crttrack_v = [ larlite_event_crttrack.at(itrack) for itrack in range(larlite_event_crttrack.size()) ]
+
+    if batch:
+        if len(crttrack_v)==0:
+            return []
+        segments = []
+        customdata = []
+        for crttrack in crttrack_v:
+            xyz, cdata = get_larlite_crttrack_points( crttrack, notimeshift=notimeshift, dv=dv )
+            segments.append( xyz )
+            customdata.append( cdata )
+        hovertemplate = """
+        <b>crttrack</b>: %{customdata[0]:.0f}<br>
+        <b>x</b>: %{x}<br>
+        <b>y</b>: %{y}<br>
+        <b>z</b>: %{z}<br>
+        <b>t</b>: %{customdata[1]} usec<br>
+        <b>tick</b>: %{customdata[2]}<br>
+        <b>CRT plane</b>: %{customdata[3]}<br>
+        """
+        trace = make_polyline_trace( segments, colors=line_color, segment_ids=track_ids,
+                                     customdata=customdata, name=name, width=2,
+                                     mode="lines+markers", hovertemplate=hovertemplate )
+        trace["marker"] = {"color":marker_color,"size":8,"opacity":0.8}
+        return [trace]
+
+    crttracks_v = []
+    for crttrack in crttrack_v:
         trace = visualize_larlite_crttrack( crttrack, notimeshift=notimeshift,
                                             marker_color=marker_color,
                                             line_color=line_color )
@@ -1,13 +1,13 @@
 import os,sys
 import numpy as np
+from lardly.geometry import get_geometry
 
 def visualize_larlite_larflowhits( larlite_event_larflowhit, name="",score_threshold=0,
-                                   max_hits=None, score_index=None, plot_renormed_shower_score=False ):
+                                   max_hits=None, score_index=None, plot_renormed_shower_score=False, seed=0 ):
 
     npoints = larlite_event_larflowhit.size()
 
-    from larlite import larutil
-    dv = larutil.LArProperties.GetME().DriftVelocity()
+    dv = get_geometry().drift_velocity
 
     nplot = npoints
     sample = False
@@ -16,6 +16,8 @@ def visualize_larlite_larflowhits( larlite_event_larflowhit, name="",score_thres
         nplot = max_hits
         sample = True
         downsample_fraction = float(nplot)/float(npoints)
+    # seeded, so the same event always gives the same points
+    rng = np.random.default_rng(seed)
     
     xyz = np.zeros( (nplot,4 ) )
     ptsused = 0
@@ -35,7 +37,7 @@ def visualize_larlite_larflowhits( larlite_event_larflowhit, name="",score_thres
         if hit.track_score<score_threshold:
             continue
 
-        if sample and np.random.uniform()>downsample_fraction:
+        if sample and rng.uniform()>downsample_fraction:
             continue
         
         xyz[ptsused,0] = hit[0]
@@ -0,0 +1,182 @@
+import os,sys
+import numpy as np
+
+class MCTruthGraph:
+    """
+    MC particle graph for one entry, stored as numpy arrays.
+
+    Built once from the mctrack, mcshower and mctruth containers.
+    Lookups take arrays of track ids and are resolved with np.searchsorted,
+    so a query for every deposit in an event is a few array operations.
+
+    Particle arrays (one row per mctrack/mcshower, sorted by trackid):
+       trackid, parent, ancestor, pdg, origin, start (N,4: x,y,z,t), energy (MeV), is_shower
+
+    Shower daughters (sorted by daughter id):
+       shower_daughter, shower_mother
+    """
+
+    def __init__( self, trackid, parent, ancestor, pdg, origin, start, energy, is_shower,
+                  shower_daughter=None, shower_mother=None,
+                  nu_vertex=None, nu_energy=None, nu_pdg=None ):
+
+        order = np.argsort( trackid, kind='stable' )
+        self.trackid  = np.asarray( trackid, dtype=np.int64 )[order]
+        self.parent   = np.asarray( parent, dtype=np.int64 )[order]
+        self.ancestor = np.asarray( ancestor, dtype=np.int64 )[order]
+        self.pdg      = np.asarray( pdg, dtype=np.int64 )[order]
+        self.origin   = np.asarray( origin, dtype=np.int64 )[order]
+        self.start    = np.asarray( start, dtype=np.float64 ).reshape(-1,4)[order]
+        self.energy   = np.asarray( energy, dtype=np.float64 )[order]
+        self.is_shower = np.asarray( is_shower, dtype=bool )[order]
+
+        if shower_daughter is None:
+            shower_daughter = np.zeros(0,dtype=np.int64)
+            shower_mother = np.zeros(0,dtype=np.int64)
+        sorder = np.argsort( shower_daughter, kind='stable' )
+        self.shower_daughter = np.asarray( shower_daughter, dtype=np.int64 )[sorder]
+        self.shower_mother   = np.asarray( shower_mother, dtype=np.int64 )[sorder]
+
+        # neutrino interaction, if any
+        self.nu_vertex = nu_vertex # (x,y,z,t) or None
+        self.nu_energy = nu_energy # MeV
+        self.nu_pdg = nu_pdg
+
+    @classmethod
+    def from_larlite( cls, ioll, mcreco_producer="mcreco", mctruth_producer="generator" ):
+        """ build the graph from the containers in a larlite::storage_manager """
+
+        rows = []
+        daughters = []
+        mothers = []
+        for dtype,is_shower in [("mctrack",False),("mcshower",True)]:
+            try:
+                ev_mc = ioll.get_data( dtype, mcreco_producer )
+            except:
+                continue
+            for i in range(ev_mc.size()):
+                mc = ev_mc.at(i)
+                start = mc.Start()
+                rows.append( (mc.TrackID(), mc.MotherTrackID(), mc.AncestorTrackID(),
+                              mc.PdgCode(), mc.Origin(),
+                              start.X(), start.Y(), start.Z(), start.T(), start.E(), is_shower) )
+                if is_shower:
+                    dtid_v = mc.DaughterTrackID()
+                    ndaughters = dtid_v.size()
+                    if ndaughters>0:
+                        daughters.append( np.fromiter( dtid_v, dtype=np.int64, count=ndaughters ) )
+                        mothers.append( np.full( ndaughters, mc.TrackID(), dtype=np.int64 ) )
+
+        if len(rows)>0:
+            table = np.array( rows, dtype=np.float64 )
+        else:
+            table = np.zeros( (0,11) )
+
+        if len(daughters)>0:
+            shower_daughter = np.concatenate( daughters )
+            shower_mother = np.concatenate( mothers )
+        else:
+            shower_daughter = None
+            shower_mother = None
+
+        nu_vertex = None
+        nu_energy = None
+        nu_pdg = None
+        try:
+            ev_mctruth = ioll.get_data( "mctruth", mctruth_producer )
+            for i in range(ev_mctruth.size()):
+                mctruth = ev_mctruth.at(i)
+                if mctruth.Origin()!=1:
+                    continue
+                nu = mctruth.GetNeutrino().Nu()
+                step = nu.Trajectory().front()
+                nu_vertex = (step.X(),step.Y(),step.Z(),step.T())
+                nu_energy = step.E()*1000.0
+                nu_pdg = nu.PdgCode()
+                break
+        except:
+            pass
+
+        return cls( table[:,0], table[:,1], table[:,2], table[:,3], table[:,4],
+                    table[:,5:9], table[:,9], table[:,10]>0,
+                    shower_daughter=shower_daughter, shower_mother=shower_mother,
+                    nu_vertex=nu_vertex, nu_energy=nu_energy, nu_pdg=nu_pdg )
+
+    def __len__(self):
+        return self.trackid.shape[0]
+
+    def index_of( self, tids ):
+        """ row of each track id in the particle arrays, -1 if not in the graph """
+        tids = np.asarray( tids, dtype=np.int64 )
+        if self.trackid.shape[0]==0:
+            return np.full( tids.shape, -1, dtype=np.int64 )
+        idx = np.searchsorted( self.trackid, tids )
+        idx = np.clip( idx, 0, self.trackid.shape[0]-1 )
+        found = self.trackid[idx]==tids
+        return np.where( found, idx, -1 )
+
+    def _lookup( self, tids, values, missing ):
+        idx = self.index_of( tids )
+        if values.shape[0]==0:
+            return np.full( idx.shape, missing, dtype=values.dtype )
+        return np.where( idx>=0, values[np.maximum(idx,0)], missing )
+
+    def shower_mother_id( self, tids ):
+        """ id of the shower each track id belongs to, -1 if it is not part of a shower """
+        tids = np.asarray( tids, dtype=np.int64 )
+        if self.shower_daughter.shape[0]==0:
+            return np.full( tids.shape, -1, dtype=np.int64 )
+        idx = np.searchsorted( self.shower_daughter, tids )
+        idx = np.clip( idx, 0, self.shower_daughter.shape[0]-1 )
+        found = self.shower_daughter[idx]==tids
+        return np.where( found, self.shower_mother[idx], -1 )
+
+    def instance_id( self, tids ):
+        """ shower mother id if the track id belongs to a shower, else the track id itself """
+        tids = np.asarray( tids, dtype=np.int64 )
+        mid = self.shower_mother_id( tids )
+        return np.where( mid>0, mid, tids )
+
+    def ancestor_id( self, tids, max_depth=100 ):
+        """
+        ancestor (primary) id of each track id, -1 if it cannot be found.
+
+        The ancestor stored in mctrack/mcshower is used. Where that is missing,
+        the parent links are followed, for all ids at once.
+        """
+        tids = np.asarray( tids, dtype=np.int64 )
+        aid = self._lookup( tids, self.ancestor, -1 )
+        todo = (aid<=0) & (self.index_of(tids)>=0)
+        cur = tids.copy()
+        for _ in range(max_depth):
+            if not np.any(todo):
+                break
+            parent = self._lookup( cur, self.parent, -1 )
+            # a particle whose parent is not in the graph is the ancestor
+            top = todo & (self.index_of(parent)<0)
+            aid[top] = cur[top]
+            todo &= ~top
+            cur = np.where( todo, parent, cur )
+        return aid
+
+    def pdg_code( self, tids ):
+        """ pdg code of each track id, 0 if not in the graph """
+        return self._lookup( tids, self.pdg, 0 )
+
+    def origin_of( self, tids ):
+        """ origin flag (1: neutrino, 2: cosmic) of each track id, 0 if not in the graph """
+        return self._lookup( tids, self.origin, 0 )
+
+def get_mctruth_graph( ioll, entry_cache=None, mcreco_producer="mcreco", mctruth_producer="generator" ):
+    """
+    Get the truth graph for the current entry.
+
+    If an entry cache is given (see lardly.ubdl.io.entry_cache), the graph is built
+    only once per entry and shared by everyone asking for it.
+    """
+    if entry_cache is None:
+        return MCTruthGraph.from_larlite( ioll, mcreco_producer=mcreco_producer, mctruth_producer=mctruth_producer )
+    key = ("mctruth_graph",mcreco_producer,mctruth_producer)
+    return entry_cache.get( key, lambda: MCTruthGraph.from_larlite( ioll,
+                                                                    mcreco_producer=mcreco_producer,
+                                                                    mctruth_producer=mctruth_producer ) )
@@ -3,6 +3,7 @@ import ROOT as rt
 
 # define the default colors for particles
 from .default_pid_colors import default_pid_colors,get_pid_color
+from lardly.geometry import get_geometry
 
 try:
     from ublarcvapp import ublarcvapp
@@ -74,7 +75,8 @@ def extract_mctrackpts( mctrack, sce=None, no_offset=False, set_tick=0, trigger_
 def visualize_larlite_event_mctrack( event_mctrack, origin=None,
                                      do_sce_correction=False,
                                      color_labels=default_pid_colors,
-                                     width=3, color_by_origin=False, no_offset=False, set_tick=0 ):
+                                     width=3, color_by_origin=False, no_offset=False, set_tick=0,
+                                     batch=False ):
     """
     Produce plotly visualization objects for an entire event's set of mctrack objects.
     
@@ -114,6 +116,11 @@ def visualize_larlite_event_mctrack( event_mctrack, origin=None,
        manually set a TPC time tick relative to which we calculate the t0 time of the track.
        if 0, then we determine the tick of each track using the TPC clock info and drift time.
        (default: 0)
+
+    batch : bool
+       If true, all tracks are drawn in a single trace, separated by gaps.
+       The hover text still gives the track id and pdg code of each track.
+       (default: False)
     """
 
 
@@ -121,6 +128,10 @@ def visualize_larlite_event_mctrack( event_mctrack, origin=None,
 
     print ("number of mctracks in container: ",event_mctrack.size())
 
+    segments = []
+    colors = []
+    labels = []
+    trackids = []
     for itrack in range(event_mctrack.size()):
         mctrack = event_mctrack.at(itrack)
 
@@ -130,6 +141,17 @@ def visualize_larlite_event_mctrack( event_mctrack, origin=None,
         if origin is not None and origin!=mctrack.Origin():
             continue
 
+        if batch:
+            steps_np = get_mctrack_points( mctrack, do_sce_correction=do_sce_correction,
+                                           no_offset=no_offset, set_tick=set_tick )
+            if steps_np is None:
+                continue
+            segments.append( steps_np )
+            colors.append( get_mctrack_color( mctrack, color_labels=color_labels,
+                                              color_by_origin=color_by_origin ) )
+            labels.append( "id[%d] pdg[%d]"%(mctrack.TrackID(),mctrack.PdgCode()) )
+            trackids.append( mctrack.TrackID() )
+            continue
 
         trackvis = visualize_larlite_mctrack( mctrack, do_sce_correction=do_sce_correction,
                                               color_labels=color_labels,
@@ -139,18 +161,37 @@ def visualize_larlite_event_mctrack( event_mctrack, origin=None,
                                               set_tick=set_tick)
         if trackvis is not None:
             track_vis.append( trackvis )
+
+    if batch and len(segments)>0:
+        from .polyline import make_polyline_trace
+        customdata = [ get_mctrack_projection_info(steps_np) for steps_np in segments ]
+        from .larlite_track import make_track_projection_hovertemplate
+        # column 0 of the batched customdata is the track id, the projection info follows
+        hovertemplate = "<b>Track ID</b>: %{text}<br>" + make_track_projection_hovertemplate( offset=1 )
+        trackvis = make_polyline_trace( segments, colors=colors, segment_ids=trackids,
+                                        segment_labels=labels, customdata=customdata,
+                                        name="mctracks", width=width, hovertemplate=hovertemplate )
+        track_vis.append( trackvis )
+        
     print("number of mctrack plots (zero step plots removed): ",len(track_vis))
 
     return track_vis
 
-def visualize_larlite_mctrack( mctrack, origin=None,
-                                do_sce_correction=False,
-                                color_labels=default_pid_colors,
-                                width=3, color_by_origin=False, no_offset=False, set_tick=0 ):
-    from larlite import larutil
-    
-    pid = mctrack.PdgCode()
+mctrack_hovertemplate = """
+    <b>Track ID</b>: %{text}<br>
+    <b>x</b>: %{x:.1f}<br>
+    <b>y</b>: %{y:.1f}<br>
+    <b>z</b>: %{z:.1f}<br>
+    <b>t</b>: %{customdata[0]:.1f} usec<br>
+    <b>tick</b>: %{customdata[1]:.0f}<br>
+    <b>U</b>: %{customdata[2]:.0f}<br>
+    <b>V</b>: %{customdata[3]:.0f}<br>
+    <b>Y</b>: %{customdata[4]:.0f}<br>
+    """
 
+def get_mctrack_color( mctrack, color_labels=default_pid_colors, color_by_origin=False ):
+    pid = mctrack.PdgCode()
+    
     # cosmic origin
     if color_by_origin:
         color = 'rgb(0,0,255)'
@@ -162,71 +203,54 @@ def visualize_larlite_mctrack( mctrack, origin=None,
             color = color_labels[pid]
         else:
             color = color_labels[0]
+    return color
+
+def get_mctrack_points( mctrack, do_sce_correction=False, no_offset=False, set_tick=0 ):
+    """ (N,3) array of the steps of the mctrack, or None if there are no steps """
+    from larlite import larutil
 
     if do_sce_correction:
         if tracksce is not None:
-            #print("GETTING TO IF STATEMENT 1")
             lltrack = tracksce.applySCE( mctrack )
             npoints = lltrack.NumberTrajectoryPoints()
             steps_np = np.zeros( (npoints,3 ) )
             for ipt in range(npoints):
                 for i in range(3):
                     steps_np[ipt,i] = lltrack.LocationAtPoint(ipt)(i)
-                if not no_offset:
-                    t0 = mctrack.Start().T()*1.0e-3
-                    xoffset = t0*larutil.LArProperties.GetME().DriftVelocity()
-                    steps_np[ipt,0] += xoffset
-
+            if not no_offset:
+                t0 = mctrack.Start().T()*1.0e-3
+                xoffset = t0*larutil.LArProperties.GetME().DriftVelocity()
+                steps_np[:,0] += xoffset
         else:
             raise ValueError("SCE correction requested, but SCE class not loaded.")
     else:
-        #print("GETTING TO ELSE STATEMENT 2")
         steps_np = extract_mctrackpts( mctrack, no_offset=no_offset, set_tick=set_tick )
         if steps_np is None:
             return None
 
     if steps_np.shape[0]==0:
         return None
+    return steps_np
+
+def get_mctrack_projection_info( steps_np ):
+    """ (N,5) array of t, tick, U, V, Y for each step """
+    return get_geometry().projection_info( steps_np )
+
+def visualize_larlite_mctrack( mctrack, origin=None,
+                                do_sce_correction=False,
+                                color_labels=default_pid_colors,
+                                width=3, color_by_origin=False, no_offset=False, set_tick=0 ):
+    pid = mctrack.PdgCode()
+    color = get_mctrack_color( mctrack, color_labels=color_labels, color_by_origin=color_by_origin )
+
+    steps_np = get_mctrack_points( mctrack, do_sce_correction=do_sce_correction,
+                                   no_offset=no_offset, set_tick=set_tick )
+    if steps_np is None:
+        return None
 
     # Calculate image coordinates for each point along the track
-    from larlite import larutil
-    cm_per_tick = larutil.LArProperties.GetME().DriftVelocity() * 0.5
-    npoints = steps_np.shape[0]
-    customdata = np.zeros((npoints, 5))  # t, tick, U, V, Y
-    
-    for ipt in range(npoints):
-        pos = steps_np[ipt, :]
-        tick = 3200 + pos[0] / cm_per_tick
-        t = pos[0] / cm_per_tick * 0.5
-        
-        # Get wire coordinates for each plane
-        try:
-            import ROOT as rt
-            pos_vec = rt.TVector3(pos[0], pos[1], pos[2])
-            wire_u = larutil.Geometry.GetME().WireCoordinate(pos_vec, 0)
-            wire_v = larutil.Geometry.GetME().WireCoordinate(pos_vec, 1)
-            wire_y = larutil.Geometry.GetME().WireCoordinate(pos_vec, 2)
-            
-            customdata[ipt, 0] = t
-            customdata[ipt, 1] = tick
-            customdata[ipt, 2] = wire_u
-            customdata[ipt, 3] = wire_v
-            customdata[ipt, 4] = wire_y
-        except:
-            # If coordinate calculation fails, set to zero
-            customdata[ipt, :] = 0
-    
-    hovertemplate = """
-    <b>Track ID</b>: %{text}<br>
-    <b>x</b>: %{x:.1f}<br>
-    <b>y</b>: %{y:.1f}<br>
-    <b>z</b>: %{z:.1f}<br>
-    <b>t</b>: %{customdata[0]:.1f} usec<br>
-    <b>tick</b>: %{customdata[1]:.0f}<br>
-    <b>U</b>: %{customdata[2]:.0f}<br>
-    <b>V</b>: %{customdata[3]:.0f}<br>
-    <b>Y</b>: %{customdata[4]:.0f}<br>
-    """
+    customdata = get_mctrack_projection_info( steps_np )
+    hovertemplate = mctrack_hovertemplate
 
     trackvis = {
         "type":"scatter3d",
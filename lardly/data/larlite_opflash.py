@@ -1,7 +1,9 @@
 from __future__ import print_function
 import os,sys
 from ..ubdl.pmtpos import getPMTPosByOpChannel, getPMTPosByOpDet, getOpChannelFromOpDet, getOpDetFromOpChannel
+from ..ubdl.pmtmesh import make_pmt_mesh, make_pmt_outline
 import numpy as np
+from lardly.geometry import get_geometry
 from plotly import graph_objects as go
 
 def define_circle_mesh( center, radius, value, nsteps=20, color=None, outline_color=None,x_offset=0,rgb_channel='r'):
@@ -65,99 +67,46 @@ def visualize_larlite_opflash_3d( opflash, pmt_radius_cm=15.24,
                                   x_offset=0,
                                   rgb_channel='r',
                                   pe_draw_threshold=0.0):
-    from larlite import larlite
-    from larlite import larutil
-    dv = larutil.LArProperties.GetME().DriftVelocity()
+    """
+    Draw the PMTs of a flash as one mesh (all disks, colored by PE) and one outline trace.
+    """
+    dv = get_geometry().drift_velocity
     
-    circles = []
-    nsteps = 20
-    # for ipmt in xrange(32):
-    # we have to define a mesh
-
     if min_pe is None:
         min_pe = 0.0
 
-    all_pe = [ 0 for x in range(32) ]
-    petot = 0.0
     # The index for PE(n) is the OpChannel Number (I think)
+    all_pe = np.zeros( 32 )
     for n in range(opflash.nOpDets()):
         pe = opflash.PE(n)
         ch = n%100
-        petot += pe
-        
-        if pe>0:
-            #print("ch[%d,%d] %.2f"%(n,ch,opflash.PE(n)))
-            if ch<32:
-                all_pe[ch] = pe
-    #print(petot,all_pe)
+        if pe>0 and ch<32:
+            all_pe[ch] = pe
         
     if max_pe is None:
-        max_pe = max(all_pe)
-        max_pe = max(max_pe,1.0)
+        max_pe = max( all_pe.max(), 1.0 )
     
-    for ipmt in range(32):
-        pe = all_pe[ipmt]
-
-        if pe < pe_draw_threshold:
-            continue
-        
-        value = (pe-min_pe)/(max_pe-min_pe)
-        value = min( value, 1.0 )
-        value = max( value, 0 )
-
-        # how to interpret opflash PE(n) indexing
-        if not use_opdet_index:
-            # default: interpret as OpChannel
-            opchid = ipmt
-            center = getPMTPosByOpChannel(ipmt, use_v4_geom=use_v4_geom)
-            opdetid = getOpDetFromOpChannel(ipmt)
-        else:
-            # interpret index as (larsoft opdet index)
-            opdetid = ipmt
-            center = getPMTPosByOpDet(ipmt, use_v4_geom=use_v4_geom)
-            opchid  = getOpChannelFromOpDet(ipmt)
-            
-        if xpos_by_time:
-            t = opflash.Time()
-            xpos = t*dv+x_offset
-            recenter = [xpos,center[1],center[2]]
-        else:
-            recenter = [center[0]+x_offset,center[1],center[2]]
-        
-        mesh, outline = define_circle_mesh( recenter, pmt_radius_cm, value, nsteps=20, x_offset=x_offset, rgb_channel=rgb_channel )
-        hovertext =  f"<b>OpChannel</b>: {opchid}<br>"
-        hovertext += f"<b>OpDetID</b>: {opdetid}"
-        mesh['hovertext'] = hovertext
-        outline['hovertext'] = hovertext
-        circles.append( mesh )
-        circles.append( outline )
-        
-    return circles
+    values = np.clip( (all_pe-min_pe)/(max_pe-min_pe), 0.0, 1.0 )
+    show = all_pe >= pe_draw_threshold
+    if not show.any():
+        return []
+
+    # how to interpret opflash PE(n) indexing: default is OpChannel, else larsoft opdet index
+    xpos = None
+    if xpos_by_time:
+        xpos = opflash.Time()*dv+x_offset
+
+    mesh = make_pmt_mesh( values, radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom,
+                          show=show, x_offset=x_offset, xpos=xpos, pe=all_pe, rgb_channel=rgb_channel )
+    outline = make_pmt_outline( radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom,
+                                show=show, x_offset=x_offset, xpos=xpos )
+    return [mesh,outline]
 
 def visualize_empty_opflash( pmt_radius_cm=15.2, use_v4_geom=True, use_opdet_index=False ):
-
-    circles = []
-    nsteps = 20
-    # for ipmt in range(32):
-    # we have to define a mesh
-    
-    for ipmt in range(32):
-        pe = 0.0
-        if use_opdet_index:
-            opdetid = ipmt
-            center = getPMTPosByOpDet(ipmt, use_v4_geom=use_v4_geom)
-            opchid  = getOpChannelFromOpDet(ipmt)
-        else:
-            opchid = ipmt
-            center = getPMTPosByOpChannel(ipmt, use_v4_geom=use_v4_geom)
-            opdetid = getOpDetFromOpChannel(ipmt)
-
-        mesh, outline = define_circle_mesh( center, pmt_radius_cm, pe, nsteps=20 )
-        hovertext =  f"<b>OpChannel</b>: {opchid}<br>"
-        hovertext += f"<b>OpDetID</b>: {opdetid}"
-        mesh['hovertext'] = hovertext
-        outline['hovertext'] = hovertext
-        circles.append( mesh )
-        circles.append( outline )
-        
-    return circles
+    """
+    Draw all PMTs with zero PE: one mesh and one outline trace.
+    """
+    mesh = make_pmt_mesh( np.zeros(32), radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom,
+                          pe=np.zeros(32) )
+    outline = make_pmt_outline( radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom )
+    return [mesh,outline]
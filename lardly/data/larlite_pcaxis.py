@@ -1,5 +1,6 @@
 import os,sys
 import numpy as np
+from .default_pid_colors import get_hashed_rgb
 
 def visualize_pcaxis( llpca, color=None, idnum=0 ):
     pca_pts = np.zeros( (3,3) )
@@ -8,9 +9,9 @@ def visualize_pcaxis( llpca, color=None, idnum=0 ):
         pca_pts[1,i] = llpca.getAvePosition()[i]
         pca_pts[2,i] = llpca.getEigenVectors()[4][i]
 
-    # random color
+    # color fixed by the axis id
     if color is None:
-        rand = np.random.randint(low=0,high=255,size=3)
+        rand = get_hashed_rgb( "pcaxis", idnum )
         pcacolor = "rgb(%d,%d,%d)"%(rand[0],rand[1],rand[2])
     else:
         pcacolor = color
@@ -2,6 +2,7 @@ import os,sys
 from ROOT import std
 from larlite import larlite,larutil
 import numpy as np
+from lardly.geometry import get_geometry
 
 def visualize3d_larlite_shower( larlite_shower ):
     shr = larlite_shower
@@ -23,33 +24,30 @@ def visualize3d_larlite_shower( larlite_shower ):
 
 def visualize2d_larlite_shower( larlite_shower ):
 
-    cm_per_tick = larutil.LArProperties.GetME().DriftVelocity()*0.5
+    geo = get_geometry()
     
     shr = larlite_shower
     shrlen = shr.Length()
 
-    # get projections: vertex
-    vtx_v = std.vector("double")(3)
-    vtx_v[0] = shr.ShowerStart().X()
-    vtx_v[1] = shr.ShowerStart().Y()
-    vtx_v[2] = shr.ShowerStart().Z()
+    # vertex and end points
+    pts = np.zeros( (2,3) )
+    pts[0,0] = shr.ShowerStart().X()
+    pts[0,1] = shr.ShowerStart().Y()
+    pts[0,2] = shr.ShowerStart().Z()
+    pts[1,0] = pts[0,0] + shrlen*shr.Direction().X()
+    pts[1,1] = pts[0,1] + shrlen*shr.Direction().Y()
+    pts[1,2] = pts[0,2] + shrlen*shr.Direction().Z()
 
-    # get projections: end
-    end_v = std.vector("double")(3)
-    end_v[0] = vtx_v[0] + shrlen*shr.Direction().X()
-    end_v[1] = vtx_v[1] + shrlen*shr.Direction().Y()
-    end_v[2] = vtx_v[2] + shrlen*shr.Direction().Z()
-
-    # wire coordintes
-    vtx = [ larutil.Geometry.GetME().WireCoordinate(vtx_v,p) for p in range(3) ]
-    end = [ larutil.Geometry.GetME().WireCoordinate(end_v,p) for p in range(3) ]
+    # wire coordinates and ticks
+    wires = geo.wire_coordinate( pts )
+    ticks = geo.x_to_tick( pts[:,0] )
 
     shower_traces = {}
     for p in range(3):
         shower_trace = {
             "type":"scatter",
-            "x":[ vtx[p], end[p] ],
-            "y":[ 3200+vtx_v[0]/cm_per_tick,3200+end_v[0]/cm_per_tick],
+            "x":wires[:,p],
+            "y":ticks,
             "mode":"lines",
             "line":{"color":"rgb(255,155,255)"},
         }
@@ -4,239 +4,273 @@ import os,sys
 import numpy as np
 from ROOT import std
 from larlite import larlite,larutil
-from ublarcvapp import ublarcvapp
 
-def visualize_larlite_simch( event_simch_v, color_by='edep', opacity=1.0, marker_size=2.0, 
-                            min_image_tick=2400, max_image_tick=8448,
-                            max_num_pts=20000,
-                            ioll=None ):
+from .larlite_mcgraph import MCTruthGraph
+from .default_pid_colors import default_pid_colors, get_hashed_rgb
+from .voxelize import voxelize_points
+from lardly.geometry import get_geometry
 
-    timeservice = larutil.TimeService.GetME()
-
-    nsimch = event_simch_v.size()
-    min_tdc = 1e9
-    max_tdc = 0
-    min_tick = 50000
-    max_tick = 0
-    pos_v = []
-    tid_v = []
+simch_hovertemplate = """
+        <b>x</b>: %{x:.1f}<br>
+        <b>y</b>: %{y:.1f}<br>
+        <b>z</b>: %{z:.1f}<br>
+        <b>edep</b>: %{customdata[0]:.3f} MeV<br>
+        <b>PID</b>:  %{customdata[1]:d}<br>
+        <b>TID</b>:  %{customdata[2]:d}<br>
+        <b>AID</b>:  %{customdata[3]:d}<br>
+        <b>ChID</b>: %{customdata[4]:d}<br>
+        """
 
-    mcpg = None
-    if ioll is not None:
-        mcpg = ublarcvapp.mctools.MCParticleGraph()
-        mcpg.buildgraph( ioll )
+def flatten_larlite_simch( event_simch_v, timeservice=None ):
+    """
+    Flatten all IDEs of an event_simch container into numpy arrays.
 
-    tid_map = {}
-    for isimch in range(nsimch):
-        simch = event_simch_v.at(isimch)
-        chid = simch.Channel()
-        idcmap = simch.TDCIDEMap()
-        nentries = idcmap.size()
-        for it in idcmap:
+    Parameters
+    ----------
 
-            tdc = float(it.first)
-            tick = int(timeservice.TPCTDC2Tick(tdc))
+    event_simch_v : larlite::event_simch
 
-            if min_tdc > tdc:
-                min_tdc = tdc
-            if max_tdc < it.first:
-                max_tdc = tdc
+    timeservice : larutil::TimeService or None
+       Used to convert TDC to ticks. If None, the singleton is used.
 
-            if min_tick > tick:
-                min_tick = tick
-            if max_tick < tick:
-                max_tick = tick
+    Returns
+    -------
+    dict of numpy arrays, one entry per IDE, with keys
+       'tick','channel','x','y','z','energy','trackid'
+    """
 
-            #if tick<min_image_tick or tick>max_image_tick:
-            #    continue
+    if timeservice is None:
+        timeservice = larutil.TimeService.GetME()
 
+    # pull the scalars out with one tight loop. 
+    # the TDC->tick conversion and everything else is done on whole arrays below.
+    tdc_v = []
+    ch_v = []
+    x_v = []
+    y_v = []
+    z_v = []
+    e_v = []
+    tid_v = []
+    for isimch in range(event_simch_v.size()):
+        simch = event_simch_v.at(isimch)
+        chid = simch.Channel()
+        for it in simch.TDCIDEMap():
+            tdc = it.first
             ide_v = it.second
             nide = ide_v.size()
-            for iide in range(nide):
-                ide = ide_v.at(iide)
-                tid = int(ide.trackID)
-                tid = abs(tid)
-
-                t0_ns = None
-                if mcpg is not None:
-                    mtid = mcpg.getShowerMotherID( tid )
-                    if mtid>0:
-                        tid = mtid
-                    aid = mcpg.getAncestorID( tid )
-                    if aid>0:
-                        t0_ns = mcpg.findTrackID( tid ).start.at(3)
-                
-                x_t0_offset = 0.0
-                if t0_ns is not None:
-                    x_t0_offset = t0_ns*0.001*0.1098
-                else:
-                    continue
-
-                if tid not in tid_map:
-                    tid_map[tid] = {}
-                if tick not in tid_map[tid]:
-                    tid_map[tid][tick] = []
-                tid_map[tid][tick].append( (chid,ide.energy,ide.x,ide.y,ide.z) )
-                if ide.x<-1000 or ide.x>10000:
-                    continue
-                if ide.y<-1000 or ide.y>10000:
-                    continue
-                if ide.z<-1000 or ide.z>10000:
-                    continue
-
-                #x_tick = (tick-3200)*0.5*0.1098 - x_t0_offset
-                x_tick = (tick-3200)*0.5*0.1098
-                pos_v.append( (x_tick,ide.y,ide.z,ide.energy,chid) )
-                tid_v.append( (tid) )
-
-
-        #print(f"Simch[{chid}]: num ide map entries = {nentries}")
-    #print("tdc: [",min_tdc,",",max_tdc,"]")
-    #print("tick: [",min_tick,",",max_tick,"]")
-    print("Number of SimCh deposits within image tick bounds: ",len(pos_v))
-    # for tid in tid_map:
-    #     print("TRACKID[",tid,"]")
-    #     tick_map = tid_map[tid]
-    #     #for tick in tick_map:
-    #     #    print("  tick[",tick,"]: ",tick_map[tick])
-
-    data = np.array( pos_v )
-    tid_array = np.array( tid_v )
-    #print("data array: ",data.shape)
-
-    if data.shape[0]>max_num_pts:
-        indexlist = np.arange(data.shape[0])
-        np.random.shuffle(indexlist)
-        data = data[indexlist[:max_num_pts],:]
-        tid_array = tid_array[indexlist[:max_num_pts]]
-        #print("downsampled data array: ",data.shape)
-
-    if color_by in ['instance','ancestor'] and mcpg is not None:
-        # replace IDs by shower mother id
-        tid_showermid = {}
-        unique_tid = np.unique( tid_array )
-        for tid in unique_tid:
-            #print("find tid: ",tid," ",type(tid))
-            xtid = abs(int(tid))
-            mtid = mcpg.getShowerMotherID( xtid )
-            if mtid<0 and int(tid)<0:
-                mtid = mcpg.getShowerMotherID( int(tid) )
-            if mtid>0:
-                #print("  found shower motherid: ",mtid)
-                tid_showermid[int(tid)] = mtid
-            else:
-                tid_showermid[int(tid)] = int(tid)
-        for tid in unique_tid:
-            tid_mask = tid_array==tid
-            tid_array[tid_mask[:]] = tid_showermid[int(tid)]
-
-
-    if color_by=='ancestor' and ioll is not None:
-        tid_to_ancestor = {}
-        if mcpg is None:
-            mcpg = ublarcvapp.mctools.MCPixelPGraph()
-            mcpg.buildgraphonly( ioll )
-        
-        #mcpg.printAllNodeInfo()
-        unique_tid = np.unique( tid_array )
-        for tid in unique_tid:
-            #print("find aid for tid: ",tid," ",type(tid))
-            aid = mcpg.getAncestorID( xtid )
-            if aid<=0:
-                #print(" cannot get aid for tid=",xtid)
-                tid_to_ancestor[tid] = xtid
-                continue
-            else:
-                #print(" ancestor found: ",aid)
-                tid_to_ancestor[tid] = aid
-
-        for tid in unique_tid:
-            tid_mask = tid_array==tid
-            tid_array[tid_mask[:]] = tid_to_ancestor[tid]
+            tdc_v.extend( [tdc]*nide )
+            ch_v.extend( [chid]*nide )
+            for ide in ide_v:
+                x_v.append( ide.x )
+                y_v.append( ide.y )
+                z_v.append( ide.z )
+                e_v.append( ide.energy )
+                tid_v.append( ide.trackID )
+
+    tdc = np.array( tdc_v, dtype=np.float64 )
+    # TPCTDC2Tick is linear in the TDC: get the slope and offset once
+    t0 = float(timeservice.TPCTDC2Tick(0.0))
+    slope = float(timeservice.TPCTDC2Tick(1.0)) - t0
+    tick = (tdc*slope + t0).astype(np.int64)
+
+    return { 'tick':tick,
+             'channel':np.array( ch_v, dtype=np.int64 ),
+             'x':np.array( x_v, dtype=np.float64 ),
+             'y':np.array( y_v, dtype=np.float64 ),
+             'z':np.array( z_v, dtype=np.float64 ),
+             'energy':np.array( e_v, dtype=np.float64 ),
+             'trackid':np.array( tid_v, dtype=np.int64 ) }
+
+def lookup_simch_particles( trackid, mcgraph ):
+    """
+    Resolve truth info for an array of IDE track ids.
+
+    The graph is only queried for the unique track ids.
+    Results are broadcast back to every deposit with the np.unique inverse index.
+
+    Parameters
+    ----------
+
+    trackid : numpy array of IDE track ids
+    mcgraph : lardly.data.larlite_mcgraph.MCTruthGraph
+
+    Returns
+    -------
+    dict of numpy arrays with keys
+       'instance' : shower mother id if there is one, else the track id
+       'ancestor' : ancestor id of the instance (<=0 if not found)
+       'pid'      : pdg code of the instance
+    """
+    unique_tid, inverse = np.unique( np.abs(trackid), return_inverse=True )
+    instance = mcgraph.instance_id( unique_tid )
+    ancestor = mcgraph.ancestor_id( instance )
+    pid = mcgraph.pdg_code( instance )
+    return { 'instance':instance[inverse],
+             'ancestor':ancestor[inverse],
+             'pid':pid[inverse] }
 
-    
-    labels_v = []
-    if mcpg is not None:
-        print("Make customdata for hovertemplate")
-        for i in range(data.shape[0]):
-            xtid = int(tid_array[i])
-            pid  = float(mcpg.getParticleID(xtid))
-            aid  = float(mcpg.getAncestorID(xtid))
-            chid = data[i,4]
-            edep = data[i,3]
-            labels_v.append((edep,pid,float(xtid),aid,chid))
-        customdata = np.array( labels_v, dtype=np.float32 )
-        hovertemplate = """
-        <b>x</b>: %{x:.1f}<br>
-        <b>y</b>: %{y:.1f}<br>
-        <b>z</b>: %{z:.1f}<br>
-        <b>edep</b>: %{customdata[0]:.3f} MeV<br>
-        <b>PID</b>:  %{customdata[1]:d}<br>
-        <b>TID</b>:  %{customdata[2]:d}<br>
-        <b>AID</b>:  %{customdata[3]:d}<br>
-        <b>ChID</b>: %{customdata[4]:d}<br>
-        """
+def visualize_larlite_simch( event_simch_v, color_by='edep', opacity=1.0, marker_size=2.0, 
+                            min_image_tick=2400, max_image_tick=8448,
+                            max_num_pts=20000,
+                            ioll=None, mcgraph=None,
+                            downsample_mode='random', voxel_size=0.3, seed=0 ):
+    """
+    Plot the energy deposits stored in an event_simch container.
+
+    Parameters
+    ----------
+
+    color_by : str
+       'edep' (color by energy), 'instance' (one trace per shower-mother/track id),
+       'ancestor' (one trace per ancestor id) or 'pid' (color by particle type).
+       'instance', 'ancestor' and 'pid' need a particle graph.
+
+    max_num_pts : int
+       Deposits are randomly downsampled to this number before the hover data is made.
+
+    downsample_mode : str
+       'random': keep a random subset of max_num_pts deposits.
+       'voxel': sum the deposits into cubes of side `voxel_size` cm. One point per occupied voxel
+       is drawn at the energy-weighted centroid, carrying the summed energy and the
+       id of the particle that deposited the most energy in it.
+       If there are still more than max_num_pts voxels, they are randomly downsampled.
+
+    voxel_size : float
+       Voxel size in cm for downsample_mode='voxel' (default 0.3, about the wire pitch)
+
+    seed : int
+       seed of the random downsampling, so the same event always gives the same points
+
+    ioll : larlite::storage_manager or None
+       Used to build the truth graph, if `mcgraph` is not given.
+
+    mcgraph : lardly.data.larlite_mcgraph.MCTruthGraph or None
+       An already built truth graph, e.g. the one cached for the entry.
+    """
+
+    if mcgraph is None and ioll is not None:
+        mcgraph = MCTruthGraph.from_larlite( ioll )
+
+    deposits = flatten_larlite_simch( event_simch_v )
+    ndeposits = deposits['tick'].shape[0]
+
+    # keep deposits with a sensible position
+    keep = np.ones( ndeposits, dtype=bool )
+    for v in ['x','y','z']:
+        keep &= (deposits[v]>=-1000)*(deposits[v]<=10000)
+
+    particles = None
+    if mcgraph is not None and len(mcgraph)>0:
+        particles = lookup_simch_particles( deposits['trackid'], mcgraph )
+        # only keep deposits that can be traced back to an ancestor
+        keep &= particles['ancestor']>0
+
+    index = np.nonzero(keep)[0]
+    print("Number of SimCh deposits within image tick bounds: ",index.shape[0])
+
+    x = get_geometry().tick_to_x( deposits['tick'][index] )
+    y = deposits['y'][index]
+    z = deposits['z'][index]
+    edep = deposits['energy'][index]
+    chid = deposits['channel'][index]
+    if particles is not None:
+        instance = particles['instance'][index]
+        ancestor = particles['ancestor'][index]
+        pid = particles['pid'][index]
     else:
-        customdata = None
-        hovertemplate = None
+        instance = np.abs( deposits['trackid'][index] )
+        ancestor = instance
+        pid = None
+
+    if downsample_mode=='voxel' and index.shape[0]>0:
+        voxels = voxelize_points( np.stack([x,y,z],axis=1), weights=edep,
+                                  voxel_size=voxel_size, labels=instance )
+        rep = voxels['representative']
+        x = voxels['xyz'][:,0]
+        y = voxels['xyz'][:,1]
+        z = voxels['xyz'][:,2]
+        edep = voxels['weight']
+        chid = chid[rep]
+        instance = voxels['label']
+        ancestor = ancestor[rep]
+        if pid is not None:
+            pid = pid[rep]
+        print("Number of SimCh voxels: ",x.shape[0])
+    elif downsample_mode not in ['random','voxel']:
+        raise ValueError("Unrecognized downsample_mode option: ",downsample_mode)
+
+    # downsample before making any per-point data
+    npts = x.shape[0]
+    if npts>max_num_pts:
+        sel = np.sort( np.random.default_rng(seed).choice( npts, size=max_num_pts, replace=False ) )
+        x, y, z, edep, chid = x[sel], y[sel], z[sel], edep[sel], chid[sel]
+        instance, ancestor = instance[sel], ancestor[sel]
+        if pid is not None:
+            pid = pid[sel]
+        npts = max_num_pts
+
+    customdata = None
+    hovertemplate = None
+    if particles is not None:
+        customdata = np.zeros( (npts,5), dtype=np.float32 )
+        customdata[:,0] = edep
+        customdata[:,1] = pid
+        customdata[:,2] = instance
+        customdata[:,3] = ancestor
+        customdata[:,4] = chid
+        hovertemplate = simch_hovertemplate
 
     simch_plots = []
-    if color_by=='edep':
-        if hovertemplate is None:
-            simch_plot = {
-                 "type":"scatter3d",
-                 "x":data[:,0],
-                 "y":data[:,1],
-                 "z":data[:,2],
-                 "mode":"markers",
-                 "name":"simch",
-                 "marker":{"color":data[:,3],'opacity':opacity,'size':marker_size},
-            }
-        else:
-            simch_plot = {
-                 "type":"scatter3d",
-                 "x":data[:,0],
-                 "y":data[:,1],
-                 "z":data[:,2],
-                 "mode":"markers",
-                 "name":"simch",
-                 "hovertemplate":hovertemplate,
-                 "customdata":customdata,
-                 "marker":{"color":data[:,3],'opacity':opacity,'size':marker_size},
-            }            
+    if color_by=='edep' or (color_by=='pid' and pid is None):
+        simch_plot = {
+            "type":"scatter3d",
+            "x":x,
+            "y":y,
+            "z":z,
+            "mode":"markers",
+            "name":"simch",
+            "marker":{"color":edep,'opacity':opacity,'size':marker_size},
+        }
+        if hovertemplate is not None:
+            simch_plot["hovertemplate"] = hovertemplate
+            simch_plot["customdata"] = customdata
+        simch_plots.append( simch_plot )
+    elif color_by=='pid':
+        unique_pid, pid_inverse = np.unique( pid, return_inverse=True )
+        pid_colors = np.array( [ default_pid_colors.get(int(p),default_pid_colors[0]) for p in unique_pid ], dtype=object )
+        simch_plot = {
+            "type":"scatter3d",
+            "x":x,
+            "y":y,
+            "z":z,
+            "mode":"markers",
+            "name":"simch",
+            "hovertemplate":hovertemplate,
+            "customdata":customdata,
+            "marker":{"color":pid_colors[pid_inverse].tolist(),'opacity':opacity,'size':marker_size},
+        }
         simch_plots.append( simch_plot )
     elif color_by in ['instance','ancestor']:
-        unique_tid = np.unique( tid_array )
-        for tid in unique_tid:
-            instance_mask = tid_array==tid
-            xdata = data[instance_mask[:],:]
-            if customdata is not None:
-                xcustomdata = customdata[instance_mask[:],:]
-            rcolor = np.random.randint(0,255,3)
+        group_id = instance if color_by=='instance' else ancestor
+        # split the points by id using the unique inverse index, instead of one mask per id
+        unique_tid, group_inverse, group_counts = np.unique( group_id, return_inverse=True, return_counts=True )
+        order = np.argsort( group_inverse, kind='stable' )
+        group_index_v = np.split( order, np.cumsum(group_counts)[:-1] )
+        for tid,group_index in zip(unique_tid,group_index_v):
+            rcolor = get_hashed_rgb( color_by, tid )
             strcolor = "rgba(%d,%d,%d,1.0)"%(rcolor[0],rcolor[1],rcolor[2])
-            if hovertemplate is None:
-                simch_plot = {
-                    "type":"scatter3d",
-                    "x":xdata[:,0],
-                    "y":xdata[:,1],
-                    "z":xdata[:,2],
-                    "mode":"markers",
-                    "name":f"tid[{tid}]",
-                    "marker":{"color":strcolor,"opacity":opacity,"size":marker_size}
-                }
-            else:
-                #print("simch plot with template")
-                simch_plot = {
-                    "type":"scatter3d",
-                    "x":xdata[:,0],
-                    "y":xdata[:,1],
-                    "z":xdata[:,2],
-                    "mode":"markers",
-                    "name":f"tid[{tid}]",
-                    "customdata":xcustomdata,
-                    "hovertemplate":hovertemplate,
-                    "marker":{"color":strcolor,"opacity":opacity,"size":marker_size}
-                }                
+            simch_plot = {
+                "type":"scatter3d",
+                "x":x[group_index],
+                "y":y[group_index],
+                "z":z[group_index],
+                "mode":"markers",
+                "name":f"tid[{tid}]",
+                "marker":{"color":strcolor,"opacity":opacity,"size":marker_size}
+            }
+            if hovertemplate is not None:
+                simch_plot["customdata"] = customdata[group_index,:]
+                simch_plot["hovertemplate"] = hovertemplate
             simch_plots.append( simch_plot )
     else:
         raise ValueError("Unrecognized color_by option: ",color_by)
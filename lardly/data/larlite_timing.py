@@ -0,0 +1,185 @@
+import os,sys
+import threading
+import numpy as np
+
+class TimingIndex:
+    """
+    Times of the optical flashes, CRT hits and CRT tracks of one entry.
+
+    Each container is read from the storage manager once, the first time it is asked for.
+    Flash times are kept sorted, so "which flash is closest to each of these times"
+    is answered for a whole array of times with np.searchsorted.
+    The nearest-flash distance of every crthit/crttrack is also kept, so that
+    changing the allowed time difference only needs a comparison.
+
+    All times are in microseconds.
+    """
+
+    def __init__( self, ioll=None ):
+        self.ioll = ioll
+        self._flashes = {}    # producer -> dict(time, order, sorted)
+        self._combined = {}   # tuple of producers -> (sorted times, producer slot, container index)
+        self._crthits = {}    # producer -> dict of arrays
+        self._crttracks = {}  # producer -> dict of arrays
+        self._dt = {}         # (kind,producer,flash producers) -> (dt, producer slot, flash index)
+        self._lock = threading.RLock()
+
+    # ---- filling ----
+
+    def add_flashes( self, producer, times ):
+        """ store flash times (in container order) for a producer """
+        times = np.asarray( times, dtype=np.float64 ).reshape(-1)
+        order = np.argsort( times, kind='stable' )
+        with self._lock:
+            self._flashes[producer] = { 'time':times, 'order':order, 'sorted':times[order] }
+            self._combined.clear()
+            self._dt.clear()
+
+    def _load_flashes( self, producer ):
+        with self._lock:
+            if producer not in self._flashes:
+                ev_flash = self.ioll.get_data( "opflash", producer )
+                nflashes = ev_flash.size()
+                times = np.fromiter( (ev_flash.at(i).Time() for i in range(nflashes)),
+                                     dtype=np.float64, count=nflashes )
+                self.add_flashes( producer, times )
+            return self._flashes[producer]
+
+    def crthits( self, producer ):
+        """
+        arrays of the crthits of a producer, in container order.
+        keys: 't_usec', 'x', 'y', 'z', 'plane'
+        """
+        with self._lock:
+            if producer not in self._crthits:
+                ev_crthit = self.ioll.get_data( "crthit", producer )
+                nhits = ev_crthit.size()
+                table = np.zeros( (nhits,5) )
+                for ihit in range(nhits):
+                    crthit = ev_crthit.at(ihit)
+                    table[ihit,:] = ( crthit.ts2_ns*0.001, crthit.x_pos, crthit.y_pos, crthit.z_pos, crthit.plane )
+                self._crthits[producer] = { 't_usec':table[:,0], 'x':table[:,1], 'y':table[:,2],
+                                            'z':table[:,3], 'plane':table[:,4].astype(np.int64) }
+            return self._crthits[producer]
+
+    def crttracks( self, producer ):
+        """
+        arrays of the crttracks of a producer, in container order.
+        keys: 't_usec' (time of the first hit)
+        """
+        with self._lock:
+            if producer not in self._crttracks:
+                ev_crttrack = self.ioll.get_data( "crttrack", producer )
+                ntracks = ev_crttrack.size()
+                t_usec = np.fromiter( (ev_crttrack.at(i).ts2_ns_h1*0.001 for i in range(ntracks)),
+                                      dtype=np.float64, count=ntracks )
+                self._crttracks[producer] = { 't_usec':t_usec }
+            return self._crttracks[producer]
+
+    # ---- queries ----
+
+    def flash_times( self, producer ):
+        """ flash times of a producer, in container order """
+        return self._load_flashes( producer )['time']
+
+    def flashes_in_window( self, producer, tmin, tmax ):
+        """ container indices of the flashes with tmin <= t <= tmax, in container order """
+        flashes = self._load_flashes( producer )
+        lo = np.searchsorted( flashes['sorted'], tmin, side='left' )
+        hi = np.searchsorted( flashes['sorted'], tmax, side='right' )
+        return np.sort( flashes['order'][lo:hi] )
+
+    def _combined_flashes( self, producers ):
+        key = tuple(producers)
+        with self._lock:
+            if key not in self._combined:
+                times = []
+                slots = []
+                index = []
+                for islot,producer in enumerate(key):
+                    t = self._load_flashes( producer )['time']
+                    times.append( t )
+                    slots.append( np.full( t.shape[0], islot, dtype=np.int64 ) )
+                    index.append( np.arange( t.shape[0], dtype=np.int64 ) )
+                times = np.concatenate( times ) if len(times)>0 else np.zeros(0)
+                slots = np.concatenate( slots ) if len(slots)>0 else np.zeros(0,dtype=np.int64)
+                index = np.concatenate( index ) if len(index)>0 else np.zeros(0,dtype=np.int64)
+                order = np.argsort( times, kind='stable' )
+                self._combined[key] = ( times[order], slots[order], index[order] )
+            return self._combined[key]
+
+    def nearest_flash( self, times, producers ):
+        """
+        Find the closest flash to each time.
+
+        Parameters
+        ----------
+
+        times : numpy array with shape (N,), in usec
+        producers : str or list of str
+           opflash producers to search. Flashes of all of them are searched together.
+
+        Returns
+        -------
+        tuple of three numpy arrays with shape (N,)
+           |dt| to the nearest flash (inf if there are no flashes),
+           position of the flash's producer in `producers` (-1 if none),
+           index of the flash in its container (-1 if none)
+        """
+        if isinstance(producers,str):
+            producers = [producers]
+        times = np.asarray( times, dtype=np.float64 ).reshape(-1)
+        sorted_t, slots, index = self._combined_flashes( producers )
+        nflashes = sorted_t.shape[0]
+        if nflashes==0:
+            return ( np.full( times.shape, np.inf ),
+                     np.full( times.shape, -1, dtype=np.int64 ),
+                     np.full( times.shape, -1, dtype=np.int64 ) )
+        # the nearest flash is either the one just before or just after
+        after = np.clip( np.searchsorted( sorted_t, times ), 0, nflashes-1 )
+        before = np.clip( after-1, 0, nflashes-1 )
+        dt_after = np.abs( sorted_t[after]-times )
+        dt_before = np.abs( sorted_t[before]-times )
+        pick = np.where( dt_after<dt_before, after, before )
+        dt = np.minimum( dt_after, dt_before )
+        return dt, slots[pick], index[pick]
+
+    def _cached_nearest( self, kind, producer, times, flash_producers ):
+        if isinstance(flash_producers,str):
+            flash_producers = [flash_producers]
+        key = (kind,producer,tuple(flash_producers))
+        with self._lock:
+            if key not in self._dt:
+                self._dt[key] = self.nearest_flash( times, flash_producers )
+            return self._dt[key]
+
+    def crthit_flash_match( self, crthit_producer, flash_producers ):
+        """ nearest_flash for every crthit of the producer, cached """
+        t_usec = self.crthits( crthit_producer )['t_usec']
+        return self._cached_nearest( "crthit", crthit_producer, t_usec, flash_producers )
+
+    def crttrack_flash_match( self, crttrack_producer, flash_producers ):
+        """ nearest_flash for every crttrack of the producer, cached """
+        t_usec = self.crttracks( crttrack_producer )['t_usec']
+        return self._cached_nearest( "crttrack", crttrack_producer, t_usec, flash_producers )
+
+    def crthits_near_flash( self, crthit_producer, flash_producers, max_dt_usec ):
+        """ boolean mask of the crthits within max_dt_usec of a flash """
+        dt, _, _ = self.crthit_flash_match( crthit_producer, flash_producers )
+        return dt < max_dt_usec
+
+    def crttracks_near_flash( self, crttrack_producer, flash_producers, max_dt_usec ):
+        """ boolean mask of the crttracks within max_dt_usec of a flash """
+        dt, _, _ = self.crttrack_flash_match( crttrack_producer, flash_producers )
+        return dt < max_dt_usec
+
+def get_timing_index( ioll, entry_cache=None ):
+    """
+    Get the timing index for the current entry.
+
+    If an entry cache is given (see lardly.ubdl.io.entry_cache), one index is kept per entry
+    and shared by all plotters, so every container is only read once.
+    """
+    if entry_cache is None:
+        return TimingIndex( ioll )
+    return entry_cache.get( ("timing_index",), lambda: TimingIndex( ioll ) )
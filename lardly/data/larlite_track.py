@@ -1,15 +1,36 @@
 import os,sys
 import numpy as np
-from ROOT import std
-from larlite import larlite,larutil
+from .polyline import make_polyline_trace
+from lardly.geometry import get_geometry
+
+def make_track_projection_hovertemplate( offset=0 ):
+    """ hover template for the columns made by get_track_projection_info, starting at customdata[offset] """
+    return """
+        <b>x</b>: %{{x:.1f}}<br>
+        <b>y</b>: %{{y:.1f}}<br>
+        <b>z</b>: %{{z:.1f}}<br>
+        <b>t</b>: %{{customdata[{}]:.1f}} usec<br>
+        <b>tick</b>: %{{customdata[{}]:.0f}}<br>
+        <b>U</b>: %{{customdata[{}]:.0f}}<br>
+        <b>V</b>: %{{customdata[{}]:.0f}}<br>
+        <b>Y</b>: %{{customdata[{}]:.0f}}<br>
+        """.format( *range(offset,offset+5) )
+
+def get_larlite_track_points( larlite_track ):
+    """ get the trajectory of a larlite::track as a (N,3) numpy array """
+    npoints = larlite_track.NumberTrajectoryPoints()
+    locs = [ larlite_track.LocationAtPoint(ipt) for ipt in range(npoints) ]
+    xyz = np.array( [ (loc.X(),loc.Y(),loc.Z()) for loc in locs ], dtype=np.float64 ).reshape(npoints,3)
+    return xyz
+
+def get_track_projection_info( xyz ):
+    """ (N,5) array of (t usec, tick, U wire, V wire, Y wire) for each point of a trajectory """
+    return get_geometry().projection_info( xyz )
 
 def visualize_larlite_track( larlite_track, track_id=None, color=None, show_projection_info=True ):
 
     npoints = larlite_track.NumberTrajectoryPoints()
-    xyz = np.zeros( (npoints,3 ) )
-    for ipt in range(npoints):
-        for i in range(3):
-            xyz[ipt,i] = larlite_track.LocationAtPoint(ipt)(i)
+    xyz = get_larlite_track_points( larlite_track )
 
 
     if track_id is None:
@@ -48,31 +69,8 @@ def visualize_larlite_track( larlite_track, track_id=None, color=None, show_proj
     }
         
     if show_projection_info:
-        cm_per_tick = larutil.LArProperties.GetME().DriftVelocity()*0.5                
-        customdata = np.zeros( (npoints,5) )
-        hovertemplate="""
-        <b>x</b>: %{x:.1f}<br>
-        <b>y</b>: %{y:.1f}<br>
-        <b>z</b>: %{z:.1f}<br>
-        <b>t</b>: %{customdata[0]:.1f} usec<br>
-        <b>tick</b>: %{customdata[1]:.0f}<br>
-        <b>U</b>: %{customdata[2]:.0f}<br>
-        <b>V</b>: %{customdata[3]:.0f}<br>
-        <b>Y</b>: %{customdata[4]:.0f}<br>
-        """
-
-        for ipt in range(npoints):
-            loc = larlite_track.LocationAtPoint(ipt)
-            x = larlite_track.LocationAtPoint(ipt)[0]
-            tick = 3200 + x/cm_per_tick
-            t = x/cm_per_tick*0.5
-            customdata[ipt,0] = t
-            customdata[ipt,1] = tick
-            for p in range(3):
-                customdata[ipt,2+p] = larutil.Geometry.GetME().WireCoordinate( loc, p )
-
-        track['hovertemplate'] = hovertemplate
-        track['customdata'] = customdata
+        track['hovertemplate'] = make_track_projection_hovertemplate()
+        track['customdata'] = get_track_projection_info( xyz )
 
     if type(color) is str and "dqdx" in color:
         track["mode"] = "lines+markers"
@@ -81,6 +79,54 @@ def visualize_larlite_track( larlite_track, track_id=None, color=None, show_proj
 
     return track
 
+def visualize_larlite_event_track( event_track, name="", color=None, width=2,
+                                   track_ids=None, track_labels=None, show_projection_info=True ):
+    """
+    Plot all tracks of a container as a single polyline trace.
+
+    Parameters
+    ----------
+
+    event_track : larlite::event_track or a python list of larlite::track
+    color : one color for all tracks, or one color per track (rgb strings or (r,g,b) tuples)
+    track_ids : id shown in hover for each track (default: index in container)
+    track_labels : optional hover label for each track
+    """
+    if type(event_track) is list:
+        tracks = event_track
+    else:
+        tracks = [ event_track.at(i) for i in range(event_track.size()) ]
+    if len(tracks)==0:
+        return None
+
+    if color is None:
+        color = "rgb(255,0,0)"
+    if type(color) in [list,tuple] and len(color)==len(tracks) and type(color[0]) is not int:
+        colors = [ c if type(c) is str else "rgb({},{},{})".format(c[0],c[1],c[2]) for c in color ]
+    elif type(color) is str:
+        colors = color
+    else:
+        colors = "rgb({},{},{})".format(color[0],color[1],color[2])
+
+    segments = [ get_larlite_track_points(track) for track in tracks ]
+    if track_ids is None:
+        track_ids = list(range(len(tracks)))
+
+    customdata = None
+    hovertemplate = None
+    if show_projection_info:
+        customdata = [ get_track_projection_info(xyz) for xyz in segments ]
+        if track_labels is not None:
+            hovertemplate = "<b>%{text}</b><br>"
+        else:
+            hovertemplate = "<b>track</b>: %{customdata[0]:.0f}<br>"
+        # the projection columns come after the track id
+        hovertemplate += make_track_projection_hovertemplate( offset=1 )
+
+    return make_polyline_trace( segments, colors=colors, segment_ids=track_ids,
+                                segment_labels=track_labels, customdata=customdata,
+                                name=name, width=width, hovertemplate=hovertemplate )
+
 def visualize_larlite_track_vtx( larlite_track ):
 
     xyz = np.zeros( (1,3 ) )
@@ -122,8 +168,9 @@ def visualize_larlite_track_end( larlite_track ):
 def visualize2d_larlite_track( larlite_track, larcv_image2d_v, track_id=None, color=None ):
     """ plot path projected into wire planes """
 
-    npoints = larlite_track.NumberTrajectoryPoints()
-    cm_per_tick = larutil.LArProperties.GetME().DriftVelocity()*0.5        
+    geo = get_geometry()
+    xyz = get_larlite_track_points( larlite_track )
+    tick = geo.x_to_tick( xyz[:,0] )
 
     if color is None:
         color = "rgb(255,0,0)"
@@ -138,19 +185,10 @@ def visualize2d_larlite_track( larlite_track, larcv_image2d_v, track_id=None, co
         
     traces2d = {}
     for p in range(larcv_image2d_v.size()):
-
-        wt = np.zeros( (npoints,2) )
-
-        for ipt in range(npoints):
-            wire = larutil.Geometry.GetME().WireCoordinate( larlite_track.LocationAtPoint(ipt), p )
-            x = larlite_track.LocationAtPoint(ipt)[0]
-            tick = 3200 + x/cm_per_tick
-            wt[ipt,0] = wire
-            wt[ipt,1] = tick
         traces2d[p] = {
             "type":"scatter",
-            "x":wt[:,0],
-            "y":wt[:,1],
+            "x":geo.wire_coordinate( xyz, p ),
+            "y":tick,
             "mode":"lines",
             "name":name,
             "line":{"color":color,"width":2},
@@ -0,0 +1,128 @@
+import os,sys
+import numpy as np
+
+def make_polyline_trace( segments, colors="rgb(255,0,0)", segment_ids=None, segment_labels=None,
+                         customdata=None, name="", width=2, mode="lines",
+                         hovertemplate=None, colorscale=None, marker_size=None ):
+    """
+    Concatenate many polylines into a single scatter3d trace.
+
+    Each polyline is separated from the next by a row of NaN values, which plotly
+    draws as a gap. This lets an event with hundreds of tracks be sent to the
+    browser as one trace instead of one trace per track.
+
+    Parameters
+    ----------
+
+    segments : list of numpy arrays with shape (N_i,3)
+       The (x,y,z) points of each polyline. Empty segments are skipped.
+
+    colors : str, list of str, or list of numpy arrays
+       A single color for everything, one color string per segment,
+       or one array of numeric values per segment (per-vertex coloring, use with `colorscale`).
+
+    segment_ids : list of numbers or None
+       Id stored in customdata[0] of every vertex of the segment, so that hover
+       can resolve which track a point belongs to. Defaults to the segment index.
+
+    segment_labels : list of str or None
+       If given, each vertex gets the label of its segment as hover `text`.
+
+    customdata : list of numpy arrays with shape (N_i,M) or None
+       Extra per-vertex hover columns. They are stored after the segment id,
+       i.e. starting at customdata[1].
+
+    hovertemplate : str or None
+       Custom hover template. If None, a template showing the label or id is made.
+
+    Returns
+    -------
+    dict : scatter3d trace, or None if there are no points
+    """
+
+    keep = [ i for i,seg in enumerate(segments) if seg is not None and len(seg)>0 ]
+    if len(keep)==0:
+        return None
+
+    nseg = len(keep)
+    segs = [ np.asarray(segments[i],dtype=np.float64)[:,:3] for i in keep ]
+    lengths = np.array( [ seg.shape[0] for seg in segs ], dtype=np.int64 )
+
+    # each segment is followed by a separator row (except the last one),
+    # so the output row of a vertex is its flat index shifted by its segment index
+    npts = int(lengths.sum())
+    nrows = npts + nseg - 1
+    seg_index = np.repeat( np.arange(nseg), lengths )
+    rows = np.arange(npts) + seg_index
+    sep_rows = np.cumsum( lengths+1 )[:-1] - 1
+
+    xyz = np.full( (nrows,3), np.nan )
+    xyz[rows,:] = np.concatenate( segs, axis=0 )
+
+    # segment ids for hover
+    if segment_ids is None:
+        ids = np.asarray( keep, dtype=np.float64 )
+    else:
+        ids = np.asarray( [ segment_ids[i] for i in keep ], dtype=np.float64 )
+    ncols = 1
+    extra = None
+    if customdata is not None:
+        extra = [ np.asarray(customdata[i],dtype=np.float64).reshape(lengths[n],-1) for n,i in enumerate(keep) ]
+        ncols += extra[0].shape[1]
+    cdata = np.full( (nrows,ncols), np.nan )
+    cdata[rows,0] = ids[seg_index]
+    if extra is not None:
+        cdata[rows,1:] = np.concatenate( extra, axis=0 )
+
+    trace = {
+        "type":"scatter3d",
+        "x":xyz[:,0],
+        "y":xyz[:,1],
+        "z":xyz[:,2],
+        "mode":mode,
+        "name":name,
+        "customdata":cdata,
+        "line":{"width":width},
+    }
+
+    # colors: single, per segment, or per vertex
+    if isinstance(colors,str):
+        line_color = colors
+    elif len(colors)>0 and isinstance(colors[0],str):
+        seg_colors = np.array( [ colors[i] for i in keep ], dtype=object )
+        vertex_colors = np.full( nrows, seg_colors[0], dtype=object )
+        vertex_colors[rows] = seg_colors[seg_index]
+        # separators take the color of the segment before them
+        if sep_rows.shape[0]>0:
+            vertex_colors[sep_rows] = vertex_colors[sep_rows-1]
+        line_color = vertex_colors.tolist()
+    else:
+        vertex_values = np.full( nrows, np.nan )
+        vertex_values[rows] = np.concatenate( [ np.asarray(colors[i],dtype=np.float64) for i in keep ] )
+        line_color = vertex_values
+        if colorscale is not None:
+            trace["line"]["colorscale"] = colorscale
+    trace["line"]["color"] = line_color
+
+    if "markers" in mode:
+        trace["marker"] = {"color":line_color}
+        if marker_size is not None:
+            trace["marker"]["size"] = marker_size
+        if colorscale is not None and not isinstance(line_color,(str,list)):
+            trace["marker"]["colorscale"] = colorscale
+
+    if segment_labels is not None:
+        seg_labels = np.array( [ segment_labels[i] for i in keep ], dtype=object )
+        text = np.full( nrows, "", dtype=object )
+        text[rows] = seg_labels[seg_index]
+        trace["text"] = text.tolist()
+
+    if hovertemplate is None:
+        if segment_labels is not None:
+            hovertemplate = "<b>%{text}</b><br>"
+        else:
+            hovertemplate = "<b>id</b>: %{customdata[0]:.0f}<br>"
+        hovertemplate += "<b>x</b>: %{x:.1f}<br><b>y</b>: %{y:.1f}<br><b>z</b>: %{z:.1f}<br>"
+    trace["hovertemplate"] = hovertemplate
+
+    return trace
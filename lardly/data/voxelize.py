@@ -0,0 +1,150 @@
+import os,sys
+import numpy as np
+
+def voxelize_points( xyz, weights=None, voxel_size=0.3, labels=None ):
+    """
+    Aggregate a point cloud into occupied voxels.
+
+    All the work is done with np.unique/np.bincount on the integer voxel coordinates,
+    so millions of points can be reduced without a python loop.
+
+    Parameters
+    ----------
+
+    xyz : numpy array with shape (N,3)
+
+    weights : numpy array with shape (N,) or None
+       Quantity summed in each voxel, e.g. deposited energy. If None, every point has weight 1.
+
+    voxel_size : float or sequence of 3 floats
+       Voxel edge length in cm. The default is roughly the wire pitch.
+
+    labels : numpy array of ints with shape (N,) or None
+       Per-point label, e.g. a track id. If given, the label with the largest
+       summed weight in each voxel is returned.
+
+    Returns
+    -------
+    dict with keys
+       'xyz'      : (M,3) weighted centroid of the points in each voxel
+       'weight'   : (M,) summed weight
+       'count'    : (M,) number of points
+       'inverse'  : (N,) voxel index of every input point
+       'label'    : (M,) dominant label (only if labels given)
+       'representative' : (M,) index of an input point carrying the dominant label (only if labels given)
+    """
+
+    xyz = np.asarray( xyz, dtype=np.float64 ).reshape(-1,3)
+    npts = xyz.shape[0]
+    if weights is None:
+        weights = np.ones( npts, dtype=np.float64 )
+    else:
+        weights = np.asarray( weights, dtype=np.float64 )
+
+    if npts==0:
+        out = { 'xyz':np.zeros( (0,3) ),
+                'weight':np.zeros( 0 ),
+                'count':np.zeros( 0, dtype=np.int64 ),
+                'inverse':np.zeros( 0, dtype=np.int64 ) }
+        if labels is not None:
+            out['label'] = np.zeros( 0, dtype=np.int64 )
+            out['representative'] = np.zeros( 0, dtype=np.int64 )
+        return out
+
+    voxel_size = np.broadcast_to( np.asarray(voxel_size,dtype=np.float64), (3,) )
+    ijk = np.floor( xyz/voxel_size ).astype(np.int64)
+    _, inverse = np.unique( ijk, axis=0, return_inverse=True )
+    inverse = inverse.reshape(-1)
+    nvoxels = int(inverse.max())+1
+
+    count = np.bincount( inverse, minlength=nvoxels )
+    wsum = np.bincount( inverse, weights=weights, minlength=nvoxels )
+
+    # weighted centroid. voxels with zero total weight use the plain mean
+    use_w = wsum!=0
+    denom = np.where( use_w, wsum, count )
+    centroid = np.zeros( (nvoxels,3) )
+    for i in range(3):
+        wx = np.bincount( inverse, weights=weights*xyz[:,i], minlength=nvoxels )
+        x  = np.bincount( inverse, weights=xyz[:,i], minlength=nvoxels )
+        centroid[:,i] = np.where( use_w, wx, x )/denom
+
+    out = { 'xyz':centroid,
+            'weight':wsum,
+            'count':count,
+            'inverse':inverse }
+
+    if labels is not None:
+        labels = np.asarray( labels ).astype(np.int64)
+        # sum the weight of each (voxel,label) pair
+        pairs = np.stack( [inverse,labels], axis=1 )
+        upairs, pair_first, pair_inv = np.unique( pairs, axis=0, return_index=True, return_inverse=True )
+        pair_inv = pair_inv.reshape(-1)
+        pair_w = np.bincount( pair_inv, weights=weights, minlength=upairs.shape[0] )
+        # sort by voxel, then weight: the last pair of each voxel is the dominant one
+        order = np.lexsort( (pair_w, upairs[:,0]) )
+        pair_voxel = upairs[order,0]
+        last = np.nonzero( np.append( pair_voxel[1:]!=pair_voxel[:-1], True ) )[0]
+        dominant = order[last]
+        out['label'] = upairs[dominant,1]
+        out['representative'] = pair_first[dominant]
+
+    return out
+
+def voxel_average( values, voxels, weights=None ):
+    """
+    Average per-point values over the voxels returned by `voxelize_points`.
+
+    Parameters
+    ----------
+
+    values : numpy array with shape (N,) or (N,M)
+    voxels : dict returned by voxelize_points
+    weights : numpy array with shape (N,) or None (plain mean).
+       Voxels whose total weight is zero use the plain mean, as the centroids do.
+
+    Returns
+    -------
+    numpy array with shape (nvoxels,) or (nvoxels,M)
+    """
+    inverse = voxels['inverse']
+    count = voxels['count']
+    nvoxels = count.shape[0]
+    values = np.asarray( values, dtype=np.float64 )
+    if weights is None:
+        weights = np.ones( inverse.shape[0] )
+    else:
+        weights = np.asarray( weights, dtype=np.float64 )
+    wsum = np.bincount( inverse, weights=weights, minlength=nvoxels )
+    use_w = wsum!=0
+    denom = np.where( use_w, wsum, np.maximum(count,1) )
+    columns = values.reshape( values.shape[0], int(np.prod(values.shape[1:])) )
+    out = np.zeros( (nvoxels,columns.shape[1]) )
+    for i in range(columns.shape[1]):
+        wx = np.bincount( inverse, weights=weights*columns[:,i], minlength=nvoxels )
+        x  = np.bincount( inverse, weights=columns[:,i], minlength=nvoxels )
+        out[:,i] = np.where( use_w, wx, x )/denom
+    return out[:,0] if values.ndim==1 else out
+
+def voxel_sum( values, voxels ):
+    """
+    Sum per-point values over the voxels returned by `voxelize_points`, e.g. charge.
+
+    Parameters
+    ----------
+
+    values : numpy array with shape (N,) or (N,M)
+    voxels : dict returned by voxelize_points
+
+    Returns
+    -------
+    numpy array with shape (nvoxels,) or (nvoxels,M)
+    """
+    inverse = voxels['inverse']
+    nvoxels = voxels['count'].shape[0]
+    values = np.asarray( values, dtype=np.float64 )
+    columns = values.reshape( values.shape[0], int(np.prod(values.shape[1:])) )
+    out = np.zeros( (nvoxels,columns.shape[1]) )
+    for i in range(columns.shape[1]):
+        out[:,i] = np.bincount( inverse, weights=columns[:,i], minlength=nvoxels )
+    return out[:,0] if values.ndim==1 else out
@@ -1,12 +1,79 @@
 import os,sys
-import collada
 import numpy as np
 from collections import OrderedDict
+from .data.voxelize import voxelize_points
 
+# bump when the content of the cached arrays changes
+MESH_CACHE_VERSION = 2
+
+# vertex clustering cell size of each level of detail, in the units of the .dae file
+# (mm for the MicroBooNE cryostat). level 0 is the full mesh.
+DEFAULT_LOD_CELL_SIZES = (0.0, 20.0, 60.0, 150.0)
+
+# camera distances (plotly scene units) below which each level is used, finest level first.
+# beyond the last distance the coarsest level is used.
+DEFAULT_LOD_DISTANCES = (1.0, 2.0, 3.5)
+
+def decimate_mesh( vertices, indices, cell_size ):
+    """
+    Simplify a triangle mesh by vertex clustering.
+
+    Vertices in the same cubic cell are merged into their centroid, triangles that
+    collapse or become duplicates are dropped, and unused vertices are removed.
+
+    Parameters
+    ----------
+
+    vertices : numpy array with shape (N,3)
+    indices : numpy array with shape (M,3)
+    cell_size : float
+       cell edge length, in the units of the vertices. Values <= 0 return the mesh unchanged.
+
+    Returns
+    -------
+    (vertices, indices) of the simplified mesh
+    """
+    if cell_size<=0.0 or indices.shape[0]==0:
+        return vertices, indices
+    cells = voxelize_points( vertices, voxel_size=cell_size )
+    tri = cells['inverse'][indices]
+    keep = (tri[:,0]!=tri[:,1]) & (tri[:,1]!=tri[:,2]) & (tri[:,2]!=tri[:,0])
+    tri = tri[keep]
+    # triangles with the same three vertices are drawn once
+    _, first = np.unique( np.sort(tri,axis=1), axis=0, return_index=True )
+    tri = tri[np.sort(first)]
+    used, remap = np.unique( tri, return_inverse=True )
+    return cells['xyz'][used], remap.reshape(tri.shape)
+
+def choose_lod_level( distance, lod_distances=DEFAULT_LOD_DISTANCES ):
+    """ level of detail for a camera distance: the index of the first threshold larger than distance """
+    return int( np.searchsorted( np.asarray(lod_distances,dtype=np.float64), distance, side='right' ) )
 
 class DetectorDisplay:
-    def __init__(self, daefile="microboone_32pmts_nowires_cryostat.dae"):
-        self.daefile = daefile
+    """
+    Detector geometry read from a DAE/COLLADA file.
+
+    The triangles of all solids are merged into one vertex/index array,
+    with duplicate vertices welded. The edges of the triangles, each shared edge
+    kept once, are drawn as a single line trace.
+
+    Simplified copies of the mesh are made by vertex clustering, one per entry of
+    `lod_cell_sizes` (level 0 is the full mesh). All levels are made once.
+
+    Parsing the .dae is slow, so the arrays are saved in an .npz next to it
+    (or in `cache_dir`) and reloaded as long as the .dae has not changed.
+    """
+    def __init__(self, daefile="microboone_32pmts_nowires_cryostat.dae", use_cache=True, cache_dir=None,
+                 lod_cell_sizes=DEFAULT_LOD_CELL_SIZES, scale=1.0, offset=(0.0,0.0,0.0)):
+        self.daefile = self._find_daefile( daefile )
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.lod_cell_sizes = np.asarray( lod_cell_sizes, dtype=np.float64 )
+        # applied to the vertices after loading, e.g. to go from the DAE frame (mm) to TPC coordinates (cm)
+        self.scale = scale
+        self.offset = np.asarray( offset, dtype=np.float64 )
+        self.levels = []
+        self._lines = {}
         self._load_geometry( self.daefile )
 
         self.default_colorscale =  [
@@ -16,31 +83,100 @@ class DetectorDisplay:
             [0.75, "rgb(242,143,56)"],
             [1, "rgb(217,30,30)"],
         ]
-        
+
+    def _find_daefile( self, daefile ):
+        """ relative paths that do not exist are looked up in lardly/ubdl, where the default file lives """
+        if os.path.exists(daefile) or os.path.isabs(daefile):
+            return daefile
+        packaged = os.path.join( os.path.dirname(os.path.abspath(__file__)), "ubdl", daefile )
+        if os.path.exists(packaged):
+            return packaged
+        return daefile
+
+    def cache_path( self ):
+        """ location of the .npz cache for the .dae file """
+        base = os.path.splitext( os.path.basename(self.daefile) )[0] + ".mesh.npz"
+        if self.cache_dir is not None:
+            return os.path.join( self.cache_dir, base )
+        return os.path.join( os.path.dirname(os.path.abspath(self.daefile)), base )
 
     def _load_geometry( self, daefile ):
-        # Make list of solids
-        self.solids = self._read_daecollada( daefile )
+        self.solids = None
+        arrays = None
+        if self.use_cache:
+            arrays = self._load_cache()
+        if arrays is None:
+            # Make list of solids
+            self.solids = self._read_daecollada( daefile )
 
-        # generate the mesh and load 3D widget
-        self.vertices, self.indices = self._flatten_solids( self.solids )
+            # generate the mesh, weld duplicate vertices and find the unique edges
+            vertices, indices = self._flatten_solids( self.solids )
+            vertices, indices = self._weld_vertices( vertices, indices )
+            arrays = { "lod_cell_sizes":self.lod_cell_sizes }
+            for level,cell_size in enumerate(self.lod_cell_sizes):
+                lod_vertices, lod_indices = decimate_mesh( vertices, indices, cell_size )
+                arrays["vertices_%d"%(level)] = lod_vertices
+                arrays["indices_%d"%(level)] = lod_indices
+                arrays["edges_%d"%(level)] = self._find_edges( lod_indices )
+            if self.use_cache:
+                self._save_cache( arrays )
 
-        self.lines = self._make_lines()
+        self.levels = [ { "vertices":arrays["vertices_%d"%(level)]*self.scale + self.offset,
+                          "indices":arrays["indices_%d"%(level)],
+                          "edges":arrays["edges_%d"%(level)] }
+                        for level in range(len(self.lod_cell_sizes)) ]
+        self.vertices = self.levels[0]["vertices"]
+        self.indices = self.levels[0]["indices"]
+        self.edges = self.levels[0]["edges"]
+        self.lines = self.get_lines( 0 )
+
+    @property
+    def nlevels( self ):
+        return len(self.levels)
+
+    def _load_cache( self ):
+        path = self.cache_path()
+        if not os.path.exists(path) or not os.path.exists(self.daefile):
+            return None
+        if os.path.getmtime(path) < os.path.getmtime(self.daefile):
+            return None
+        try:
+            with np.load( path ) as data:
+                if int(data["version"])!=MESH_CACHE_VERSION:
+                    return None
+                if not np.array_equal( data["lod_cell_sizes"], self.lod_cell_sizes ):
+                    return None
+                return { key:data[key] for key in data.files if key!="version" }
+        except Exception as e:
+            print("could not read detector mesh cache ",path,": ",e)
+            return None
+
+    def _save_cache( self, arrays ):
+        path = self.cache_path()
+        # write to a temporary file first so a reader never sees a partial cache
+        tmppath = path + ".tmp%d.npz"%(os.getpid())
+        try:
+            np.savez( tmppath, version=MESH_CACHE_VERSION, **arrays )
+            os.replace( tmppath, path )
+        except Exception as e:
+            print("could not write detector mesh cache ",path,": ",e)
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
 
     def _read_daecollada( self, daefile ):
+        import collada
         try:
-            geom = collada.Collada( daefile )
+            mesh = collada.Collada( daefile )
         except:
             raise RuntimeError("Could not read DAE/COLLADA file")
-        
+
         solids = OrderedDict()
-        mesh = collada.Collada( daefile )
         boundgeom = list(mesh.scene.objects('geometry'))
         for geom in boundgeom:
             solidname = geom.original.name.split("0x")[0]
             if solidname not in solids:
                 solids[solidname] = {"vertices":[],"indices":[] }
-                
+
             boundprimitives = list(geom.primitives())
             for boundprim in boundprimitives:
                 triset = boundprim.triangleset()
@@ -54,52 +190,77 @@ class DetectorDisplay:
         indices = []
         nvertices = 0
         for solid in solids:
-            for n,(solid_vertices,solid_indices) in enumerate(zip(solids[solid]["vertices"],solids[solid]["indices"])):
-                #print solid,"prim #%d, nvertices=%d, offset=%d" % ( n, len(solid_vertices),nvertices)
-                #print solid_indices
-                solid_indices_copy = np.copy( solid_indices )
-                solid_indices_copy += nvertices
+            for solid_vertices,solid_indices in zip(solids[solid]["vertices"],solids[solid]["indices"]):
+                indices.append( np.asarray(solid_indices,dtype=np.int64) + nvertices )
+                vertices.append( np.asarray(solid_vertices,dtype=np.float64) )
                 nvertices += len(solid_vertices)
-                vertices.append( solids[solid]["vertices"][n] )
-                indices.append( solid_indices_copy )
         return np.concatenate(vertices), np.concatenate(indices)
 
-    def _make_lines(self):
-        tri_vertices = self.vertices[self.indices]
-        Xe = []
-        Ye = []
-        Ze = []
-        for T in tri_vertices:
-            Xe += [T[k % 3][0] for k in range(4)] + [None]
-            Ye += [T[k % 3][1] for k in range(4)] + [None]
-            Ze += [T[k % 3][2] for k in range(4)] + [None]
+    def _weld_vertices( self, vertices, indices, decimals=4 ):
+        """ merge vertices at the same position (to `decimals` places) and drop triangles that become degenerate """
+        _, first, inverse = np.unique( np.round(vertices,decimals), axis=0, return_index=True, return_inverse=True )
+        inverse = inverse.reshape(-1)
+        welded = vertices[first]
+        indices = inverse[indices]
+        keep = (indices[:,0]!=indices[:,1]) & (indices[:,1]!=indices[:,2]) & (indices[:,2]!=indices[:,0])
+        return welded, indices[keep]
+
+    def _find_edges( self, indices ):
+        """ (E,2) array of the unique triangle edges, with the smaller vertex index first """
+        edges = np.concatenate( [ indices[:,[0,1]], indices[:,[1,2]], indices[:,[2,0]] ], axis=0 )
+        edges.sort( axis=1 )
+        return np.unique( edges, axis=0 )
+
+    def _make_lines( self, level=0 ):
+        # each edge is two points followed by a NaN row, which plotly draws as a gap
+        vertices = self.levels[level]["vertices"]
+        edges = self.levels[level]["edges"]
+        nedges = edges.shape[0]
+        xyz = np.full( (nedges,3,3), np.nan )
+        xyz[:,0,:] = vertices[edges[:,0]]
+        xyz[:,1,:] = vertices[edges[:,1]]
+        xyz = xyz.reshape(-1,3)
 
         # define the lines to be plotted
         lines = {
             "type": "scatter3d",
-            "x": Xe,
-            "y": Ye,
-            "z": Ze,
+            "x": xyz[:,0],
+            "y": xyz[:,1],
+            "z": xyz[:,2],
             "mode": "lines",
             "name": "",
             "line": {"color": "rgb(70,70,70)", "width": 1},
         }
         return lines
 
-                
+    def get_lines( self, level=0 ):
+        """ edge trace of a level of detail. The trace is made once per level; copy it before changing it. """
+        level = min( max(int(level),0), self.nlevels-1 )
+        if level not in self._lines:
+            self._lines[level] = self._make_lines( level )
+        return self._lines[level]
+
+    def get_lines_for_distance( self, distance, lod_distances=DEFAULT_LOD_DISTANCES ):
+        """ edge trace of the level of detail for a camera distance """
+        return self.get_lines( choose_lod_level( distance, lod_distances ) )
+
     def getmeshdata(self,
                     intensities=None,
                     colorscale="Viridis",
                     flatshading=False,
                     showscale=False,
-                    plot_edges=False ):
-        
-        x = self.vertices[:,0]
-        y = self.vertices[:,1]
-        z = self.vertices[:,2]
-        I = self.indices[:,0]
-        J = self.indices[:,1]
-        K = self.indices[:,2]
+                    plot_edges=False,
+                    level=0 ):
+
+        level = min( max(int(level),0), self.nlevels-1 )
+        vertices = self.levels[level]["vertices"]
+        indices = self.levels[level]["indices"]
+        x = vertices[:,0]
+        y = vertices[:,1]
+        z = vertices[:,2]
+        I = indices[:,0]
+        J = indices[:,1]
+        K = indices[:,2]
 
         if intensities is None:
             intensities = z
@@ -135,7 +296,7 @@ class DetectorDisplay:
         if showscale:
             mesh["colorbar"] = {"thickness": 20, "ticklen": 4, "len": 0.75}
 
-        #return [mesh,self.lines]
-        return [self.lines]
+        #return [mesh,self.get_lines(level)]
+        return [self.get_lines(level)]
     #lines = create_plot_edges_lines(vertices, faces)
     #return [mesh, lines]
@@ -0,0 +1,171 @@
+"""
+Vectorized MicroBooNE wire and time conversions.
+
+larutil::Geometry::WireCoordinate is linear in (y,z) and the x <-> tick conversion is linear in x,
+so the whole projection is a handful of coefficients. We get them once (from larutil if it is
+available, otherwise from a cached json table or nominal values) and then convert numpy arrays
+of points with no calls into PyROOT.
+"""
+import os,sys
+import json
+import numpy as np
+
+# nominal MicroBooNE values, used if larutil cannot be loaded
+NOMINAL_GEOMETRY = {
+    "wire_pitch":0.3,
+    # wire coordinate = dy*y + dz*z + offset, for planes U,V,Y
+    "wire_dy":[ -0.8660254/0.3, 0.8660254/0.3, 0.0 ],
+    "wire_dz":[ 0.5/0.3, 0.5/0.3, 1.0/0.3 ],
+    "wire_offset":[ 336.3, 336.3, 0.0 ],
+    "nwires":[ 2400, 2400, 3456 ],
+    "drift_velocity":0.1098, # cm/usec
+    "usec_per_tick":0.5,
+    "trigger_tick":3200.0,
+}
+
+class TPCGeometry:
+    """
+    Wire plane and drift-time constants with vectorized conversions.
+
+    All functions take numpy arrays of shape (N,3) for positions and (N,) for ticks/wires.
+    """
+
+    def __init__(self, params=None, source="nominal"):
+        if params is None:
+            params = NOMINAL_GEOMETRY
+        self.params = dict(params)
+        self.source = source
+        self.wire_dy = np.array( params["wire_dy"], dtype=np.float64 )
+        self.wire_dz = np.array( params["wire_dz"], dtype=np.float64 )
+        self.wire_offset = np.array( params["wire_offset"], dtype=np.float64 )
+        self.nwires = np.array( params["nwires"], dtype=np.int64 )
+        self.drift_velocity = float(params["drift_velocity"])
+        self.usec_per_tick = float(params["usec_per_tick"])
+        self.trigger_tick = float(params["trigger_tick"])
+        self.cm_per_tick = self.drift_velocity*self.usec_per_tick
+
+    @classmethod
+    def from_larutil(cls):
+        """ get the coefficients by evaluating larutil at a few points """
+        import ROOT as rt
+        from larlite import larutil
+        geo = larutil.Geometry.GetME()
+        origin = rt.TVector3(0,0,0)
+        ydir = rt.TVector3(0,1.0,0)
+        zdir = rt.TVector3(0,0,1.0)
+        params = dict(NOMINAL_GEOMETRY)
+        params["wire_offset"] = [ geo.WireCoordinate(origin,p) for p in range(3) ]
+        params["wire_dy"] = [ geo.WireCoordinate(ydir,p)-params["wire_offset"][p] for p in range(3) ]
+        params["wire_dz"] = [ geo.WireCoordinate(zdir,p)-params["wire_offset"][p] for p in range(3) ]
+        try:
+            params["nwires"] = [ int(geo.Nwires(p)) for p in range(3) ]
+            params["wire_pitch"] = float(geo.WirePitch(2))
+        except:
+            pass
+        params["drift_velocity"] = float(larutil.LArProperties.GetME().DriftVelocity())
+        return cls( params, source="larutil" )
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path,'r') as f:
+            params = json.load(f)
+        return cls( params, source=path )
+
+    def to_json(self, path):
+        with open(path,'w') as f:
+            json.dump( self.params, f, indent=2 )
+
+    # ---- time ----
+
+    def x_to_tick(self, x):
+        return self.trigger_tick + np.asarray(x)/self.cm_per_tick
+
+    def tick_to_x(self, tick):
+        return (np.asarray(tick)-self.trigger_tick)*self.cm_per_tick
+
+    def x_to_usec(self, x):
+        """ drift time relative to the trigger """
+        return np.asarray(x)/self.drift_velocity
+
+    def usec_to_tick(self, t_usec):
+        return self.trigger_tick + np.asarray(t_usec)/self.usec_per_tick
+
+    def tick_to_usec(self, tick):
+        return (np.asarray(tick)-self.trigger_tick)*self.usec_per_tick
+
+    # ---- wires ----
+
+    def wire_coordinate(self, xyz, plane=None):
+        """ continuous wire coordinate. (N,3) array for all planes if plane is None, else (N,) """
+        xyz = np.asarray( xyz, dtype=np.float64 ).reshape(-1,3)
+        if plane is None:
+            return np.outer(xyz[:,1],self.wire_dy) + np.outer(xyz[:,2],self.wire_dz) + self.wire_offset
+        return xyz[:,1]*self.wire_dy[plane] + xyz[:,2]*self.wire_dz[plane] + self.wire_offset[plane]
+
+    def nearest_wire(self, xyz, plane, clip=True):
+        """ nearest wire index, clipped to the wires of the plane """
+        wire = np.floor( self.wire_coordinate(xyz,plane)+0.5 ).astype(np.int64)
+        if clip:
+            wire = np.clip( wire, 0, self.nwires[plane]-1 )
+        return wire
+
+    def project(self, xyz):
+        """ (N,4) array with columns: U wire, V wire, Y wire, tick """
+        xyz = np.asarray( xyz, dtype=np.float64 ).reshape(-1,3)
+        out = np.zeros( (xyz.shape[0],4) )
+        out[:,:3] = self.wire_coordinate(xyz)
+        out[:,3] = self.x_to_tick(xyz[:,0])
+        return out
+
+    def projection_info(self, xyz):
+        """ (N,5) array with columns: t usec, tick, U wire, V wire, Y wire. This is the hover customdata layout. """
+        xyz = np.asarray( xyz, dtype=np.float64 ).reshape(-1,3)
+        out = np.zeros( (xyz.shape[0],5) )
+        out[:,0] = self.x_to_usec(xyz[:,0])
+        out[:,1] = self.x_to_tick(xyz[:,0])
+        out[:,2:] = self.wire_coordinate(xyz)
+        return out
+
+    def unproject(self, wire_a, plane_a, wire_b, plane_b, tick):
+        """ (N,3) positions from the wire coordinates on two planes and the tick """
+        wire_a = np.asarray(wire_a, dtype=np.float64)
+        wire_b = np.asarray(wire_b, dtype=np.float64)
+        m = np.array( [[self.wire_dy[plane_a], self.wire_dz[plane_a]],
+                       [self.wire_dy[plane_b], self.wire_dz[plane_b]]] )
+        rhs = np.stack( [wire_a-self.wire_offset[plane_a], wire_b-self.wire_offset[plane_b]], axis=0 ).reshape(2,-1)
+        yz = np.linalg.solve( m, rhs )
+        xyz = np.zeros( (yz.shape[1],3) )
+        xyz[:,0] = self.tick_to_x(tick)
+        xyz[:,1] = yz[0]
+        xyz[:,2] = yz[1]
+        return xyz
+
+_geometry = None
+
+def get_geometry(cache_file=None):
+    """
+    Get the geometry singleton.
+
+    Tries larutil first. If larutil is not available, loads `cache_file`
+    (or the file in LARDLY_GEOMETRY_CACHE) if it exists, else uses nominal values.
+    If larutil is available and a cache file is given, the table is written to it.
+    """
+    global _geometry
+    if _geometry is not None:
+        return _geometry
+    if cache_file is None:
+        cache_file = os.environ.get("LARDLY_GEOMETRY_CACHE",None)
+    try:
+        _geometry = TPCGeometry.from_larutil()
+        if cache_file is not None:
+            try:
+                _geometry.to_json(cache_file)
+            except Exception as e:
+                print("could not write geometry cache ",cache_file,": ",e)
+    except Exception:
+        if cache_file is not None and os.path.exists(cache_file):
+            _geometry = TPCGeometry.from_json(cache_file)
+        else:
+            print("larutil not available: using nominal MicroBooNE geometry")
+            _geometry = TPCGeometry()
+    return _geometry
@@ -17,8 +17,11 @@ from lardly.ubdl.config.settings import config, load_config
 from lardly.ubdl.core.state import state_manager
 from lardly.ubdl.io.io_manager import io_manager
 from lardly.ubdl.plotters.registry import registry, register_plotter
-from lardly.detectoroutline import DetectorOutline
+from lardly.ubdl.utils.geometry_assets import get_geometry_traces
 from lardly.ubdl.ui.wireplane_viewer import visualize_larcv_image2d
+from lardly.ubdl.core.serialization import encode_arrays, dumps
+from lardly.ubdl.core.perf import perf_recorder, count_points
+from lardly.ubdl.core.memory import memory_monitor
 
 # Import plotter implementations
 from lardly.ubdl.plotters.implementations.reconu import RecoNuPlotter
@@ -30,6 +33,10 @@ from lardly.ubdl.plotters.implementations.larflowhits import LArFlowHitsPlotter
 
 logger = logging.getLogger(__name__)
 
+# plotly.js used by the combined HTML output. plotly-latest is frozen at 1.58 and cannot
+# decode typed arrays; 2.28 is the first version that can.
+PLOTLYJS_CDN_URL = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+
 class BatchRunner:
     """
     Batch runner for automated visualization generation
@@ -197,11 +204,11 @@ class BatchRunner:
         
         # Add detector outline if requested
         if viewer_config.get('show_detector', True):
-            # Add detector outline
-            detector_outline = DetectorOutline()
+            # Add detector outline, built once per process
             detector_color = viewer_config.get('detector_color', [100, 150, 200])  # Default light blue
-            detector_traces = detector_outline.getlines(color=tuple(detector_color))
+            detector_traces = get_geometry_traces("tpc_outline")
             for trace in detector_traces:
+                trace['line']['color'] = "rgb(%d,%d,%d)" % tuple(detector_color)
                 trace['opacity'] = viewer_config.get('detector_opacity', 0.1)
                 fig.add_trace(trace)
         
@@ -213,7 +220,7 @@ class BatchRunner:
             try:
                 # Get tree dictionary from IO manager
                 tree_dict = io_manager.get_tree_dict()
-                traces = plotter.make_traces(tree_dict)
+                traces = registry.make_plotter_traces(plotter, tree_dict)
                 if traces:
                     # Add plotter name to trace names for legend
                     for trace in traces:
@@ -323,13 +330,18 @@ class BatchRunner:
                 )
                 
                 # Create heatmap trace
-                trace = visualize_larcv_image2d(
-                    img_v.at(plane),
-                    minz=min_value,
-                    maxz=max_value,
-                    reverse_ticks=False,
-                    colorscale=colorscale
-                )
+                component = f"wireplane plane{plane}"
+                with perf_recorder.measure(io_manager.get_current_entry(), component):
+                    trace = visualize_larcv_image2d(
+                        img_v.at(plane),
+                        minz=min_value,
+                        maxz=max_value,
+                        reverse_ticks=False,
+                        colorscale=colorscale,
+                        entry_cache=io_manager.get_entry_cache(),
+                        cache_key=(prodname, plane)
+                    )
+                perf_recorder.add(io_manager.get_current_entry(), component, traces=1, points=count_points([trace]))
                 
                 fig = go.Figure(data=[trace], layout=layout)
                 figures.append(fig)
@@ -352,24 +364,24 @@ class BatchRunner:
         Returns:
             HTML content string
         """
-        import json
-        
-        # Convert figures to JSON
-        fig_3d_json = fig_3d.to_json()
-        figs_2d_json = [fig_2d.to_json() for fig_2d in figs_2d]
+        # Convert figures to JSON, with arrays as typed arrays (PLOTLYJS_CDN_URL decodes them)
+        fig_3d_json = dumps(encode_arrays(fig_3d, enabled=True))
+        figs_2d_json = [dumps(encode_arrays(fig_2d, enabled=True)) for fig_2d in figs_2d]
         
         # Create JavaScript code to plot the figures
         plot_scripts = []
         
         # 3D plot script
         plot_scripts.append(f"""
-        Plotly.newPlot('plot-3d', {fig_3d_json}.data, {fig_3d_json}.layout, {{displayModeBar: true, displaylogo: false}});
+        var fig3d = {fig_3d_json};
+        Plotly.newPlot('plot-3d', fig3d.data, fig3d.layout, {{displayModeBar: true, displaylogo: false}});
         """)
         
         # 2D plot scripts
         for i, fig_2d_json in enumerate(figs_2d_json):
             plot_scripts.append(f"""
-        Plotly.newPlot('plot-2d-{i}', {fig_2d_json}.data, {fig_2d_json}.layout, {{displayModeBar: true, displaylogo: false}});
+        var fig2d_{i} = {fig_2d_json};
+        Plotly.newPlot('plot-2d-{i}', fig2d_{i}.data, fig2d_{i}.layout, {{displayModeBar: true, displaylogo: false}});
             """)
         
         # Create combined HTML
@@ -379,7 +391,7 @@ class BatchRunner:
 <head>
     <meta charset="utf-8">
     <title>Lardly Event Visualization</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <script src="{PLOTLYJS_CDN_URL}"></script>
     <style>
         body {{
             font-family: Arial, sans-serif;
@@ -486,6 +498,15 @@ class BatchRunner:
             
             logger.info(f"Saved HTML visualization to {html_path}")
             
+            # Save the figures as JSON, e.g. for the render benchmark (lardly.ubdl.bench.render)
+            if output_config.get('save_figure_json', False):
+                figure_paths = [html_path.with_name(html_path.stem + '_3d.json')]
+                figure_paths += [html_path.with_name(html_path.stem + f'_wireplane_{i}.json') for i in range(len(figs_2d))]
+                for figure_path, fig in zip(figure_paths, [fig_3d] + list(figs_2d)):
+                    with open(figure_path, 'w') as f:
+                        f.write(dumps(encode_arrays(fig, enabled=True)))
+                    logger.info(f"Saved figure JSON to {figure_path}")
+            
             # Save images if requested
             if output_config.get('save_images', False):
                 image_format = output_config.get('image_format', 'png')
@@ -563,6 +584,30 @@ class BatchRunner:
         if not self.save_visualization(fig_3d, figs_2d, output_config):
             return False
         
+        # Save the time and size of each plotter
+        if perf_recorder.enabled:
+            perf_file = output_config.get('perf_file')
+            if not perf_file:
+                html_path = Path(output_config.get('html_file', 'output.html'))
+                perf_file = str(html_path.with_name(html_path.stem + '_perf.json'))
+            try:
+                perf_recorder.write_json(perf_file)
+                for row in perf_recorder.slow_rows():
+                    logger.warning(f"Slow: {row['component']} took {row['total']:.2f} s at entry {row['entry']}")
+            except Exception as e:
+                logger.warning(f"Could not write performance summary: {e}")
+        
+        # Save the memory growth per plotter
+        if memory_monitor.enabled:
+            memory_file = output_config.get('memory_file')
+            if not memory_file:
+                html_path = Path(output_config.get('html_file', 'output.html'))
+                memory_file = str(html_path.with_name(html_path.stem + '_memory.json'))
+            try:
+                memory_monitor.write_json(memory_file)
+            except Exception as e:
+                logger.warning(f"Could not write memory summary: {e}")
+        
         logger.info("Batch run completed successfully")
         return True
 
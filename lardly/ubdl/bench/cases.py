@@ -0,0 +1,173 @@
+"""
+Benchmark cases for Lardly
+
+This module lists what the benchmark suite times: the make_traces method of
+every plotter in lardly.ubdl.plotters.implementations, and the lardly.data
+converters, run on events of the mock IO backend at standard sizes.
+"""
+from typing import Any, Callable, Dict, List
+import importlib
+import inspect
+import pkgutil
+import logging
+
+from lardly.ubdl.plotters.base import BasePlotter
+from lardly.ubdl.io.mock_backend import MockIOManager, PRODUCERS
+
+logger = logging.getLogger(__name__)
+
+# Product sizes of the standard events
+STANDARD_SIZES = {
+    "small": {"larflow3dhit": 1000, "larflowcluster": 10, "track": 10, "crthit": 20, "crttrack": 5,
+              "mctrack": 10, "simch": 100, "nu_cluster_hits": 50, "image_occupancy": 0.01},
+    "medium": {"larflow3dhit": 10000, "larflowcluster": 20, "track": 30, "crthit": 50, "crttrack": 10,
+               "mctrack": 20, "simch": 500, "nu_cluster_hits": 200, "image_occupancy": 0.02},
+    "large": {"larflow3dhit": 100000, "larflowcluster": 50, "track": 100, "crthit": 200, "crttrack": 40,
+              "mctrack": 50, "simch": 2000, "nu_cluster_hits": 1000, "image_occupancy": 0.05},
+}
+
+class CaseSkipped(Exception):
+    """Raised by a case setup when the case cannot run on the mock event"""
+
+class BenchCase:
+    """
+    One thing to time
+
+    `setup(backend)` is called once per event size, outside of the timing, and
+    returns the function that is timed. The timed function returns the traces made.
+    """
+
+    def __init__(self, name: str, kind: str, setup: Callable[[MockIOManager], Callable[[], Any]]):
+        """
+        Initialize the case
+
+        Args:
+            name: Case name, e.g. "plotter:LArFlowHits" or "converter:visualize_larcv_image2d"
+            kind: "plotter" or "converter"
+            setup: Function of the backend returning the timed function
+        """
+        self.name = name
+        self.kind = kind
+        self.setup = setup
+
+def _plotter_setup(plotter_class: type) -> Callable[[MockIOManager], Callable[[], Any]]:
+    def setup(backend: MockIOManager) -> Callable[[], Any]:
+        plotter = plotter_class()
+        if not plotter.is_applicable(backend.get_available_trees()):
+            raise CaseSkipped(f"{plotter.name} is not applicable to the mock event")
+        tree_dict = backend.get_tree_dict()
+        options = plotter.get_effective_options(None)
+        return lambda: plotter.make_traces(tree_dict, options)
+    return setup
+
+def plotter_classes() -> List[type]:
+    """
+    Find the plotter classes of lardly.ubdl.plotters.implementations
+
+    Plotter modules that cannot be imported (missing ROOT, larlite, ...) are
+    left out with a warning.
+
+    Returns:
+        List of BasePlotter subclasses
+    """
+    import lardly.ubdl.plotters.implementations as implementations
+    classes = []
+    for module_info in pkgutil.iter_modules(implementations.__path__):
+        module_name = f"{implementations.__name__}.{module_info.name}"
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"Skipping plotters of {module_name}: {e}")
+            continue
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, BasePlotter) and cls is not BasePlotter and cls.__module__ == module_name:
+                classes.append(cls)
+    return classes
+
+def plotter_cases() -> List[BenchCase]:
+    """
+    Make a case for every plotter implementation
+
+    Returns:
+        List of cases
+    """
+    return [BenchCase(f"plotter:{cls.__name__}", "plotter", _plotter_setup(cls)) for cls in plotter_classes()]
+
+def _larlite(backend: MockIOManager, product: str) -> Any:
+    return backend.get_tree_dict()["iolarlite"].get_data(product, PRODUCERS[product])
+
+def _converter_larflowhits(backend):
+    from lardly.data.larlite_larflowhit import visualize_larlite_larflowhits
+    hits = _larlite(backend, "larflow3dhit")
+    return lambda: visualize_larlite_larflowhits(hits, name="larflowhits")
+
+def _converter_simch(backend):
+    from lardly.data.larlite_simch import visualize_larlite_simch
+    simch = _larlite(backend, "simch")
+    return lambda: visualize_larlite_simch(simch)
+
+def _converter_image2d(backend):
+    from lardly.data.larcv_image2d import visualize_larcv_image2d
+    images = backend.get_tree_dict()["iolarcv"].get_data("image2d", PRODUCERS["image2d"]).as_vector()
+    return lambda: [visualize_larcv_image2d(image) for image in images]
+
+def _converter_image2d_sparse(backend):
+    # the standard sizes differ in image occupancy; with a threshold, that picks the trace type
+    from lardly.data.larcv_image2d import visualize_larcv_image2d, DEFAULT_SPARSE_THRESHOLD
+    images = backend.get_tree_dict()["iolarcv"].get_data("image2d", PRODUCERS["image2d"]).as_vector()
+    return lambda: [visualize_larcv_image2d(image, sparse_threshold=DEFAULT_SPARSE_THRESHOLD) for image in images]
+
+def _converter_opflash(backend):
+    from lardly.data.larlite_opflash import visualize_larlite_opflash_3d
+    flashes = _larlite(backend, "opflash")
+    return lambda: [trace for flash in flashes for trace in visualize_larlite_opflash_3d(flash)]
+
+def _converter_track(backend):
+    from lardly.data.larlite_track import visualize_larlite_event_track
+    tracks = _larlite(backend, "track")
+    return lambda: visualize_larlite_event_track(tracks)
+
+def _converter_crthit(backend):
+    from lardly.data.larlite_crthit import visualize_larlite_event_crthit
+    crthits = _larlite(backend, "crthit")
+    return lambda: visualize_larlite_event_crthit(crthits)
+
+def _converter_crttrack(backend):
+    from lardly.data.larlite_crttrack import visualize_larlite_event_crttrack
+    crttracks = _larlite(backend, "crttrack")
+    return lambda: visualize_larlite_event_crttrack(crttracks)
+
+def _converter_mctrack(backend):
+    from lardly.data.larlite_mctrack import visualize_larlite_event_mctrack
+    mctracks = _larlite(backend, "mctrack")
+    return lambda: visualize_larlite_event_mctrack(mctracks)
+
+CONVERTERS: Dict[str, Callable[[MockIOManager], Callable[[], Any]]] = {
+    "visualize_larlite_larflowhits": _converter_larflowhits,
+    "visualize_larlite_simch": _converter_simch,
+    "visualize_larcv_image2d": _converter_image2d,
+    "visualize_larcv_image2d_sparse": _converter_image2d_sparse,
+    "visualize_larlite_opflash_3d": _converter_opflash,
+    "visualize_larlite_event_track": _converter_track,
+    "visualize_larlite_event_crthit": _converter_crthit,
+    "visualize_larlite_event_crttrack": _converter_crttrack,
+    "visualize_larlite_event_mctrack": _converter_mctrack,
+}
+
+def converter_cases() -> List[BenchCase]:
+    """
+    Make a case for every converter in CONVERTERS
+
+    Returns:
+        List of cases
+    """
+    return [BenchCase(f"converter:{name}", "converter", setup) for name, setup in CONVERTERS.items()]
+
+def all_cases() -> List[BenchCase]:
+    """
+    Get the plotter and converter cases
+
+    Returns:
+        List of cases
+    """
+    return plotter_cases() + converter_cases()
@@ -0,0 +1,315 @@
+"""
+End-to-end throughput benchmark for Lardly (lardly-bench)
+
+This module runs what the app does for each event of a file list: load_entry,
+make_traces of the selected plotters (through the registry, with its figure
+cache and concurrency settings), building the 3D figure and serializing it.
+It reports events per second, latency percentiles per plotter and stage, the
+difference between a cold and a warm figure cache, and the growth of the
+process RSS (per plotter too with --memory), as JSON or CSV.
+
+    python lardly_bench.py --files dlmerged.root --entries 20 --output bench.json
+    python lardly_bench.py --mock medium --plotters LArFlowHits RecoNu --output bench.csv
+
+The cold pass runs with an empty figure cache in a temporary directory (unless
+--cache-dir is given); the warm pass runs the same entries again.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import logging
+import numpy as np
+
+from lardly.ubdl.config.settings import config, load_config
+from lardly.ubdl.core.perf import perf_recorder, STAGES
+from lardly.ubdl.core.memory import memory_monitor, get_rss_bytes
+from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.core.serialization import encode_arrays, dumps
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """
+    Summarize latencies
+
+    Args:
+        values: Seconds
+
+    Returns:
+        n, mean, max and the PERCENTILES (as p50, ...)
+    """
+    if not values:
+        return {"n": 0}
+    arr = np.asarray(values, dtype=np.float64)
+    summary = {"n": int(arr.size), "mean": float(arr.mean()), "max": float(arr.max())}
+    for q in PERCENTILES:
+        summary[f"p{q}"] = float(np.percentile(arr, q))
+    return summary
+
+def register_plotters(names: Optional[List[str]], tree_keys: List[str]) -> List[str]:
+    """
+    Register the plotter implementations and select the ones to run
+
+    Args:
+        names: Plotter names; all the applicable ones if None
+        tree_keys: Trees in the loaded files
+
+    Returns:
+        Names of the selected plotters
+    """
+    from lardly.ubdl.plotters.registry import registry
+    from lardly.ubdl.bench.cases import plotter_classes
+    for cls in plotter_classes():
+        plotter = cls()
+        if registry.get_plotter(plotter.name) is None:
+            registry.register(plotter)
+    applicable = [plotter.name for plotter in registry.get_applicable_plotters(tree_keys)]
+    if names is None:
+        return applicable
+    for name in names:
+        if name not in applicable:
+            logger.warning(f"Plotter '{name}' is unknown or not applicable to the files")
+    return [name for name in names if name in applicable]
+
+def run_event(backend: Any, entry: int, plotters: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Process one event as the 3D viewer does
+
+    Args:
+        backend: IO manager (or mock backend) with files loaded
+        entry: Entry number
+        plotters: Names of the plotters to run
+
+    Returns:
+        Seconds per component and stage; components are load_entry, each plotter,
+        figure (building and serializing the figure) and event (wall time)
+    """
+    from lardly.ubdl.plotters.registry import registry
+    from lardly.ubdl.ui.det3d_viewer import make_default_plot
+
+    start = time.perf_counter()
+    if not backend.load_entry(entry):
+        raise RuntimeError(f"Could not load entry {entry}")
+    tree_dict = backend.get_tree_dict()
+    all_options = state_manager.get_state('plotters', 'options', default={})
+    options = {name: all_options.get(name, {}) for name in plotters}
+    traces = registry.make_traces(plotters, tree_dict, options)
+
+    figure_start = time.perf_counter()
+    fig = make_default_plot()
+    for trace in traces:
+        fig.add_trace(trace)
+    payload = dumps(encode_arrays(fig))
+    end = time.perf_counter()
+
+    latencies = {}
+    for row in perf_recorder.rows():
+        if row["entry"] == entry and (row["component"] == "load_entry" or row["component"] in plotters):
+            latencies[row["component"]] = {stage: row[stage] for stage in STAGES + ("total",)}
+            latencies[row["component"]]["cached"] = bool(row.get("cached", False))
+    latencies["figure"] = {"serialize": end - figure_start, "total": end - figure_start, "bytes": len(payload)}
+    latencies["event"] = {"total": end - start}
+    return latencies
+
+def run_pass(backend: Any, entries: List[int], plotters: List[str]) -> Dict[str, Any]:
+    """
+    Process a list of entries and summarize the latencies
+
+    Args:
+        backend: IO manager with files loaded
+        entries: Entry numbers
+        plotters: Names of the plotters to run
+
+    Returns:
+        events, wall_s, events_per_s, RSS at the start and end, and latency
+        summaries per component and stage
+    """
+    rss_start = get_rss_bytes()
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    cached = {}
+    start = time.perf_counter()
+    for entry in entries:
+        for component, stages in run_event(backend, entry, plotters).items():
+            for stage, value in stages.items():
+                if stage == "cached":
+                    cached[component] = cached.get(component, 0) + int(value)
+                else:
+                    samples.setdefault(component, {}).setdefault(stage, []).append(value)
+    wall = time.perf_counter() - start
+    rss_end = get_rss_bytes()
+
+    latency = {}
+    for component, stages in samples.items():
+        latency[component] = {stage: latency_summary(values) for stage, values in stages.items() if stage != "bytes"}
+        if "bytes" in stages:
+            latency[component]["bytes"] = {"mean": float(np.mean(stages["bytes"]))}
+        if component in cached:
+            latency[component]["cached_events"] = cached[component]
+    return {
+        "events": len(entries),
+        "wall_s": wall,
+        "events_per_s": len(entries)/wall if wall > 0 else 0.0,
+        "rss_start": rss_start,
+        "rss_end": rss_end,
+        "rss_growth": rss_end - rss_start,
+        "latency": latency,
+    }
+
+def write_csv(report: Dict[str, Any], path: str) -> None:
+    """
+    Write the latency summaries as CSV, one row per pass, component and stage
+
+    Args:
+        report: From run_benchmark
+        path: Output file path
+    """
+    columns = ["pass", "component", "stage", "n", "mean"] + [f"p{q}" for q in PERCENTILES] + ["max"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + ["events_per_s", "rss_growth"])
+        for pass_name, result in report["passes"].items():
+            for component, stages in result["latency"].items():
+                for stage, summary in stages.items():
+                    if not isinstance(summary, dict) or "n" not in summary:
+                        continue
+                    writer.writerow([pass_name, component, stage] + [summary.get(column) for column in columns[3:]]
+                                    + [result["events_per_s"], result["rss_growth"]])
+    logger.info(f"Wrote benchmark results to {path}")
+
+def run_benchmark(backend: Any, entries: List[int], plotters: List[str], warm: bool = True) -> Dict[str, Any]:
+    """
+    Run the cold pass and, optionally, the warm pass
+
+    Args:
+        backend: IO manager with files loaded
+        entries: Entry numbers
+        plotters: Names of the plotters to run
+        warm: Also run the entries a second time, with the figure cache filled
+
+    Returns:
+        Report dictionary
+    """
+    from lardly.ubdl.core.figure_cache import get_figure_cache
+    cache = get_figure_cache()
+    if cache is not None:
+        cache.clear()
+
+    report = {"plotters": plotters, "entries": entries, "passes": {}}
+    report["passes"]["cold"] = run_pass(backend, entries, plotters)
+    if warm:
+        report["passes"]["warm"] = run_pass(backend, entries, plotters)
+    if cache is not None:
+        report["figure_cache"] = cache.stats()
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the benchmark from the command line
+
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(description='Lardly end-to-end throughput benchmark')
+    parser.add_argument('--files', type=str, nargs='+',
+                        help='Data files to load')
+    parser.add_argument('--mock', type=str, default=None, choices=['small', 'medium', 'large'],
+                        help='Use synthetic events of this size instead of files')
+    parser.add_argument('--tick-direction', type=str, default='TickForwards',
+                        choices=['TickForwards', 'TickBackwards'],
+                        help='Tick direction for data processing')
+    parser.add_argument('--config', type=str, default='lardly.yaml',
+                        help='Path to configuration file')
+    parser.add_argument('--plotters', type=str, nargs='+', default=None,
+                        help='Plotters to run (default: all applicable)')
+    parser.add_argument('--entries', type=int, default=10,
+                        help='Number of entries to process')
+    parser.add_argument('--start', type=int, default=0,
+                        help='First entry')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Plotter threads (plotters.concurrency.max_workers)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Figure cache directory (default: a temporary one)')
+    parser.add_argument('--no-warm', action='store_true',
+                        help='Skip the warm cache pass')
+    parser.add_argument('--memory', action='store_true',
+                        help='Also measure the memory growth per entry and plotter (tracemalloc; slower)')
+    parser.add_argument('--output', type=str, default='lardly_bench.json',
+                        help='Write the report to this .json or .csv file')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                        help='Set the logging level')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if os.path.exists(args.config):
+        load_config(args.config)
+    if args.workers is not None:
+        config.set(args.workers, 'plotters', 'concurrency', 'max_workers')
+    # every measured entry must stay in the performance records
+    config.set(True, 'perf', 'enabled')
+    if args.memory:
+        config.set(True, 'memory', 'enabled')
+
+    with tempfile.TemporaryDirectory(prefix="lardly-bench-") as tmpdir:
+        config.set(args.cache_dir or tmpdir, 'figure_cache', 'cache_dir')
+
+        if args.mock:
+            from lardly.ubdl.io.mock_backend import MockIOManager, SyntheticEventGenerator
+            from lardly.ubdl.bench.cases import STANDARD_SIZES
+            backend = MockIOManager(SyntheticEventGenerator(sizes=STANDARD_SIZES[args.mock]),
+                                    nentries=args.start + args.entries)
+            files = [f"mock:{args.mock}"]
+        elif args.files:
+            from lardly.ubdl.io.io_manager import io_manager as backend
+            files = args.files
+        else:
+            parser.error("give --files or --mock")
+
+        load_start = time.perf_counter()
+        if not backend.load_files(args.files, args.tick_direction):
+            logger.error(f"Could not load files: {args.files}")
+            return 1
+        load_files_s = time.perf_counter() - load_start
+
+        nentries = backend.get_total_entries()
+        entries = list(range(args.start, min(args.start + args.entries, nentries)))
+        if not entries:
+            logger.error(f"No entries to process ({nentries} in the files)")
+            return 1
+
+        plotters = register_plotters(args.plotters, backend.get_available_trees())
+        if not plotters:
+            logger.error("No plotters to run")
+            return 1
+
+        report = run_benchmark(backend, entries, plotters, warm=not args.no_warm)
+        report["files"] = files
+        report["load_files_s"] = load_files_s
+        report["max_workers"] = config.get('plotters', 'concurrency', 'max_workers', default=0)
+        if memory_monitor.enabled:
+            report["memory"] = memory_monitor.summary()
+
+    for pass_name, result in report["passes"].items():
+        print(f"{pass_name}: {result['events']} events in {result['wall_s']:.2f} s "
+              f"({result['events_per_s']:.2f} events/s), RSS +{result['rss_growth']/1e6:.1f} MB",
+              file=sys.stderr)
+
+    if args.output.endswith(".csv"):
+        write_csv(report, args.output)
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Wrote benchmark results to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
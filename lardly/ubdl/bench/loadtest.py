@@ -0,0 +1,478 @@
+"""
+Load test of the Lardly Dash server
+
+This module drives the callback endpoints of a running app (create_app()) with
+N concurrent simulated users. Each user opens the page, loads the files
+(button-load-dlmerged), then browses entries: load an entry
+(io-nav-button-load-entry), draw the 3D view with some of the plotters
+(button-load-det3d-fig) and pick a wire plane image
+(wireplane-viewer-dropdown), with a think time between actions.
+
+Requests are built from the app's own /_dash-dependencies and /_dash-layout,
+as the browser does. The report has the latency histogram and percentiles and
+the error rate of each action, and the RSS of the server process over the run.
+
+    python -m lardly.ubdl.bench.loadtest --serve --files dlmerged.root --users 8 --steps 20
+    python -m lardly.ubdl.bench.loadtest --url http://viewer:8891 --pid 12345 --files /data/dlmerged.root
+
+Note that the app keeps one IO manager for the whole server: simulated users
+share the loaded files and current entry, as real users of one server do.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper edges of the latency histogram bins (ms)
+HISTOGRAM_BINS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+def _parse_output(output: str) -> Tuple[List[Dict[str, str]], bool]:
+    """Split the output string of a callback into (id, property) pairs; True if it has several"""
+    multi = output.startswith("..")
+    parts = output[2:-2].split("...") if multi else [output]
+    outputs = []
+    for part in parts:
+        component_id, prop = part.rsplit(".", 1)
+        outputs.append({"id": component_id, "property": prop})
+    return outputs, multi
+
+def _layout_props(node: Any, props: Dict[str, Dict[str, Any]]) -> None:
+    """Collect the properties of every component with a string id"""
+    if isinstance(node, list):
+        for child in node:
+            _layout_props(child, props)
+    elif isinstance(node, dict) and "props" in node:
+        component_props = node["props"]
+        if isinstance(component_props.get("id"), str):
+            props[component_props["id"]] = component_props
+        _layout_props(component_props.get("children"), props)
+
+class DashClient:
+    """
+    HTTP client calling the callbacks of a Dash app as the browser does
+    """
+
+    def __init__(self, url: str, timeout: float = 120.0):
+        """
+        Initialize the client
+
+        Args:
+            url: Base URL of the app, e.g. http://localhost:8891
+            timeout: Seconds to wait for a response
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.callbacks: List[Dict[str, Any]] = []
+        self.props: Dict[str, Dict[str, Any]] = {}
+
+    def _request(self, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, headers={
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read()
+                if response.headers.get("Content-Encoding") == "gzip":
+                    content = gzip.decompress(content)
+                return response.status, content
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def open_page(self) -> None:
+        """Get the page, the layout and the callback map"""
+        self._request("/")
+        status, layout = self._request("/_dash-layout")
+        if status != 200:
+            raise RuntimeError(f"/_dash-layout returned {status}")
+        status, dependencies = self._request("/_dash-dependencies")
+        if status != 200:
+            raise RuntimeError(f"/_dash-dependencies returned {status}")
+        self.props = {}
+        _layout_props(json.loads(layout), self.props)
+        self.callbacks = [callback for callback in json.loads(dependencies)
+                          if not callback.get("clientside_function") and "{" not in callback["output"]]
+
+    def _value(self, dependency: Dict[str, str], values: Dict[Tuple[str, str], Any]) -> Dict[str, Any]:
+        key = (dependency["id"], dependency["property"])
+        value = values[key] if key in values else self.props.get(dependency["id"], {}).get(dependency["property"])
+        return {"id": dependency["id"], "property": dependency["property"], "value": value}
+
+    def trigger(self, component_id: str, prop: str, value: Any,
+                values: Optional[Dict[Tuple[str, str], Any]] = None) -> Tuple[int, int, Dict[str, Any]]:
+        """
+        Change a property and run the callbacks it triggers
+
+        Args:
+            component_id: Component id, e.g. 'button-load-det3d-fig'
+            prop: Property, e.g. 'n_clicks'
+            value: New value
+            values: Values of other inputs and states; the layout values are used for the rest
+
+        Returns:
+            (HTTP status, response bytes, response properties by component id).
+            The status is the worst one of the callbacks; 204 (no update) counts as success.
+        """
+        values = dict(values or {})
+        values[(component_id, prop)] = value
+        self.props.setdefault(component_id, {})[prop] = value
+        worst_status, nbytes, changed = 204, 0, {}
+        for callback in self.callbacks:
+            if not any(dep["id"] == component_id and dep["property"] == prop for dep in callback["inputs"]):
+                continue
+            outputs, multi = _parse_output(callback["output"])
+            body = {
+                "output": callback["output"],
+                "outputs": outputs if multi else outputs[0],
+                "inputs": [self._value(dep, values) for dep in callback["inputs"]],
+                "state": [self._value(dep, values) for dep in callback.get("state", [])],
+                "changedPropIds": [f"{component_id}.{prop}"],
+            }
+            status, content = self._request("/_dash-update-component", body)
+            nbytes += len(content)
+            if status not in (200, 204):
+                worst_status = status
+            elif status == 200 and worst_status == 204:
+                worst_status = 200
+            if status == 200:
+                for response_id, response_props in json.loads(content).get("response", {}).items():
+                    changed.setdefault(response_id, {}).update(response_props)
+        for response_id, response_props in changed.items():
+            self.props.setdefault(response_id, {}).update(response_props)
+        return worst_status, nbytes, changed
+
+class LoadTest:
+    """
+    Simulated users browsing the viewer, and the samples they record
+    """
+
+    def __init__(self, url: str, files: List[str], users: int = 4, steps: int = 10,
+                 think_time: float = 1.0, nplotters: int = 3, seed: int = 0, tick_direction: str = 'TickForwards'):
+        """
+        Initialize the load test
+
+        Args:
+            url: Base URL of the app
+            files: Files each user loads (paths on the server)
+            users: Number of concurrent users
+            steps: Entries browsed by each user
+            think_time: Mean pause between actions (seconds, exponential)
+            nplotters: Plotters drawn in the 3D view (chosen at random among the available ones)
+            seed: Seed of the browse patterns
+            tick_direction: Tick direction sent when loading the files
+        """
+        self.url = url
+        self.files = files
+        self.users = users
+        self.steps = steps
+        self.think_time = think_time
+        self.nplotters = nplotters
+        self.seed = seed
+        self.tick_direction = tick_direction
+        self.samples: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _record(self, user: int, action: str, start: float, status: int, nbytes: int, error: str = "") -> None:
+        with self._lock:
+            self.samples.append({"user": user, "action": action, "start": start,
+                                 "latency": time.perf_counter() - start, "status": status,
+                                 "bytes": nbytes, "ok": status in (200, 204) and not error, "error": error})
+
+    def _action(self, user: int, action: str, fn, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            status, nbytes, changed = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(user, action, start, 0, 0, f"{type(e).__name__}: {e}")
+            return None
+        self._record(user, action, start, status, nbytes)
+        return changed
+
+    def run_user(self, user: int) -> None:
+        """
+        Browse as one user
+
+        Args:
+            user: User number, also used to seed the browse pattern
+        """
+        rng = random.Random(self.seed*1000 + user)
+        client = DashClient(self.url)
+        start = time.perf_counter()
+        try:
+            client.open_page()
+            self._record(user, "open_page", start, 200, 0)
+        except Exception as e:
+            self._record(user, "open_page", start, 0, 0, f"{type(e).__name__}: {e}")
+            return
+
+        changed = self._action(user, "load_files", client.trigger, 'button-load-dlmerged', 'n_clicks', 1, {
+            ('file-path-input-dlmerged', 'value'): " ".join(self.files),
+            ('tick-direction', 'value'): self.tick_direction,
+        })
+        if changed is None:
+            return
+        plotter_choices = [o["value"] for o in client.props.get('det3d-viewer-checklist-plotchoices', {}).get('options') or []]
+        image_choices = [o["value"] for o in client.props.get('wireplane-viewer-dropdown', {}).get('options') or []]
+        nentries_text = str(client.props.get('io-nav-num-entries', {}).get('children', ""))
+        try:
+            nentries = int(nentries_text.split(":")[-1])
+        except ValueError:
+            nentries = 1
+
+        entry = rng.randrange(nentries)
+        for step in range(self.steps):
+            # mostly step to the next entry, sometimes jump
+            entry = (entry + 1) % nentries if rng.random() < 0.8 else rng.randrange(nentries)
+            self._action(user, "load_entry", client.trigger, 'io-nav-button-load-entry', 'n_clicks', step + 1,
+                         {('io-nav-entry-input', 'value'): str(entry)})
+            time.sleep(rng.expovariate(1.0/self.think_time) if self.think_time > 0 else 0.0)
+
+            if plotter_choices:
+                selected = rng.sample(plotter_choices, min(self.nplotters, len(plotter_choices)))
+                self._action(user, "det3d_figure", client.trigger, 'button-load-det3d-fig', 'n_clicks', step + 1,
+                             {('det3d-viewer-checklist-plotchoices', 'value'): selected})
+                time.sleep(rng.expovariate(1.0/self.think_time) if self.think_time > 0 else 0.0)
+
+            if image_choices:
+                self._action(user, "wireplane", client.trigger, 'wireplane-viewer-dropdown', 'value',
+                             rng.choice(image_choices))
+                time.sleep(rng.expovariate(1.0/self.think_time) if self.think_time > 0 else 0.0)
+
+    def run(self, ramp_up: float = 0.0) -> None:
+        """
+        Run all users concurrently
+
+        Args:
+            ramp_up: Seconds over which the users are started
+        """
+        def start_user(user: int) -> None:
+            time.sleep(ramp_up*user/max(1, self.users))
+            self.run_user(user)
+
+        with ThreadPoolExecutor(max_workers=self.users, thread_name_prefix="lardly-user") as pool:
+            for future in [pool.submit(start_user, user) for user in range(self.users)]:
+                future.result()
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the samples per action
+
+        Returns:
+            Per action: count, errors, error_rate, latency percentiles (seconds) and
+            histogram counts for HISTOGRAM_BINS_MS; and the first errors
+        """
+        actions = {}
+        for action in sorted({sample["action"] for sample in self.samples}):
+            samples = [sample for sample in self.samples if sample["action"] == action]
+            latencies_ms = np.array([sample["latency"]*1000 for sample in samples])
+            errors = sum(1 for sample in samples if not sample["ok"])
+            edges = (0,) + HISTOGRAM_BINS_MS
+            histogram = [int(((latencies_ms >= lo) & (latencies_ms < hi)).sum()) for lo, hi in zip(edges[:-1], edges[1:])]
+            actions[action] = {
+                "count": len(samples),
+                "errors": errors,
+                "error_rate": errors/len(samples),
+                "mean_s": float(latencies_ms.mean()/1000),
+                "p50_s": float(np.percentile(latencies_ms, 50)/1000),
+                "p90_s": float(np.percentile(latencies_ms, 90)/1000),
+                "p99_s": float(np.percentile(latencies_ms, 99)/1000),
+                "max_s": float(latencies_ms.max()/1000),
+                "mean_bytes": float(np.mean([sample["bytes"] for sample in samples])),
+                "histogram_ms": dict(zip([str(hi) for hi in HISTOGRAM_BINS_MS], histogram)),
+            }
+        errors = [f"{s['action']} (user {s['user']}): {s['error'] or 'HTTP ' + str(s['status'])}"
+                  for s in self.samples if not s["ok"]]
+        return {"users": self.users, "steps": self.steps, "actions": actions, "errors": errors[:20]}
+
+class MemorySampler:
+    """
+    Samples the RSS of a process in a background thread
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        """
+        Initialize the sampler
+
+        Args:
+            pid: Process id of the server
+            interval: Seconds between samples
+        """
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lardly-memory-sampler", daemon=True)
+
+    def rss(self) -> Optional[int]:
+        """RSS of the process in bytes, or None if it cannot be read"""
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])*1024
+        except OSError:
+            return None
+        return None
+
+    def _run(self) -> None:
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            rss = self.rss()
+            if rss is not None:
+                self.samples.append((time.perf_counter() - start, rss))
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Stop sampling
+
+        Returns:
+            start, end and peak RSS (bytes) and the samples as (seconds, bytes)
+        """
+        self._stop.set()
+        self._thread.join()
+        if not self.samples:
+            return {}
+        rss = [value for _, value in self.samples]
+        return {"start": rss[0], "end": rss[-1], "peak": max(rss), "growth": rss[-1] - rss[0],
+                "samples": self.samples}
+
+def serve_in_background(port: int) -> None:
+    """
+    Start the app in a thread of this process
+
+    Args:
+        port: Port to listen on
+    """
+    from lardly.ubdl.core.app import create_app
+    app = create_app()
+    thread = threading.Thread(target=app.server.run,
+                              kwargs={"host": "127.0.0.1", "port": port, "threaded": True},
+                              name="lardly-server", daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{port}/_dash-layout"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url, timeout=1.0).read()
+            return
+        except Exception:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Make a text summary with a latency histogram per action
+
+    Args:
+        report: From LoadTest.report, with the memory summary under 'server_memory'
+
+    Returns:
+        Text
+    """
+    lines = []
+    for action, summary in report["actions"].items():
+        lines.append(f"{action}: {summary['count']} calls, {summary['errors']} errors "
+                     f"({summary['error_rate']*100:.1f}%), p50 {summary['p50_s']*1000:.0f} ms, "
+                     f"p90 {summary['p90_s']*1000:.0f} ms, p99 {summary['p99_s']*1000:.0f} ms")
+        largest = max(summary["histogram_ms"].values()) or 1
+        previous = "0"
+        for edge, count in summary["histogram_ms"].items():
+            label = f"< {edge} ms" if edge != "inf" else f">= {previous} ms"
+            previous = edge
+            lines.append(f"  {label:>12} {count:6d} {'#'*int(40*count/largest)}")
+    memory = report.get("server_memory")
+    if memory:
+        lines.append(f"server RSS: {memory['start']/1e6:.0f} MB -> {memory['end']/1e6:.0f} MB "
+                     f"(peak {memory['peak']/1e6:.0f} MB)")
+    for error in report["errors"]:
+        lines.append(f"error: {error}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the load test from the command line
+
+    Returns:
+        Exit code: 1 if any request failed, else 0
+    """
+    parser = argparse.ArgumentParser(description='Lardly server load test')
+    parser.add_argument('--url', type=str, default=None,
+                        help='URL of a running server (default: the one started with --serve)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Start the app in this process')
+    parser.add_argument('--port', type=int, default=8899,
+                        help='Port of the server started with --serve')
+    parser.add_argument('--pid', type=int, default=None,
+                        help='Process id of the server, to sample its memory')
+    parser.add_argument('--files', type=str, nargs='+', required=True,
+                        help='Files the users load (paths on the server)')
+    parser.add_argument('--tick-direction', type=str, default='TickForwards',
+                        choices=['TickForwards', 'TickBackwards'],
+                        help='Tick direction for data processing')
+    parser.add_argument('--users', type=int, default=4,
+                        help='Concurrent users')
+    parser.add_argument('--steps', type=int, default=10,
+                        help='Entries browsed by each user')
+    parser.add_argument('--think-time', type=float, default=1.0,
+                        help='Mean pause between actions (seconds)')
+    parser.add_argument('--ramp-up', type=float, default=0.0,
+                        help='Seconds over which the users are started')
+    parser.add_argument('--plotters', type=int, default=3,
+                        help='Plotters drawn per 3D view')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the browse patterns')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the report to this JSON file')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                        help='Set the logging level')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    url = args.url
+    pid = args.pid
+    if args.serve:
+        import os
+        serve_in_background(args.port)
+        url = url or f"http://127.0.0.1:{args.port}"
+        pid = pid or os.getpid()
+    if url is None:
+        parser.error("give --url or --serve")
+
+    sampler = MemorySampler(pid) if pid is not None else None
+    if sampler is not None:
+        sampler.start()
+    test = LoadTest(url, args.files, users=args.users, steps=args.steps, think_time=args.think_time,
+                    nplotters=args.plotters, seed=args.seed, tick_direction=args.tick_direction)
+    start = time.perf_counter()
+    test.run(ramp_up=args.ramp_up)
+    report = test.report()
+    report["wall_s"] = time.perf_counter() - start
+    if sampler is not None:
+        report["server_memory"] = sampler.stop()
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(summary["errors"] for summary in report["actions"].values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
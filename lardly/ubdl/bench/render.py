@@ -0,0 +1,401 @@
+"""
+Browser render benchmark for Lardly
+
+This module renders figures in a headless Chromium (the one kaleido uses, or
+another local Chrome/Chromium) and measures, per figure:
+
+- time to first frame: from Plotly.newPlot to the first animation frame after it
+- frame times during a scripted camera orbit (3D figures) or pan (2D figures)
+
+The figures are read from JSON files, e.g. those written by BatchRunner with
+output.save_figure_json, or made from synthetic events with the 3D viewer plotters.
+A local HTTP server serves plotly.js (from plotly.py, no network needed), the
+figures and a page that runs the measurements and posts them back.
+
+    python -m lardly.ubdl.bench.render event_3d.json event_wireplane_2.json
+    python -m lardly.ubdl.bench.render --mock large --plotters LArFlowHits --output render.json
+
+WebGL runs on SwiftShader (software) unless other flags are given in
+bench.chromium_flags, so absolute frame times are pessimistic; compare figures
+with each other on the same machine.
+"""
+from typing import Any, Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+import numpy as np
+
+from lardly.ubdl.config.settings import config
+from lardly.ubdl.core.serialization import encode_arrays, dumps
+
+logger = logging.getLogger(__name__)
+
+# Flags of the headless browser; WebGL (scatter3d) needs a software GL
+CHROMIUM_FLAGS = [
+    "--headless=new",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-dev-shm-usage",
+    "--use-angle=swiftshader",
+    "--enable-unsafe-swiftshader",
+    "--ignore-gpu-blocklist",
+    "--window-size=1400,900",
+]
+
+# Executable names tried on the PATH
+CHROMIUM_NAMES = ["chromium", "chromium-browser", "google-chrome", "google-chrome-stable", "chrome"]
+
+RENDER_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="/plotly.js"></script>
+</head>
+<body style="margin:0">
+<div id="plot" style="width:1400px;height:900px"></div>
+<script>
+const RUN = %(run)d;
+const NFRAMES = %(nframes)d;
+function nextFrame() {
+    return new Promise(resolve => requestAnimationFrame(() => resolve()));
+}
+async function post(result) {
+    const response = await fetch('/result/' + RUN, {method: 'POST', body: JSON.stringify(result)});
+    const reply = await response.json();
+    if (reply.next) {
+        window.location.href = reply.next;
+    }
+}
+async function run() {
+    const result = {};
+    let start = performance.now();
+    const response = await fetch('/figure/' + RUN + '.json');
+    const fig = await response.json();
+    result.load_ms = performance.now() - start;
+
+    const div = document.getElementById('plot');
+    await nextFrame();
+    start = performance.now();
+    await Plotly.newPlot(div, fig.data || [], fig.layout || {});
+    await nextFrame();
+    result.first_frame_ms = performance.now() - start;
+
+    const scene = div._fullLayout.scene;
+    result.is3d = !!scene;
+    const frames = [];
+    let eye = null, radius = 0, xrange = null;
+    if (scene) {
+        eye = scene.camera.eye;
+        radius = Math.hypot(eye.x, eye.z) || 2.0;
+    } else if (div._fullLayout.xaxis) {
+        xrange = div._fullLayout.xaxis.range.slice();
+    }
+    let last = performance.now();
+    for (let i = 1; i <= NFRAMES; i++) {
+        const angle = Math.atan2(eye ? eye.z : 0, eye ? eye.x : 1) + 2*Math.PI*i/NFRAMES;
+        if (scene) {
+            await Plotly.relayout(div, {'scene.camera.eye': {x: radius*Math.cos(angle), y: eye.y, z: radius*Math.sin(angle)}});
+        } else if (xrange) {
+            const shift = 0.25*(xrange[1] - xrange[0])*Math.sin(2*Math.PI*i/NFRAMES);
+            await Plotly.relayout(div, {'xaxis.range': [xrange[0] + shift, xrange[1] + shift]});
+        }
+        await nextFrame();
+        const now = performance.now();
+        frames.push(now - last);
+        last = now;
+    }
+    result.frame_ms = frames;
+    await post(result);
+}
+run().catch(error => post({error: String(error)}));
+</script>
+</body>
+</html>
+"""
+
+def find_chromium(path: Optional[str] = None) -> Optional[str]:
+    """
+    Find a Chrome/Chromium executable
+
+    Tried in order: `path`, bench.chromium_path, $BROWSER_PATH (used by kaleido),
+    the Chrome downloaded by kaleido (`kaleido.get_chrome`), then the PATH.
+
+    Args:
+        path: Executable to use, if given
+
+    Returns:
+        Executable path, or None if none is found
+    """
+    candidates = [path, config.get("bench", "chromium_path", default=None), os.environ.get("BROWSER_PATH")]
+    try:
+        import choreographer
+        package_dir = os.path.dirname(choreographer.__file__)
+        candidates += sorted(glob.glob(os.path.join(package_dir, "cli", "browser_exe", "**", "chrome"), recursive=True))
+    except ImportError:
+        pass
+    candidates += [shutil.which(name) for name in CHROMIUM_NAMES]
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+class _RenderServer(ThreadingHTTPServer):
+    """Serves plotly.js, the figures and the page, and collects the results"""
+    daemon_threads = True
+
+    def __init__(self, figures: List[bytes], repeats: int, nframes: int):
+        super().__init__(("127.0.0.1", 0), _RenderHandler)
+        from plotly.offline import get_plotlyjs
+        self.plotlyjs = get_plotlyjs().encode("utf-8")
+        self.figures = figures
+        self.repeats = repeats
+        self.nframes = nframes
+        self.nruns = len(figures)*repeats
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.done = threading.Event()
+
+    def url(self, run: int) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/run/{run}"
+
+class _RenderHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, content: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/plotly.js":
+            self._send(server.plotlyjs, "application/javascript")
+        elif self.path.startswith("/run/"):
+            run = int(self.path[len("/run/"):])
+            page = RENDER_PAGE % {"run": run, "nframes": server.nframes}
+            self._send(page.encode("utf-8"), "text/html")
+        elif self.path.startswith("/figure/"):
+            run = int(self.path[len("/figure/"):-len(".json")])
+            self._send(server.figures[run // server.repeats], "application/json")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        server = self.server
+        run = int(self.path[len("/result/"):])
+        length = int(self.headers.get("Content-Length", 0))
+        server.results[run] = json.loads(self.rfile.read(length))
+        following = run + 1 if run + 1 < server.nruns else None
+        self._send(json.dumps({"next": server.url(following) if following is not None else None}).encode("utf-8"),
+                   "application/json")
+        if following is None:
+            server.done.set()
+
+def _frame_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the repeats of one figure"""
+    errors = [result["error"] for result in results if "error" in result]
+    good = [result for result in results if "error" not in result]
+    if not good:
+        return {"error": errors[0] if errors else "no result"}
+    frames = np.concatenate([np.asarray(result["frame_ms"], dtype=np.float64) for result in good])
+    first_frame = np.asarray([result["first_frame_ms"] for result in good])
+    summary = {
+        "is3d": good[0]["is3d"],
+        "load_ms": float(np.median([result["load_ms"] for result in good])),
+        "first_frame_ms": float(np.median(first_frame)),
+        "first_frame_max_ms": float(first_frame.max()),
+    }
+    if frames.size:
+        summary.update({
+            "frames": int(frames.size),
+            "frame_mean_ms": float(frames.mean()),
+            "frame_p50_ms": float(np.percentile(frames, 50)),
+            "frame_p90_ms": float(np.percentile(frames, 90)),
+            "frame_max_ms": float(frames.max()),
+            "fps": float(1000.0/frames.mean()) if frames.mean() > 0 else 0.0,
+        })
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+def render_figures(figures: List[Any], repeats: int = 3, nframes: Optional[int] = None,
+                   chromium: Optional[str] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Render figures in a headless browser and measure their frame times
+
+    Args:
+        figures: Plotly figures, figure dictionaries, or their JSON (str or bytes)
+        repeats: Page loads per figure
+        nframes: Frames of the camera orbit (default: bench.render_frames)
+        chromium: Browser executable (default: see find_chromium)
+        timeout: Seconds to wait for all results (default: bench.render_timeout)
+
+    Returns:
+        One summary per figure: bytes, traces, load_ms, first_frame_ms, frame
+        time statistics and fps, or 'error'
+    """
+    if nframes is None:
+        nframes = config.get("bench", "render_frames", default=60)
+    if timeout is None:
+        timeout = config.get("bench", "render_timeout", default=300.0)
+    executable = find_chromium(chromium)
+    if executable is None:
+        raise RuntimeError("No Chrome/Chromium found: install kaleido's Chrome (plotly_get_chrome) "
+                           "or set bench.chromium_path")
+
+    payloads = []
+    for figure in figures:
+        if isinstance(figure, str):
+            figure = figure.encode("utf-8")
+        if not isinstance(figure, bytes):
+            figure = dumps(encode_arrays(figure, enabled=True)).encode("utf-8")
+        payloads.append(figure)
+
+    server = _RenderServer(payloads, repeats, nframes)
+    server_thread = threading.Thread(target=server.serve_forever, name="lardly-render-server", daemon=True)
+    server_thread.start()
+    flags = CHROMIUM_FLAGS + list(config.get("bench", "chromium_flags", default=None) or [])
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        flags.append("--no-sandbox")
+    try:
+        with tempfile.TemporaryDirectory(prefix="lardly-render-") as profile_dir:
+            log_path = os.path.join(profile_dir, "chrome.log")
+            log = open(log_path, "wb")
+            browser = subprocess.Popen([executable] + flags + [f"--user-data-dir={profile_dir}", server.url(0)],
+                                       stdout=subprocess.DEVNULL, stderr=log)
+            try:
+                deadline = time.monotonic() + timeout
+                # poll, so that a browser that fails to start is reported right away
+                while not server.done.wait(0.5):
+                    if browser.poll() is not None:
+                        with open(log_path, "rb") as f:
+                            stderr = f.read().decode("utf-8", "replace").strip()
+                        raise RuntimeError(f"{executable} exited with code {browser.returncode}: {stderr[-500:]}")
+                    if time.monotonic() > deadline:
+                        logger.error(f"Rendering timed out after {timeout} s ({len(server.results)}/{server.nruns} runs)")
+                        break
+            finally:
+                browser.terminate()
+                try:
+                    browser.wait(10)
+                except subprocess.TimeoutExpired:
+                    browser.kill()
+                log.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    summaries = []
+    for ifig, payload in enumerate(payloads):
+        results = [server.results[run] for run in range(ifig*repeats, (ifig + 1)*repeats) if run in server.results]
+        summary = {"bytes": len(payload), "traces": len(json.loads(payload).get("data", []))}
+        summary.update(_frame_summary(results))
+        summaries.append(summary)
+    return summaries
+
+def make_mock_figure(size: str, plotters: Optional[List[str]] = None) -> Any:
+    """
+    Make a 3D viewer figure from a synthetic event
+
+    Args:
+        size: Name in STANDARD_SIZES
+        plotters: Plotter names (default: all applicable)
+
+    Returns:
+        Plotly figure
+    """
+    from lardly.ubdl.io.mock_backend import MockIOManager, SyntheticEventGenerator
+    from lardly.ubdl.bench.cases import STANDARD_SIZES
+    from lardly.ubdl.bench.cli import register_plotters
+    from lardly.ubdl.plotters.registry import registry
+    from lardly.ubdl.core.state import state_manager
+    from lardly.ubdl.ui.det3d_viewer import make_default_plot
+
+    backend = MockIOManager(SyntheticEventGenerator(sizes=STANDARD_SIZES[size]), nentries=1)
+    backend.load_files()
+    backend.load_entry(0)
+    selected = register_plotters(plotters, backend.get_available_trees())
+    all_options = state_manager.get_state('plotters', 'options', default={})
+    options = {name: all_options.get(name, {}) for name in selected}
+    fig = make_default_plot()
+    for trace in registry.make_traces(selected, backend.get_tree_dict(), options):
+        fig.add_trace(trace)
+    return fig
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the render benchmark from the command line
+
+    Returns:
+        Exit code: 1 if a figure could not be rendered, else 0
+    """
+    parser = argparse.ArgumentParser(description='Lardly browser render benchmark')
+    parser.add_argument('figures', type=str, nargs='*',
+                        help='Figure JSON files')
+    parser.add_argument('--mock', type=str, default=None, choices=['small', 'medium', 'large'],
+                        help='Also render a 3D figure made from a synthetic event of this size')
+    parser.add_argument('--plotters', type=str, nargs='+', default=None,
+                        help='Plotters of the synthetic event figure (default: all applicable)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Page loads per figure')
+    parser.add_argument('--frames', type=int, default=None,
+                        help='Frames of the camera orbit')
+    parser.add_argument('--chromium', type=str, default=None,
+                        help='Chrome/Chromium executable')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the results to this JSON file')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                        help='Set the logging level')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    names = []
+    figures = []
+    for path in args.figures:
+        with open(path, "rb") as f:
+            figures.append(f.read())
+        names.append(path)
+    if args.mock:
+        figures.append(make_mock_figure(args.mock, args.plotters))
+        names.append(f"mock:{args.mock}")
+    if not figures:
+        parser.error("give figure files or --mock")
+
+    try:
+        summaries = render_figures(figures, repeats=args.repeats, nframes=args.frames, chromium=args.chromium)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    failed = False
+    for name, summary in zip(names, summaries):
+        summary["figure"] = name
+        if "error" in summary:
+            failed = True
+            print(f"{name}: error: {summary['error']}")
+        else:
+            print(f"{name}: {summary['bytes']/1e6:.1f} MB, {summary['traces']} traces, "
+                  f"first frame {summary['first_frame_ms']:.0f} ms, "
+                  f"frame p50 {summary.get('frame_p50_ms', 0):.1f} ms, p90 {summary.get('frame_p90_ms', 0):.1f} ms "
+                  f"({summary.get('fps', 0):.1f} fps)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+Benchmark suite for Lardly
+
+This module times the plotters and lardly.data converters (see
+lardly.ubdl.bench.cases) on synthetic events of standard sizes, records the
+time, peak Python memory, serialized output size, traces and points of each,
+and compares them with stored baselines. A case larger or slower than its
+baseline by more than the bench thresholds is a regression, and the suite
+exits with an error; so does a case that has no baseline or fails.
+
+    python -m lardly.ubdl.bench.suite --sizes small medium
+    python -m lardly.ubdl.bench.suite --update-baselines [--timings]
+
+The baselines in this package hold only the metrics that do not depend on the
+machine (output size, traces, points). Timings and peak memory are stored and
+compared only with --timings, on the machine that will run the comparisons.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import logging
+
+from lardly.ubdl.config.settings import config
+from lardly.ubdl.core.perf import count_points
+from lardly.ubdl.core.serialization import encode_arrays, dumps
+from lardly.ubdl.io.mock_backend import MockIOManager, SyntheticEventGenerator
+from lardly.ubdl.bench.cases import BenchCase, CaseSkipped, STANDARD_SIZES, all_cases
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Measured values compared with the baselines, and the threshold setting of each
+METRICS = {
+    "output_bytes": "bytes_threshold",
+    "traces": "count_threshold",
+    "points": "count_threshold",
+    "time_s": "time_threshold",
+    "peak_bytes": "memory_threshold",
+}
+
+# Metrics that are the same on every machine for the same synthetic events
+DETERMINISTIC_METRICS = ("output_bytes", "traces", "points")
+
+def _as_list(traces: Any) -> List[Any]:
+    if traces is None:
+        return []
+    if isinstance(traces, (list, tuple)):
+        return list(traces)
+    return [traces]
+
+def run_case(case: BenchCase, size: str, backend: MockIOManager, repeats: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Time one case on the event loaded in the backend
+
+    The case is run once to warm up (products are generated on first use), then
+    `repeats` times for the time (the fastest is kept), then once more under
+    tracemalloc for the peak memory.
+
+    Args:
+        case: Case to run
+        size: Name of the event size, recorded in the result
+        backend: Mock backend with an entry loaded
+        repeats: Timed runs (default: bench.repeats)
+
+    Returns:
+        Result dictionary; 'status' is "ok", "skipped" (missing dependency or product) or "error"
+    """
+    if repeats is None:
+        repeats = config.get("bench", "repeats", default=3)
+    result = {"case": case.name, "kind": case.kind, "size": size}
+    try:
+        fn = case.setup(backend)
+        traces = _as_list(fn())
+    except (ImportError, CaseSkipped) as e:
+        logger.warning(f"{case.name} [{size}] skipped: {e}")
+        result.update(status="skipped", error=str(e))
+        return result
+    except Exception as e:
+        logger.error(f"{case.name} [{size}] failed: {e}")
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+        return result
+
+    times = []
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result.update(status="ok",
+                  time_s=min(times),
+                  peak_bytes=peak,
+                  # typed arrays whatever the installed Dash, so that the size does not depend on it
+                  output_bytes=len(dumps(encode_arrays(traces, enabled=True))),
+                  traces=len(traces),
+                  points=count_points(traces))
+    return result
+
+def run_suite(sizes: Optional[List[str]] = None, match: Optional[str] = None,
+              repeats: Optional[int] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Run all cases at the given event sizes
+
+    Args:
+        sizes: Names in STANDARD_SIZES (default: all)
+        match: Only run cases whose name contains this string
+        repeats: Timed runs per case (default: bench.repeats)
+        seed: Seed of the synthetic events
+
+    Returns:
+        List of results from run_case
+    """
+    cases = [case for case in all_cases() if match is None or match in case.name]
+    results = []
+    for size in sizes or list(STANDARD_SIZES):
+        backend = MockIOManager(SyntheticEventGenerator(sizes=STANDARD_SIZES[size], seed=seed), nentries=1)
+        backend.load_files()
+        backend.load_entry(0)
+        for case in cases:
+            result = run_case(case, size, backend, repeats)
+            if result["status"] == "ok":
+                logger.info(f"{case.name} [{size}]: {result['time_s']*1000:.1f} ms, "
+                            f"{result['peak_bytes']} bytes peak, {result['output_bytes']} bytes out")
+            results.append(result)
+    return results
+
+def result_key(result: Dict[str, Any]) -> str:
+    """Key of a result in the baselines file, e.g. "plotter:CRTPlotter[small]" """
+    return f"{result['case']}[{result['size']}]"
+
+def load_baselines(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the baselines file
+
+    Args:
+        path: File path (default: bench.baselines, else the file in this package)
+
+    Returns:
+        Dictionary of result key to the metrics; empty if there is no file
+    """
+    path = path or config.get("bench", "baselines", default=None) or DEFAULT_BASELINES
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("cases", {})
+
+def write_baselines(results: List[Dict[str, Any]], path: Optional[str] = None, timings: bool = False) -> None:
+    """
+    Write the successful results as the new baselines
+
+    Baselines of cases that were not run are kept.
+
+    Args:
+        results: Results from run_suite
+        path: File path (default: bench.baselines, else the file in this package)
+        timings: Also store the time and peak memory, which depend on the machine
+    """
+    path = path or config.get("bench", "baselines", default=None) or DEFAULT_BASELINES
+    metrics = list(METRICS) if timings else list(DETERMINISTIC_METRICS)
+    cases = load_baselines(path)
+    for result in results:
+        if result["status"] == "ok":
+            cases[result_key(result)] = {metric: result[metric] for metric in metrics}
+    header = {"machine": platform.node(), "python": platform.python_version()} if timings else {}
+    with open(path, "w") as f:
+        json.dump({**header, "cases": dict(sorted(cases.items()))}, f, indent=2)
+        f.write("\n")
+    logger.info(f"Wrote {len(cases)} baselines to {path}")
+
+def compare_to_baselines(results: List[Dict[str, Any]], baselines: Dict[str, Dict[str, Any]],
+                         thresholds: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Find the results that are worse than their baselines by more than the thresholds
+
+    Only the metrics stored in a baseline are checked. Times shorter than
+    bench.min_time are too noisy to compare and are not checked.
+
+    Args:
+        results: Results from run_suite
+        baselines: From load_baselines
+        thresholds: Relative threshold per metric (default: the bench settings)
+
+    Returns:
+        One dictionary per regression with the key, metric, baseline, value and ratio
+    """
+    if thresholds is None:
+        thresholds = {metric: config.get("bench", setting, default=0.0) for metric, setting in METRICS.items()}
+    min_time = config.get("bench", "min_time", default=0.005)
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result_key(result))
+        if result["status"] != "ok" or baseline is None:
+            continue
+        for metric, threshold in thresholds.items():
+            reference = baseline.get(metric)
+            if reference is None or (metric == "time_s" and max(reference, result[metric]) < min_time):
+                continue
+            if reference == 0:
+                ratio = 1.0 if result[metric] == 0 else float("inf")
+            else:
+                ratio = result[metric] / reference
+            if ratio > 1.0 + threshold:
+                regressions.append({"key": result_key(result), "metric": metric,
+                                    "baseline": reference, "value": result[metric], "ratio": ratio})
+    return regressions
+
+def missing_baselines(results: List[Dict[str, Any]], baselines: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Find the results that have no baseline to compare with
+
+    Args:
+        results: Results from run_suite
+        baselines: From load_baselines
+
+    Returns:
+        Result keys
+    """
+    return [result_key(result) for result in results
+            if result["status"] == "ok" and result_key(result) not in baselines]
+
+def format_results(results: List[Dict[str, Any]], regressions: List[Dict[str, Any]]) -> str:
+    """
+    Make a text table of the results, marking the regressions
+
+    Args:
+        results: Results from run_suite
+        regressions: From compare_to_baselines
+
+    Returns:
+        Table
+    """
+    regressed = {(r["key"], r["metric"]) for r in regressions}
+    lines = [f"{'case':<55} {'out kB':>10} {'traces':>10} {'points':>10} {'time ms':>10} {'peak kB':>10}"]
+    for result in results:
+        key = result_key(result)
+        if result["status"] != "ok":
+            lines.append(f"{key:<55} {result['status']}: {result['error']}")
+            continue
+        cells = [f"{result['output_bytes']/1024:.0f}", f"{result['traces']}", f"{result['points']}",
+                 f"{result['time_s']*1000:.1f}", f"{result['peak_bytes']/1024:.0f}"]
+        cells = [cell + ("!" if (key, metric) in regressed else " ") for cell, metric in zip(cells, METRICS)]
+        lines.append(f"{key:<55} " + " ".join(f"{cell:>10}" for cell in cells))
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the suite from the command line
+
+    Returns:
+        Exit code: 1 if there are regressions, failed cases or cases without a baseline, else 0
+    """
+    parser = argparse.ArgumentParser(description='Lardly plotter and converter benchmarks')
+    parser.add_argument('--sizes', type=str, nargs='+', default=None, choices=list(STANDARD_SIZES),
+                        help='Event sizes to run (default: all)')
+    parser.add_argument('--match', type=str, default=None,
+                        help='Only run cases whose name contains this string')
+    parser.add_argument('--repeats', type=int, default=None,
+                        help='Timed runs per case')
+    parser.add_argument('--baselines', type=str, default=None,
+                        help='Baselines file')
+    parser.add_argument('--update-baselines', action='store_true',
+                        help='Store the results as the new baselines instead of comparing')
+    parser.add_argument('--timings', action='store_true',
+                        help='With --update-baselines, also store the time and peak memory (machine dependent)')
+    parser.add_argument('--allow-missing', action='store_true',
+                        help='Only warn about cases that have no baseline')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the results and regressions to this JSON file')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                        help='Set the logging level')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    results = run_suite(sizes=args.sizes, match=args.match, repeats=args.repeats)
+    if args.update_baselines:
+        write_baselines(results, args.baselines, timings=args.timings)
+        regressions = []
+        missing = []
+    else:
+        baselines = load_baselines(args.baselines)
+        regressions = compare_to_baselines(results, baselines)
+        missing = missing_baselines(results, baselines)
+    errors = [result_key(result) for result in results if result["status"] == "error"]
+
+    print(format_results(results, regressions))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "regressions": regressions}, f, indent=2)
+
+    for regression in regressions:
+        logger.error(f"REGRESSION {regression['key']} {regression['metric']}: "
+                     f"{regression['value']:.4g} vs baseline {regression['baseline']:.4g} "
+                     f"({(regression['ratio'] - 1)*100:.0f}% worse)")
+    for key in missing:
+        logger.warning(f"NO BASELINE {key}: run with --update-baselines to add it")
+
+    failed = False
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond the thresholds", file=sys.stderr)
+        failed = True
+    if errors:
+        print(f"\n{len(errors)} case(s) failed: {', '.join(errors)}", file=sys.stderr)
+        failed = True
+    if missing and not args.allow_missing:
+        print(f"\n{len(missing)} case(s) without a baseline: {', '.join(missing)}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,8 +34,125 @@ class Config:
                 [0.75, "rgb(242,143,56)"],
                 [1, "rgb(217,30,30)"],
             ],
+            # Cryostat mesh from the DAE file, drawn behind the TPC outline
+            "detector_mesh": {
+                "show": False,
+                # level of detail: 0 (full mesh) ... N-1 (coarsest), or "auto" to follow the camera distance
+                "level": "auto",
+                "lod_cell_sizes": [0.0, 20.0, 60.0, 150.0],  # vertex clustering cell size, in DAE units (mm)
+                "lod_distances": [1.0, 2.0, 3.5],  # camera distances where the level changes
+                "scale": 0.1,  # DAE mm -> cm
+                "offset": [125.0, 0.0, 518.5],  # cryostat center in TPC coordinates (cm)
+                "cache_dir": None,  # where the .npz cache is written; next to the DAE file if None
+            },
+        },
+        
+        # Wire plane viewer
+        "wireplane": {
+            # maximum number of pixels sent per plane; coarser pyramid levels are used above it
+            "max_pixels": 250000,
+            # pooling of the coarse levels: "max" or "sum"
+            "pyramid_mode": "max",
+            # None keeps float pixels; 8 or 16 builds the pyramid on a quantized copy (max pooling only)
+            "quantize_bits": None,
+            # planes (or zoomed windows) with a smaller fraction of nonzero pixels are drawn as a scattergl
+            "sparse_threshold": 0.05,
+            # "heatmap" sends pixel values; "image" applies the colorscale on the server and sends a PNG
+            "render_mode": "heatmap",
+            # zlib level of the PNGs sent in image mode
+            "png_compress_level": 6,
         },
         
+        # Transport of figures to the browser
+        "serialization": {
+            # send NumPy arrays as base64 typed arrays: True, False, or "auto" (if the plotly.js served supports them)
+            "typed_arrays": "auto",
+            # arrays with fewer elements are sent as JSON lists
+            "min_array_size": 16,
+            # doubles are sent as float32 if no value changes by more than this (relative); 0 keeps doubles
+            "float32_rtol": 1e-6,
+            # compress HTTP responses (with flask-compress if installed, else gzip)
+            "compress": True,
+            "compress_min_size": 1024,
+            "compress_level": 6,
+        },
+
+        # Plotter execution
+        "plotters": {
+            "concurrency": {
+                # threads running the selected plotters; 0 or 1 runs them one after another
+                "max_workers": 0,
+                # seconds a plotter may take before its traces are left out; None waits
+                "timeout": 30.0,
+                # seconds an entry load waits for plotters still running (e.g. after a timeout)
+                # before it fails; None waits
+                "load_wait": 60.0,
+            },
+        },
+
+        # Performance records (time, traces, points and bytes per plotter per entry)
+        "perf": {
+            "enabled": True,
+            # serialize each plotter's traces again to record the exact payload size;
+            # otherwise the size is estimated from the arrays
+            "measure_payload": False,
+            # components taking longer (seconds) are highlighted
+            "slow_threshold": 1.0,
+            # entries kept
+            "max_entries": 50,
+            # refresh of the Performance panel while it is open
+            "refresh_interval_ms": 2000,
+        },
+
+        # Memory diagnostics (lardly.ubdl.core.memory); tracemalloc slows the app down
+        "memory": {
+            "enabled": False,
+            # growth (MB of RSS or Python heap) from one entry load to the next that is warned about
+            "growth_threshold_mb": 20.0,
+            # allocation sites listed with a warning; 0 skips the tracemalloc snapshots
+            "top_stats": 10,
+            # frames kept per traced allocation
+            "traceback_frames": 1,
+            # entries kept
+            "max_entries": 50,
+            # drop the products of the current entry before loading the next (IOManager.release_entry)
+            "release_on_load": False,
+        },
+
+        # Benchmark suite (lardly.ubdl.bench)
+        "bench": {
+            # timed runs per case; the fastest is kept
+            "repeats": 3,
+            # relative increase over the baseline reported as a regression
+            "time_threshold": 0.25,
+            "memory_threshold": 0.25,
+            "bytes_threshold": 0.05,
+            # traces and points of the synthetic events are exact
+            "count_threshold": 0.0,
+            # times (seconds) below this are too noisy to compare
+            "min_time": 0.005,
+            # baselines file; the one in the package if None
+            "baselines": None,
+            # browser render benchmark: Chrome/Chromium to use (found automatically if None),
+            # extra flags, frames of the camera orbit and seconds to wait for all figures
+            "chromium_path": None,
+            "chromium_flags": None,
+            "render_frames": 60,
+            "render_timeout": 300.0,
+        },
+
+        # Memoized plotter traces, keyed by files, entry, plotter and options
+        "figure_cache": {
+            "enabled": True,
+            # results kept in memory
+            "max_entries": 64,
+            # on-disk store shared by server workers and batch runs, e.g. "~/.cache/lardly/figures";
+            # memory only if None. Only give a directory that no one else can write to.
+            "cache_dir": None,
+            # size of the on-disk store (MB) beyond which the least recently used results are deleted
+            "max_disk_mb": 512.0,
+        },
+
         # Tree names for different plotters
         "tree_names": {
             "intime_flash": "simpleFlashBeam",
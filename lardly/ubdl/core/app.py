@@ -15,7 +15,9 @@ from lardly.ubdl.config.settings import config, load_config
 from lardly.ubdl.core.state import state_manager
 from lardly.ubdl.ui.io_navigation import make_io_navigation_widget, register_io_navigation_callbacks
 from lardly.ubdl.ui.det3d_viewer import make_det3d_viewer, register_det3d_callbacks
+from lardly.ubdl.ui.perf_panel import make_perf_panel, register_perf_panel_callbacks
 from lardly.ubdl.io.io_manager import io_manager
+from lardly.ubdl.core.serialization import enable_compression
 
 # Import plotter implementations
 from lardly.ubdl.plotters.registry import register_plotter
@@ -87,6 +89,8 @@ def create_layout() -> html.Div:
             # Left panel - file navigation
             html.Div([
                 make_io_navigation_widget(),
+                html.Hr(),
+                make_perf_panel(),
             ], style={
                 'width': '30%', 
                 'float': 'left',
@@ -144,6 +148,9 @@ def register_callbacks(app):
     # Register det3d callbacks
     register_det3d_callbacks(app)
     
+    # Register performance panel callbacks
+    register_perf_panel_callbacks(app)
+    
     # Register plotter-specific callbacks
     from lardly.ubdl.plotters.registry import register_callbacks as register_plotter_callbacks
     register_plotter_callbacks(app)
@@ -165,6 +172,10 @@ def create_app():
     # Register callbacks
     register_callbacks(app)
     
+    # Compress responses and log the bytes saved per callback
+    if config.get('serialization', 'compress', default=True):
+        enable_compression(app.server)
+    
     return app
 
 def run_app(app: dash.Dash, port: Optional[int] = None, debug: Optional[bool] = None) -> None:
@@ -0,0 +1,304 @@
+"""
+Figure cache for Lardly
+
+This module memoizes the traces made by plotters. A result is stored under a hash
+of everything it depends on: the loaded files (catalog hash), the entry, the plotter
+and its options, and the lardly code that made it. The cache has two tiers: an
+in-process LRU and an optional on-disk store addressed by the same hash, which can
+be shared by several server workers and batch runs. The on-disk store is off unless
+figure_cache.cache_dir is set; it holds JSON (arrays base64-encoded), never pickles,
+and its oldest files are deleted beyond figure_cache.max_disk_mb.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import logging
+import numpy as np
+
+from lardly.ubdl.config.settings import config
+
+logger = logging.getLogger(__name__)
+
+# bump when the format of the stored values changes
+FIGURE_CACHE_VERSION = 2
+
+_code_fingerprint = None
+
+def code_fingerprint() -> str:
+    """
+    Hash of the source of the lardly package
+
+    Part of every cache key, so that results made by older code are not used
+    after the plotters or converters change.
+
+    Returns:
+        Hex digest, computed once per process
+    """
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        package_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        h = hashlib.sha1()
+        for dirpath, dirnames, filenames in os.walk(package_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    path = os.path.join(dirpath, filename)
+                    h.update(os.path.relpath(path, package_dir).encode("utf-8"))
+                    with open(path, "rb") as f:
+                        h.update(f.read())
+        _code_fingerprint = h.hexdigest()
+    return _code_fingerprint
+
+def make_cache_key(**identity: Any) -> str:
+    """
+    Hash the identity of a cached result
+
+    Dictionaries are canonicalized (sorted keys), so options given in a
+    different order give the same key.
+
+    Args:
+        **identity: JSON-serializable values the result depends on
+
+    Returns:
+        Hex digest
+    """
+    canonical = json.dumps(identity, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{FIGURE_CACHE_VERSION}:{code_fingerprint()}:{canonical}".encode("utf-8")).hexdigest()
+
+def _to_json(obj: Any) -> Any:
+    """Make traces JSON-serializable, keeping arrays exactly (base64 of their bytes)"""
+    if isinstance(obj, dict):
+        return {key: _to_json(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_json(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind in "biuf":
+            arr = np.ascontiguousarray(obj)
+            return {"__ndarray__": base64.b64encode(arr.tobytes()).decode("ascii"),
+                    "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        return _to_json(obj.tolist())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    raise TypeError(f"cannot store {type(obj).__name__} in the figure cache")
+
+def _from_json(obj: Any) -> Any:
+    """Inverse of _to_json"""
+    if isinstance(obj, dict):
+        if "__ndarray__" in obj:
+            data = base64.b64decode(obj["__ndarray__"])
+            return np.frombuffer(data, dtype=np.dtype(obj["dtype"])).reshape(obj["shape"]).copy()
+        return {key: _from_json(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_from_json(value) for value in obj]
+    return obj
+
+def _copy_dicts(obj: Any) -> Any:
+    """Copy nested dictionaries and lists, sharing everything else (e.g. arrays)"""
+    if isinstance(obj, dict):
+        return {key: _copy_dicts(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_copy_dicts(value) for value in obj]
+    return obj
+
+class FigureCache:
+    """
+    Two-tier cache of trace lists
+
+    Values are kept as plain trace dictionaries. `get` returns copies of the
+    dictionaries, so callers can restyle the traces; arrays are shared and must
+    not be modified in place.
+    """
+
+    def __init__(self, max_entries: int = 64, cache_dir: Optional[str] = None, max_disk_mb: float = 512.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Number of results kept in memory
+            cache_dir: Directory of the on-disk store, or None for memory only
+            max_disk_mb: Size of the on-disk store beyond which the least recently used files are deleted
+        """
+        self.max_entries = max_entries
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.max_disk_bytes = int(max_disk_mb*1024*1024)
+        self._disk_bytes: Optional[int] = None
+        self._memory: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _disk_files(self) -> List[Tuple[str, os.stat_result]]:
+        files = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        files.append((path, os.stat(path)))
+                    except OSError:
+                        pass
+        return files
+
+    def _evict(self, added: int) -> None:
+        """Delete the least recently used files while the store is larger than max_disk_bytes"""
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(stat.st_size for _, stat in self._disk_files())
+            else:
+                self._disk_bytes += added
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            # other workers write to the same store: count again before deleting
+            files = sorted(self._disk_files(), key=lambda item: item[1].st_mtime)
+            total = sum(stat.st_size for _, stat in files)
+            target = 0.9*self.max_disk_bytes
+            removed = 0
+            for path, stat in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= stat.st_size
+                    removed += 1
+                except OSError:
+                    pass
+            self._disk_bytes = total
+        logger.info(f"Figure cache: removed {removed} files, {total/1e6:.1f} MB left in {self.cache_dir}")
+
+    def _remember(self, key: str, traces: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._memory[key] = traces
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up a result, in memory first and then on disk
+
+        Args:
+            key: Key from make_cache_key
+
+        Returns:
+            Copy of the cached traces, or None
+        """
+        with self._lock:
+            traces = self._memory.get(key)
+            if traces is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return _copy_dicts(traces)
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                with open(path, "r") as f:
+                    traces = _from_json(json.load(f))
+                # the modification time orders the files for eviction
+                os.utime(path)
+            except FileNotFoundError:
+                traces = None
+            except Exception as e:
+                logger.warning(f"Could not read figure cache file {path}: {e}")
+                traces = None
+            if traces is not None:
+                self._remember(key, traces)
+                with self._lock:
+                    self.disk_hits += 1
+                return _copy_dicts(traces)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, traces: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Store a result in memory and on disk
+
+        Args:
+            key: Key from make_cache_key
+            traces: Traces (dictionaries or plotly graph objects)
+
+        Returns:
+            Copy of the stored trace dictionaries
+        """
+        traces = [trace.to_plotly_json() if hasattr(trace, "to_plotly_json") else trace for trace in traces]
+        self._remember(key, traces)
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                content = json.dumps(_to_json(traces), separators=(",", ":"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # write to a temporary file first so other workers never read a partial file
+                fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        f.write(content)
+                    os.replace(tmppath, path)
+                except Exception:
+                    if os.path.exists(tmppath):
+                        os.remove(tmppath)
+                    raise
+                self._evict(len(content))
+            except Exception as e:
+                logger.warning(f"Could not write figure cache file {path}: {e}")
+
+        return _copy_dicts(traces)
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        Drop all results
+
+        Args:
+            disk: Also delete the on-disk store
+        """
+        with self._lock:
+            self._memory.clear()
+        if disk and self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            import shutil
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            with self._lock:
+                self._disk_bytes = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get hit and miss counts
+
+        Returns:
+            Dictionary with hits, disk_hits, misses and the number of results in memory
+        """
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self._memory)}
+
+# Global cache, made on first use from the config
+_figure_cache = None
+
+def get_figure_cache() -> Optional[FigureCache]:
+    """
+    Get the global figure cache
+
+    Returns:
+        FigureCache, or None if figure_cache.enabled is false
+    """
+    global _figure_cache
+    if not config.get("figure_cache", "enabled", default=True):
+        return None
+    if _figure_cache is None:
+        _figure_cache = FigureCache(
+            max_entries=config.get("figure_cache", "max_entries", default=64),
+            cache_dir=config.get("figure_cache", "cache_dir", default=None),
+            max_disk_mb=config.get("figure_cache", "max_disk_mb", default=512.0))
+    return _figure_cache
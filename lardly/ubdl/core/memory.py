@@ -0,0 +1,302 @@
+"""
+Memory diagnostics for Lardly
+
+This module measures the Python heap (with tracemalloc) and the process RSS
+around each entry load and each plotter, to find what makes long viewer
+sessions grow. Heap growth is Python objects: arrays, trace dictionaries,
+cached values. RSS growth without heap growth points at C++ objects, e.g.
+ROOT products or ublarcvapp graphs kept alive by Python references.
+
+Diagnostics are off by default (memory.enabled): tracemalloc makes every
+allocation slower. When they are on, the growth between two entry loads is
+compared with memory.growth_threshold_mb, and the allocation sites that grew
+the most are logged with the warning.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import gc
+import json
+import sys
+import threading
+import tracemalloc
+import logging
+
+from lardly.ubdl.config.settings import config
+
+logger = logging.getLogger(__name__)
+
+MB = 1024*1024
+
+# Allocations of the diagnostics themselves and of imports are not reported
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def get_rss_bytes() -> int:
+    """
+    Get the resident set size of this process
+
+    Returns:
+        Bytes; the peak RSS where /proc is not available
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])*1024
+    except OSError:
+        pass
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == "darwin" else maxrss*1024
+
+def get_heap_bytes() -> int:
+    """
+    Get the size of the Python allocations traced by tracemalloc
+
+    Returns:
+        Bytes; 0 if tracemalloc is not tracing
+    """
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+class MemoryMonitor:
+    """
+    Heap and RSS growth per entry and component
+
+    Components are the plotters, 'load_entry' and 'release_entry', measured
+    with `track()`. Each entry load also records the growth since the previous
+    load (`entry_loaded()`). Only the most recent entries are kept (memory.max_entries).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize an empty monitor
+
+        Args:
+            max_entries: Number of entries kept (default: memory.max_entries)
+        """
+        self.max_entries = max_entries or config.get("memory", "max_entries", default=50)
+        self._records: "OrderedDict[int, OrderedDict[str, Dict[str, int]]]" = OrderedDict()
+        self._growth: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._last: Optional[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+        self.version = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(config.get("memory", "enabled", default=False))
+
+    def _start_tracing(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(config.get("memory", "traceback_frames", default=1))
+            logger.info("Started tracemalloc for memory diagnostics")
+
+    @staticmethod
+    def _trim(records: "OrderedDict[int, Any]", max_entries: int) -> None:
+        while len(records) > max_entries:
+            records.popitem(last=False)
+
+    @contextmanager
+    def track(self, entry: int, component: str) -> Iterator[None]:
+        """
+        Measure the heap and RSS growth of a block of code
+
+        The growth is what the block allocated and did not free, e.g. the traces it
+        returned and the values it cached. The previous record of the component for
+        the entry is replaced. Plotters running in several threads at the same time
+        share their growth; set plotters.concurrency.max_workers to 0 to attribute
+        it to each plotter exactly.
+
+        Args:
+            entry: Entry number
+            component: Plotter name or other component
+        """
+        if not self.enabled:
+            yield
+            return
+        self._start_tracing()
+        heap_start = get_heap_bytes()
+        rss_start = get_rss_bytes()
+        try:
+            yield
+        finally:
+            self.add(entry, component, heap=get_heap_bytes() - heap_start, rss=get_rss_bytes() - rss_start)
+
+    def add(self, entry: int, component: str, heap: int = 0, rss: int = 0) -> None:
+        """
+        Set the growth of a component for an entry
+
+        Args:
+            entry: Entry number
+            component: Plotter name or other component
+            heap: Python heap growth in bytes
+            rss: RSS growth in bytes
+        """
+        with self._lock:
+            components = self._records.get(entry)
+            if components is None:
+                components = self._records[entry] = OrderedDict()
+                self._trim(self._records, self.max_entries)
+            components[component] = {"heap": heap, "rss": rss}
+            self.version += 1
+
+    def entry_loaded(self, entry: int) -> Optional[Dict[str, Any]]:
+        """
+        Record the growth since the previous entry load, and warn if it is too large
+
+        Called by the IO manager after each load_entry. The growth covers everything
+        done while the previous entry was loaded (plotters, wire planes, figures)
+        and loading this one; the part not measured by `track()` is 'other'.
+        Garbage is collected first, so that only what is still referenced counts.
+
+        Args:
+            entry: Entry number just loaded
+
+        Returns:
+            Growth record, or None if diagnostics are off or this is the first load
+        """
+        if not self.enabled:
+            return None
+        self._start_tracing()
+        gc.collect()
+        rss = get_rss_bytes()
+        heap = get_heap_bytes()
+        top_stats = config.get("memory", "top_stats", default=10)
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS) if top_stats > 0 else None
+
+        with self._lock:
+            previous = self._last
+            self._last = {"entry": entry, "rss": rss, "heap": heap, "snapshot": snapshot}
+            if previous is None:
+                return None
+            # the previous entry's own load happened before its snapshot
+            measured = [(component, growth) for component, growth in self._records.get(previous["entry"], {}).items()
+                        if component != "load_entry"]
+            if "load_entry" in self._records.get(entry, {}):
+                measured.append(("load_entry", self._records[entry]["load_entry"]))
+            record = {
+                "entry": entry,
+                "previous_entry": previous["entry"],
+                "rss": rss,
+                "heap": heap,
+                "rss_growth": rss - previous["rss"],
+                "heap_growth": heap - previous["heap"],
+                "components": {component: dict(growth) for component, growth in measured},
+            }
+            record["other"] = {key: record[f"{key}_growth"] - sum(growth[key] for _, growth in measured)
+                               for key in ("heap", "rss")}
+            if snapshot is not None and previous["snapshot"] is not None:
+                record["top"] = self.top_growth(previous["snapshot"], snapshot, top_stats)
+            self._growth[entry] = record
+            self._trim(self._growth, self.max_entries)
+            self.version += 1
+
+        threshold = config.get("memory", "growth_threshold_mb", default=20.0)*MB
+        if max(record["rss_growth"], record["heap_growth"]) > threshold:
+            largest = sorted(record["components"].items(), key=lambda item: item[1]["rss"], reverse=True)
+            lines = [f"Memory grew by {record['rss_growth']/MB:.1f} MB RSS, {record['heap_growth']/MB:.1f} MB heap "
+                     f"from entry {previous['entry']} to entry {entry}"]
+            lines += [f"  {component}: {growth['rss']/MB:+.1f} MB RSS, {growth['heap']/MB:+.1f} MB heap"
+                      for component, growth in largest[:5]]
+            lines += [f"  {site['site']}: {site['size_diff']/MB:+.1f} MB in {site['count_diff']:+d} blocks"
+                      for site in record.get("top", [])]
+            logger.warning("\n".join(lines))
+        return record
+
+    @staticmethod
+    def top_growth(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find the allocation sites that grew the most between two snapshots
+
+        Args:
+            before: Earlier snapshot
+            after: Later snapshot
+            limit: Number of sites
+
+        Returns:
+            One dictionary per site with the site ("file:line"), size_diff and count_diff
+        """
+        stats = [stat for stat in after.compare_to(before, "lineno") if stat.size_diff > 0]
+        return [{"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_diff": stat.size_diff,
+                 "count_diff": stat.count_diff} for stat in stats[:limit]]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Get the component records as a list, most recent entry first
+
+        Returns:
+            One dictionary per entry and component, with the heap and RSS growth
+        """
+        with self._lock:
+            rows = []
+            for entry in reversed(self._records):
+                for component, growth in self._records[entry].items():
+                    rows.append({"entry": entry, "component": component, **growth})
+            return rows
+
+    def growth_rows(self) -> List[Dict[str, Any]]:
+        """
+        Get the growth between entry loads, most recent first
+
+        Returns:
+            Records from `entry_loaded()`
+        """
+        with self._lock:
+            return [dict(self._growth[entry]) for entry in reversed(self._growth)]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the current usage, the growth per entry and the totals per component
+
+        Returns:
+            JSON-serializable dictionary
+        """
+        rows = self.rows()
+        growth = self.growth_rows()
+        components: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            totals = components.setdefault(row["component"], {"entries": 0, "heap": 0, "rss": 0})
+            totals["entries"] += 1
+            totals["heap"] += row["heap"]
+            totals["rss"] += row["rss"]
+        for totals in components.values():
+            totals["mean_heap"] = totals["heap"] / totals["entries"]
+            totals["mean_rss"] = totals["rss"] / totals["entries"]
+        return {
+            "rss": get_rss_bytes(),
+            "heap": get_heap_bytes(),
+            "growth_threshold_mb": config.get("memory", "growth_threshold_mb", default=20.0),
+            "mean_rss_growth": sum(record["rss_growth"] for record in growth) / len(growth) if growth else 0.0,
+            "mean_heap_growth": sum(record["heap_growth"] for record in growth) / len(growth) if growth else 0.0,
+            "components": components,
+            "growth": growth,
+            "records": rows,
+        }
+
+    def write_json(self, path: str) -> None:
+        """
+        Write the summary to a JSON file
+
+        Args:
+            path: Output file path
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        logger.info(f"Wrote memory summary to {path}")
+
+    def clear(self) -> None:
+        """Drop all records and the last snapshot"""
+        with self._lock:
+            self._records.clear()
+            self._growth.clear()
+            self._last = None
+            self.version += 1
+
+# Global monitor
+memory_monitor = MemoryMonitor()
@@ -0,0 +1,353 @@
+"""
+Performance recording for Lardly
+
+This module records, per entry and per component (a plotter, the entry load,
+a wire plane), the wall time spent in each stage of making a figure and the
+size of the result. Stages are:
+
+- read: reading products from the files
+- extract: turning products into arrays
+- style: building traces from the arrays
+- serialize: encoding the traces for the browser
+
+The records are shown in the Performance panel of the app and written as a
+JSON summary by the batch runner.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import threading
+import time
+import logging
+
+from lardly.ubdl.config.settings import config
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("read", "extract", "style", "serialize")
+COUNTS = ("traces", "points", "bytes")
+
+def count_points(traces: List[Any]) -> int:
+    """
+    Count the points drawn by a list of traces
+
+    Uses the size of 'z' when the trace has one (heatmaps, images and 3D traces;
+    a heatmap's 'x' and 'y' only label its columns and rows), else the length of 'x'.
+
+    Args:
+        traces: Trace dictionaries or plotly graph objects
+
+    Returns:
+        Number of points
+    """
+    npoints = 0
+    for trace in traces:
+        for key in ("z", "x"):
+            try:
+                values = trace[key]
+            except (KeyError, TypeError, ValueError):
+                continue
+            if values is None:
+                continue
+            if hasattr(values, "size"):
+                npoints += int(values.size)
+            else:
+                try:
+                    npoints += sum(len(row) for row in values)
+                except TypeError:
+                    try:
+                        npoints += len(values)
+                    except TypeError:
+                        pass
+            break
+    return npoints
+
+def estimate_bytes(obj: Any) -> int:
+    """
+    Estimate the size of traces sent to the browser without serializing them
+
+    Arrays count their buffer size (as typed arrays do), strings their length,
+    other values 8 bytes. Use perf.measure_payload for the exact size.
+
+    Args:
+        obj: Trace dictionaries, plotly graph objects or an encoded figure
+
+    Returns:
+        Approximate number of bytes
+    """
+    nbytes = 0
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if hasattr(value, "nbytes"):
+            nbytes += int(value.nbytes)
+        elif isinstance(value, (str, bytes)):
+            nbytes += len(value) + 2
+        elif isinstance(value, dict):
+            nbytes += sum(len(str(key)) + 4 for key in value)
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            nbytes += len(value) + 2
+            stack.extend(value)
+        elif hasattr(value, "to_plotly_json"):
+            stack.append(value.to_plotly_json())
+        else:
+            nbytes += 8
+    return nbytes
+
+class PerfRecorder:
+    """
+    Stage timings and counts per entry and component
+
+    Only the most recent entries are kept (perf.max_entries).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize an empty recorder
+
+        Args:
+            max_entries: Number of entries kept (default: perf.max_entries)
+        """
+        self.max_entries = max_entries or config.get("perf", "max_entries", default=50)
+        self._records: "OrderedDict[int, OrderedDict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.version = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(config.get("perf", "enabled", default=True))
+
+    def _record(self, entry: int, component: str) -> Dict[str, Any]:
+        components = self._records.get(entry)
+        if components is None:
+            components = self._records[entry] = OrderedDict()
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        record = components.get(component)
+        if record is None:
+            record = components[component] = {stage: 0.0 for stage in STAGES}
+            record.update({count: 0 for count in COUNTS})
+        return record
+
+    def add(self, entry: int, component: str, stage: Optional[str] = None, seconds: float = 0.0,
+            **values: Any) -> None:
+        """
+        Add time to a stage and/or set counts of a component
+
+        Args:
+            entry: Entry number
+            component: Plotter name or other component
+            stage: One of STAGES, or None to only set values
+            seconds: Time to add to the stage
+            **values: Counts to add (traces, points, bytes) or flags to set (e.g. cached=True)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self._record(entry, component)
+            if stage is not None:
+                record[stage] += seconds
+            for key, value in values.items():
+                if key in COUNTS:
+                    record[key] += value
+                else:
+                    record[key] = value
+            self.version += 1
+
+    @contextmanager
+    def timed(self, entry: int, component: str, stage: str) -> Iterator[None]:
+        """
+        Time a block of code as one stage of a component
+
+        Args:
+            entry: Entry number
+            component: Plotter name or other component
+            stage: One of STAGES
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(entry, component, stage, time.perf_counter() - start)
+
+    @contextmanager
+    def measure(self, entry: int, component: str) -> Iterator[None]:
+        """
+        Time a component whose stages are marked inside the block
+
+        The previous record of the component for the entry is replaced. Time marked
+        with `stage()` (or reads through `timed_io`) made by the same thread inside
+        the block goes to that stage; the rest goes to 'extract'.
+
+        Args:
+            entry: Entry number
+            component: Plotter name or other component
+        """
+        self.reset(entry, component)
+        previous = getattr(self._local, "active", None)
+        active = {"entry": entry, "component": component, "marked": 0.0}
+        self._local.active = active
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.active = previous
+            self.add(entry, component, "extract", max(0.0, elapsed - active["marked"]))
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """
+        Mark a block inside `measure()` as a stage, e.g. `with perf_recorder.stage("style"):`
+
+        Does nothing outside of `measure()`.
+
+        Args:
+            stage: One of STAGES
+        """
+        active = getattr(self._local, "active", None)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if active is not None:
+                elapsed = time.perf_counter() - start
+                active["marked"] += elapsed
+                self.add(active["entry"], active["component"], stage, elapsed)
+
+    def reset(self, entry: int, component: str) -> None:
+        """
+        Drop the record of a component for an entry
+
+        Args:
+            entry: Entry number
+            component: Plotter name or other component
+        """
+        with self._lock:
+            components = self._records.get(entry)
+            if components is not None and component in components:
+                del components[component]
+                self.version += 1
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Get the records as a list, most recent entry first
+
+        Returns:
+            One dictionary per entry and component, with the stages, their total and the counts
+        """
+        with self._lock:
+            rows = []
+            for entry in reversed(self._records):
+                for component, record in self._records[entry].items():
+                    row = {"entry": entry, "component": component}
+                    row.update(record)
+                    row["total"] = sum(record[stage] for stage in STAGES)
+                    rows.append(row)
+            return rows
+
+    def slow_rows(self, threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Get the records that took longer than a threshold, slowest first
+
+        Args:
+            threshold: Seconds (default: perf.slow_threshold)
+
+        Returns:
+            Rows as in `rows()`
+        """
+        if threshold is None:
+            threshold = config.get("perf", "slow_threshold", default=1.0)
+        slow = [row for row in self.rows() if row["total"] > threshold]
+        return sorted(slow, key=lambda row: row["total"], reverse=True)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get all records, the slow ones, and the totals per component
+
+        Returns:
+            JSON-serializable dictionary
+        """
+        rows = self.rows()
+        components: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            totals = components.setdefault(row["component"], {"entries": 0, "total": 0.0, "max": 0.0})
+            totals["entries"] += 1
+            totals["total"] += row["total"]
+            totals["max"] = max(totals["max"], row["total"])
+        for totals in components.values():
+            totals["mean"] = totals["total"] / totals["entries"]
+        return {
+            "slow_threshold": config.get("perf", "slow_threshold", default=1.0),
+            "components": components,
+            "slow": self.slow_rows(),
+            "records": rows,
+        }
+
+    def write_json(self, path: str) -> None:
+        """
+        Write the summary to a JSON file
+
+        Args:
+            path: Output file path
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        logger.info(f"Wrote performance summary to {path}")
+
+    def clear(self) -> None:
+        """Drop all records"""
+        with self._lock:
+            self._records.clear()
+            self.version += 1
+
+class TimedIO:
+    """
+    Proxy of an IO manager whose method calls are timed as the 'read' stage
+    of the component measured by the calling thread
+    """
+
+    def __init__(self, obj: Any, recorder: PerfRecorder):
+        """
+        Initialize the proxy
+
+        Args:
+            obj: IO manager, or a proxy of one
+            recorder: Recorder to add the time to
+        """
+        self._obj = obj
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            with self._recorder.stage("read"):
+                return attr(*args, **kwargs)
+        return call
+
+def timed_io(tree_dict: Dict[str, Any], recorder: Optional["PerfRecorder"] = None) -> Dict[str, Any]:
+    """
+    Copy of a tree dictionary whose IO manager calls are timed as reads
+
+    Args:
+        tree_dict: Dictionary of trees (data sources)
+        recorder: Recorder to add the time to (default: the global one)
+
+    Returns:
+        Dictionary with the same keys
+    """
+    from lardly.ubdl.io.io_thread import IO_KEYS
+    recorder = recorder or perf_recorder
+    timed = dict(tree_dict)
+    for key in IO_KEYS:
+        if timed.get(key) is not None:
+            timed[key] = TimedIO(timed[key], recorder)
+    return timed
+
+# Global recorder
+perf_recorder = PerfRecorder()
@@ -0,0 +1,285 @@
+"""
+Figure serialization for Lardly
+
+This module encodes the NumPy arrays in figures as base64 typed arrays
+({"dtype", "bdata", "shape"}, understood by plotly.js >= 2.28) instead of JSON
+number lists, selects the fastest available JSON engine, and compresses the
+HTTP responses of the Dash server while recording the bytes saved per callback.
+"""
+from typing import Any, Dict, Optional, Tuple
+import base64
+import gzip
+import threading
+import logging
+import numpy as np
+
+import plotly.io.json
+
+from lardly.ubdl.config.settings import config
+
+logger = logging.getLogger(__name__)
+
+# Check for optional dependencies
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+try:
+    from flask_compress import Compress
+    _FLASK_COMPRESS_AVAILABLE = True
+except ImportError:
+    _FLASK_COMPRESS_AVAILABLE = False
+
+# First plotly.js version that decodes typed arrays
+TYPED_ARRAY_MIN_PLOTLYJS = (2, 28)
+
+# Integer types of plotly.js typed arrays, smallest first
+_INT_TYPES = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32]
+
+if _ORJSON_AVAILABLE:
+    plotly.io.json.config.default_engine = "orjson"
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    parts = []
+    for part in version.split("."):
+        digits = "".join(c for c in part if c.isdigit())
+        if not digits:
+            break
+        parts.append(int(digits))
+    return tuple(parts)
+
+def typed_arrays_enabled() -> bool:
+    """
+    Check whether figures should carry typed arrays
+
+    Set by serialization.typed_arrays: True, False or "auto". With "auto",
+    typed arrays are used if the plotly.js served by Dash can decode them.
+
+    Returns:
+        True if typed arrays should be used
+    """
+    setting = config.get("serialization", "typed_arrays", default="auto")
+    if setting != "auto":
+        return bool(setting)
+    try:
+        import dash
+        # Dash 3 serves the plotly.js bundled with plotly.py; older Dash has its own copy
+        if _version_tuple(dash.__version__) < (3,):
+            return False
+        from plotly.offline import get_plotlyjs_version
+        return _version_tuple(get_plotlyjs_version()) >= TYPED_ARRAY_MIN_PLOTLYJS
+    except Exception:
+        return False
+
+def _smallest_int_type(arr: np.ndarray) -> Optional[np.dtype]:
+    if arr.size == 0:
+        return np.dtype(np.uint8)
+    lo, hi = arr.min(), arr.max()
+    for int_type in _INT_TYPES:
+        info = np.iinfo(int_type)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(int_type)
+    return None
+
+def _compact_dtype(arr: np.ndarray, float32_rtol: float) -> Optional[np.dtype]:
+    """Smallest plotly.js typed array dtype that keeps the values, or None to leave the array as a list"""
+    if arr.dtype == np.bool_:
+        return np.dtype(np.uint8)
+    if np.issubdtype(arr.dtype, np.integer):
+        return _smallest_int_type(arr)
+    if arr.dtype == np.float32:
+        return arr.dtype
+    if np.issubdtype(arr.dtype, np.floating):
+        if float32_rtol > 0:
+            as32 = arr.astype(np.float32)
+            if np.allclose(as32, arr, rtol=float32_rtol, atol=0.0, equal_nan=True):
+                return np.dtype(np.float32)
+        return np.dtype(np.float64)
+    return None
+
+def encode_typed_array(arr: np.ndarray, float32_rtol: float = 1e-6) -> Optional[Dict[str, str]]:
+    """
+    Encode an array as a plotly.js typed array
+
+    Integers are stored in the smallest type holding their range. Doubles are stored
+    as float32 if that changes no value by more than `float32_rtol` (relative).
+
+    Args:
+        arr: 1D or 2D numeric array
+        float32_rtol: Largest relative change allowed when going to float32; 0 keeps doubles
+
+    Returns:
+        Typed array dictionary, or None if the array cannot be encoded (e.g. strings)
+    """
+    arr = np.asarray(arr)
+    if arr.ndim not in (1, 2):
+        return None
+    dtype = _compact_dtype(arr, float32_rtol)
+    if dtype is None:
+        return None
+    data = np.ascontiguousarray(arr, dtype=dtype.newbyteorder("<"))
+    encoded = {
+        "dtype": dtype.str.lstrip("<>|="),
+        "bdata": base64.b64encode(data.tobytes()).decode("ascii"),
+    }
+    if arr.ndim == 2:
+        encoded["shape"] = f"{arr.shape[0]}, {arr.shape[1]}"
+    return encoded
+
+def encode_arrays(obj: Any, min_size: Optional[int] = None, float32_rtol: Optional[float] = None,
+                  enabled: Optional[bool] = None) -> Any:
+    """
+    Replace the NumPy arrays in a figure, trace or layout by typed arrays
+
+    Containers are copied; everything else is shared. Arrays with fewer than
+    `min_size` elements, and arrays that cannot be encoded, are left as they are.
+    Nothing is changed if typed arrays are disabled.
+
+    Args:
+        obj: go.Figure, trace, or nested dicts/lists
+        min_size: Smallest array encoded (default: serialization.min_array_size)
+        float32_rtol: See encode_typed_array (default: serialization.float32_rtol)
+        enabled: Whether to encode; default from typed_arrays_enabled(). Pass True when the
+                 plotly.js version is known, e.g. for standalone HTML.
+
+    Returns:
+        Object with the same structure (a dict for a plotly graph object)
+    """
+    if enabled is None:
+        enabled = typed_arrays_enabled()
+    if not enabled:
+        return obj
+    if min_size is None:
+        min_size = config.get("serialization", "min_array_size", default=16)
+    if float32_rtol is None:
+        float32_rtol = config.get("serialization", "float32_rtol", default=1e-6)
+    return _encode(obj, min_size, float32_rtol)
+
+def _encode(obj: Any, min_size: int, float32_rtol: float) -> Any:
+    if hasattr(obj, "to_plotly_json"):
+        obj = obj.to_plotly_json()
+    if isinstance(obj, dict):
+        return {key: _encode(value, min_size, float32_rtol) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_encode(value, min_size, float32_rtol) for value in obj]
+    if isinstance(obj, np.ndarray) and obj.size >= min_size:
+        encoded = encode_typed_array(obj, float32_rtol)
+        if encoded is not None:
+            return encoded
+    return obj
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize a figure (or any plotly object) to JSON with the fastest available engine
+
+    Args:
+        obj: Object to serialize
+
+    Returns:
+        JSON string
+    """
+    return plotly.io.json.to_json_plotly(obj)
+
+class ResponseStats:
+    """
+    Bytes of the Dash callback responses, before and after compression, per callback output
+    """
+
+    def __init__(self):
+        """Initialize empty statistics"""
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, output: str, raw_bytes: int, sent_bytes: int) -> None:
+        """
+        Add one response
+
+        Args:
+            output: Callback output id
+            raw_bytes: Size of the JSON response
+            sent_bytes: Size sent after compression
+        """
+        with self._lock:
+            entry = self._stats.setdefault(output, {"calls": 0, "raw_bytes": 0, "sent_bytes": 0})
+            entry["calls"] += 1
+            entry["raw_bytes"] += raw_bytes
+            entry["sent_bytes"] += sent_bytes
+        saved = raw_bytes - sent_bytes
+        logger.info(f"{output}: {raw_bytes} bytes, {sent_bytes} sent ({saved} saved)")
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the totals per callback output
+
+        Returns:
+            Dictionary of output id to calls, raw_bytes and sent_bytes
+        """
+        with self._lock:
+            return {output: dict(entry) for output, entry in self._stats.items()}
+
+# Global response statistics
+response_stats = ResponseStats()
+
+def _callback_output(request) -> str:
+    try:
+        return str((request.get_json(silent=True) or {}).get("output", request.path))
+    except Exception:
+        return request.path
+
+def enable_compression(server, min_size: Optional[int] = None, level: Optional[int] = None) -> None:
+    """
+    Compress the responses of a Flask server and record the bytes saved per callback
+
+    flask-compress is used if it is installed (it negotiates brotli/gzip); otherwise
+    JSON responses are gzipped here.
+
+    Args:
+        server: Flask server (the `server` attribute of a Dash app)
+        min_size: Smallest response compressed (default: serialization.compress_min_size)
+        level: gzip level (default: serialization.compress_level)
+    """
+    from flask import g, request
+
+    if min_size is None:
+        min_size = config.get("serialization", "compress_min_size", default=1024)
+    if level is None:
+        level = config.get("serialization", "compress_level", default=6)
+
+    # Flask runs after_request functions in reverse order of registration:
+    # record_sent_size runs after the compression, measure_raw_size before it.
+    @server.after_request
+    def record_sent_size(response):
+        raw_bytes = g.pop("lardly_raw_bytes", None)
+        if raw_bytes is not None and not response.direct_passthrough:
+            response_stats.record(_callback_output(request), raw_bytes, response.content_length or raw_bytes)
+        return response
+
+    if _FLASK_COMPRESS_AVAILABLE:
+        server.config.setdefault("COMPRESS_MIN_SIZE", min_size)
+        server.config.setdefault("COMPRESS_LEVEL", level)
+        Compress(server)
+        logger.info("Compressing responses with flask-compress")
+    else:
+        @server.after_request
+        def gzip_response(response):
+            if (response.direct_passthrough or response.status_code != 200
+                    or "gzip" not in request.headers.get("Accept-Encoding", "")
+                    or "Content-Encoding" in response.headers
+                    or response.mimetype != "application/json"):
+                return response
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(gzip.compress(data, compresslevel=level))
+            response.headers["Content-Encoding"] = "gzip"
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+        logger.info("flask-compress not installed; gzipping JSON responses")
+
+    @server.after_request
+    def measure_raw_size(response):
+        if request.path.endswith("_dash-update-component") and not response.direct_passthrough:
+            g.lardly_raw_bytes = response.content_length or len(response.get_data())
+        return response
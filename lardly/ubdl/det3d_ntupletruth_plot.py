@@ -7,6 +7,7 @@ import ROOT as rt
 from larlite import larutil
 from math import sqrt
 from .t2range import get_t2range_util
+from lardly.data.default_pid_colors import get_hashed_rgb
 
 def get_treenames_from_yaml():
     return ["EventTree"]
@@ -109,7 +110,7 @@ def make_traces( tree_dict ):
         segpts[1,1] = segpts[0,1] + cmrange*diry
         segpts[1,2] = segpts[0,2] + cmrange*dirz
 
-        rcolor = np.random.randint(0,255,3)
+        rcolor = get_hashed_rgb("ntupletruth",ipart)
         srgb='rgba(%d,%d,%d,1.0)'%(rcolor[0],rcolor[1],rcolor[2])
 
         hovertext=f"""
@@ -4,6 +4,7 @@ from lardly.data.larlite_opflash import visualize_larlite_opflash_3d, visualize_
 import yaml
 import os
 import numpy as np
+from lardly.data.default_pid_colors import get_hashed_rgb
 
 INPUT_TREES_PRESENT=[]
 
@@ -83,8 +84,8 @@ def make_traces( tree_dict ):
                     customdata[isp,5+c] = hit[10+c]
             # end of hit loop
 
-            # random color
-            rcolor = np.random.randint(0,255,3)
+            # color fixed by the tree and cluster index
+            rcolor = get_hashed_rgb(inputtree,icluster)
             scolor="rgba(%d,%d,%d,1)"%(rcolor[0],rcolor[1],rcolor[2])
             
             # make trace
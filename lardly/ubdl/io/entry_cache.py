@@ -0,0 +1,89 @@
+"""
+Per-entry cache for Lardly
+
+This module provides a small cache for derived data that is expensive to
+build and is shared by several plotters for the same entry, e.g. the MC truth graph.
+The IO manager clears it whenever a new entry or new files are loaded.
+"""
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EntryCache:
+    """
+    Cache of objects derived from the currently loaded entry
+
+    Values are built on first request with a builder function and kept until
+    the cache is cleared. Access is guarded by a lock so plotters running
+    in different threads build each value only once.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache"""
+        self._data: Dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+        self._entry = -1
+
+    def get(self, key: Hashable, builder: Optional[Callable[[], Any]] = None, default: Any = None) -> Any:
+        """
+        Get a cached value, building it if needed
+
+        Args:
+            key: Cache key
+            builder: Function with no arguments that makes the value if it is not cached.
+                     If None, `default` is returned for missing keys.
+            default: Value returned if the key is missing and there is no builder
+
+        Returns:
+            The cached value
+        """
+        with self._lock:
+            if key in self._data:
+                return self._data[key]
+            if builder is None:
+                return default
+            value = builder()
+            self._data[key] = value
+            logger.debug(f"EntryCache[{self._entry}]: built {key}")
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._data[key] = value
+
+    def clear(self, entry: int = -1) -> None:
+        """
+        Drop all cached values
+
+        Args:
+            entry: The entry the cache will hold values for next
+        """
+        with self._lock:
+            self._data.clear()
+            self._entry = entry
+
+    def get_entry(self) -> int:
+        """
+        Get the entry the cached values belong to
+
+        Returns:
+            Entry number, -1 if unset
+        """
+        return self._entry
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -3,18 +3,46 @@ IO Manager for Lardly
 
 This module handles loading and managing data files.
 """
+import gc
 import os
-from typing import Dict, Any, List, Optional, Tuple
+import time
+import hashlib
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import logging
 
 import ROOT as rt
 from larlite import larlite
 from larcv import larcv
 
+from lardly.ubdl.config.settings import config
 from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.core.perf import perf_recorder
+from lardly.ubdl.core.memory import memory_monitor
+from lardly.ubdl.io.entry_cache import EntryCache
+from lardly.ubdl.io.io_thread import SerializedIO, entry_guard, get_io_thread
 
 logger = logging.getLogger(__name__)
 
+def make_catalog_hash(file_paths: List[str], tick_direction: str = 'TickForwards') -> str:
+    """
+    Hash identifying a set of input files
+    
+    Uses the path, size and modification time of each file, so the hash changes
+    when a file is rewritten.
+    
+    Args:
+        file_paths: Paths of the files, in load order
+        tick_direction: Tick direction the files are read with
+        
+    Returns:
+        Hex digest
+    """
+    h = hashlib.sha1(tick_direction.encode("utf-8"))
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        h.update(f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
 class IOManager:
     """
     IO Manager for handling data files
@@ -34,11 +62,22 @@ class IOManager:
         self._the_core_nentries = 0
         self._available_trees = []
         self._current_entry = -1
+        self._entry_cache = EntryCache()
+        self._catalog_hash = None
+        self._release_hooks: List[Callable[[], None]] = []
+    
+    def _exclusive(self, fn: Callable, *args) -> Any:
+        """Run a function on the IO thread once no one uses the current entry (see lardly.ubdl.io.io_thread)"""
+        with entry_guard.exclusive(config.get('plotters', 'concurrency', 'load_wait', default=60.0)):
+            return get_io_thread().call(fn, *args)
     
     def load_files(self, file_paths: List[str], tick_direction: str = 'TickForwards') -> bool:
         """
         Load data files
         
+        Waits until the products of the current entry are no longer in use, then
+        reads on the IO thread.
+        
         Args:
             file_paths: List of file paths to load
             tick_direction: Tick direction ('TickForwards' or 'TickBackwards')
@@ -47,15 +86,26 @@ class IOManager:
             True if files were loaded successfully
         """
         try:
-            # Initialize IO managers
+            return self._exclusive(self._load_files, file_paths, tick_direction)
+        except TimeoutError as e:
+            logger.error(f"Not loading files: {e}")
+            return False
+    
+    def _load_files(self, file_paths: List[str], tick_direction: str) -> bool:
+        try:
+            self._entry_cache.clear()
+            self._catalog_hash = None
+            
+            # Initialize IO managers; their calls always run on the IO thread
+            io_thread = get_io_thread()
             if tick_direction == 'TickBackwards':
-                self._larcv_io = larcv.IOManager(larcv.IOManager.kREAD, "larcv", larcv.IOManager.kTickBackward)
+                self._larcv_io = SerializedIO(larcv.IOManager(larcv.IOManager.kREAD, "larcv", larcv.IOManager.kTickBackward), io_thread)
                 logger.info("IOManager set to TickBackwards")
             else:
-                self._larcv_io = larcv.IOManager(larcv.IOManager.kREAD, "larcv", larcv.IOManager.kTickForward)
+                self._larcv_io = SerializedIO(larcv.IOManager(larcv.IOManager.kREAD, "larcv", larcv.IOManager.kTickForward), io_thread)
                 logger.info("IOManager set to TickForwards")
             
-            self._larlite_io = larlite.storage_manager(larlite.storage_manager.kREAD)
+            self._larlite_io = SerializedIO(larlite.storage_manager(larlite.storage_manager.kREAD), io_thread)
             self._larlite_io.set_verbosity(1)
             
             self._recoTree   = rt.TChain("KPSRecoManagerTree")
@@ -98,6 +148,8 @@ class IOManager:
                 
                 tfile.Close()
             
+            self._catalog_hash = make_catalog_hash(file_paths, tick_direction)
+            
             # Initialize IO managers
             if tick_direction == 'TickBackwards':
                 self._larcv_io.reverse_all_products()
@@ -163,66 +215,143 @@ class IOManager:
         """
         Load a specific entry from the data files
         
+        Waits until the products of the current entry are no longer in use, e.g.
+        by plotters left running after a timeout, then reads on the IO thread.
+        Fails if they are still in use after plotters.concurrency.load_wait seconds.
+        
         Args:
             entry: Entry number to load
             
         Returns:
             True if entry was loaded successfully
         """
+        try:
+            return self._exclusive(self._load_entry, entry)
+        except TimeoutError as e:
+            logger.error(f"Not loading entry {entry}: {e}")
+            return False
+    
+    def _load_entry(self, entry: int) -> bool:
         try:
             if entry < 0 or entry >= self._the_core_nentries:
                 logger.error(f"Entry {entry} out of bounds (0-{self._the_core_nentries-1})")
                 return False
             
-            # Load entry in each IO manager
-            if self._larcv_io is not None:
-                try:
-                    self._larcv_io.read_entry(entry)
-                    logger.info(f"Read larcv entry [{entry}]")
-                except Exception as e:
-                    logger.error(f"Error reading larcv entry: {e}")
+            start = time.perf_counter()
             
-            if self._larlite_io is not None:
-                try:
-                    self._larlite_io.go_to(entry)
-                    logger.info(f"Read larlite entry [{entry}]")                    
-                except Exception as e:
-                    logger.error(f"Error reading larlite entry: {e}")
+            if self._current_entry >= 0 and config.get('memory', 'release_on_load', default=False):
+                self._release_entry()
             
-            if self._recoTree is not None:
-                try:
-                    self._recoTree.GetEntry(entry)
-                    logger.info(f"Read recoTree entry [{entry}]")
-                except Exception as e:
-                    logger.error(f"Error reading recoTree entry: {e}")
-
-            if self._cosmicTree is not None:
-                try:
-                    self._cosmicTree.GetEntry(entry)
-                    logger.info(f"Read cosmicTree entry [{entry}]")                    
-                except Exception as e:
-                    logger.error(f"Error reading cosmicTree entry: {e}")
+            # Values derived from the previous entry are no longer valid
+            self._entry_cache.clear(entry)
             
-            if self._eventTree is not None:
-                try:
-                    self._eventTree.GetEntry(entry)
-                    logger.info(f"Read eventTree entry [{entry}]")                    
-                except Exception as e:
-                    logger.error(f"Error reading eventTree entry: {e}")
+            with memory_monitor.track(entry, 'load_entry'):
+                self._read_entry(entry)
             
             self._current_entry = entry
             state_manager.set_state(entry, 'io', 'current_entry')
             
+            perf_recorder.reset(entry, 'load_entry')
+            perf_recorder.add(entry, 'load_entry', 'read', time.perf_counter() - start)
+            memory_monitor.entry_loaded(entry)
+            
             return True
         
         except Exception as e:
             logger.error(f"Error loading entry {entry}: {e}")
             return False
     
+    def _read_entry(self, entry: int) -> None:
+        """Read an entry in each IO manager and tree"""
+        # Load entry in each IO manager
+        if self._larcv_io is not None:
+            try:
+                self._larcv_io.read_entry(entry)
+                logger.info(f"Read larcv entry [{entry}]")
+            except Exception as e:
+                logger.error(f"Error reading larcv entry: {e}")
+        
+        if self._larlite_io is not None:
+            try:
+                self._larlite_io.go_to(entry)
+                logger.info(f"Read larlite entry [{entry}]")                    
+            except Exception as e:
+                logger.error(f"Error reading larlite entry: {e}")
+        
+        if self._recoTree is not None:
+            try:
+                self._recoTree.GetEntry(entry)
+                logger.info(f"Read recoTree entry [{entry}]")
+            except Exception as e:
+                logger.error(f"Error reading recoTree entry: {e}")
+
+        if self._cosmicTree is not None:
+            try:
+                self._cosmicTree.GetEntry(entry)
+                logger.info(f"Read cosmicTree entry [{entry}]")                    
+            except Exception as e:
+                logger.error(f"Error reading cosmicTree entry: {e}")
+        
+        if self._eventTree is not None:
+            try:
+                self._eventTree.GetEntry(entry)
+                logger.info(f"Read eventTree entry [{entry}]")                    
+            except Exception as e:
+                logger.error(f"Error reading eventTree entry: {e}")
+    
+    def add_release_hook(self, hook: Callable[[], None]) -> None:
+        """
+        Add a function called by release_entry, e.g. to drop objects a plotter keeps for the entry
+        
+        Args:
+            hook: Function with no arguments
+        """
+        self._release_hooks.append(hook)
+    
+    def release_entry(self) -> None:
+        """
+        Drop what is held for the current entry
+        
+        Clears the per-entry cache (the MC truth graph, timing index and prepared
+        images hold references to C++ products), calls the release hooks, clears
+        the products of the larcv IO manager and collects garbage, so that PyROOT
+        proxies in reference cycles are freed. larlite's storage_manager has no
+        call to drop its products; they are replaced on the next go_to.
+        
+        Afterwards no entry is loaded: call load_entry before using the products again.
+        """
+        try:
+            self._exclusive(self._release_entry)
+        except TimeoutError as e:
+            logger.error(f"Not releasing entry {self._current_entry}: {e}")
+    
+    def _release_entry(self) -> None:
+        entry = self._current_entry
+        with memory_monitor.track(entry, 'release_entry'):
+            self._entry_cache.clear()
+            for hook in self._release_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    logger.warning(f"Release hook {hook} failed: {e}")
+            if self._larcv_io is not None and hasattr(self._larcv_io, 'clear_entry'):
+                try:
+                    self._larcv_io.clear_entry()
+                except Exception as e:
+                    logger.warning(f"Error clearing larcv entry: {e}")
+            self._current_entry = -1
+            state_manager.set_state(-1, 'io', 'current_entry')
+            gc.collect()
+        logger.info(f"Released entry {entry}")
+    
     def get_tree_dict(self) -> Dict[str, Any]:
         """
         Get a dictionary of available trees/data sources
         
+        The products it reaches are those of the current entry: take it and use it
+        with the entry guard held (see lardly.ubdl.io.io_thread). 'generation' tells
+        whether an entry was loaded since it was taken.
+        
         Returns:
             Dictionary with IO managers and trees
         """
@@ -231,7 +360,11 @@ class IOManager:
             'iolarcv': self._larcv_io,
             'recoTree': self._recoTree,
             'cosmicTree':self._cosmicTree,
-            'eventTree': self._eventTree
+            'eventTree': self._eventTree,
+            'entry_cache': self._entry_cache,
+            'catalog_hash': self._catalog_hash,
+            'entry': self._current_entry,
+            'generation': entry_guard.generation
         }
     
     def get_available_trees(self) -> List[str]:
@@ -243,6 +376,24 @@ class IOManager:
         """
         return self._available_trees
     
+    def get_entry_cache(self) -> EntryCache:
+        """
+        Get the cache of values derived from the current entry
+        
+        Returns:
+            EntryCache instance
+        """
+        return self._entry_cache
+    
+    def get_catalog_hash(self) -> Optional[str]:
+        """
+        Get the hash identifying the loaded files
+        
+        Returns:
+            Hex digest, or None if no files are loaded
+        """
+        return self._catalog_hash
+    
     def get_current_entry(self) -> int:
         """
         Get the current entry number
@@ -298,6 +449,12 @@ def load_entry(entry: int) -> bool:
     """
     return io_manager.load_entry(entry)
 
+def release_entry() -> None:
+    """
+    Drop what the global IO manager holds for the current entry (see IOManager.release_entry)
+    """
+    io_manager.release_entry()
+
 def get_tree_dict() -> Dict[str, Any]:
     """
     Get a dictionary of available trees/data sources
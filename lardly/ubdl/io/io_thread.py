@@ -0,0 +1,274 @@
+"""
+IO thread for Lardly
+
+ROOT file access is not thread safe. The IO manager keeps its larlite and
+larcv IO managers behind proxies that run every method call on a single IO
+thread, and loads files and entries on that thread, so products are read one
+at a time whichever Dash request or plotter thread asks for them.
+
+Products of the current entry are only valid until the next entry is loaded.
+Code that uses them (plotters, the wire plane views) holds the entry guard
+shared, from taking the tree dictionary until the last plotter has finished;
+loading files or an entry holds it exclusively, so it waits until every user
+has finished, including plotters left behind after a timeout. Work handed to
+other threads gets its own shared hold from the caller (`EntryGuard.hand_off`).
+"""
+from typing import Any, Callable, Dict, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import functools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tree dictionary entries whose methods read from the files
+IO_KEYS = ('iolarlite', 'iolarcv')
+
+class IOThread:
+    """
+    Single thread that owns the ROOT file access
+    """
+
+    def __init__(self):
+        """Initialize; the thread is started on first use"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lardly-io")
+        self._thread_ident = None
+
+    def _run(self, fn: Callable, args, kwargs) -> Any:
+        self._thread_ident = threading.get_ident()
+        return fn(*args, **kwargs)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a function on the IO thread and wait for its result
+
+        Calls made from the IO thread itself run directly.
+
+        Args:
+            fn: Function to run
+            *args, **kwargs: Arguments of the function
+
+        Returns:
+            Return value of the function
+        """
+        if threading.get_ident() == self._thread_ident:
+            return fn(*args, **kwargs)
+        return self._executor.submit(self._run, fn, args, kwargs).result()
+
+class SerializedIO:
+    """
+    Proxy of an IO manager whose method calls run on the IO thread
+    """
+
+    def __init__(self, obj: Any, io_thread: IOThread):
+        """
+        Initialize the proxy
+
+        Args:
+            obj: IO manager (larlite storage_manager or larcv IOManager)
+            io_thread: Thread to run the calls on
+        """
+        self._obj = obj
+        self._io_thread = io_thread
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            return self._io_thread.call(attr, *args, **kwargs)
+        return call
+
+# Global IO thread, made on first use
+_io_thread = None
+_io_thread_lock = threading.Lock()
+
+def get_io_thread() -> IOThread:
+    """
+    Get the global IO thread
+
+    Returns:
+        IOThread instance
+    """
+    global _io_thread
+    with _io_thread_lock:
+        if _io_thread is None:
+            _io_thread = IOThread()
+        return _io_thread
+
+class HandedOffHold:
+    """
+    Shared hold of the entry guard taken by one thread for work run on another
+
+    The worker enters the hold as a context manager: inside it, the worker holds
+    the guard shared (nested `shared()` calls return at once). The hold is released
+    when the worker leaves it, or by `release()` if the work never runs.
+    """
+
+    def __init__(self, guard: "EntryGuard"):
+        self._guard = guard
+        self._released = False
+        self._lock = threading.Lock()
+        self._depth = 0
+
+    def __enter__(self) -> "HandedOffHold":
+        self._depth = getattr(self._guard._local, "depth", 0)
+        self._guard._local.depth = self._depth + 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._guard._local.depth = self._depth
+        self.release()
+
+    def release(self) -> None:
+        """Give the hold back; later calls do nothing"""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._guard._release_reader()
+
+class EntryGuard:
+    """
+    Readers-writer lock on the loaded entry
+
+    Shared holds are reentrant within a thread. A waiting exclusive hold
+    blocks new shared holds from other threads, so a stream of requests cannot
+    keep an entry load waiting forever. A thread that holds the guard and waits
+    for work on other threads hands each of them a hold (`hand_off()`) instead
+    of letting them take one, which would wait behind a pending load.
+
+    `generation` counts the exclusive holds. The IO managers put it in their
+    tree dictionaries, so that a dictionary taken before a load can be told apart
+    from the current one (`is_current()`).
+    """
+
+    def __init__(self):
+        """Initialize an unheld guard"""
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._local = threading.local()
+        self.generation = 0
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Hold the guard while using products of the current entry"""
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._cond:
+                while self._writer:
+                    self._cond.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                self._release_reader()
+
+    def _release_reader(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            self._cond.notify_all()
+
+    def hand_off(self) -> HandedOffHold:
+        """
+        Take a shared hold for work that another thread will run
+
+        The calling thread must hold the guard shared, so the hold is taken
+        without waiting, even if a load is pending.
+
+        Returns:
+            Hold for the worker to enter (see HandedOffHold)
+
+        Raises:
+            RuntimeError: if the calling thread does not hold the guard
+        """
+        if getattr(self._local, "depth", 0) == 0:
+            raise RuntimeError("hand_off needs the entry guard held shared")
+        with self._cond:
+            self._readers += 1
+        return HandedOffHold(self)
+
+    def is_current(self, tree_dict: Dict[str, Any]) -> bool:
+        """
+        Check that no files or entry were loaded since a tree dictionary was taken
+
+        Args:
+            tree_dict: Dictionary from the IO manager's get_tree_dict
+
+        Returns:
+            False if the dictionary is from an earlier generation; True if it is
+            current or does not record its generation
+        """
+        generation = tree_dict.get('generation')
+        return generation is None or generation == self.generation
+
+    @contextmanager
+    def exclusive(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Hold the guard while loading files or an entry
+
+        Args:
+            timeout: Seconds to wait for the shared holders; None waits as long as needed
+
+        Raises:
+            TimeoutError: if shared holders are still running after the timeout
+        """
+        if getattr(self._local, "depth", 0) > 0:
+            raise RuntimeError("cannot load an entry while using the products of the current one")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._writer = True
+            while self._readers > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    readers = self._readers
+                    self._writer = False
+                    self._cond.notify_all()
+                    raise TimeoutError(f"{readers} users of the current entry still running after {timeout} s")
+                self._cond.wait(remaining)
+            self.generation += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+    def holding_shared(self, fn: Callable) -> Callable:
+        """Decorate a function to run with the guard held shared"""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.shared():
+                return fn(*args, **kwargs)
+        return wrapper
+
+# Global entry guard
+entry_guard = EntryGuard()
+
+def serialize_io(tree_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a tree dictionary whose IO managers run their calls on the IO thread
+
+    The IO manager's own proxies are kept as they are. The ROOT trees are passed as they are: the IO manager has already read the
+    current entry of them.
+
+    Args:
+        tree_dict: Dictionary of trees (data sources)
+
+    Returns:
+        Dictionary with the same keys
+    """
+    io_thread = get_io_thread()
+    serialized = dict(tree_dict)
+    for key in IO_KEYS:
+        if serialized.get(key) is not None and not isinstance(serialized[key], SerializedIO):
+            serialized[key] = SerializedIO(serialized[key], io_thread)
+    return serialized
@@ -0,0 +1,792 @@
+"""
+Mock IO backend for Lardly
+
+This module generates synthetic events and serves them through the same
+surface as the IO manager (get_tree_dict() and friends), so plotters can be
+run, benchmarked and compared without ROOT, larlite, larcv or data files.
+
+The products mimic the parts of the larlite/larcv API the plotters use:
+containers have size()/at(), points have X()/Y()/Z() and indexing, and so on.
+Events are generated from a seed and the entry number, so the same
+configuration always gives the same events. Sizes are set per product, e.g.
+
+    backend = MockIOManager(SyntheticEventGenerator(sizes={"larflow3dhit": 1000000}))
+    backend.load_files()
+    backend.load_entry(0)
+    traces = registry.make_traces(["LArFlowHits"], backend.get_tree_dict())
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import gc
+import hashlib
+import json
+import time
+import logging
+import numpy as np
+
+from lardly.ubdl.config.settings import config
+from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.core.perf import perf_recorder
+from lardly.ubdl.core.memory import memory_monitor
+from lardly.ubdl.io.entry_cache import EntryCache
+from lardly.ubdl.io.io_thread import entry_guard
+from lardly.geometry import get_geometry
+
+logger = logging.getLogger(__name__)
+
+# Number of objects of each product per event
+DEFAULT_SIZES = {
+    "larflow3dhit": 10000,      # hits in the larflow3dhit container
+    "larflowcluster": 20,       # clusters; the larflow hits are shared among them
+    "track": 30,                # cosmic tracks
+    "track_points": 20,         # trajectory points per track
+    "opflash": 10,
+    "crthit": 50,
+    "crttrack": 10,
+    "mctrack": 20,
+    "mctrack_steps": 50,        # steps per mctrack
+    "simch": 200,               # channels
+    "simch_ides": 20,           # IDEs per channel
+    "nu_vertices": 2,           # vertices in the reco tree
+    "nu_tracks": 3,             # tracks per vertex
+    "nu_showers": 2,            # showers per vertex
+    "nu_cluster_hits": 200,     # hits per track/shower cluster of a vertex
+    "image_occupancy": 0.02,    # fraction of nonzero wire image pixels
+}
+
+# Producer names, chosen to match what the plotters look for
+PRODUCERS = {
+    "larflow3dhit": "larmatch",
+    "larflowcluster": "showergoodhit",
+    "track": "boundarycosmicreduced",
+    "opflash": "simpleFlashBeam",
+    "crthit": "crthitcorr",
+    "crttrack": "crttrack",
+    "mctrack": "mcreco",
+    "mcshower": "mcreco",
+    "simch": "largeant",
+    "image2d": "wire",
+}
+
+# Active volume of the TPC (cm)
+TPC_BOUNDS = np.array([[0.0, 256.0], [-116.5, 116.5], [0.0, 1036.8]])
+
+# ---- larlite-like objects ----
+
+class MockVector(list):
+    """std::vector-like container"""
+
+    def size(self) -> int:
+        return len(self)
+
+    def at(self, i: int) -> Any:
+        return self[i]
+
+class MockPoint(tuple):
+    """TVector3-like point: p.X(), p[0] and p(0) all give x"""
+
+    def X(self) -> float:
+        return self[0]
+
+    def Y(self) -> float:
+        return self[1]
+
+    def Z(self) -> float:
+        return self[2]
+
+    def __call__(self, i: int) -> float:
+        return self[i]
+
+class MockLArFlow3DHit(MockVector):
+    """larlite::larflow3dhit: a vector of floats (position, scores, charges) plus wire and tick"""
+    __slots__ = ("targetwire", "tick", "track_score")
+
+class MockTrack:
+    """larlite::track"""
+
+    def __init__(self, points: np.ndarray, dqdx: Optional[np.ndarray] = None):
+        self._points = [MockPoint(p) for p in points.tolist()]
+        self._dqdx = dqdx
+
+    def NumberTrajectoryPoints(self) -> int:
+        return len(self._points)
+
+    def LocationAtPoint(self, i: int) -> MockPoint:
+        return self._points[i]
+
+    def Vertex(self) -> MockPoint:
+        return self._points[0]
+
+    def End(self) -> MockPoint:
+        return self._points[-1]
+
+    def NumberdQdx(self, plane: int) -> int:
+        return 0 if self._dqdx is None else len(self._points)
+
+    def DQdxAtPoint(self, i: int, plane: int) -> float:
+        return float(self._dqdx[i, plane])
+
+class MockOpFlash:
+    """larlite::opflash"""
+
+    def __init__(self, time_usec: float, pe: np.ndarray):
+        self._time = time_usec
+        self._pe = pe
+
+    def Time(self) -> float:
+        return self._time
+
+    def PE(self, n: int) -> float:
+        return float(self._pe[n])
+
+    def nOpDets(self) -> int:
+        return len(self._pe)
+
+    def TotalPE(self) -> float:
+        return float(self._pe.sum())
+
+class MockCRTHit:
+    """larlite::crthit"""
+
+    def __init__(self, ts2_ns: float, pos: Iterable[float], plane: int):
+        self.ts2_ns = ts2_ns
+        self.x_pos, self.y_pos, self.z_pos = pos
+        self.plane = plane
+
+class MockCRTTrack:
+    """larlite::crttrack"""
+
+    def __init__(self, ts2_ns: float, pos1: Iterable[float], pos2: Iterable[float], plane1: int, plane2: int):
+        self.ts2_ns_h1 = ts2_ns
+        self.ts2_ns_h2 = ts2_ns + 10.0
+        self.x1_pos, self.y1_pos, self.z1_pos = pos1
+        self.x2_pos, self.y2_pos, self.z2_pos = pos2
+        self.plane1 = plane1
+        self.plane2 = plane2
+
+class MockMCStep(MockPoint):
+    """larlite::mcstep: position and time (ns)"""
+
+    def T(self) -> float:
+        return self[3]
+
+    def E(self) -> float:
+        return self[4]
+
+class MockMCTrack(MockVector):
+    """larlite::mctrack: a vector of steps"""
+
+    def __init__(self, steps: np.ndarray, track_id: int, pdg: int, origin: int):
+        super().__init__(MockMCStep(s) for s in steps.tolist())
+        self._track_id = track_id
+        self._pdg = pdg
+        self._origin = origin
+
+    def TrackID(self) -> int:
+        return self._track_id
+
+    def MotherTrackID(self) -> int:
+        return self._track_id
+
+    def AncestorTrackID(self) -> int:
+        return self._track_id
+
+    def PdgCode(self) -> int:
+        return self._pdg
+
+    def MotherPdgCode(self) -> int:
+        return self._pdg
+
+    def AncestorPdgCode(self) -> int:
+        return self._pdg
+
+    def Origin(self) -> int:
+        return self._origin
+
+    def Process(self) -> str:
+        return "primary"
+
+    def Start(self) -> MockMCStep:
+        return self[0]
+
+    def End(self) -> MockMCStep:
+        return self[-1]
+
+class MockIDE:
+    """larlite::ide"""
+    __slots__ = ("x", "y", "z", "energy", "numElectrons", "trackID")
+
+    def __init__(self, x: float, y: float, z: float, energy: float, track_id: int):
+        self.x, self.y, self.z = x, y, z
+        self.energy = energy
+        self.numElectrons = energy*4.0e4
+        self.trackID = track_id
+
+class MockPair:
+    """std::pair"""
+    __slots__ = ("first", "second")
+
+    def __init__(self, first: Any, second: Any):
+        self.first = first
+        self.second = second
+
+class MockSimCh:
+    """larlite::simch"""
+
+    def __init__(self, channel: int, tdc_ides: List[MockPair]):
+        self._channel = channel
+        self._tdc_ides = tdc_ides
+
+    def Channel(self) -> int:
+        return self._channel
+
+    def TDCIDEMap(self) -> List[MockPair]:
+        return self._tdc_ides
+
+# ---- larcv-like objects ----
+
+class MockImageMeta:
+    """larcv::ImageMeta"""
+
+    def __init__(self, plane: int, rows: int, cols: int, min_x: float = 0.0, min_y: float = 2400.0,
+                 pixel_width: float = 1.0, pixel_height: float = 6.0):
+        self._plane = plane
+        self._rows = rows
+        self._cols = cols
+        self._min_x = min_x
+        self._min_y = min_y
+        self._pixel_width = pixel_width
+        self._pixel_height = pixel_height
+
+    def plane(self) -> int:
+        return self._plane
+
+    def rows(self) -> int:
+        return self._rows
+
+    def cols(self) -> int:
+        return self._cols
+
+    def min_x(self) -> float:
+        return self._min_x
+
+    def max_x(self) -> float:
+        return self._min_x + self._cols*self._pixel_width
+
+    def min_y(self) -> float:
+        return self._min_y
+
+    def max_y(self) -> float:
+        return self._min_y + self._rows*self._pixel_height
+
+    def pixel_width(self) -> float:
+        return self._pixel_width
+
+    def pixel_height(self) -> float:
+        return self._pixel_height
+
+class MockImage2D:
+    """larcv::Image2D; as_ndarray() plays the role of larcv.as_ndarray (array of shape (cols, rows))"""
+
+    def __init__(self, meta: MockImageMeta, data: np.ndarray):
+        self._meta = meta
+        self._data = data
+
+    def meta(self) -> MockImageMeta:
+        return self._meta
+
+    def as_ndarray(self) -> np.ndarray:
+        return self._data
+
+class MockEventImage2D:
+    """larcv::EventImage2D"""
+
+    def __init__(self, images: List[MockImage2D]):
+        self._images = MockVector(images)
+
+    def as_vector(self) -> MockVector:
+        return self._images
+
+    def Image2DArray(self) -> MockVector:
+        return self._images
+
+# ---- reco tree objects ----
+
+class MockNuVertex:
+    """larflow::reco::NuVertexCandidate, with the members read by the RecoNu plotter"""
+
+    def __init__(self, **members: Any):
+        self.__dict__.update(members)
+
+class MockNuSelection:
+    """larflow::reco::NuSelectionVariables"""
+
+    def __init__(self, unreco_fraction_v: List[float]):
+        self.unreco_fraction_v = MockVector(unreco_fraction_v)
+
+class MockRecoTree:
+    """KPSRecoManagerTree (a TChain): branches are attributes, filled by GetEntry"""
+
+    def __init__(self, backend: "MockIOManager"):
+        self._backend = backend
+        self.nuvetoed_v = MockVector()
+        self.nu_sel_v = MockVector()
+
+    def GetEntry(self, entry: int) -> int:
+        self.nuvetoed_v, self.nu_sel_v = self._backend.generator.make_reco(entry)
+        return 1
+
+    def GetEntries(self) -> int:
+        return self._backend.get_total_entries()
+
+# ---- generator ----
+
+class SyntheticEventGenerator:
+    """
+    Makes the products of an event from a seed and the entry number
+
+    Args to the constructor:
+        sizes: Product sizes, overriding DEFAULT_SIZES
+        seed: Base seed
+    """
+
+    def __init__(self, sizes: Optional[Dict[str, Any]] = None, seed: int = 0):
+        """
+        Initialize the generator
+
+        Args:
+            sizes: Product sizes, overriding DEFAULT_SIZES
+            seed: Base seed
+        """
+        self.sizes = dict(DEFAULT_SIZES)
+        if sizes:
+            self.sizes.update(sizes)
+        self.seed = seed
+
+    def identity(self) -> Dict[str, Any]:
+        """Everything the events depend on"""
+        return {"seed": self.seed, "sizes": self.sizes}
+
+    def _rng(self, entry: int, product: str) -> np.random.Generator:
+        salt = int(hashlib.md5(product.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng([self.seed, entry, salt])
+
+    @staticmethod
+    def _positions(rng: np.random.Generator, n: int) -> np.ndarray:
+        lo, hi = TPC_BOUNDS[:, 0], TPC_BOUNDS[:, 1]
+        return lo + rng.random((n, 3))*(hi - lo)
+
+    @staticmethod
+    def _line(rng: np.random.Generator, start: np.ndarray, npoints: int, step: float = 2.0) -> np.ndarray:
+        direction = rng.normal(size=3)
+        direction /= np.linalg.norm(direction)
+        wiggle = rng.normal(scale=0.1*step, size=(npoints, 3))
+        points = start + np.outer(np.arange(npoints)*step, direction) + wiggle
+        return np.clip(points, TPC_BOUNDS[:, 0], TPC_BOUNDS[:, 1])
+
+    def _hits(self, rng: np.random.Generator, pos: np.ndarray) -> MockVector:
+        """larflow3dhits at the given positions"""
+        n = pos.shape[0]
+        geo = get_geometry()
+        wires = geo.nearest_wire(pos, None) if n > 0 else np.zeros((0, 3))
+        ticks = geo.x_to_tick(pos[:, 0]) if n > 0 else np.zeros(0)
+        features = np.zeros((n, 26), dtype=np.float64)
+        features[:, 0:3] = pos
+        features[:, 3] = rng.integers(0, 6, size=n)                    # keypoint type
+        features[:, 4] = rng.random(n)                                  # keypoint score
+        features[:, 10:15] = rng.dirichlet(np.ones(5), size=n)          # e, g, mu, p, pi scores
+        features[:, 17:23] = rng.random((n, 6))                         # keypoint scores
+        features[:, 23:26] = rng.exponential(50.0, size=(n, 3))        # plane charge
+        track_score = rng.random(n)
+        hits = MockVector()
+        for i, row in enumerate(features.tolist()):
+            hit = MockLArFlow3DHit(row)
+            hit.targetwire = [int(w) for w in wires[i]]
+            hit.tick = int(ticks[i])
+            hit.track_score = float(track_score[i])
+            hits.append(hit)
+        return hits
+
+    def _cluster_positions(self, rng: np.random.Generator, nhits: int, nclusters: int) -> List[np.ndarray]:
+        """Hit positions grouped in track-like clusters"""
+        if nclusters <= 0 or nhits <= 0:
+            return []
+        counts = np.bincount(rng.integers(0, nclusters, size=nhits), minlength=nclusters)
+        starts = self._positions(rng, nclusters)
+        clusters = []
+        for start, count in zip(starts, counts):
+            along = self._line(rng, start, 2, step=rng.uniform(10.0, 200.0))
+            t = rng.random((count, 1))
+            pos = along[0] + t*(along[1] - along[0]) + rng.normal(scale=0.5, size=(count, 3))
+            clusters.append(np.clip(pos, TPC_BOUNDS[:, 0], TPC_BOUNDS[:, 1]))
+        return clusters
+
+    def make_larlite(self, entry: int, product: str) -> MockVector:
+        """
+        Make a larlite container
+
+        Args:
+            entry: Entry number
+            product: larlite product name, e.g. "larflow3dhit"
+
+        Returns:
+            MockVector of objects; empty for products that are not generated
+        """
+        rng = self._rng(entry, product)
+        sizes = self.sizes
+        geo = get_geometry()
+
+        if product == "larflow3dhit":
+            clusters = self._cluster_positions(rng, sizes["larflow3dhit"], max(1, sizes["larflowcluster"]))
+            pos = np.concatenate(clusters) if clusters else np.zeros((0, 3))
+            return self._hits(rng, pos)
+
+        if product == "larflowcluster":
+            clusters = self._cluster_positions(rng, sizes["larflow3dhit"], sizes["larflowcluster"])
+            return MockVector(self._hits(rng, pos) for pos in clusters)
+
+        if product == "track":
+            starts = self._positions(rng, sizes["track"])
+            return MockVector(MockTrack(self._line(rng, start, sizes["track_points"], step=5.0),
+                                        dqdx=rng.exponential(100.0, size=(sizes["track_points"], 3)))
+                              for start in starts)
+
+        if product == "opflash":
+            flashes = MockVector()
+            for iflash in range(sizes["opflash"]):
+                # the first flash is in the beam window
+                time_usec = rng.uniform(3.2, 4.8) if iflash == 0 else rng.uniform(-400.0, 3200.0)
+                flashes.append(MockOpFlash(time_usec, rng.exponential(20.0, size=32)))
+            return flashes
+
+        if product == "crthit":
+            pos = self._positions(rng, sizes["crthit"])*np.array([1.5, 1.5, 1.1]) - np.array([60.0, 0.0, 50.0])
+            t_ns = rng.uniform(-500.0, 2700.0, size=sizes["crthit"])*1000.0
+            planes = rng.integers(0, 4, size=sizes["crthit"])
+            return MockVector(MockCRTHit(float(t), p, int(plane)) for t, p, plane in zip(t_ns, pos.tolist(), planes))
+
+        if product == "crttrack":
+            n = sizes["crttrack"]
+            pos1 = self._positions(rng, n) + np.array([0.0, 300.0, 0.0])
+            pos2 = self._positions(rng, n) - np.array([0.0, 300.0, 0.0])
+            t_ns = rng.uniform(-500.0, 2700.0, size=n)*1000.0
+            planes = rng.integers(0, 4, size=(n, 2))
+            return MockVector(MockCRTTrack(float(t), p1, p2, int(pl[0]), int(pl[1]))
+                              for t, p1, p2, pl in zip(t_ns, pos1.tolist(), pos2.tolist(), planes))
+
+        if product == "mctrack":
+            tracks = MockVector()
+            nsteps = sizes["mctrack_steps"]
+            pdgs = [13, -13, 2212, 211, -211, 321]
+            for itrack, start in enumerate(self._positions(rng, sizes["mctrack"])):
+                steps = np.zeros((nsteps, 5))
+                steps[:, 0:3] = self._line(rng, start, nsteps, step=1.0)
+                steps[:, 3] = rng.uniform(0.0, 5000.0) + np.arange(nsteps)*0.03
+                steps[:, 4] = np.linspace(rng.uniform(200.0, 2000.0), 105.0, nsteps)
+                tracks.append(MockMCTrack(steps, track_id=itrack + 1, pdg=pdgs[itrack % len(pdgs)],
+                                          origin=1 if itrack < 3 else 2))
+            return tracks
+
+        if product == "simch":
+            channels = MockVector()
+            nwires = int(geo.nwires.sum())
+            nides = sizes["simch_ides"]
+            chids = np.sort(rng.choice(nwires, size=min(sizes["simch"], nwires), replace=False))
+            for chid in chids:
+                pos = self._positions(rng, nides)
+                tdc = (geo.x_to_tick(pos[:, 0])*4).astype(np.int64)
+                energy = rng.exponential(0.05, size=nides)
+                track_id = rng.integers(1, max(2, sizes["mctrack"] + 1), size=nides)
+                ides = [MockPair(int(t), MockVector([MockIDE(p[0], p[1], p[2], float(e), int(tid))]))
+                        for t, p, e, tid in zip(tdc, pos.tolist(), energy, track_id)]
+                channels.append(MockSimCh(int(chid), ides))
+            return channels
+
+        return MockVector()
+
+    def make_image2d(self, entry: int) -> MockEventImage2D:
+        """
+        Make the wire images of the three planes
+
+        Args:
+            entry: Entry number
+
+        Returns:
+            MockEventImage2D
+        """
+        rng = self._rng(entry, "image2d")
+        rows = 1008
+        images = []
+        for plane, cols in enumerate([2400, 2400, 3456]):
+            data = np.zeros((cols, rows), dtype=np.float32)
+            npix = int(self.sizes["image_occupancy"]*cols*rows)
+            if npix > 0:
+                data[rng.integers(0, cols, size=npix), rng.integers(0, rows, size=npix)] = \
+                    rng.exponential(40.0, size=npix).astype(np.float32) + 10.0
+            meta = MockImageMeta(plane, rows=rows, cols=3456 if plane < 2 else cols)
+            if plane < 2:
+                # planes 0 and 1 are stored with the width of the Y plane, like the real images
+                data = np.concatenate([data, np.zeros((3456 - cols, rows), dtype=np.float32)])
+            images.append(MockImage2D(meta, data))
+        return MockEventImage2D(images)
+
+    def make_reco(self, entry: int) -> Tuple[MockVector, MockVector]:
+        """
+        Make the neutrino vertices of the reco tree
+
+        Args:
+            entry: Entry number
+
+        Returns:
+            (nuvetoed_v, nu_sel_v)
+        """
+        rng = self._rng(entry, "reco")
+        sizes = self.sizes
+        geo = get_geometry()
+        nhits = sizes["nu_cluster_hits"]
+        vertices = MockVector()
+        selections = MockVector()
+        for pos in self._positions(rng, sizes["nu_vertices"]):
+            tracks = [MockTrack(self._line(rng, pos, 20, step=3.0)) for _ in range(sizes["nu_tracks"])]
+            track_hits = []
+            track_dirs = []
+            for track in tracks:
+                start = np.array(track.LocationAtPoint(0))
+                end = np.array(track.End())
+                t = rng.random((nhits, 1))
+                track_hits.append(self._hits(rng, start + t*(end - start)))
+                direction = end - start
+                norm = np.linalg.norm(direction)
+                track_dirs.append(MockVector((direction/norm if norm > 0 else direction).tolist()))
+            showers = []
+            trunks = []
+            for _ in range(sizes["nu_showers"]):
+                trunk = self._line(rng, pos, 2, step=10.0)
+                cone = trunk[0] + rng.random((nhits, 1))*(trunk[1] - trunk[0])*5.0 \
+                       + rng.normal(scale=3.0, size=(nhits, 3))
+                showers.append(self._hits(rng, np.clip(cone, TPC_BOUNDS[:, 0], TPC_BOUNDS[:, 1])))
+                trunks.append(MockTrack(trunk))
+            vertices.append(MockNuVertex(
+                pos=MockVector(pos.tolist()),
+                tick=float(geo.x_to_tick(pos[0])),
+                col_v=MockVector(int(w) for w in geo.nearest_wire(pos.reshape(1, 3), None)[0]),
+                track_v=MockVector(tracks),
+                track_hitcluster_v=MockVector(track_hits),
+                track_isSecondary_v=MockVector([0]*len(tracks)),
+                track_dir_v=MockVector(track_dirs),
+                shower_v=MockVector(showers),
+                shower_isSecondary_v=MockVector([0]*len(showers)),
+                shower_trunk_v=MockVector(trunks),
+                netScore=float(rng.random()),
+                netNuScore=float(rng.random()),
+                keypoint_type=int(rng.integers(0, 3)),
+            ))
+            selections.append(MockNuSelection(rng.random(3).tolist()))
+        return vertices, selections
+
+# ---- IO managers ----
+
+class MockStorageManager:
+    """larlite::storage_manager serving generated containers"""
+
+    def __init__(self, backend: "MockIOManager"):
+        self._backend = backend
+
+    def get_data(self, product: str, producer: str) -> MockVector:
+        return self._backend.get_product("larlite", product, producer)
+
+    def go_to(self, entry: int) -> bool:
+        return True
+
+    def get_nentries(self) -> int:
+        return self._backend.get_total_entries()
+
+    def run_id(self) -> int:
+        return 1
+
+    def subrun_id(self) -> int:
+        return 1
+
+    def event_id(self) -> int:
+        return self._backend.get_current_entry()
+
+class MockLArCVIOManager:
+    """larcv::IOManager serving generated images"""
+
+    def __init__(self, backend: "MockIOManager"):
+        self._backend = backend
+
+    def get_data(self, product: str, producer: str) -> Any:
+        return self._backend.get_product("larcv", product, producer)
+
+    def read_entry(self, entry: int) -> bool:
+        return True
+
+    def get_n_entries(self) -> int:
+        return self._backend.get_total_entries()
+
+class MockIOManager:
+    """
+    Drop-in replacement of the IO manager (see lardly.ubdl.io.io_manager.IOManager)
+    serving synthetic events
+    """
+
+    def __init__(self, generator: Optional[SyntheticEventGenerator] = None, nentries: int = 10):
+        """
+        Initialize the backend
+
+        Args:
+            generator: Event generator (default: DEFAULT_SIZES, seed 0)
+            nentries: Number of entries
+        """
+        self.generator = generator or SyntheticEventGenerator()
+        self.nentries = nentries
+        self._larlite_io = MockStorageManager(self)
+        self._larcv_io = MockLArCVIOManager(self)
+        self._recoTree = MockRecoTree(self)
+        self._current_entry = -1
+        self._entry_cache = EntryCache()
+        self._products: Dict[Tuple[str, str, str], Any] = {}
+        self._catalog_hash = None
+        self._loaded = False
+        self._release_hooks: List[Callable[[], None]] = []
+
+    def load_files(self, file_paths: Optional[List[str]] = None, tick_direction: str = 'TickForwards') -> bool:
+        """
+        Start serving events; the arguments are ignored
+
+        Returns:
+            True
+        """
+        identity = json.dumps({"mock": self.generator.identity(), "nentries": self.nentries}, sort_keys=True)
+        self._catalog_hash = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+        self._entry_cache.clear()
+        self._products.clear()
+        self._loaded = True
+        state_manager.set_state({"larlite": self.nentries, "larcv": self.nentries, "reco": self.nentries},
+                                'io', 'nentries')
+        state_manager.set_state(self.get_available_trees(), 'io', 'available_trees')
+        state_manager.set_state(self.nentries, 'io', 'total_entries')
+        return True
+
+    def load_entry(self, entry: int) -> bool:
+        """
+        Load an entry
+
+        Products are generated when they are first asked for. As with IOManager,
+        the load waits until the products of the current entry are no longer in use.
+
+        Args:
+            entry: Entry number
+
+        Returns:
+            True if the entry is in range
+        """
+        if entry < 0 or entry >= self.nentries:
+            logger.error(f"Entry {entry} out of bounds (0-{self.nentries-1})")
+            return False
+        try:
+            with entry_guard.exclusive(config.get('plotters', 'concurrency', 'load_wait', default=60.0)):
+                return self._load_entry(entry)
+        except TimeoutError as e:
+            logger.error(f"Not loading entry {entry}: {e}")
+            return False
+
+    def _load_entry(self, entry: int) -> bool:
+        start = time.perf_counter()
+        if self._current_entry >= 0 and config.get('memory', 'release_on_load', default=False):
+            self.release_entry()
+        with memory_monitor.track(entry, 'load_entry'):
+            self._entry_cache.clear(entry)
+            self._products.clear()
+            self._current_entry = entry
+            self._recoTree.GetEntry(entry)
+        state_manager.set_state(entry, 'io', 'current_entry')
+        perf_recorder.reset(entry, 'load_entry')
+        perf_recorder.add(entry, 'load_entry', 'read', time.perf_counter() - start)
+        memory_monitor.entry_loaded(entry)
+        return True
+
+    def add_release_hook(self, hook: Callable[[], None]) -> None:
+        """Add a function called by release_entry, as IOManager.add_release_hook"""
+        self._release_hooks.append(hook)
+
+    def release_entry(self) -> None:
+        """Drop the generated products and the per-entry cache, as IOManager.release_entry"""
+        with memory_monitor.track(self._current_entry, 'release_entry'):
+            self._entry_cache.clear()
+            for hook in self._release_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    logger.warning(f"Release hook {hook} failed: {e}")
+            self._products.clear()
+            self._current_entry = -1
+            state_manager.set_state(-1, 'io', 'current_entry')
+            gc.collect()
+
+    def get_product(self, io: str, product: str, producer: str) -> Any:
+        """
+        Get a product of the current entry, generating it on first use
+
+        Args:
+            io: "larlite" or "larcv"
+            product: Product name
+            producer: Producer name; all producers of a product get the same objects
+
+        Returns:
+            Container
+        """
+        key = (io, product, producer)
+        if key not in self._products:
+            if io == "larcv":
+                if product != "image2d":
+                    raise ValueError(f"mock backend has no larcv product '{product}'")
+                self._products[key] = self.generator.make_image2d(self._current_entry)
+            else:
+                self._products[key] = self.generator.make_larlite(self._current_entry, product)
+        return self._products[key]
+
+    def get_tree_dict(self) -> Dict[str, Any]:
+        """
+        Get a dictionary of the data sources, as IOManager.get_tree_dict
+
+        Returns:
+            Dictionary with the mock IO managers and trees
+        """
+        return {
+            'iolarlite': self._larlite_io,
+            'iolarcv': self._larcv_io,
+            'recoTree': self._recoTree,
+            'cosmicTree': None,
+            'eventTree': None,
+            'entry_cache': self._entry_cache,
+            'catalog_hash': self._catalog_hash,
+            'entry': self._current_entry,
+            'generation': entry_guard.generation
+        }
+
+    def get_available_trees(self) -> List[str]:
+        """
+        Get the names of the trees, as they would be listed in a dlmerged file
+
+        Returns:
+            List of tree names
+        """
+        trees = [f"{product}_{producer}_tree" for product, producer in PRODUCERS.items()]
+        trees.append("KPSRecoManagerTree")
+        return trees
+
+    def get_entry_cache(self) -> EntryCache:
+        return self._entry_cache
+
+    def get_catalog_hash(self) -> Optional[str]:
+        return self._catalog_hash
+
+    def get_current_entry(self) -> int:
+        return self._current_entry
+
+    def get_total_entries(self) -> int:
+        return self.nentries
+
+    def is_loaded(self) -> bool:
+        return self._loaded
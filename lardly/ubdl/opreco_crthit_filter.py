@@ -1,36 +1,27 @@
 from __future__ import print_function
 import os,sys
-from math import fabs
+import numpy as np
+from lardly.data.larlite_timing import TimingIndex
 
 def filter_crthits_wopreco( event_opreco_beam, event_opreco_cosmic, event_crthit, max_dt_usec=1.5, verbose=False ):
     # crt hit must be close in time to an opreco
-    filtered = []
-    nopflash_matched = {}
-    for ihit in range(event_crthit.size()):
-        crthit = event_crthit.at(ihit)
-        t_usec = crthit.ts2_ns*0.001
+    timing = TimingIndex()
+    for name,opreco_v in [("beam",event_opreco_beam),("cosmic",event_opreco_cosmic)]:
+        timing.add_flashes( name, [ opreco_v.at(i).Time() for i in range(opreco_v.size()) ] )
 
-        mindt = 1e6
-        minidx = -1
-        for opreco_v in [event_opreco_beam,event_opreco_cosmic]:
-            for iopflash in range(opreco_v.size()):
-                opflash = opreco_v.at(iopflash)
-                dt = fabs(opflash.Time()-t_usec)
-                if dt < mindt:
-                    minidx = iopflash
-                    mindt = dt
-        if verbose:
-            print("[filter_crthits_wopreco] crthit[%d] min dt=%.1f opflash[%d]"%(ihit,mindt,minidx))
-        if mindt<max_dt_usec:
-            filtered.append( crthit )
-            if minidx not in nopflash_matched:
-                nopflash_matched[minidx] = 0
-            nopflash_matched[minidx] += 1
-            
-    print("filtered crthits by opreco: %d of %d pass"%(len(filtered),event_crthit.size()))
+    nhits = event_crthit.size()
+    t_usec = np.fromiter( (event_crthit.at(ihit).ts2_ns*0.001 for ihit in range(nhits)), dtype=np.float64, count=nhits )
+    mindt, _, minidx = timing.nearest_flash( t_usec, ["beam","cosmic"] )
+    passing = np.nonzero( mindt<max_dt_usec )[0]
+
+    if verbose:
+        for ihit in range(nhits):
+            print("[filter_crthits_wopreco] crthit[%d] min dt=%.1f opflash[%d]"%(ihit,mindt[ihit],minidx[ihit]))
+
+    filtered = [ event_crthit.at(int(ihit)) for ihit in passing ]
+    print("filtered crthits by opreco: %d of %d pass"%(len(filtered),nhits))
     if verbose:
-        ophits_with_matches = nopflash_matched.keys()
-        ophits_with_matches.sort()
-        for iopflash in ophits_with_matches:
-            print("  ophit[%d] %d matches"%(iopflash,nopflash_matched[iopflash]))
+        matched, nmatches = np.unique( minidx[passing], return_counts=True )
+        for iopflash,n in zip(matched,nmatches):
+            print("  ophit[%d] %d matches"%(iopflash,n))
     return filtered
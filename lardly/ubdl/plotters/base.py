@@ -21,8 +21,21 @@ class BasePlotter(abc.ABC):
     This class defines the interface that all plotters should implement.
     It provides methods for checking applicability, creating traces, and
     generating UI widgets for options.
+    
+    Traces are memoized by the registry (see lardly.ubdl.core.figure_cache).
+    Plotters whose traces depend on more than the entry and their options
+    should set `cacheable` to False. Keys include a hash of the lardly source,
+    so code changes invalidate them; bump `cache_version` when the traces
+    change for another reason (e.g. an updated external library).
+    
+    `timeout` (seconds) overrides plotters.concurrency.timeout when the
+    plotters run concurrently.
     """
     
+    cacheable = True
+    cache_version = 1
+    timeout: Optional[float] = None
+    
     def __init__(self, name: str, description: str = ""):
         """
         Initialize the plotter with a name and optional description
@@ -93,6 +106,22 @@ class BasePlotter(abc.ABC):
         from lardly.ubdl.core.state import state_manager
         return state_manager.get_state('plotters', 'options', self.name, option_name, default=default)
     
+    def get_effective_options(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Get the options the plotter will use: the stored options updated by the given ones
+        
+        Args:
+            options: Optional dictionary of options passed to make_traces
+            
+        Returns:
+            Dictionary of option values
+        """
+        from lardly.ubdl.core.state import state_manager
+        effective = dict(state_manager.get_state('plotters', 'options', self.name, default=None) or {})
+        if options:
+            effective.update(options)
+        return effective
+    
     def set_option_value(self, option_name: str, value: Any) -> None:
         """
         Get the current value of an option from the state manager
@@ -10,7 +10,7 @@ from dash.dependencies import Input, Output, State
 import logging
 
 from lardly.ubdl.plotters.base import BasePlotter
-from lardly.data.larlite_track import visualize_larlite_track
+from lardly.data.larlite_track import visualize_larlite_event_track
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
@@ -134,20 +134,26 @@ class CosmicTracksPlotter(BasePlotter):
         elif cosmictracks_source in self._input_trees_present[1:]:
             cosmictracks_source = [cosmictracks_source]
         
-        # Process each type of cosmic track
-        itrack = 0
+        # Collect the tracks of every producer and draw them as one trace.
+        # Cosmic-rich events can have hundreds of tracks, one trace per track is slow to render.
+        track_v = []
+        colors = []
+        labels = []
         for ev_container_name in cosmictracks_source:
             producername = ev_container_name[len("track_"):-len("_tree")]
             self.log_info(f"  get cosmic tracks from {producername}")
             ev_container = iolarlite.get_data("track",producername)
             container_ntracks = ev_container.size()
             self.log_info(f"  num tracks in {producername}: {container_ntracks}")
-            for itrack in range(ev_container.size()):
-                track = ev_container.at(itrack)
-                track_trace = visualize_larlite_track(track, track_id=itrack, color=self.colors[ev_container_name])
-                track_trace['line']['width'] = 2.0
-                traces.append(track_trace)
-                itrack += 1
+            for itrack in range(container_ntracks):
+                track_v.append( ev_container.at(itrack) )
+                colors.append( self.colors[ev_container_name] )
+                labels.append( f"{producername}[{itrack}]" )
+
+        track_trace = visualize_larlite_event_track( track_v, name="cosmictracks", color=colors,
+                                                     width=2.0, track_labels=labels )
+        if track_trace is not None:
+            traces.append(track_trace)
         
         return traces
 
@@ -21,8 +21,9 @@ try:
     from lardly.data.larlite_crttrack import visualize_larlite_event_crttrack
     from lardly.data.larlite_crthit import visualize_larlite_event_crthit
     from lardly.data.larlite_opflash import visualize_larlite_opflash_3d
-    from lardly.crtoutline import CRTOutline
-    from larlite import larlite, larutil
+    from lardly.ubdl.utils.geometry_assets import get_geometry_traces
+    from lardly.geometry import get_geometry
+    from lardly.data.larlite_timing import get_timing_index
     _IMPORTS_SUCCESSFUL = True
 except ImportError as e:
     logger.error(f"Error importing dependencies for CRTPlotter: {e}")
@@ -222,6 +223,9 @@ class CRTPlotter(BasePlotter):
             hit_size = options.get('hit_size', self.get_option_value('hit_size', 3))
             track_width = options.get('track_width', self.get_option_value('track_width', 2))
             
+            # Times of the flashes, hits and tracks are indexed once per entry
+            timing = get_timing_index(iolarlite, tree_dict.get('entry_cache'))
+
             # Get CRT tracks and hits
             if show_tracks:
                 ev_crttrk = iolarlite.get_data("crttrack", self.crttrack_treename)
@@ -230,41 +234,30 @@ class CRTPlotter(BasePlotter):
                 ev_crthit = iolarlite.get_data("crthit", self.crthit_treename)
                 self.log_info(f"Number of CRT hit objects: {ev_crthit.size()}")
             
-            # Get optical flashes for filtering
-            flash_times = None
-            if filter_by_opflash:
-                ev_flash = iolarlite.get_data("opflash", self.opflash_treename)
-                if ev_flash.size() > 0:
-                    flash_times = np.zeros(ev_flash.size())
-                    for iflash in range(ev_flash.size()):
-                        flash = ev_flash.at(iflash)
-                        flash_times[iflash] = flash.Time()
+            # Flash filtering needs at least one flash
+            if filter_by_opflash and timing.flash_times(self.opflash_treename).shape[0] == 0:
+                filter_by_opflash = False
             
             crt_traces = []
             
             # Process CRT tracks
             if show_tracks and ev_crttrk.size() > 0:
                 try:
-                    # Get all track traces
-                    track_traces = visualize_larlite_event_crttrack(ev_crttrk)
-                    
-                    # Filter and configure tracks
-                    for itrack, trace in enumerate(track_traces):
-                        # Adjust marker size
+                    # Apply flash filter if enabled, using the time of the first hit
+                    if filter_by_opflash:
+                        passing = timing.crttracks_near_flash(self.crttrack_treename, self.opflash_treename, max_dt_usec)
+                        track_indices = np.nonzero(passing)[0].tolist()
+                    else:
+                        track_indices = list(range(ev_crttrk.size()))
+
+                    # All passing tracks go into one trace
+                    track_traces = visualize_larlite_event_crttrack(
+                        [ev_crttrk.at(itrack) for itrack in track_indices],
+                        name="crttracks", batch=True, track_ids=track_indices)
+                    for trace in track_traces:
                         trace['marker']['size'] = hit_size * 1.33  # Slightly larger than hits
                         trace['line']['width'] = track_width
-                        trace['name'] = f"crttrack[{itrack}]"
-                        
-                        # Apply flash filter if enabled
-                        if filter_by_opflash and flash_times is not None:
-                            tusec = trace['customdata'][0, 0]  # (t,tick,plane)
-                            dt = np.abs(flash_times - tusec)
-                            dtmin = np.min(dt)
-                            
-                            if dtmin < max_dt_usec:
-                                crt_traces.append(trace)
-                        else:
-                            crt_traces.append(trace)
+                        crt_traces.append(trace)
                 except Exception as e:
                     self.log_error(f"Error processing CRT tracks: {e}")
             
@@ -272,7 +265,8 @@ class CRTPlotter(BasePlotter):
             if show_hits and ev_crthit.size() > 0:
                 try:
                     # Process hit data
-                    dv = larutil.LArProperties.GetME().DriftVelocity()
+                    geo = get_geometry()
+                    dv = geo.drift_velocity
                     
                     crthit_hovertemplate = """
                     <b>x</b>: %{x}<br>
@@ -284,41 +278,24 @@ class CRTPlotter(BasePlotter):
                     <b>Index</b>: %{customdata[3]:%d}<br>
                     """
 
+                    hits = timing.crthits(self.crthit_treename)
+                    nhits = hits['t_usec'].shape[0]
+                    hitinfo_all = np.zeros((nhits, 7))
+                    hitinfo_all[:, 0] = hits['x'] + hits['t_usec'] * dv
+                    hitinfo_all[:, 1] = hits['y']
+                    hitinfo_all[:, 2] = hits['z']
+                    hitinfo_all[:, 3] = hits['t_usec']
+                    hitinfo_all[:, 4] = geo.usec_to_tick(hits['t_usec'])
+                    hitinfo_all[:, 5] = hits['plane']
+                    hitinfo_all[:, 6] = np.arange(nhits)
                     
-                    hitinfo_v = []
-                    
-                    # Apply flash filtering if enabled
-                    for ihit in range(ev_crthit.size()):
-                        crthit = ev_crthit.at(ihit)
-                        hitinfo = np.zeros(7)
-                        t_usec = crthit.ts2_ns * 0.001
-                        dx = t_usec * dv
-                        
-                        hitinfo[0] = crthit.x_pos + dx
-                        hitinfo[1] = crthit.y_pos
-                        hitinfo[2] = crthit.z_pos
-                        hitinfo[3] = t_usec
-                        hitinfo[4] = 3200 + t_usec / 0.5
-                        hitinfo[5] = crthit.plane
-                        hitinfo[6] = ihit
-                        
-                        # Apply flash filter if enabled
-                        if filter_by_opflash and flash_times is not None:
-                            dt = np.abs(flash_times - t_usec)
-                            dtmin = np.min(dt)
-                            
-                            if dtmin < max_dt_usec:
-                                hitinfo_v.append(hitinfo)
-                        else:
-                            hitinfo_v.append(hitinfo)
+                    # Apply flash filter if enabled
+                    if filter_by_opflash:
+                        passing = timing.crthits_near_flash(self.crthit_treename, self.opflash_treename, max_dt_usec)
+                        hitinfo_all = hitinfo_all[passing]
                     
                     # Create hit trace if we have hits
-                    if len(hitinfo_v) > 0:
-                        if len(hitinfo_v) > 1:
-                            hitinfo_all = np.stack(hitinfo_v, axis=0)
-                        else:
-                            hitinfo_all = np.array([hitinfo_v[0]])
-                        
+                    if hitinfo_all.shape[0] > 0:
                         crthit_trace = {
                             "type": "scatter3d",
                             "x": hitinfo_all[:, 0],
@@ -337,7 +314,7 @@ class CRTPlotter(BasePlotter):
             # Add CRT outline if requested
             if show_outline and len(crt_traces) > 0:
                 try:
-                    crt_outline_traces = CRTOutline().get_lines()
+                    crt_outline_traces = get_geometry_traces("crt_outline")
                     crt_traces.extend(crt_outline_traces)
                 except Exception as e:
                     self.log_error(f"Error creating CRT outline: {e}")
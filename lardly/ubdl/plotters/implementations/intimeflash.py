@@ -19,12 +19,15 @@ logger = logging.getLogger(__name__)
 # Import optional dependencies with error handling
 try:
     from lardly.data.larlite_opflash import visualize_larlite_opflash_3d, visualize_empty_opflash
-    from larlite import larlite, larutil
+    from lardly.data.larlite_timing import get_timing_index
     _IMPORTS_SUCCESSFUL = True
 except ImportError as e:
     logger.error(f"Error importing dependencies for IntimeFlashPlotter: {e}")
     _IMPORTS_SUCCESSFUL = False
 
+# Beam window in usec
+INTIME_WINDOW_USEC = (2.94, 4.98)
+
 class IntimeFlashPlotter(BasePlotter):
     """
     Plotter for in-time optical flashes
@@ -164,40 +167,35 @@ class IntimeFlashPlotter(BasePlotter):
             'intimeflash-display-options'
         ]
     
-    def get_flash_data(self, iolarlite, opflash_treename) -> List[Tuple[int, float]]:
+    def get_flash_data(self, iolarlite, opflash_treename, entry_cache=None) -> Dict[str, Any]:
         """
         Get flash data from the current event
         
         Args:
             iolarlite: LArLite I/O manager
+            opflash_treename: Producer name of the opflash tree
+            entry_cache: Per-entry cache holding the shared timing index
             
         Returns:
-            List of (index, time) tuples for each flash
+            Dictionary with the (index, time) of each flash, their in-window flags,
+            and the index of the first flash in the intime window
         """
         if self._flash_data is not None:
             return self._flash_data
-            
-        flash_data = []
         
         try:
-            ev_flash = iolarlite.get_data("opflash", opflash_treename)
-            nflashes = ev_flash.size()
+            timing = get_timing_index(iolarlite, entry_cache)
+            times = timing.flash_times(opflash_treename)
             
-            # Find intime flash (in window [2.94, 4.98])
-            intime_index = None
-            
-            for i in range(nflashes):
-                flash = ev_flash.at(i)
-                time = flash.Time()
-                flash_data.append((i, time))
-                
-                # Check if this is the first flash in the intime window
-                if intime_index is None and 2.94 <= time <= 4.98:
-                    intime_index = i
+            # Find intime flash: the first flash in the intime window
+            in_window = timing.flashes_in_window(opflash_treename, *INTIME_WINDOW_USEC)
+            intime_index = int(in_window[0]) if in_window.shape[0] > 0 else None
+            is_intime = np.zeros(times.shape[0], dtype=bool)
+            is_intime[in_window] = True
             
-            # Store intime_index in the flash data
             self._flash_data = {
-                'flashes': flash_data,
+                'flashes': list(enumerate(times.tolist())),
+                'in_window': is_intime.tolist(),
                 'intime_index': intime_index
             }
             
@@ -207,7 +205,7 @@ class IntimeFlashPlotter(BasePlotter):
             logger.error(f"Error getting flash data: {e}")
             import traceback
             logger.error(traceback.format_exc())
-            return {'flashes': [], 'intime_index': None}
+            return {'flashes': [], 'in_window': [], 'intime_index': None}
 
     def make_traces(self, tree_dict: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
@@ -249,7 +247,7 @@ class IntimeFlashPlotter(BasePlotter):
 
             # Get flash data
             self.log_info(f"Get optical flashes from {opflash_source}")
-            flash_data     = self.get_flash_data(iolarlite, opflash_source)
+            flash_data     = self.get_flash_data(iolarlite, opflash_source, tree_dict.get('entry_cache'))
             
             traces = []
             
@@ -322,7 +320,7 @@ class IntimeFlashPlotter(BasePlotter):
                     return [{'label': 'No data loaded', 'value': 'loading'}]
                 
                 # Get flash data
-                flash_data = self.get_flash_data(iolarlite, flash_source)
+                flash_data = self.get_flash_data(iolarlite, flash_source, tree_dict.get('entry_cache'))
                 options = []
                 
                 # Add null option if requested
@@ -340,8 +338,7 @@ class IntimeFlashPlotter(BasePlotter):
                     options.append({'label': 'No Intime Flash Found', 'value': 'intime'})
                 
                 # Add individual flash options
-                for idx, time in flash_data['flashes']:
-                    in_window = 2.94 <= time <= 4.98
+                for (idx, time), in_window in zip(flash_data['flashes'], flash_data['in_window']):
                     window_marker = " [INTIME]" if in_window else ""
                     options.append({
                         'label': f'Flash #{idx}: t={time:.2f} μs{window_marker}',
@@ -13,17 +13,13 @@ from dash.dependencies import Input, Output, State
 
 from lardly.ubdl.plotters.base import BasePlotter
 from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.core.perf import perf_recorder
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
 
-# Import optional dependencies with error handling
-try:
-    from larlite import larlite, larutil
-    _IMPORTS_SUCCESSFUL = True
-except ImportError as e:
-    logger.error(f"Error importing dependencies for LArFlowHitsPlotter: {e}")
-    _IMPORTS_SUCCESSFUL = False
+# Hits are read through the IO manager in the tree dictionary; no larlite import is needed
+_IMPORTS_SUCCESSFUL = True
 
 class KeypointHitsPlotter(BasePlotter):
     """
@@ -231,37 +227,39 @@ class KeypointHitsPlotter(BasePlotter):
                     custom_data[isp, 5] = hit.at(4)  # keypoint score
                     custom_data[isp, 6] = hit.at(3)/5.0
                 
-                # Color by type
-                marker_config = {
-                    "color": custom_data[:,6],
-                    "size": marker_size,
-                    "opacity": marker_opacity,
-                    "colorscale": "Jet",
-                    "cmin": 0.0,
-                    "cmax": 1.0,
-                    "colorbar": {
-                        "title": "LArMatch Score",
-                        "thickness": 15,
-                        "len": 0.5,
-                        "x": 1.0,
-                        "xanchor": "left"
+                # Marker colors and the trace are the style stage of the performance record
+                with perf_recorder.stage("style"):
+                    # Color by type
+                    marker_config = {
+                        "color": custom_data[:,6],
+                        "size": marker_size,
+                        "opacity": marker_opacity,
+                        "colorscale": "Jet",
+                        "cmin": 0.0,
+                        "cmax": 1.0,
+                        "colorbar": {
+                            "title": "LArMatch Score",
+                            "thickness": 15,
+                            "len": 0.5,
+                            "x": 1.0,
+                            "xanchor": "left"
+                        }
                     }
-                }
 
-                # Create the trace for this cluster
-                cluster_trace = {
-                    "type": "scatter3d",
-                    "x": pos[:, 0],
-                    "y": pos[:, 1],
-                    "z": pos[:, 2],
-                    "mode": "markers",
-                    "name": f"{cluster_source}[{icluster}]",
-                    "hovertemplate": hover_template,
-                    "customdata": custom_data,
-                    "marker": marker_config
-                }
+                    # Create the trace for this cluster
+                    cluster_trace = {
+                        "type": "scatter3d",
+                        "x": pos[:, 0],
+                        "y": pos[:, 1],
+                        "z": pos[:, 2],
+                        "mode": "markers",
+                        "name": f"{cluster_source}[{icluster}]",
+                        "hovertemplate": hover_template,
+                        "customdata": custom_data,
+                        "marker": marker_config
+                    }
 
-                traces.append(cluster_trace)
+                    traces.append(cluster_trace)
             
             self.log_info(f"Created {len(traces)} cluster traces")
             return traces
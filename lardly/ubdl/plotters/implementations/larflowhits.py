@@ -13,13 +13,15 @@ from dash.dependencies import Input, Output, State
 
 from lardly.ubdl.plotters.base import BasePlotter
 from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.core.perf import perf_recorder
+from lardly.data.default_pid_colors import get_hashed_rgb
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
 
 # Import optional dependencies with error handling
 try:
-    from larlite import larlite, larutil
+    from lardly.data.voxelize import voxelize_points, voxel_average, voxel_sum
     _IMPORTS_SUCCESSFUL = True
 except ImportError as e:
     logger.error(f"Error importing dependencies for LArFlowHitsPlotter: {e}")
@@ -83,6 +85,8 @@ class LArFlowHitsPlotter(BasePlotter):
         self.set_option_value("plane_charge", "U")  # Default to U plane
         self.set_option_value("marker_size", 1.0)
         self.set_option_value("marker_opacity", 0.4)
+        self.set_option_value("voxelize", False)
+        self.set_option_value("voxel_size", 0.3)
     
     def make_option_widgets(self) -> List[Any]:
         """
@@ -136,6 +140,23 @@ class LArFlowHitsPlotter(BasePlotter):
                     # This will be populated by callback
                 ]),
                 
+                html.Div([
+                    dcc.Checklist(
+                        id='larflowhits-voxelize',
+                        options=[{'label': 'Merge Hits in Voxels', 'value': 'voxelize'}],
+                        value=['voxelize'] if self.get_option_value("voxelize", False) else [],
+                    ),
+                    html.Label('Voxel Size (cm):'),
+                    dcc.Slider(
+                        id='larflowhits-voxel-size',
+                        min=0.3,
+                        max=3.0,
+                        step=0.1,
+                        marks={0.3: '0.3', 1.0: '1.0', 2.0: '2.0', 3.0: '3.0'},
+                        value=self.get_option_value("voxel_size", 0.3),
+                    )
+                ], style={'margin-bottom': '10px'}),
+                
                 html.Div([
                     html.Label('Visual Settings:'),
                     html.Div([
@@ -173,6 +194,8 @@ class LArFlowHitsPlotter(BasePlotter):
             'larflowhits-particle-type',
             'larflowhits-keypoint-type',
             'larflowhits-plane-charge',
+            'larflowhits-voxelize',
+            'larflowhits-voxel-size',
             'larflowhits-marker-size',
             'larflowhits-marker-opacity'
         ]
@@ -211,6 +234,8 @@ class LArFlowHitsPlotter(BasePlotter):
             plane_charge = options.get('plane_charge', self.get_option_value('plane_charge', 'U'))
             marker_size = options.get('marker_size', self.get_option_value('marker_size', 1.0))
             marker_opacity = options.get('marker_opacity', self.get_option_value('marker_opacity', 0.4))
+            voxelize = options.get('voxelize', self.get_option_value('voxelize', False))
+            voxel_size = options.get('voxel_size', self.get_option_value('voxel_size', 0.3))
             
             if cluster_source not in self._input_trees_present:
                 self.log_error(f"Selected cluster source {cluster_source} not available")
@@ -300,146 +325,162 @@ class LArFlowHitsPlotter(BasePlotter):
                     for k in range(6):
                         if hit.size() > 17 + k:
                             custom_data[isp, 10 + k] = hit[17 + k]
+
+                    # Plane charge
+                    for p in range(3):
+                        if hit.size() > 23 + p:
+                            custom_data[isp, 16 + p] = hit[23 + p]
+
+                # Merge the hits that fall in the same voxel: the plane charges are summed,
+                # the position and scores are charge-weighted, and the wires and tick are
+                # those of the hit with the most charge (each hit is its own label)
+                if voxelize:
+                    charge = custom_data[:, 16:19].sum(axis=1)
+                    voxels = voxelize_points(pos, weights=charge, voxel_size=voxel_size, labels=np.arange(npts))
+                    pos = voxels['xyz']
+                    merged = custom_data[voxels['representative']]
+                    merged[:, 4:16] = voxel_average(custom_data[:, 4:16], voxels, weights=charge)
+                    merged[:, 16:19] = voxel_sum(custom_data[:, 16:19], voxels)
+                    custom_data = merged
+                    self.log_info(f"Merged {npts} hits into {pos.shape[0]} voxels")
+                    npts = pos.shape[0]
                 
-                # Determine coloring based on selected mode
-                if coloring_mode == 'cluster':
-                    # Random color for entire cluster
-                    random_color = np.random.randint(0, 255, 3)
-                    color_rgb = f'rgba({random_color[0]},{random_color[1]},{random_color[2]},1.0)'
+                # Marker colors and the trace are the style stage of the performance record
+                with perf_recorder.stage("style"):
+                    # Determine coloring based on selected mode
+                    if coloring_mode == 'cluster':
+                        # One color for the entire cluster, fixed by its source and index
+                        cluster_color = get_hashed_rgb(cluster_source, icluster)
+                        color_rgb = f'rgba({cluster_color[0]},{cluster_color[1]},{cluster_color[2]},1.0)'
                     
-                    marker_config = {
-                        "color": color_rgb,
-                        "size": marker_size,
-                        "opacity": marker_opacity
-                    }
+                        marker_config = {
+                            "color": color_rgb,
+                            "size": marker_size,
+                            "opacity": marker_opacity
+                        }
                 
-                elif coloring_mode == 'larmatch':
-                    # Color by larmatch score
-                    marker_config = {
-                        "color": custom_data[:, 4],  # larmatch score
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Bluered",
-                        "cmin": 0.0,
-                        "cmax": 1.0,
-                        "colorbar": {
-                            "title": "LArMatch Score",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                    elif coloring_mode == 'larmatch':
+                        # Color by larmatch score
+                        marker_config = {
+                            "color": custom_data[:, 4],  # larmatch score
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Bluered",
+                            "cmin": 0.0,
+                            "cmax": 1.0,
+                            "colorbar": {
+                                "title": "LArMatch Score",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'ssnet':
-                    # Color by particle ID score
-                    particle_idx = particle_type_indices.get(particle_type, 10)
-                    score_idx = particle_idx - 10 + 5  # Adjust to our custom_data index
+                    elif coloring_mode == 'ssnet':
+                        # Color by particle ID score
+                        particle_idx = particle_type_indices.get(particle_type, 10)
+                        score_idx = particle_idx - 10 + 5  # Adjust to our custom_data index
                     
-                    marker_config = {
-                        "color": custom_data[:, score_idx],
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Bluered",
-                        "cmin": 0.0,
-                        "cmax": 1.0,
-                        "colorbar": {
-                            "title": f"{particle_type.capitalize()} Score",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                        marker_config = {
+                            "color": custom_data[:, score_idx],
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Bluered",
+                            "cmin": 0.0,
+                            "cmax": 1.0,
+                            "colorbar": {
+                                "title": f"{particle_type.capitalize()} Score",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'keypoint':
-                    # Color by keypoint score
-                    keypoint_idx = keypoint_type_indices.get(keypoint_type, 17)
-                    score_idx = keypoint_idx - 17 + 10  # Adjust to our custom_data index
+                    elif coloring_mode == 'keypoint':
+                        # Color by keypoint score
+                        keypoint_idx = keypoint_type_indices.get(keypoint_type, 17)
+                        score_idx = keypoint_idx - 17 + 10  # Adjust to our custom_data index
                     
-                    marker_config = {
-                        "color": custom_data[:, score_idx],
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Bluered",
-                        "cmin": 0.0,
-                        "cmax": 1.0,
-                        "colorbar": {
-                            "title": f"{keypoint_type.replace('_', ' ').capitalize()} Score",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                        marker_config = {
+                            "color": custom_data[:, score_idx],
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Bluered",
+                            "cmin": 0.0,
+                            "cmax": 1.0,
+                            "colorbar": {
+                                "title": f"{keypoint_type.replace('_', ' ').capitalize()} Score",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'charge':
-                    # Color by plane charge
-                    plane_idx = plane_charge_indices.get(plane_charge, 23)
+                    elif coloring_mode == 'charge':
+                        # Color by plane charge
+                        plane_idx = plane_charge_indices.get(plane_charge, 23)
                     
-                    # Extract charge values if available
-                    charges = np.zeros(npts)
-                    for isp in range(npts):
-                        hit = cluster.at(isp)
-                        if hit.size() > plane_idx:
-                            charges[isp] = hit[plane_idx]
+                        charges = custom_data[:, plane_idx - 23 + 16]  # Adjust to our custom_data index
                     
-                    marker_config = {
-                        "color": charges,
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Jet",
-                        "colorbar": {
-                            "title": f"{plane_charge} Plane Charge",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                        marker_config = {
+                            "color": charges,
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Jet",
+                            "colorbar": {
+                                "title": f"{plane_charge} Plane Charge",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'position':
-                    # Map XYZ coordinates to RGB values
-                    x_norm = (pos[:, 0] - np.min(pos[:, 0])) / (np.max(pos[:, 0]) - np.min(pos[:, 0]) + 1e-8)
-                    y_norm = (pos[:, 1] - np.min(pos[:, 1])) / (np.max(pos[:, 1]) - np.min(pos[:, 1]) + 1e-8)
-                    z_norm = (pos[:, 2] - np.min(pos[:, 2])) / (np.max(pos[:, 2]) - np.min(pos[:, 2]) + 1e-8)
+                    elif coloring_mode == 'position':
+                        # Map XYZ coordinates to RGB values
+                        x_norm = (pos[:, 0] - np.min(pos[:, 0])) / (np.max(pos[:, 0]) - np.min(pos[:, 0]) + 1e-8)
+                        y_norm = (pos[:, 1] - np.min(pos[:, 1])) / (np.max(pos[:, 1]) - np.min(pos[:, 1]) + 1e-8)
+                        z_norm = (pos[:, 2] - np.min(pos[:, 2])) / (np.max(pos[:, 2]) - np.min(pos[:, 2]) + 1e-8)
                     
-                    # Create RGB color array
-                    rgb_colors = []
-                    for i in range(npts):
-                        rgb_colors.append(f'rgb({int(x_norm[i]*255)},{int(y_norm[i]*255)},{int(z_norm[i]*255)})')
+                        # Create RGB color array
+                        rgb_colors = []
+                        for i in range(npts):
+                            rgb_colors.append(f'rgb({int(x_norm[i]*255)},{int(y_norm[i]*255)},{int(z_norm[i]*255)})')
                     
-                    marker_config = {
-                        "color": rgb_colors,
-                        "size": marker_size,
-                        "opacity": marker_opacity
-                    }
+                        marker_config = {
+                            "color": rgb_colors,
+                            "size": marker_size,
+                            "opacity": marker_opacity
+                        }
                 
-                else:
-                    # Default coloring by shower score
-                    marker_config = {
-                        "color": custom_data[:, 4],  # shower score = renormed_shower_score
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Bluered",
-                        "cmin": 0.0,
-                        "cmax": 1.0
-                    }
+                    else:
+                        # Default coloring by shower score
+                        marker_config = {
+                            "color": custom_data[:, 4],  # shower score = renormed_shower_score
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Bluered",
+                            "cmin": 0.0,
+                            "cmax": 1.0
+                        }
                 
-                # Create the trace for this cluster
-                cluster_trace = {
-                    "type": "scatter3d",
-                    "x": pos[:, 0],
-                    "y": pos[:, 1],
-                    "z": pos[:, 2],
-                    "mode": "markers",
-                    "name": f"{cluster_source}[{icluster}]",
-                    "hovertemplate": hover_template,
-                    "customdata": custom_data,
-                    "marker": marker_config
-                }
+                    # Create the trace for this cluster
+                    cluster_trace = {
+                        "type": "scatter3d",
+                        "x": pos[:, 0],
+                        "y": pos[:, 1],
+                        "z": pos[:, 2],
+                        "mode": "markers",
+                        "name": f"{cluster_source}[{icluster}]",
+                        "hovertemplate": hover_template,
+                        "customdata": custom_data,
+                        "marker": marker_config
+                    }
                 
-                traces.append(cluster_trace)
+                    traces.append(cluster_trace)
             
             self.log_info(f"Created {len(traces)} cluster traces")
             return traces
@@ -568,6 +609,27 @@ class LArFlowHitsPlotter(BasePlotter):
                     self.set_option_value('plane_charge', value)
                 return None
             
+            # Store voxel settings when they change
+            @app.callback(
+                Output('det3d-hidden-output', 'children', allow_duplicate=True),
+                [Input('larflowhits-voxelize', 'value')],
+                prevent_initial_call=True
+            )
+            def store_voxelize(value):
+                if value is not None:
+                    self.set_option_value('voxelize', 'voxelize' in value)
+                return None
+            
+            @app.callback(
+                Output('det3d-hidden-output', 'children', allow_duplicate=True),
+                [Input('larflowhits-voxel-size', 'value')],
+                prevent_initial_call=True
+            )
+            def store_voxel_size(value):
+                if value:
+                    self.set_option_value('voxel_size', value)
+                return None
+            
             # Store marker size when it changes
             @app.callback(
                 Output('det3d-hidden-output', 'children', allow_duplicate=True),
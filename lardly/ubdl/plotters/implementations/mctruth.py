@@ -16,8 +16,9 @@ from lardly.ubdl.plotters.base import BasePlotter
 from lardly.ubdl.core.state import state_manager
 import lardly.data.larlite_mctrack as vis_mctrack
 import lardly.data.larlite_mcshower as vis_mcshower
-from ublarcvapp import ublarcvapp
+from lardly.data.larlite_mcgraph import get_mctruth_graph
 from larlite import larlite, larutil
+from lardly.geometry import get_geometry
 
 class MCTruthPlotter(BasePlotter):
     """
@@ -147,36 +148,22 @@ class MCTruthPlotter(BasePlotter):
 
         self.log_info(f"no_offset flag: {no_offset}")
         
-        # dump MC particle graph
-        self.log_info('MCPixelPGraph Start')
-        mcpg = ublarcvapp.mctools.MCPixelPGraph()
-        mcpg.buildgraphonly( iolarlite )
-        #mcpg.printGraph(0,False)
-        self.log_info('MCPixelPGraph End')
+        # MC truth graph, shared with the other truth plotters for this entry
+        mcgraph = get_mctruth_graph( iolarlite, tree_dict.get('entry_cache') )
+        self.log_info(f'MC truth graph with {len(mcgraph)} particles')
 
         traces = []
 
-        if show_vertices:
-            nunode = mcpg.findTrackID(0) # neutrino given trackid=0
-            x = [nunode.start[0]]
-            y = [nunode.start[1]]
-            z = [nunode.start[2]]
-            E_MeV = nunode.E_MeV
+        if show_vertices and mcgraph.nu_vertex is not None:
+            nu_vertex = mcgraph.nu_vertex
+            x = [nu_vertex[0]]
+            y = [nu_vertex[1]]
+            z = [nu_vertex[2]]
+            E_MeV = mcgraph.nu_energy
             
-            # Calculate image coordinates for neutrino vertex
-            cm_per_tick = larutil.LArProperties.GetME().DriftVelocity() * 0.5
-            pos = [nunode.start[0], nunode.start[1], nunode.start[2]]
-            tick = 3200 + pos[0] / cm_per_tick
-            t = pos[0] / cm_per_tick * 0.5
-            
-            # Get wire coordinates for each plane
-            import ROOT as rt
-            pos_vec = rt.TVector3(pos[0], pos[1], pos[2])
-            wire_u = larutil.Geometry.GetME().WireCoordinate(pos_vec, 0)
-            wire_v = larutil.Geometry.GetME().WireCoordinate(pos_vec, 1)
-            wire_y = larutil.Geometry.GetME().WireCoordinate(pos_vec, 2)
-            
-            customdata = np.array([[t, tick, wire_u, wire_v, wire_y]])
+            # Calculate image coordinates for neutrino vertex: t, tick, U, V, Y
+            pos = np.array([[nu_vertex[0], nu_vertex[1], nu_vertex[2]]])
+            customdata = get_geometry().projection_info(pos)
             
             nu_hover="""
             <b>x</b>: %{x:.2f}<br>
@@ -212,7 +199,8 @@ class MCTruthPlotter(BasePlotter):
                 ev_mctrack, 
                 origin=origin_filter, 
                 do_sce_correction=do_sce_correction, 
-                no_offset=no_offset
+                no_offset=no_offset,
+                batch=True
             )
             
             self.log_info(f"Number of track traces: {len(track_traces)}")
@@ -247,7 +235,7 @@ class MCTruthPlotter(BasePlotter):
 
                 x_t0_offset = 0.0
                 if not no_offset:
-                    x_t0_offset = originpt[-1]*1.0e-3*larutil.LArProperties.GetME().DriftVelocity()
+                    x_t0_offset = originpt[-1]*1.0e-3*get_geometry().drift_velocity
 
                 dirnorm = 0.
                 for i in range(3):
@@ -289,32 +277,8 @@ class MCTruthPlotter(BasePlotter):
                 profcolor = 'rgb(0,255,255)' if pid==22 else 'rgb(0,255,0)'
                 print(profpts)
                 
-                # Calculate image coordinates for shower profile points
-                cm_per_tick = larutil.LArProperties.GetME().DriftVelocity() * 0.5
-                npoints = profpts.shape[0]
-                customdata = np.zeros((npoints, 5))  # t, tick, U, V, Y
-                
-                for ipt in range(npoints):
-                    pos = profpts[ipt, :]
-                    tick = 3200 + pos[0] / cm_per_tick
-                    t = pos[0] / cm_per_tick * 0.5
-                    
-                    # Get wire coordinates for each plane
-                    try:
-                        import ROOT as rt
-                        pos_vec = rt.TVector3(pos[0], pos[1], pos[2])
-                        wire_u = larutil.Geometry.GetME().WireCoordinate(pos_vec, 0)
-                        wire_v = larutil.Geometry.GetME().WireCoordinate(pos_vec, 1)
-                        wire_y = larutil.Geometry.GetME().WireCoordinate(pos_vec, 2)
-                        
-                        customdata[ipt, 0] = t
-                        customdata[ipt, 1] = tick
-                        customdata[ipt, 2] = wire_u
-                        customdata[ipt, 3] = wire_v
-                        customdata[ipt, 4] = wire_y
-                    except:
-                        # If coordinate calculation fails, set to zero
-                        customdata[ipt, :] = 0
+                # Calculate image coordinates for shower profile points: t, tick, U, V, Y
+                customdata = get_geometry().projection_info(profpts)
                 
                 shower_hovertemplate = """
                 <b>Shower ID</b>: %{text}<br>
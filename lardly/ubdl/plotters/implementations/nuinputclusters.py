@@ -13,17 +13,14 @@ from dash.dependencies import Input, Output, State
 
 from lardly.ubdl.plotters.base import BasePlotter
 from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.core.perf import perf_recorder
+from lardly.data.default_pid_colors import get_hashed_rgb
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
 
-# Import optional dependencies with error handling
-try:
-    from larlite import larlite, larutil
-    _IMPORTS_SUCCESSFUL = True
-except ImportError as e:
-    logger.error(f"Error importing dependencies for NuInputClustersPlotter: {e}")
-    _IMPORTS_SUCCESSFUL = False
+# Hits are read through the IO manager in the tree dictionary; no larlite import is needed
+_IMPORTS_SUCCESSFUL = True
 
 class NuInputClustersPlotter(BasePlotter):
     """
@@ -315,145 +312,147 @@ class NuInputClustersPlotter(BasePlotter):
                         if hit.size() > 17 + k:
                             custom_data[isp, 10 + k] = hit[17 + k]
                 
-                # Determine coloring based on selected mode
-                if coloring_mode == 'cluster':
-                    # Random color for entire cluster
-                    random_color = np.random.randint(0, 255, 3)
-                    color_rgb = f'rgba({random_color[0]},{random_color[1]},{random_color[2]},1.0)'
+                # Marker colors and the trace are the style stage of the performance record
+                with perf_recorder.stage("style"):
+                    # Determine coloring based on selected mode
+                    if coloring_mode == 'cluster':
+                        # One color for the entire cluster, fixed by its source and index
+                        cluster_color = get_hashed_rgb(cluster_source, icluster)
+                        color_rgb = f'rgba({cluster_color[0]},{cluster_color[1]},{cluster_color[2]},1.0)'
                     
-                    marker_config = {
-                        "color": color_rgb,
-                        "size": marker_size,
-                        "opacity": marker_opacity
-                    }
+                        marker_config = {
+                            "color": color_rgb,
+                            "size": marker_size,
+                            "opacity": marker_opacity
+                        }
                 
-                elif coloring_mode == 'larmatch':
-                    # Color by larmatch score
-                    marker_config = {
-                        "color": custom_data[:, 4],  # larmatch score
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Viridis",
-                        "cmin": 0.0,
-                        "cmax": 1.0,
-                        "colorbar": {
-                            "title": "LArMatch Score",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                    elif coloring_mode == 'larmatch':
+                        # Color by larmatch score
+                        marker_config = {
+                            "color": custom_data[:, 4],  # larmatch score
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Viridis",
+                            "cmin": 0.0,
+                            "cmax": 1.0,
+                            "colorbar": {
+                                "title": "LArMatch Score",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'ssnet':
-                    # Color by particle ID score
-                    particle_idx = particle_type_indices.get(particle_type, 10)
-                    score_idx = particle_idx - 10 + 5  # Adjust to our custom_data index
+                    elif coloring_mode == 'ssnet':
+                        # Color by particle ID score
+                        particle_idx = particle_type_indices.get(particle_type, 10)
+                        score_idx = particle_idx - 10 + 5  # Adjust to our custom_data index
                     
-                    marker_config = {
-                        "color": custom_data[:, score_idx],
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Plasma",
-                        "cmin": 0.0,
-                        "cmax": 1.0,
-                        "colorbar": {
-                            "title": f"{particle_type.capitalize()} Score",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                        marker_config = {
+                            "color": custom_data[:, score_idx],
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Plasma",
+                            "cmin": 0.0,
+                            "cmax": 1.0,
+                            "colorbar": {
+                                "title": f"{particle_type.capitalize()} Score",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'keypoint':
-                    # Color by keypoint score
-                    keypoint_idx = keypoint_type_indices.get(keypoint_type, 17)
-                    score_idx = keypoint_idx - 17 + 10  # Adjust to our custom_data index
+                    elif coloring_mode == 'keypoint':
+                        # Color by keypoint score
+                        keypoint_idx = keypoint_type_indices.get(keypoint_type, 17)
+                        score_idx = keypoint_idx - 17 + 10  # Adjust to our custom_data index
                     
-                    marker_config = {
-                        "color": custom_data[:, score_idx],
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Cividis",
-                        "cmin": 0.0,
-                        "cmax": 1.0,
-                        "colorbar": {
-                            "title": f"{keypoint_type.replace('_', ' ').capitalize()} Score",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                        marker_config = {
+                            "color": custom_data[:, score_idx],
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Cividis",
+                            "cmin": 0.0,
+                            "cmax": 1.0,
+                            "colorbar": {
+                                "title": f"{keypoint_type.replace('_', ' ').capitalize()} Score",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'charge':
-                    # Color by plane charge
-                    plane_idx = plane_charge_indices.get(plane_charge, 23)
+                    elif coloring_mode == 'charge':
+                        # Color by plane charge
+                        plane_idx = plane_charge_indices.get(plane_charge, 23)
                     
-                    # Extract charge values if available
-                    charges = np.zeros(npts)
-                    for isp in range(npts):
-                        hit = cluster.at(isp)
-                        if hit.size() > plane_idx:
-                            charges[isp] = hit[plane_idx]
+                        # Extract charge values if available
+                        charges = np.zeros(npts)
+                        for isp in range(npts):
+                            hit = cluster.at(isp)
+                            if hit.size() > plane_idx:
+                                charges[isp] = hit[plane_idx]
                     
-                    marker_config = {
-                        "color": charges,
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Viridis",
-                        "colorbar": {
-                            "title": f"{plane_charge} Plane Charge",
-                            "thickness": 15,
-                            "len": 0.5,
-                            "x": 1.0,
-                            "xanchor": "left"
+                        marker_config = {
+                            "color": charges,
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Viridis",
+                            "colorbar": {
+                                "title": f"{plane_charge} Plane Charge",
+                                "thickness": 15,
+                                "len": 0.5,
+                                "x": 1.0,
+                                "xanchor": "left"
+                            }
                         }
-                    }
                 
-                elif coloring_mode == 'position':
-                    # Map XYZ coordinates to RGB values
-                    x_norm = (pos[:, 0] - np.min(pos[:, 0])) / (np.max(pos[:, 0]) - np.min(pos[:, 0]) + 1e-8)
-                    y_norm = (pos[:, 1] - np.min(pos[:, 1])) / (np.max(pos[:, 1]) - np.min(pos[:, 1]) + 1e-8)
-                    z_norm = (pos[:, 2] - np.min(pos[:, 2])) / (np.max(pos[:, 2]) - np.min(pos[:, 2]) + 1e-8)
+                    elif coloring_mode == 'position':
+                        # Map XYZ coordinates to RGB values
+                        x_norm = (pos[:, 0] - np.min(pos[:, 0])) / (np.max(pos[:, 0]) - np.min(pos[:, 0]) + 1e-8)
+                        y_norm = (pos[:, 1] - np.min(pos[:, 1])) / (np.max(pos[:, 1]) - np.min(pos[:, 1]) + 1e-8)
+                        z_norm = (pos[:, 2] - np.min(pos[:, 2])) / (np.max(pos[:, 2]) - np.min(pos[:, 2]) + 1e-8)
                     
-                    # Create RGB color array
-                    rgb_colors = []
-                    for i in range(npts):
-                        rgb_colors.append(f'rgb({int(x_norm[i]*255)},{int(y_norm[i]*255)},{int(z_norm[i]*255)})')
+                        # Create RGB color array
+                        rgb_colors = []
+                        for i in range(npts):
+                            rgb_colors.append(f'rgb({int(x_norm[i]*255)},{int(y_norm[i]*255)},{int(z_norm[i]*255)})')
                     
-                    marker_config = {
-                        "color": rgb_colors,
-                        "size": marker_size,
-                        "opacity": marker_opacity
-                    }
+                        marker_config = {
+                            "color": rgb_colors,
+                            "size": marker_size,
+                            "opacity": marker_opacity
+                        }
                 
-                else:
-                    # Default coloring by shower score
-                    marker_config = {
-                        "color": custom_data[:, 4],  # shower score = renormed_shower_score
-                        "size": marker_size,
-                        "opacity": marker_opacity,
-                        "colorscale": "Viridis",
-                        "cmin": 0.0,
-                        "cmax": 1.0
-                    }
+                    else:
+                        # Default coloring by shower score
+                        marker_config = {
+                            "color": custom_data[:, 4],  # shower score = renormed_shower_score
+                            "size": marker_size,
+                            "opacity": marker_opacity,
+                            "colorscale": "Viridis",
+                            "cmin": 0.0,
+                            "cmax": 1.0
+                        }
                 
-                # Create the trace for this cluster
-                cluster_trace = {
-                    "type": "scatter3d",
-                    "x": pos[:, 0],
-                    "y": pos[:, 1],
-                    "z": pos[:, 2],
-                    "mode": "markers",
-                    "name": f"{cluster_source}[{icluster}]",
-                    "hovertemplate": hover_template,
-                    "customdata": custom_data,
-                    "marker": marker_config
-                }
+                    # Create the trace for this cluster
+                    cluster_trace = {
+                        "type": "scatter3d",
+                        "x": pos[:, 0],
+                        "y": pos[:, 1],
+                        "z": pos[:, 2],
+                        "mode": "markers",
+                        "name": f"{cluster_source}[{icluster}]",
+                        "hovertemplate": hover_template,
+                        "customdata": custom_data,
+                        "marker": marker_config
+                    }
                 
-                traces.append(cluster_trace)
+                    traces.append(cluster_trace)
             
             self.log_info(f"Created {len(traces)} cluster traces")
             return traces
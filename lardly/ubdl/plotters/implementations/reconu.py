@@ -11,7 +11,10 @@ from dash.dependencies import Input, Output, State
 
 from lardly.ubdl.plotters.base import BasePlotter
 from lardly.ubdl.core.state import state_manager
-from larlite import larutil
+from lardly.data.larlite_track import get_larlite_track_points
+from lardly.data.polyline import make_polyline_trace
+from lardly.geometry import get_geometry
+from lardly.data.default_pid_colors import get_hashed_rgb
 
 class RecoNuPlotter(BasePlotter):
     """
@@ -143,7 +146,12 @@ class RecoNuPlotter(BasePlotter):
                 # Fall back to all vertices if selection is invalid
                 vertices_to_process = range(nvertices)
         
-        cm_per_tick = larutil.LArProperties.GetME().DriftVelocity() * 0.5
+        geo = get_geometry()
+
+        # the track lines of all vertices are collected and drawn as one trace
+        trackline_pts = []
+        trackline_colors = []
+        trackline_labels = []
         
         # Process each selected vertex
         for ivtx in vertices_to_process:
@@ -167,7 +175,7 @@ class RecoNuPlotter(BasePlotter):
                     for i in range(npts):
                         for v in range(3):
                             ptpos[i, v] = shower.at(i)[v]
-                    ic = np.random.randint(0, 255, 3)
+                    ic = get_hashed_rgb("shower", ivtx, ishower)
                     rcolor = f'rgba({ic[0]},{ic[1]},{ic[2]},1.0)'
                     primorsec = "1"
                     if ishower < nuvtx.shower_isSecondary_v.size() and nuvtx.shower_isSecondary_v.at(ishower)==1:
@@ -210,7 +218,7 @@ class RecoNuPlotter(BasePlotter):
                     for i in range(npts):
                         for v in range(3):
                             ptpos[i, v] = trackhits.at(i)[v]
-                    ic = np.random.randint(0, 255, 3)
+                    ic = get_hashed_rgb("track", ivtx, itrack)
                     rcolor = f'rgba({ic[0]},{ic[1]},{ic[2]},1.0)'
                     primorsec = "1"
                     if itrack < nuvtx.track_isSecondary_v.size() and nuvtx.track_isSecondary_v.at(itrack)==1:
@@ -226,20 +234,9 @@ class RecoNuPlotter(BasePlotter):
                     }
                     traces.append(trackhit_trace)
 
-                    track_pts = np.zeros( (track.NumberTrajectoryPoints(),3))
-                    for i in range( track_pts.shape[0] ):
-                        for v in range(3):
-                            track_pts[i,v] = track.LocationAtPoint(i)[v]
-                    trackline_trace = {
-                        "type": "scatter3d",
-                        "x": track_pts[:, 0],
-                        "y": track_pts[:, 1],
-                        "z": track_pts[:, 2],
-                        "mode": "lines",
-                        "name": f"Nu[{ivtx}]:T{primorsec}[{itrack}]",
-                        "line": {"color": rcolor, "width":1.0},
-                    }
-                    traces.append(trackline_trace)
+                    trackline_pts.append( get_larlite_track_points(track) )
+                    trackline_colors.append( rcolor )
+                    trackline_labels.append( f"Nu[{ivtx}]:T{primorsec}[{itrack}]" )
 
                     if itrack < nuvtx.track_dir_v.size():
                         track_dir = nuvtx.track_dir_v.at(itrack)
@@ -263,7 +260,7 @@ class RecoNuPlotter(BasePlotter):
             vtxinfo[ivtx, 0] = nuvtx.pos[0]
             vtxinfo[ivtx, 1] = nuvtx.pos[1]
             vtxinfo[ivtx, 2] = nuvtx.pos[2]
-            vtxinfo[ivtx, 3] = (nuvtx.tick - 3200) * 0.5  # t in usec relative to trigger
+            vtxinfo[ivtx, 3] = geo.tick_to_usec(nuvtx.tick)  # t in usec relative to trigger
             vtxinfo[ivtx, 4] = nuvtx.tick
             vtxinfo[ivtx, 5] = nuvtx.col_v[0]  # u-plane wire
             vtxinfo[ivtx, 6] = nuvtx.col_v[1]  # v-plane wire
@@ -308,6 +305,14 @@ class RecoNuPlotter(BasePlotter):
                 except:
                     pass
 
+        # one trace for the track lines of all vertices
+        if len(trackline_pts)>0:
+            trackline_trace = make_polyline_trace( trackline_pts, colors=trackline_colors,
+                                                   segment_labels=trackline_labels,
+                                                   name="recoNu tracks", width=1.0 )
+            if trackline_trace is not None:
+                traces.append(trackline_trace)
+
         # Create vertex trace if enabled
         if show_vertices and nvertices > 0:
             nu_hover_template = """
@@ -21,6 +21,7 @@ logger = logging.getLogger(__name__)
 try:
     from larlite import larlite, larutil
     from lardly.data.larlite_simch import visualize_larlite_simch
+    from lardly.data.larlite_mcgraph import get_mctruth_graph
     _IMPORTS_SUCCESSFUL = True
 except ImportError as e:
     logger.error(f"Error importing dependencies for SimChPlotter: {e}")
@@ -81,6 +82,8 @@ class SimChPlotter(BasePlotter):
         self.set_option_value("coloring_mode", "edep")  # Default to ssnet (particle ID) coloring
         self.set_option_value("marker_size", 1.0)
         self.set_option_value("marker_opacity", 0.4)
+        self.set_option_value("downsample_mode", "random")
+        self.set_option_value("voxel_size", 0.3)
     
     def make_option_widgets(self) -> List[Any]:
         """
@@ -129,6 +132,29 @@ class SimChPlotter(BasePlotter):
                     )
                 ], style={'margin-bottom': '10px'}),
                 
+                # how do we reduce the number of deposits
+                html.Div([
+                    html.Label('Downsampling:'),
+                    dcc.RadioItems(
+                        id='simch-downsample-mode',
+                        options=[
+                            {'label': 'Random Subset', 'value': 'random'},
+                            {'label': 'Voxel Sum (energy-weighted)', 'value': 'voxel'},
+                        ],
+                        value=self.get_option_value("downsample_mode", "random"),
+                        style={'display': 'flex', 'flex-direction': 'column'}
+                    ),
+                    html.Label('Voxel Size (cm):'),
+                    dcc.Slider(
+                        id='simch-voxel-size',
+                        min=0.3,
+                        max=3.0,
+                        step=0.1,
+                        marks={0.3: '0.3', 1.0: '1.0', 2.0: '2.0', 3.0: '3.0'},
+                        value=self.get_option_value("voxel_size", 0.3),
+                    )
+                ], style={'margin-bottom': '10px'}),
+                
                 # Conditional options depending on coloring mode
                 html.Div(id='simch-conditional-options', children=[
                     # This will be populated by callback
@@ -168,6 +194,8 @@ class SimChPlotter(BasePlotter):
         return [
             'simch-source',
             'simch-coloring-mode',
+            'simch-downsample-mode',
+            'simch-voxel-size',
             'simch-conditional-options',
             'simch-marker-size',
             'simch-marker-opacity'
@@ -204,6 +232,8 @@ class SimChPlotter(BasePlotter):
             coloring_mode  = options.get('coloring_mode',  self.get_option_value('coloring_mode', 'edep'))
             marker_size    = options.get('marker_size',    self.get_option_value('marker_size', 1.0))
             marker_opacity = options.get('marker_opacity', self.get_option_value('marker_opacity', 0.4))
+            downsample_mode = options.get('downsample_mode', self.get_option_value('downsample_mode', 'random'))
+            voxel_size     = options.get('voxel_size',     self.get_option_value('voxel_size', 0.3))
             
             if cluster_source not in self._input_trees_present:
                 self.log_error(f"Selected cluster source {cluster_source} not available")
@@ -213,13 +243,18 @@ class SimChPlotter(BasePlotter):
             self.log_info(f"getting clusters from source: {cluster_source}")
             ev_simch = iolarlite.get_data("simch", cluster_source)
 
+            # the truth graph is shared with the other truth plotters for this entry
+            mcgraph = get_mctruth_graph( iolarlite, tree_dict.get('entry_cache') )
+
             # make trace
             simch_plots = visualize_larlite_simch( ev_simch,
                color_by=coloring_mode,
                opacity=marker_opacity,
                marker_size=marker_size,
-               ioll=iolarlite,
-               max_num_pts=100000)
+               mcgraph=mcgraph,
+               max_num_pts=100000,
+               downsample_mode=downsample_mode,
+               voxel_size=voxel_size)
                
             self.log_info(f"Created {len(simch_plots)} cluster traces")
             return simch_plots
@@ -280,6 +315,27 @@ class SimChPlotter(BasePlotter):
                     self.set_option_value('coloring_mode', value)
                 return None
             
+            # Store downsampling settings when they change
+            @app.callback(
+                Output('det3d-hidden-output', 'children', allow_duplicate=True),
+                [Input('simch-downsample-mode', 'value')],
+                prevent_initial_call=True
+            )
+            def store_downsample_mode(value):
+                if value:
+                    self.set_option_value('downsample_mode', value)
+                return None
+            
+            @app.callback(
+                Output('det3d-hidden-output', 'children', allow_duplicate=True),
+                [Input('simch-voxel-size', 'value')],
+                prevent_initial_call=True
+            )
+            def store_voxel_size(value):
+                if value:
+                    self.set_option_value('voxel_size', value)
+                return None
+            
             # Store marker size when it changes
             @app.callback(
                 Output('det3d-hidden-output', 'children', allow_duplicate=True),
@@ -4,8 +4,17 @@ Plotter registry for Lardly
 This module provides a registry for plotters and functions to work with them.
 """
 from typing import Dict, List, Any, Optional, Type, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import time
 import logging
+
+from lardly.ubdl.config.settings import config
 from lardly.ubdl.plotters.base import BasePlotter
+from lardly.ubdl.core.figure_cache import get_figure_cache, make_cache_key
+from lardly.ubdl.core.perf import perf_recorder, timed_io, count_points, estimate_bytes
+from lardly.ubdl.core.memory import memory_monitor
+from lardly.ubdl.io.io_thread import HandedOffHold, entry_guard, serialize_io
+from lardly.ubdl.core.serialization import encode_arrays, dumps
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +29,8 @@ class PlotterRegistry:
     def __init__(self):
         """Initialize with an empty registry"""
         self._plotters: Dict[str, BasePlotter] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_size = 0
     
     def register(self, plotter: BasePlotter) -> None:
         """
@@ -76,6 +87,15 @@ class PlotterRegistry:
         """
         Create traces for the given plotters
         
+        With plotters.concurrency.max_workers above 1 the plotters run in a thread
+        pool (see _make_traces_concurrent); otherwise they run one after another.
+        Traces are returned in the order of `plotter_names` either way.
+        
+        The entry guard is held until the last plotter has finished, so all traces
+        come from the same entry. Callers should take `tree_dict` with the guard
+        held as well (`with entry_guard.shared():`), or an entry loaded in between
+        is drawn and not cached.
+        
         Args:
             plotter_names: Names of plotters to use
             tree_dict: Dictionary of trees (data sources)
@@ -84,8 +104,7 @@ class PlotterRegistry:
         Returns:
             List of plotly trace dictionaries
         """
-        all_traces = []
-        
+        jobs = []
         for name in plotter_names:
             plotter = self.get_plotter(name)
             if plotter is None:
@@ -95,16 +114,159 @@ class PlotterRegistry:
             plotter_options = None
             if options and name in options:
                 plotter_options = options[name]
+            jobs.append((plotter, plotter_options))
+        
+        max_workers = config.get("plotters", "concurrency", "max_workers", default=0) or 0
+        with entry_guard.shared():
+            if max_workers > 1 and len(jobs) > 1:
+                return self._make_traces_concurrent(jobs, tree_dict, max_workers)
+            
+            all_traces = []
+            for plotter, plotter_options in jobs:
+                try:
+                    traces = self.make_plotter_traces(plotter, tree_dict, plotter_options)
+                    logger.info(f"Plotter '{plotter.name}' created {len(traces)} traces")
+                    all_traces.extend(traces)
+                except Exception as e:
+                    logger.error(f"Error creating traces for plotter '{plotter.name}': {e}")
+            
+            return all_traces
+    
+    def _get_pool(self, max_workers: int) -> ThreadPoolExecutor:
+        if self._pool is None or self._pool_size != max_workers:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lardly-plotter")
+            self._pool_size = max_workers
+        return self._pool
+    
+    def _make_traces_concurrent(self, jobs: List[Tuple[BasePlotter, Optional[Dict[str, Any]]]],
+                                tree_dict: Dict[str, Any], max_workers: int) -> List[Dict[str, Any]]:
+        """
+        Run plotters in a thread pool
+        
+        Reads from the files go through the single IO thread (see lardly.ubdl.io.io_thread);
+        the conversion of the products to traces runs in the pool. A plotter that has not
+        finished within its timeout (the plotter's `timeout` attribute, or
+        plotters.concurrency.timeout), counted from when it was submitted, is left out of
+        the figure; its thread is not interrupted and its result is dropped.
+        
+        Called with the entry guard held. Each job gets a hold of the guard from
+        this thread (the workers do not take it themselves, which would wait behind
+        a pending load while this thread waits for them). A plotter left behind
+        after a timeout keeps its hold, so the next entry load waits for it (up to
+        plotters.concurrency.load_wait).
+        
+        Args:
+            jobs: (plotter, options) pairs
+            tree_dict: Dictionary of trees (data sources)
+            max_workers: Number of threads in the pool
             
+        Returns:
+            List of plotly trace dictionaries, in the order of `jobs`
+        """
+        pool = self._get_pool(max_workers)
+        serialized_tree_dict = serialize_io(tree_dict)
+        default_timeout = config.get("plotters", "concurrency", "timeout", default=None)
+        
+        start = time.monotonic()
+        futures = []
+        for plotter, plotter_options in jobs:
+            hold = entry_guard.hand_off()
+            future = pool.submit(self._make_held_traces, hold, plotter, serialized_tree_dict, plotter_options)
+            # a job cancelled before it started never enters its hold
+            future.add_done_callback(lambda f, hold=hold: hold.release() if f.cancelled() else None)
+            futures.append(future)
+        
+        all_traces = []
+        for (plotter, _), future in zip(jobs, futures):
+            timeout = plotter.timeout if plotter.timeout is not None else default_timeout
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
             try:
-                traces = plotter.make_traces(tree_dict, plotter_options)
-                logger.info(f"Plotter '{name}' created {len(traces)} traces")
+                traces = future.result(timeout=remaining)
+                logger.info(f"Plotter '{plotter.name}' created {len(traces)} traces")
                 all_traces.extend(traces)
+            except FuturesTimeoutError:
+                future.cancel()
+                logger.warning(f"Plotter '{plotter.name}' timed out after {timeout} s; its traces are left out "
+                               f"and the next entry load waits for it to finish")
             except Exception as e:
-                logger.error(f"Error creating traces for plotter '{name}': {e}")
+                logger.error(f"Error creating traces for plotter '{plotter.name}': {e}")
         
         return all_traces
 
+    def _make_held_traces(self, hold: HandedOffHold, plotter: BasePlotter, tree_dict: Dict[str, Any],
+                          options: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with hold:
+            return self.make_plotter_traces(plotter, tree_dict, options)
+
+    def make_plotter_traces(self, plotter: BasePlotter, tree_dict: Dict[str, Any],
+                            options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Create the traces of one plotter, using the figure cache when possible
+        
+        The cache is used if the tree dictionary identifies the loaded files and
+        entry ('catalog_hash' and 'entry', set by the IO manager). The time spent,
+        the number of traces and points and the payload size are recorded for the
+        entry in the performance recorder (see lardly.ubdl.core.perf), and the memory
+        growth in the memory monitor (see lardly.ubdl.core.memory).
+        
+        Args:
+            plotter: Plotter to use
+            tree_dict: Dictionary of trees (data sources)
+            options: Optional dictionary of options for this plotter
+            
+        Returns:
+            List of plotly traces
+        """
+        entry = tree_dict.get('entry', -1)
+        # the entry cannot be replaced while the plotter uses its products
+        with entry_guard.shared(), memory_monitor.track(entry, plotter.name):
+            if not perf_recorder.enabled:
+                return self._make_cached_traces(plotter, tree_dict, options)
+            
+            with perf_recorder.measure(entry, plotter.name):
+                traces = self._make_cached_traces(plotter, timed_io(tree_dict), options)
+        
+        if config.get("perf", "measure_payload", default=False):
+            with perf_recorder.timed(entry, plotter.name, "serialize"):
+                nbytes = len(dumps(encode_arrays(traces)))
+        else:
+            nbytes = estimate_bytes(traces)
+        perf_recorder.add(entry, plotter.name, traces=len(traces), points=count_points(traces), bytes=nbytes)
+        return traces
+    
+    def _make_cached_traces(self, plotter: BasePlotter, tree_dict: Dict[str, Any],
+                            options: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cache = get_figure_cache()
+        catalog_hash = tree_dict.get('catalog_hash')
+        entry = tree_dict.get('entry', -1)
+        if cache is None or not plotter.cacheable or catalog_hash is None or entry < 0:
+            return plotter.make_traces(tree_dict, options)
+        if not entry_guard.is_current(tree_dict):
+            # the products read now are those of a later entry than tree_dict['entry']
+            logger.warning(f"Entry {entry} was replaced before plotter '{plotter.name}' ran; "
+                           f"its traces are not cached")
+            return plotter.make_traces(tree_dict, options)
+        
+        key = make_cache_key(catalog=catalog_hash,
+                             entry=entry,
+                             plotter=plotter.name,
+                             plotter_class=f"{type(plotter).__module__}.{type(plotter).__qualname__}",
+                             version=plotter.cache_version,
+                             options=plotter.get_effective_options(options))
+        traces = cache.get(key)
+        cached = traces is not None
+        if cached:
+            logger.debug(f"Plotter '{plotter.name}' traces from figure cache")
+        else:
+            traces = plotter.make_traces(tree_dict, options)
+            # plotters return [] when they fail; an empty result is not kept
+            if traces:
+                traces = cache.put(key, traces)
+        perf_recorder.add(entry, plotter.name, cached=cached)
+        return traces
+
     def register_callbacks(self, app):
         """
         Register callbacks for all plotters
@@ -0,0 +1,163 @@
+from __future__ import print_function
+from functools import lru_cache
+import numpy as np
+from plotly import graph_objects as go
+from .pmtpos import getPMTPosByOpChannel, getPMTPosByOpDet, getOpChannelFromOpDet, getOpDetFromOpChannel
+
+NPMTS = 32
+
+# 0 -> dark, 1 -> bright; same range as the old per-PMT 'rgb(54+200*value,0,0)' colors
+_CHANNEL_COLORSCALES = {
+    'r':[[0.0,'rgb(54,0,0)'],[1.0,'rgb(254,0,0)']],
+    'g':[[0.0,'rgb(0,54,0)'],[1.0,'rgb(0,254,0)']],
+    'b':[[0.0,'rgb(0,0,54)'],[1.0,'rgb(0,0,254)']],
+}
+
+@lru_cache(maxsize=None)
+def get_pmt_disks( radius=15.24, nsteps=20, use_opdet_index=False, use_v4_geom=False ):
+    """
+    Disk geometry for all 32 PMTs, built once per set of arguments.
+
+    Every PMT gets `nsteps` rim vertices followed by its center vertex,
+    so vertex v belongs to PMT v//(nsteps+1).
+
+    Parameters
+    ----------
+
+    radius : float
+       disk radius in cm
+    nsteps : int
+       number of rim vertices
+    use_opdet_index : bool
+       if True, PMT n is larsoft OpDet n, else it is OpChannel n
+
+    Returns
+    -------
+    dict with (read-only) numpy arrays
+       'xyz'     : (32*(nsteps+1),3) vertex positions
+       'ijk'     : (32*nsteps,3) triangle vertex indices
+       'outline' : (32*(nsteps+2),3) rims as closed loops, separated by NaN rows
+       'center'  : (32,3) PMT centers
+       'opch', 'opdet' : (32,) ids of each PMT
+    """
+    if use_opdet_index:
+        opdet = np.arange( NPMTS, dtype=np.int64 )
+        opch = np.array( [ getOpChannelFromOpDet(n) for n in range(NPMTS) ], dtype=np.int64 )
+        center = np.array( [ getPMTPosByOpDet(n, use_v4_geom=use_v4_geom) for n in range(NPMTS) ], dtype=np.float64 )
+    else:
+        opch = np.arange( NPMTS, dtype=np.int64 )
+        opdet = np.array( [ getOpDetFromOpChannel(n) for n in range(NPMTS) ], dtype=np.int64 )
+        center = np.array( [ getPMTPosByOpChannel(n, use_v4_geom=use_v4_geom) for n in range(NPMTS) ], dtype=np.float64 )
+
+    theta = np.linspace( 0, 2*np.pi, nsteps )
+    rim = np.zeros( (nsteps+1,3) )
+    rim[:nsteps,1] = np.sin(theta)*radius
+    rim[:nsteps,2] = np.cos(theta)*radius
+    xyz = (center[:,np.newaxis,:] + rim[np.newaxis,:,:]).reshape(-1,3)
+
+    # triangle fan around the center vertex of each disk
+    n = np.arange( nsteps )
+    fan = np.stack( [ np.full(nsteps,nsteps), n, (n+1)%nsteps ], axis=1 )
+    ijk = (fan[np.newaxis,:,:] + (np.arange(NPMTS)*(nsteps+1))[:,np.newaxis,np.newaxis]).reshape(-1,3)
+
+    # closed rims: the rim, the first rim vertex again, then a NaN separator
+    loops = np.full( (NPMTS,nsteps+2,3), np.nan )
+    loops[:,:nsteps,:] = center[:,np.newaxis,:] + rim[np.newaxis,:nsteps,:]
+    loops[:,nsteps,:] = loops[:,0,:]
+    outline = loops.reshape(-1,3)
+
+    disks = { 'xyz':xyz, 'ijk':ijk, 'outline':outline, 'center':center, 'opch':opch, 'opdet':opdet }
+    for arr in disks.values():
+        arr.setflags(write=False)
+    return disks
+
+def _pmt_hovertext( disks, pe=None ):
+    if pe is None:
+        return [ f"<b>OpChannel</b>: {ch}<br><b>OpDetID</b>: {det}" for ch,det in zip(disks['opch'],disks['opdet']) ]
+    return [ f"<b>OpChannel</b>: {ch}<br><b>OpDetID</b>: {det}<br><b>PE</b>: {q:.1f}"
+             for ch,det,q in zip(disks['opch'],disks['opdet'],pe) ]
+
+def make_pmt_mesh( values, radius=15.24, nsteps=20, use_opdet_index=False, use_v4_geom=False,
+                   show=None, x_offset=0.0, xpos=None, pe=None, rgb_channel='r',
+                   colorscale=None, name="opflash" ):
+    """
+    One Mesh3d holding the disks of all PMTs, colored by a per-vertex intensity.
+
+    Parameters
+    ----------
+
+    values : array with shape (32,)
+       normalized [0,1] intensity of each PMT
+    show : bool array with shape (32,) or None
+       PMTs to draw. Triangles of hidden PMTs are dropped.
+    x_offset : float
+       shift applied to the x of every disk
+    xpos : float or None
+       if given, all disks are placed at this x (e.g. from the flash time)
+    pe : array with shape (32,) or None
+       PE shown in the hover text
+    rgb_channel : str
+       'r', 'g' or 'b', used if colorscale is None
+
+    Returns
+    -------
+    plotly.graph_objects.Mesh3d
+    """
+    disks = get_pmt_disks( float(radius), int(nsteps), bool(use_opdet_index), bool(use_v4_geom) )
+    if colorscale is None:
+        if rgb_channel not in _CHANNEL_COLORSCALES:
+            raise ValueError("rgb_channel must either be r, g, or b")
+        colorscale = _CHANNEL_COLORSCALES[rgb_channel]
+
+    nvert = nsteps+1
+    xyz = np.array( disks['xyz'] )
+    if xpos is not None:
+        xyz[:,0] = xpos
+    else:
+        xyz[:,0] += x_offset
+
+    ijk = disks['ijk']
+    if show is not None:
+        show = np.asarray( show, dtype=bool )
+        ijk = ijk[ np.repeat( show, nsteps ) ]
+
+    intensity = np.repeat( np.clip( np.asarray(values,dtype=np.float64), 0.0, 1.0 ), nvert )
+    hovertext = np.repeat( np.array( _pmt_hovertext(disks,pe), dtype=object ), nvert ).tolist()
+
+    mesh = go.Mesh3d( x=xyz[:,0], y=xyz[:,1], z=xyz[:,2],
+                      i=ijk[:,0], j=ijk[:,1], k=ijk[:,2],
+                      intensity=intensity, intensitymode="vertex",
+                      colorscale=colorscale, cmin=0.0, cmax=1.0,
+                      showscale=False, name=name,
+                      hovertext=hovertext, hoverinfo="text" )
+    return mesh
+
+def make_pmt_outline( radius=15.24, nsteps=20, use_opdet_index=False, use_v4_geom=False,
+                      show=None, x_offset=0.0, xpos=None, color="rgb(255,255,255)", name="opflash" ):
+    """
+    One Scatter3d with the rims of all (or the `show`-n) PMTs.
+
+    Arguments are the same as make_pmt_mesh.
+
+    Returns
+    -------
+    plotly.graph_objects.Scatter3d
+    """
+    disks = get_pmt_disks( float(radius), int(nsteps), bool(use_opdet_index), bool(use_v4_geom) )
+    nloop = nsteps+2
+    xyz = np.array( disks['outline'] )
+    if xpos is not None:
+        xyz[:,0] = np.where( np.isnan(xyz[:,0]), np.nan, xpos )
+    else:
+        xyz[:,0] += x_offset
+
+    hovertext = np.repeat( np.array( _pmt_hovertext(disks), dtype=object ), nloop )
+    if show is not None:
+        keep = np.repeat( np.asarray(show,dtype=bool), nloop )
+        xyz = xyz[keep]
+        hovertext = hovertext[keep]
+
+    lines = go.Scatter3d( x=xyz[:,0], y=xyz[:,1], z=xyz[:,2], mode="lines", name=name,
+                          line={"color":color,"width":1},
+                          hovertext=hovertext.tolist(), hoverinfo="text" )
+    return lines
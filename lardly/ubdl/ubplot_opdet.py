@@ -1,4 +1,5 @@
 from .pmtpos import getPMTPosByOpChannel, getPMTPosByOpDet
+from .pmtmesh import make_pmt_mesh, make_pmt_outline
 import numpy as np
 from plotly import graph_objects as go
 
@@ -48,56 +49,26 @@ def define_circle_mesh( center, radius, value, nsteps=20, color=None, outline_co
     return mesh,lines
 
 def make_opdet_plot( opdet_values, pmt_radius_cm=15.2, use_opdet_index=True, use_v4_geom=True ):
-
-    #print(opdet_values)
-
-    all_pe = [ 0.0 for x in range(32) ]
-    max_pe = 0.0
-    min_pe = 1.0e9
-    for i in range(32):
-        #if i < len(opdet_values):
-        all_pe[i] = opdet_values[i]
-        if all_pe[i]>max_pe:
-            max_pe = all_pe[i]
-        if all_pe[i]<min_pe:
-            min_pe = all_pe[i]
+    """
+    One mesh with all 32 PMTs, colored by opdet_values scaled to [min,max], plus one outline trace.
+    """
+    all_pe = np.array( [ opdet_values[i] for i in range(32) ], dtype=np.float64 )
+    max_pe = all_pe.max()
+    min_pe = all_pe.min()
 
     perange = max_pe-min_pe
+    if perange>0.0:
+        values = np.clip( (all_pe-min_pe)/perange, 0.0, 1.0 )
+    else:
+        values = np.zeros( 32 )
 
-    circles = []
-    for ipmt in range(32):
-        pe = all_pe[ipmt]
-        if perange>0.0:
-            value = (pe-min_pe)/(max_pe-min_pe)
-        else:
-            value = 0.0
-        value = min( value, 1.0 )
-        value = max( value, 0 )
-        if use_opdet_index:
-            center = getPMTPosByOpDet(ipmt,use_v4_geom=use_v4_geom)
-        else:
-            center = getPMTPosByOpChannel(ipmt,use_v4_geom=use_v4_geom)
-        #center = [pmtposmap[ipmt][0]+x_offset, pmtposmap[ipmt][1], pmtposmap[ipmt][2] ]
-        mesh, outline = define_circle_mesh( center, pmt_radius_cm, value, nsteps=20 )
-        circles.append( mesh )
-        circles.append( outline )
-        
-    return circles
+    mesh = make_pmt_mesh( values, radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom, pe=all_pe )
+    outline = make_pmt_outline( radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom )
+    return [mesh,outline]
 
 def make_opdet_outline_plot( pmt_radius_cm=15.2, use_opdet_index=True, use_v4_geom=True ):
     """
-    Just returns the circular outlines
+    Just returns the circular outlines, as one trace
     """
-
-    circles = []
-    for ipmt in range(32):
-        if use_opdet_index:
-            center = getPMTPosByOpDet(ipmt,use_v4_geom=use_v4_geom)
-        else:
-            center = getPMTPosByOpChannel(ipmt,use_v4_geom=use_v4_geom)
-        #center = [pmtposmap[ipmt][0]+x_offset, pmtposmap[ipmt][1], pmtposmap[ipmt][2] ]
-        mesh, outline = define_circle_mesh( center, pmt_radius_cm, 0.0, nsteps=20, outline_color='rgb(0,0,0)' )
-        circles.append( outline )
-        
-    return circles
-    
+    return [ make_pmt_outline( radius=pmt_radius_cm, use_opdet_index=use_opdet_index, use_v4_geom=use_v4_geom,
+                               color='rgb(0,0,0)' ) ]
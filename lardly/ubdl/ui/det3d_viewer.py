@@ -4,20 +4,27 @@ Detector 3D Viewer component
 This module provides the Detector 3D Viewer component and related functions.
 """
 import os
+import logging
+import numpy as np
 import dash
-from dash import html, dcc
+from dash import html, dcc, Patch
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
 
 from lardly.ubdl.plotters.registry import registry, get_applicable_plotters
 from lardly.ubdl.core.state import state_manager
 from lardly.ubdl.config.settings import config
-import lardly.ubdl.utils.detectoroutline as detector_utils
+from lardly.ubdl.utils.geometry_assets import get_geometry_traces, get_detector_display, cryostat_asset_name
+from lardly.ubdl.core.serialization import encode_arrays
+from lardly.ubdl.io.io_thread import entry_guard
+
+logger = logging.getLogger(__name__)
 
 def get_default_det3d_layout():
     """
     Get the default layout for the 3D detector view
-    
+
     Returns:
         Default layout dictionary for Plotly
     """
@@ -39,7 +46,7 @@ def get_default_det3d_layout():
             "xaxis": axis_template,
             "yaxis": axis_template,
             "zaxis": axis_template,
-            "aspectratio": config.get("plot", "default_layout", "aspect_ratio", 
+            "aspectratio": config.get("plot", "default_layout", "aspect_ratio",
                                     default={"x": 1, "y": 1, "z": 4}),
             "camera": {"eye": {"x": -4.0, "y": 0.25, "z": 0.0},
                       "center": {"x": 0.0, "y": 0.0, "z": 0.0},
@@ -49,21 +56,64 @@ def get_default_det3d_layout():
     }
     return layout
 
+def get_camera_distance(camera):
+    """
+    Get the distance between the camera eye and the center it looks at
+    
+    Args:
+        camera: Plotly scene camera dictionary
+        
+    Returns:
+        Distance in plotly scene units
+    """
+    eye = camera.get("eye", {})
+    center = camera.get("center", {})
+    return float(np.sqrt(sum((eye.get(k, 0.0) - center.get(k, 0.0))**2 for k in ("x", "y", "z"))))
+
+def get_cryostat_level(camera=None):
+    """
+    Get the level of detail of the cryostat mesh
+    
+    Args:
+        camera: Plotly scene camera dictionary. If None, the default camera is used.
+        
+    Returns:
+        Level index, or None if the mesh is not shown
+    """
+    detdisplay = get_detector_display()
+    if detdisplay is None:
+        return None
+    level = config.get("plot", "detector_mesh", "level", default="auto")
+    if level != "auto":
+        return min(int(level), detdisplay.nlevels - 1)
+    if camera is None:
+        camera = get_default_det3d_layout()["scene"]["camera"]
+    from lardly.detectormesh import choose_lod_level
+    lod_distances = config.get("plot", "detector_mesh", "lod_distances", default=[1.0, 2.0, 3.5])
+    return min(choose_lod_level(get_camera_distance(camera), lod_distances), detdisplay.nlevels - 1)
+
 def make_default_plot():
     """
     Create a default plot with detector outline
     
+    The geometry traces come from the geometry asset registry and are only built once.
+    If the cryostat mesh is enabled, it is the first trace of the figure,
+    so that its level of detail can be swapped with a Patch.
+    
     Returns:
         Plotly Figure object with detector outline
     """
-    detdata = detector_utils.DetectorOutline()
-    xtraces = detdata.get_lines(color=(0, 0, 0))
+    xtraces = get_geometry_traces("tpc_outline")
+    level = get_cryostat_level()
+    if level is not None:
+        xtraces = get_geometry_traces(cryostat_asset_name(level)) + xtraces
     return go.Figure(data=xtraces, layout=get_default_det3d_layout())
 
 def make_det3d_viewer():
     """Create the detector 3D viewer component"""
     return html.Div([
         html.Div(id='det3d-hidden-output', style={'display': 'none'}),  # Hidden div for callbacks
+        dcc.Store(id='det3d-cryostat-level', data=get_cryostat_level()),
         
         html.H3('Detector Viewer'),
         html.Label('Plot Menu'),
@@ -121,7 +171,8 @@ def register_det3d_callbacks(app):
     
     # Run active plotters and update the 3D figure
     @app.callback(
-        [Output('det3d', 'figure',allow_duplicate=True)],
+        [Output('det3d', 'figure',allow_duplicate=True),
+         Output('det3d-cryostat-level', 'data', allow_duplicate=True)],
         [Input('button-load-det3d-fig', 'n_clicks')],
         [State('det3d-viewer-checklist-plotchoices', 'value')],
         prevent_initial_call=True
@@ -129,22 +180,20 @@ def register_det3d_callbacks(app):
     def run_active_det3d_plotters(n_clicks, selected_plots):
         """Run active plotters and update the 3D figure"""
         if n_clicks is None or not selected_plots:
-            return [make_default_plot()]
+            return [make_default_plot(), get_cryostat_level()]
         
         # Get options for all selected plotters from the state store
         from lardly.ubdl.core.state import state_manager
         all_options = state_manager.get_state('plotters', 'options', default={})
         
-        # Get the tree dictionary
-        from lardly.ubdl.io.io_manager import get_tree_dict
-        tree_dict = get_tree_dict()
-        
         # Create options dictionary for the selected plotters
         options = {name: all_options.get(name, {}) for name in selected_plots}
         
-        # Get traces from plotters
-        from lardly.ubdl.plotters.registry import registry
-        traces = registry.make_traces(selected_plots, tree_dict, options)
+        # Get traces from plotters, all from the entry the tree dictionary is for
+        from lardly.ubdl.io.io_manager import get_tree_dict
+        with entry_guard.shared():
+            tree_dict = get_tree_dict()
+            traces = registry.make_traces(selected_plots, tree_dict, options)
         
         # Create figure
         fig = make_default_plot()
@@ -157,4 +206,29 @@ def register_det3d_callbacks(app):
         for trace in traces:
             fig.add_trace(trace)
             
-        return [fig]
+        # The new figure starts from the default camera
+        return [encode_arrays(fig), get_cryostat_level()]
+    
+    # Swap the cryostat level of detail when the camera moves
+    @app.callback(
+        [Output('det3d', 'figure', allow_duplicate=True),
+         Output('det3d-cryostat-level', 'data', allow_duplicate=True)],
+        [Input('det3d', 'relayoutData')],
+        [State('det3d-cryostat-level', 'data')],
+        prevent_initial_call=True
+    )
+    def update_cryostat_level(relayout_data, current_level):
+        """Replace the cryostat trace points if the camera distance calls for another level"""
+        if current_level is None or not relayout_data or 'scene.camera' not in relayout_data:
+            raise PreventUpdate
+        level = get_cryostat_level(relayout_data['scene.camera'])
+        if level is None or level == current_level:
+            raise PreventUpdate
+        
+        lines = get_detector_display().get_lines(level)
+        patched_fig = Patch()
+        for axis in ("x", "y", "z"):
+            patched_fig['data'][0][axis] = encode_arrays(lines[axis])
+        # keep the camera where the user left it when the figure is redrawn
+        patched_fig['layout']['scene']['camera'] = relayout_data['scene.camera']
+        return [patched_fig, level]
@@ -131,7 +131,7 @@ def register_io_navigation_callbacks(app: dash.Dash) -> None:
         # Get wire plane options
         wire_plane_options = []
         for tree in available_trees:
-            if "image2d_" in tree:
+            if "image2d_" in tree or "sparseimg_" in tree:
                 wire_plane_options.append({'label': tree, 'value': tree})
 
         # TODO feature: if wire and thrumu available, we apply the thrumu mask
@@ -0,0 +1,146 @@
+"""
+Performance Panel UI Component
+
+This module provides a collapsible panel showing the time, trace and point counts
+and payload size of each plotter, wire plane and entry load, per entry.
+Components slower than perf.slow_threshold are highlighted. With memory
+diagnostics on, the memory growth of the last entry is shown above the table.
+"""
+from typing import Any, Dict, List
+
+import dash
+from dash import html, dcc
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from lardly.ubdl.config.settings import config
+from lardly.ubdl.core.perf import perf_recorder, STAGES
+from lardly.ubdl.core.memory import memory_monitor, get_rss_bytes, MB
+
+SLOW_STYLE = {'backgroundColor': '#f8d7da', 'fontWeight': 'bold'}
+CELL_STYLE = {'padding': '2px 8px', 'textAlign': 'right'}
+
+def make_perf_panel() -> html.Details:
+    """
+    Create the performance panel
+
+    The browser opens and closes the panel without telling the server (the
+    `open` property of html.Details is not sent back), so the callbacks count
+    the clicks on the summary instead: an odd count means the panel is open.
+
+    Returns:
+        Dash component for the panel; closed at first
+    """
+    return html.Details([
+        html.Summary("Performance", id='perf-panel-summary', n_clicks=0, style={'cursor': 'pointer'}),
+        html.Div(id='perf-panel-slow', style={'margin': '5px 0'}),
+        html.Div(id='perf-panel-memory', style={'margin': '5px 0'}),
+        html.Div(id='perf-panel-table', style={'maxHeight': '400px', 'overflowY': 'auto'}),
+        dcc.Interval(
+            id='perf-panel-interval',
+            interval=config.get('perf', 'refresh_interval_ms', default=2000),
+            disabled=True
+        ),
+        dcc.Store(id='perf-panel-version', data=-1),
+    ], id='perf-panel', open=False)
+
+def _format_bytes(nbytes: int) -> str:
+    for unit in ("B", "kB", "MB"):
+        if nbytes < 1024 or unit == "MB":
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024.0
+    return str(nbytes)
+
+def make_perf_table(rows: List[Dict[str, Any]], slow_threshold: float) -> html.Table:
+    """
+    Create the table of performance records
+
+    Args:
+        rows: Records from PerfRecorder.rows()
+        slow_threshold: Rows with a larger total (seconds) are highlighted
+
+    Returns:
+        Dash table
+    """
+    columns = ["entry", "component"] + list(STAGES) + ["total", "traces", "points", "bytes"]
+    header = html.Tr([html.Th(column, style=CELL_STYLE) for column in columns])
+    body = []
+    for row in rows:
+        cells = [html.Td(str(row["entry"]), style=CELL_STYLE),
+                 html.Td(row["component"] + (" (cached)" if row.get("cached") else ""),
+                         style={**CELL_STYLE, 'textAlign': 'left'})]
+        cells += [html.Td(f"{row[stage]*1000:.0f} ms", style=CELL_STYLE) for stage in STAGES + ("total",)]
+        cells += [html.Td(f"{row['traces']}", style=CELL_STYLE),
+                  html.Td(f"{row['points']}", style=CELL_STYLE),
+                  html.Td(_format_bytes(row['bytes']), style=CELL_STYLE)]
+        body.append(html.Tr(cells, style=SLOW_STYLE if row["total"] > slow_threshold else {}))
+    return html.Table([html.Thead(header), html.Tbody(body)], style={'fontSize': '12px'})
+
+def make_memory_summary() -> html.Span:
+    """
+    Describe the memory use and the growth at the last entry load
+
+    Returns:
+        Dash span; highlighted if the growth is above memory.growth_threshold_mb
+    """
+    if not memory_monitor.enabled:
+        return html.Span(f"RSS {get_rss_bytes()/MB:.0f} MB (memory diagnostics off)")
+    growth = memory_monitor.growth_rows()
+    if not growth:
+        return html.Span(f"RSS {get_rss_bytes()/MB:.0f} MB; growth is measured from the second entry load")
+    last = growth[0]
+    text = (f"RSS {last['rss']/MB:.0f} MB, heap {last['heap']/MB:.0f} MB; "
+            f"entry {last['previous_entry']} to {last['entry']}: "
+            f"{last['rss_growth']/MB:+.1f} MB RSS, {last['heap_growth']/MB:+.1f} MB heap")
+    if last["components"]:
+        component, largest = max(last["components"].items(), key=lambda item: item[1]["rss"])
+        text += f" (largest: {component}, {largest['rss']/MB:+.1f} MB RSS)"
+    threshold = config.get('memory', 'growth_threshold_mb', default=20.0)*MB
+    too_large = max(last['rss_growth'], last['heap_growth']) > threshold
+    return html.Span(text, style=SLOW_STYLE if too_large else {})
+
+def _is_open(n_clicks) -> bool:
+    return bool(n_clicks) and n_clicks % 2 == 1
+
+def register_perf_panel_callbacks(app: dash.Dash) -> None:
+    """
+    Register callbacks for the performance panel
+
+    Args:
+        app: Dash application
+    """
+    @app.callback(
+        Output('perf-panel-interval', 'disabled'),
+        Input('perf-panel-summary', 'n_clicks')
+    )
+    def toggle_perf_refresh(n_clicks):
+        """Only poll for new records while the panel is open"""
+        return not _is_open(n_clicks)
+
+    @app.callback(
+        [Output('perf-panel-table', 'children'),
+         Output('perf-panel-slow', 'children'),
+         Output('perf-panel-memory', 'children'),
+         Output('perf-panel-version', 'data')],
+        [Input('perf-panel-interval', 'n_intervals'),
+         Input('perf-panel-summary', 'n_clicks')],
+        [State('perf-panel-version', 'data')],
+        prevent_initial_call=True
+    )
+    def update_perf_panel(n_intervals, n_clicks, version):
+        """Redraw the table when there are new records"""
+        if not _is_open(n_clicks) or version == perf_recorder.version:
+            raise PreventUpdate
+
+        slow_threshold = config.get('perf', 'slow_threshold', default=1.0)
+        rows = perf_recorder.rows()
+        slow = perf_recorder.slow_rows(slow_threshold)
+        if slow:
+            slowest = slow[0]
+            slow_text = (f"{len(slow)} slow (> {slow_threshold:.1f} s); slowest: {slowest['component']} "
+                         f"at entry {slowest['entry']}, {slowest['total']:.2f} s")
+            slow_children = html.Span(slow_text, style=SLOW_STYLE)
+        else:
+            slow_children = html.Span(f"Nothing slower than {slow_threshold:.1f} s")
+
+        return make_perf_table(rows, slow_threshold), slow_children, make_memory_summary(), perf_recorder.version
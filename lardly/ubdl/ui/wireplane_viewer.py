@@ -8,14 +8,23 @@ import traceback
 from typing import List, Dict, Any, Optional, Tuple, Union
 
 import dash
-from dash import html, dcc
+from dash import html, dcc, Patch
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
 import numpy as np
 
 from lardly.ubdl.io.io_manager import io_manager
+from lardly.ubdl.io.io_thread import entry_guard
 from lardly.ubdl.core.state import state_manager
+from lardly.ubdl.config.settings import config
+from lardly.ubdl.utils.image_pyramid import ImagePyramid
+from lardly.ubdl.utils.image_render import make_image_trace
+from lardly.ubdl.core.serialization import encode_arrays, dumps
+from lardly.ubdl.core.perf import perf_recorder, count_points, estimate_bytes
+from lardly.data.larcv_imageprep import get_prepared_image
+from lardly.data.larcv_sparseimg import (make_sparse_pixel_trace, image2d_nonzero_pixels,
+                                         find_sparseimg_plane, sparseimg_pixels)
 
 def make_wireplane_view_widget() -> html.Div:
     """
@@ -98,6 +107,19 @@ def make_wireplane_view_widget() -> html.Div:
                 )
             ], style={'width': '20%', 'display': 'inline-block', 'margin': '10px'}),
             
+            html.Div([
+                html.Label("Render Mode:"),
+                dcc.Dropdown(
+                    id='wireplane-render-mode',
+                    options=[
+                        {'label': 'Heatmap', 'value': 'heatmap'},
+                        {'label': 'Image (PNG)', 'value': 'image'}
+                    ],
+                    value=config.get("wireplane", "render_mode", default="heatmap"),
+                    clearable=False
+                )
+            ], style={'width': '15%', 'display': 'inline-block', 'margin': '10px'}),
+            
             html.Div([
                 html.Label("Min Value:"),
                 dcc.Input(
@@ -135,44 +157,41 @@ def make_wireplane_view_widget() -> html.Div:
         ], style={'margin': '10px'})
     ], id='wireplane-viewer', style={'width': '99%', 'display': 'inline-block'})
 
-def visualize_larcv_image2d(image2d, minz=0.0, maxz=200.0, reverse_ticks=False, colorscale="Jet"):
+def visualize_larcv_image2d(image2d, minz=0.0, maxz=200.0, reverse_ticks=False, colorscale="Jet",
+                            sparse_threshold: Optional[float] = None, entry_cache=None,
+                            cache_key: Optional[Tuple] = None):
     """
     Create a heatmap visualization of a larcv::Image2D
     
+    Images with few nonzero pixels are drawn as a scattergl of those pixels instead.
+    The image itself is not modified.
+    
     Args:
         image2d: larcv::Image2D object
         minz: Minimum value for color scale
         maxz: Maximum value for color scale
         reverse_ticks: Whether to reverse the tick axis
         colorscale: Colorscale to use
+        sparse_threshold: Largest fraction of nonzero pixels drawn as a scattergl
+                          (default: wireplane.sparse_threshold from the config)
+        entry_cache: Optional per-entry cache to keep the prepared image in
+        cache_key: Key of the image within the entry, e.g. (producer, plane)
         
     Returns:
-        Plotly heatmap trace
+        Plotly heatmap or scattergl trace
     """
-    from larcv import larcv
-    
-    meta = image2d.meta()
-    print("meta: ",meta.dump())
-    imgnp = np.transpose(larcv.as_ndarray(image2d), (1, 0))
-    
-    # Adjust x-axis for planes 0 and 1
-    if meta.plane() in [0, 1]:
-        imgnp = imgnp[:, 0:2400]
-        maxx = 2400.0
-    else:
-        maxx = meta.max_x()
-        
-    # Create axis arrays
-    xaxis = np.linspace(meta.min_x(), maxx, endpoint=False, num=int(maxx / meta.pixel_width()))
-    yaxis = np.linspace(meta.min_y(), meta.max_y(), endpoint=False, num=meta.rows())
+    prepared = get_prepared_image(image2d, entry_cache=entry_cache, key=cache_key)
     
-    # Apply limits to image data
-    imgnp[imgnp < minz] = 0
-    imgnp[imgnp > maxz] = maxz
+    # Apply limits to a copy of the image
+    imgnp = prepared.clipped(minz, maxz, reverse_ticks=reverse_ticks)
+    xaxis = prepared.xaxis
+    yaxis = prepared.yaxis
     
-    # Reverse ticks if requested
-    if reverse_ticks:
-        imgnp = np.flip(imgnp, axis=0)
+    if sparse_threshold is None:
+        sparse_threshold = config.get("wireplane", "sparse_threshold", default=0.05)
+    if imgnp.size > 0 and prepared.nonzero_fraction(minz) < sparse_threshold:
+        x, y, values = image2d_nonzero_pixels(imgnp, xaxis, yaxis, minz=minz)
+        return make_sparse_pixel_trace(x, y, values, minz=minz, maxz=maxz, colorscale=colorscale)
     
     # Create heatmap
     heatmap = {
@@ -185,6 +204,315 @@ def visualize_larcv_image2d(image2d, minz=0.0, maxz=200.0, reverse_ticks=False,
     
     return heatmap
 
+@entry_guard.holding_shared
+def get_plane_pyramid(prodname: str, plane: int) -> Optional[ImagePyramid]:
+    """
+    Get the image pyramid of a plane for the current entry
+    
+    The pyramid is built once per entry and kept in the IO manager's entry cache.
+    It may share memory with the larcv image, so callers use it with the entry
+    guard held (see lardly.ubdl.io.io_thread), as the callbacks of this module do.
+    It is built on the read-only view of the prepared image, or on its quantized copy
+    if wireplane.quantize_bits is set (max pooling only).
+    
+    Args:
+        prodname: image2d producer name
+        plane: Plane index
+        
+    Returns:
+        ImagePyramid, or None if the plane is not in the container
+    """
+    def build():
+        iolarcv = io_manager._larcv_io
+        if iolarcv is None:
+            raise ValueError("larcv IO manager is not initialized")
+        with perf_recorder.stage("read"):
+            img_v = iolarcv.get_data("image2d", prodname).as_vector()
+        if plane >= img_v.size():
+            return None
+        prepared = get_prepared_image(img_v.at(plane), entry_cache=entry_cache, key=(prodname, plane))
+        mode = config.get("wireplane", "pyramid_mode", default="max")
+        bits = config.get("wireplane", "quantize_bits", default=None)
+        if bits and mode == "max":
+            quantized = prepared.quantized(bits)
+            return ImagePyramid(quantized["data"], mode=mode, value_scale=quantized["scale"],
+                                value_offset=quantized["offset"], **prepared.calib)
+        return ImagePyramid(prepared.view, mode=mode, **prepared.calib)
+    
+    entry_cache = io_manager.get_entry_cache()
+    return entry_cache.get(("wireplane_pyramid", prodname, plane), build)
+
+@entry_guard.holding_shared
+def get_plane_sparse(prodname: str, plane: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Get the nonzero pixels of a plane from a sparseimg tree for the current entry
+    
+    The pixels are read once per entry and kept in the IO manager's entry cache.
+    The image is never made dense.
+    
+    Args:
+        prodname: sparseimg producer name
+        plane: Plane index
+        
+    Returns:
+        Tuple of (wire, tick, value) arrays, or None if no sparse image has the plane
+    """
+    def build():
+        iolarcv = io_manager._larcv_io
+        if iolarcv is None:
+            raise ValueError("larcv IO manager is not initialized")
+        with perf_recorder.stage("read"):
+            sparseimg_v = iolarcv.get_data("sparseimg", prodname).SparseImageArray()
+        sparseimg, feature = find_sparseimg_plane(sparseimg_v, plane)
+        if sparseimg is None:
+            return None
+        return sparseimg_pixels(sparseimg, feature=feature)
+    
+    return io_manager.get_entry_cache().get(("wireplane_sparse", prodname, plane), build)
+
+def make_sparse_trace(pixels: Tuple[np.ndarray, np.ndarray, np.ndarray], minz: float = 0.0,
+                      maxz: float = 200.0, colorscale: str = "Jet") -> Dict[str, Any]:
+    """
+    Create a scattergl of the pixels of a sparse plane
+    
+    Args:
+        pixels: Tuple of (wire, tick, value) arrays from get_plane_sparse
+        minz: Value at the bottom of the color range
+        maxz: Value at the top of the color range
+        colorscale: Colorscale to use
+        
+    Returns:
+        Plotly scattergl trace
+    """
+    x, y, values = pixels
+    return make_sparse_pixel_trace(x, y, values, minz=minz, maxz=maxz, colorscale=colorscale)
+
+def make_pyramid_sparse(pyramid: ImagePyramid, minz: float = 0.0, maxz: float = 200.0,
+                        colorscale: str = "Jet", xrange: Optional[List[float]] = None,
+                        yrange: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Create a scattergl of the nonzero pixels of the visible window, if the window is sparse
+    
+    The window is cut from the full-resolution level. It is drawn sparse if its fraction of
+    nonzero pixels is below wireplane.sparse_threshold and their number fits in wireplane.max_pixels.
+    
+    Args:
+        pyramid: ImagePyramid of the plane
+        minz: Value at the bottom of the color range
+        maxz: Value at the top of the color range
+        colorscale: Colorscale to use
+        xrange: Visible wire range, or None for the whole plane
+        yrange: Visible tick range, or None for the whole plane
+        
+    Returns:
+        Plotly scattergl trace, or None if the window is too dense
+    """
+    z, calib = pyramid.window(0, xrange, yrange)
+    nonzero = z != pyramid.zero
+    count = np.count_nonzero(nonzero)
+    if z.size == 0 or count >= config.get("wireplane", "sparse_threshold", default=0.05) * z.size \
+       or count > config.get("wireplane", "max_pixels", default=250000):
+        return None
+    rows, cols = np.nonzero(nonzero)
+    x = calib["x0"] + calib["dx"] * cols
+    y = calib["y0"] + calib["dy"] * rows
+    values = pyramid.values(z[rows, cols])
+    trace = make_sparse_pixel_trace(x, y, values, minz=minz, maxz=maxz, colorscale=colorscale)
+    trace["meta"] = {"level": 0}
+    return trace
+
+def make_pyramid_heatmap(pyramid: ImagePyramid, minz: float = 0.0, maxz: float = 200.0,
+                         colorscale: str = "Jet", xrange: Optional[List[float]] = None,
+                         yrange: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Create a heatmap of the visible window of a plane
+    
+    The finest pyramid level whose window fits in the wireplane.max_pixels budget is used,
+    so the whole plane is sent coarse and zoomed-in windows at native resolution.
+    The values are sent unclipped; minz/maxz only set the color range, so the browser
+    can change it without asking for the pixels again.
+    
+    Args:
+        pyramid: ImagePyramid of the plane
+        minz: Value at the bottom of the color range
+        maxz: Value at the top of the color range
+        colorscale: Colorscale to use
+        xrange: Visible wire range, or None for the whole plane
+        yrange: Visible tick range, or None for the whole plane
+        
+    Returns:
+        Plotly heatmap trace
+    """
+    max_pixels = config.get("wireplane", "max_pixels", default=250000)
+    z, calib, level = pyramid.get_window(max_pixels, xrange, yrange)
+    z = pyramid.values(z)
+    
+    return {
+        "type": "heatmap",
+        "z": z,
+        "x0": calib["x0"],
+        "dx": calib["dx"],
+        "y0": calib["y0"],
+        "dy": calib["dy"],
+        "zmin": minz,
+        "zmax": maxz,
+        "colorscale": colorscale,
+        "meta": {"level": level},
+    }
+
+def make_pyramid_image(pyramid: ImagePyramid, minz: float = 0.0, maxz: float = 200.0,
+                       colorscale: str = "Jet", xrange: Optional[List[float]] = None,
+                       yrange: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Create a PNG image trace of the visible window of a plane
+    
+    Same window and color range as make_pyramid_heatmap, but the colorscale is applied
+    here and the pixels are sent as a compressed PNG instead of JSON numbers.
+    Changing the colorscale or range therefore needs a new image from the server.
+    
+    Args:
+        pyramid: ImagePyramid of the plane
+        minz: Value at the bottom of the color range
+        maxz: Value at the top of the color range
+        colorscale: Colorscale to use
+        xrange: Visible wire range, or None for the whole plane
+        yrange: Visible tick range, or None for the whole plane
+        
+    Returns:
+        Plotly image trace
+    """
+    max_pixels = config.get("wireplane", "max_pixels", default=250000)
+    z, calib, level = pyramid.get_window(max_pixels, xrange, yrange)
+    
+    trace = make_image_trace(pyramid.values(z), calib, zmin=minz, zmax=maxz, colorscale=colorscale,
+                             compress_level=config.get("wireplane", "png_compress_level", default=6))
+    trace["meta"] = {"level": level}
+    return trace
+
+def make_pyramid_trace(pyramid: ImagePyramid, render_mode: str = "heatmap", **kwargs) -> Dict[str, Any]:
+    """
+    Create the trace of the visible window of a plane in the chosen render mode
+    
+    Sparse windows are sent as a scattergl of their nonzero pixels in either mode.
+    
+    Args:
+        pyramid: ImagePyramid of the plane
+        render_mode: "heatmap" or "image"
+        **kwargs: Passed to make_pyramid_heatmap or make_pyramid_image
+        
+    Returns:
+        Plotly trace
+    """
+    trace = make_pyramid_sparse(pyramid, **kwargs)
+    if trace is not None:
+        return trace
+    if render_mode == "image":
+        return make_pyramid_image(pyramid, **kwargs)
+    return make_pyramid_heatmap(pyramid, **kwargs)
+
+def _parse_tree_value(tree_value: str) -> Tuple[str, str]:
+    """
+    Split a wire plane tree name into its product type and producer name
+    
+    Returns:
+        Tuple of ("image2d" or "sparseimg", producer name)
+    """
+    treename = str(tree_value).strip()
+    for product in ("sparseimg", "image2d"):
+        if treename.startswith(f"{product}_"):
+            return product, treename[len(product) + 1:].replace("_tree", "")
+    return "image2d", treename.replace("_tree", "")
+
+def _color_range(min_value: Optional[float], max_value: Optional[float]) -> Tuple[float, float]:
+    """Color range from the min/max inputs, with defaults for empty inputs and max > min"""
+    min_value = 0 if min_value is None else min_value
+    max_value = 200 if max_value is None else max_value
+    if max_value <= min_value:
+        max_value = min_value + 1
+    return min_value, max_value
+
+def _parse_axis_range(relayout_data: Dict[str, Any], axis: str) -> Tuple[Optional[List[float]], bool]:
+    """
+    Read an axis range from relayoutData
+    
+    Returns:
+        Tuple of (range or None, True if the axis was changed)
+    """
+    if f"{axis}.range[0]" in relayout_data and f"{axis}.range[1]" in relayout_data:
+        return [relayout_data[f"{axis}.range[0]"], relayout_data[f"{axis}.range[1]"]], True
+    if f"{axis}.range" in relayout_data:
+        return list(relayout_data[f"{axis}.range"]), True
+    if relayout_data.get(f"{axis}.autorange"):
+        return None, True
+    return None, False
+
+# Clientside restyle of the three plane figures: colorscale and color range of heatmap
+# and scattergl traces, and the direction of the tick axis. Image traces keep their
+# data; recolor_image_planes re-renders them on the server.
+RESTYLE_PLANES_JS = """
+function(colorscale, minValue, maxValue, reverseTicks, fig0, fig1, fig2) {
+    var noUpdate = window.dash_clientside.no_update;
+    var zmin = (minValue === null || minValue === undefined) ? 0 : minValue;
+    var zmax = (maxValue === null || maxValue === undefined) ? 200 : maxValue;
+    if (zmax <= zmin) {
+        zmax = zmin + 1;
+    }
+    var reversed = (reverseTicks || []).indexOf('reverse') >= 0;
+
+    function restyle(fig) {
+        if (!fig || !fig.data) {
+            return noUpdate;
+        }
+        var data = fig.data.map(function(trace) {
+            if (trace.type === 'heatmap') {
+                return Object.assign({}, trace, {zmin: zmin, zmax: zmax, zauto: false, colorscale: colorscale});
+            }
+            if (trace.type === 'scattergl' && trace.marker) {
+                var marker = Object.assign({}, trace.marker, {cmin: zmin, cmax: zmax, colorscale: colorscale});
+                return Object.assign({}, trace, {marker: marker});
+            }
+            return trace;
+        });
+        var layout = Object.assign({}, fig.layout);
+        var yaxis = Object.assign({}, layout.yaxis);
+        if (Array.isArray(yaxis.range) && yaxis.autorange !== true && yaxis.autorange !== 'reversed') {
+            // zoomed: keep the window, flip its direction
+            var lo = Math.min(yaxis.range[0], yaxis.range[1]);
+            var hi = Math.max(yaxis.range[0], yaxis.range[1]);
+            yaxis.range = reversed ? [hi, lo] : [lo, hi];
+        } else {
+            yaxis.autorange = reversed ? 'reversed' : true;
+        }
+        layout.yaxis = yaxis;
+        return Object.assign({}, fig, {data: data, layout: layout});
+    }
+
+    return [restyle(fig0), restyle(fig1), restyle(fig2)];
+}
+"""
+
+def _encode_figure(fig: go.Figure, entry: int, component: str) -> Dict[str, Any]:
+    """
+    Encode a plane figure for the browser, recording the time and size
+    
+    Args:
+        fig: Plane figure
+        entry: Current entry
+        component: Name of the plane in the performance records
+        
+    Returns:
+        Encoded figure (see encode_arrays)
+    """
+    with perf_recorder.timed(entry, component, "serialize"):
+        encoded = encode_arrays(fig)
+    # the encoded figure is serialized once, by Dash; measuring it here would do it twice
+    if config.get("perf", "measure_payload", default=False):
+        nbytes = len(dumps(encoded))
+    else:
+        nbytes = estimate_bytes(encoded)
+    perf_recorder.add(entry, component, traces=len(fig.data), points=count_points(fig.data), bytes=nbytes)
+    return encoded
+
 def register_dropdown_callback(app: dash.Dash) -> None:
     """
     Register callbacks for the wire plane viewer
@@ -204,12 +532,14 @@ def register_dropdown_callback(app: dash.Dash) -> None:
          State('wireplane-colorscale-dropdown', 'value'),
          State('wireplane-min-value', 'value'),
          State('wireplane-max-value', 'value'),
-         State('wireplane-reverse-ticks', 'value')],
+         State('wireplane-reverse-ticks', 'value'),
+         State('wireplane-render-mode', 'value')],
          prevent_initial_call=True
     )
+    @entry_guard.holding_shared
     def update_wireplane_viewer(
         tree_value, n_clicks, fig_plane0, fig_plane1, fig_plane2, 
-        colorscale, min_value, max_value, reverse_ticks
+        colorscale, min_value, max_value, reverse_ticks, render_mode
     ):
         """
         Update wire plane viewer based on selected tree and display options
@@ -224,6 +554,7 @@ def register_dropdown_callback(app: dash.Dash) -> None:
             min_value: Minimum value for color scale
             max_value: Maximum value for color scale
             reverse_ticks: Whether to reverse ticks
+            render_mode: "heatmap" or "image"
             
         Returns:
             Updated figures for all three planes
@@ -250,26 +581,17 @@ def register_dropdown_callback(app: dash.Dash) -> None:
             if iolarcv is None:
                 raise ValueError("larcv IO manager is not initialized")
                 
-            # Get the image product name from the tree name
-            treename = str(tree_value).strip()
-            prodname = treename.replace("image2d_", "").replace("_tree", "")
-            
-            # Get the image data
-            ev_imgs = iolarcv.get_data("image2d", prodname)
-            img_v = ev_imgs.as_vector()
+            # Get the image product type and name from the tree name
+            product, prodname = _parse_tree_value(tree_value)
             
             # Apply reverse ticks option
             do_reverse_ticks = 'reverse' in reverse_ticks
             
             # Ensure min/max values make sense
-            if min_value is None:
-                min_value = 0
-            if max_value is None:
-                max_value = 200
-            if max_value <= min_value:
-                max_value = min_value + 1
+            min_value, max_value = _color_range(min_value, max_value)
                 
-            # Create new figures for each plane
+            # Create new figures for each plane, starting from a coarse view of the whole plane
+            entry = io_manager.get_current_entry()
             figures = []
             for plane in range(3):
                 # Create layout
@@ -277,21 +599,39 @@ def register_dropdown_callback(app: dash.Dash) -> None:
                     title=f'Plane[{plane}]',
                     autosize=True,
                     hovermode='closest',
-                    showlegend=False
+                    showlegend=False,
+                    # image traces lock the aspect ratio by default; wires and ticks have different scales
+                    yaxis={'autorange': 'reversed' if do_reverse_ticks else True, 'scaleanchor': False}
                 )
                 
-                # Create trace if this plane exists in the data
-                if plane < img_v.size():
-                    trace = visualize_larcv_image2d(
-                        img_v.at(plane),
-                        minz=min_value,
-                        maxz=max_value,
-                        reverse_ticks=do_reverse_ticks,
-                        colorscale=colorscale
-                    )
-                    figures.append(go.Figure(data=[trace], layout=layout))
+                component = f"wireplane plane{plane}"
+                with perf_recorder.measure(entry, component):
+                    # Sparse products are drawn from their pixel list, never made dense
+                    if product == "sparseimg":
+                        pixels = get_plane_sparse(prodname, plane)
+                        trace = None
+                        if pixels is not None:
+                            with perf_recorder.stage("style"):
+                                trace = make_sparse_trace(pixels, minz=min_value, maxz=max_value,
+                                                          colorscale=colorscale)
+                    else:
+                        # Create trace if this plane exists in the data
+                        pyramid = get_plane_pyramid(prodname, plane)
+                        trace = None
+                        if pyramid is not None:
+                            with perf_recorder.stage("style"):
+                                trace = make_pyramid_trace(
+                                    pyramid,
+                                    render_mode=render_mode,
+                                    minz=min_value,
+                                    maxz=max_value,
+                                    colorscale=colorscale
+                                )
+                
+                if trace is not None:
+                    figures.append(_encode_figure(go.Figure(data=[trace], layout=layout), entry, component))
                 else:
-                    # Use empty figure for missing planes
+                    # Leave missing planes as they are
                     figures.append(dash.no_update)
                     
             # Return figures for all three planes
@@ -302,4 +642,123 @@ def register_dropdown_callback(app: dash.Dash) -> None:
         except Exception as e:
             print(f"Error updating wireplane viewer: {e}")
             print(traceback.format_exc())
-            return dash.no_update, dash.no_update, dash.no_update
\ No newline at end of file
+            return dash.no_update, dash.no_update, dash.no_update
+
+    def make_zoom_callback(plane: int) -> None:
+        """Register the callback that refines one plane when it is zoomed"""
+        @app.callback(
+            Output(f'plane{plane}-graph', 'figure', allow_duplicate=True),
+            [Input(f'plane{plane}-graph', 'relayoutData')],
+            [State('wireplane-viewer-dropdown', 'value'),
+             State('wireplane-colorscale-dropdown', 'value'),
+             State('wireplane-min-value', 'value'),
+             State('wireplane-max-value', 'value'),
+             State('wireplane-reverse-ticks', 'value'),
+             State('wireplane-render-mode', 'value')],
+            prevent_initial_call=True
+        )
+        @entry_guard.holding_shared
+        def refine_zoomed_plane(relayout_data, tree_value, colorscale, min_value, max_value, reverse_ticks,
+                                render_mode):
+            """Send the visible window at the finest resolution that fits the pixel budget"""
+            if not relayout_data or tree_value is None or tree_value in ("none", "None"):
+                raise PreventUpdate
+            xrange, xchanged = _parse_axis_range(relayout_data, "xaxis")
+            yrange, ychanged = _parse_axis_range(relayout_data, "yaxis")
+            if not xchanged and not ychanged:
+                raise PreventUpdate
+            
+            product, prodname = _parse_tree_value(tree_value)
+            if product == "sparseimg":
+                # every pixel was already sent; the browser zooms the scattergl itself
+                raise PreventUpdate
+            
+            try:
+                pyramid = get_plane_pyramid(prodname, plane)
+                if pyramid is None:
+                    raise PreventUpdate
+                
+                min_value, max_value = _color_range(min_value, max_value)
+                trace = make_pyramid_trace(pyramid, render_mode=render_mode, minz=min_value, maxz=max_value,
+                                           colorscale=colorscale, xrange=xrange, yrange=yrange)
+            except PreventUpdate:
+                raise
+            except Exception as e:
+                print(f"Error refining plane {plane}: {e}")
+                print(traceback.format_exc())
+                raise PreventUpdate
+            
+            patched_fig = Patch()
+            # The whole trace is replaced: the render mode may have changed since the figure was made
+            patched_fig['data'][0] = encode_arrays(trace)
+            # Keep the zoom: the figure held by the graph still has the old axis ranges
+            autorange = {"xaxis": True, "yaxis": 'reversed' if reverse_ticks and 'reverse' in reverse_ticks else True}
+            for axis, axis_range, changed in (("xaxis", xrange, xchanged), ("yaxis", yrange, ychanged)):
+                if not changed:
+                    continue
+                if axis_range is None:
+                    patched_fig['layout'][axis]['range'] = None
+                    patched_fig['layout'][axis]['autorange'] = autorange[axis]
+                else:
+                    patched_fig['layout'][axis]['range'] = axis_range
+                    patched_fig['layout'][axis]['autorange'] = False
+            return patched_fig
+    
+    for plane in range(3):
+        make_zoom_callback(plane)
+    
+    # Display controls restyle the figures already in the browser
+    app.clientside_callback(
+        RESTYLE_PLANES_JS,
+        [Output('plane0-graph', 'figure', allow_duplicate=True),
+         Output('plane1-graph', 'figure', allow_duplicate=True),
+         Output('plane2-graph', 'figure', allow_duplicate=True)],
+        [Input('wireplane-colorscale-dropdown', 'value'),
+         Input('wireplane-min-value', 'value'),
+         Input('wireplane-max-value', 'value'),
+         Input('wireplane-reverse-ticks', 'value')],
+        [State('plane0-graph', 'figure'),
+         State('plane1-graph', 'figure'),
+         State('plane2-graph', 'figure')],
+        prevent_initial_call=True
+    )
+    
+    @app.callback(
+        [Output('plane0-graph', 'figure', allow_duplicate=True),
+         Output('plane1-graph', 'figure', allow_duplicate=True),
+         Output('plane2-graph', 'figure', allow_duplicate=True)],
+        [Input('wireplane-colorscale-dropdown', 'value'),
+         Input('wireplane-min-value', 'value'),
+         Input('wireplane-max-value', 'value')],
+        [State('wireplane-viewer-dropdown', 'value'),
+         State('wireplane-render-mode', 'value'),
+         State('plane0-graph', 'relayoutData'),
+         State('plane1-graph', 'relayoutData'),
+         State('plane2-graph', 'relayoutData')],
+        prevent_initial_call=True
+    )
+    @entry_guard.holding_shared
+    def recolor_image_planes(colorscale, min_value, max_value, tree_value, render_mode, *relayouts):
+        """Re-render the planes shown as PNG images; their colors are baked in on the server"""
+        if render_mode != "image" or tree_value is None or tree_value in ("none", "None"):
+            raise PreventUpdate
+        product, prodname = _parse_tree_value(tree_value)
+        if product == "sparseimg":
+            raise PreventUpdate
+        min_value, max_value = _color_range(min_value, max_value)
+        
+        outputs = []
+        for plane, relayout_data in enumerate(relayouts):
+            pyramid = get_plane_pyramid(prodname, plane)
+            if pyramid is None:
+                outputs.append(dash.no_update)
+                continue
+            # the last zoom of the plane, if any, is the window on screen
+            xrange, _ = _parse_axis_range(relayout_data or {}, "xaxis")
+            yrange, _ = _parse_axis_range(relayout_data or {}, "yaxis")
+            patched_fig = Patch()
+            patched_fig['data'][0] = encode_arrays(make_pyramid_trace(
+                pyramid, render_mode="image", minz=min_value, maxz=max_value,
+                colorscale=colorscale, xrange=xrange, yrange=yrange))
+            outputs.append(patched_fig)
+        return outputs
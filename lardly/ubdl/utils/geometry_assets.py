@@ -0,0 +1,182 @@
+"""
+Geometry asset registry
+
+This module builds the static detector geometry traces (TPC outline, CRT panels,
+PMTs and the cryostat mesh) once per process. Each asset is serialized once and
+decoded into plain trace dictionaries; callers get copies of these, so they can
+restyle them without touching the shared copy.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import json
+import threading
+import logging
+
+import plotly.utils
+
+from lardly.ubdl.config.settings import config
+
+logger = logging.getLogger(__name__)
+
+# Cryostat mesh, loaded on first use. False if it could not be loaded.
+_detector_display = None
+
+def get_detector_display():
+    """
+    Get the cryostat mesh if it is enabled in the config
+
+    Returns:
+        DetectorDisplay instance, or None if disabled or not loadable
+    """
+    global _detector_display
+    if not config.get("plot", "detector_mesh", "show", default=False):
+        return None
+    if _detector_display is None:
+        mesh_config = config.get("plot", "detector_mesh", default={})
+        try:
+            from lardly.detectormesh import DetectorDisplay
+            _detector_display = DetectorDisplay(
+                daefile=config.get("data_paths", "default_daefile"),
+                cache_dir=mesh_config.get("cache_dir"),
+                lod_cell_sizes=mesh_config.get("lod_cell_sizes", [0.0, 20.0, 60.0, 150.0]),
+                scale=mesh_config.get("scale", 0.1),
+                offset=mesh_config.get("offset", [125.0, 0.0, 518.5]))
+        except Exception as e:
+            logger.error(f"Could not load the detector mesh: {e}")
+            _detector_display = False
+    return _detector_display if _detector_display else None
+
+class GeometryAssetRegistry:
+    """
+    Registry of static geometry traces
+
+    Assets are registered with a builder function returning a list of trace
+    dictionaries (or plotly graph objects). A builder runs the first time its
+    asset is requested; the result is serialized once and reused afterwards.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._builders: Dict[str, Callable[[], List[Any]]] = {}
+        self._traces: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, builder: Callable[[], List[Any]]) -> None:
+        """
+        Register an asset
+
+        Args:
+            name: Asset name
+            builder: Function with no arguments returning the list of traces
+        """
+        with self._lock:
+            self._builders[name] = builder
+            self._traces.pop(name, None)
+
+    def names(self) -> List[str]:
+        """
+        Get the names of the registered assets
+
+        Returns:
+            List of asset names
+        """
+        return list(self._builders.keys())
+
+    def _build(self, name: str) -> None:
+        with self._lock:
+            if name in self._traces:
+                return
+            if name not in self._builders:
+                raise KeyError(f"Unknown geometry asset: {name}")
+            traces = []
+            for trace in self._builders[name]():
+                if hasattr(trace, "to_plotly_json"):
+                    trace = trace.to_plotly_json()
+                traces.append(trace)
+            serialized = json.dumps(traces, cls=plotly.utils.PlotlyJSONEncoder)
+            # decoded once; callers get copies of this
+            self._traces[name] = json.loads(serialized)
+            logger.info(f"Built geometry asset {name}: {len(traces)} traces, {len(serialized)} bytes")
+
+    def get_traces(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Get the traces of an asset
+
+        Args:
+            name: Asset name
+
+        Returns:
+            New list of trace dictionaries. Their attributes may be changed,
+            but the coordinate lists are shared and must not be modified in place.
+        """
+        self._build(name)
+        return [_copy_dicts(trace) for trace in self._traces[name]]
+
+def _copy_dicts(obj: Any) -> Any:
+    """Copy nested dictionaries, sharing everything else"""
+    if isinstance(obj, dict):
+        return {key: _copy_dicts(value) for key, value in obj.items()}
+    return obj
+
+def _make_tpc_outline() -> List[Dict[str, Any]]:
+    from lardly.ubdl.utils.detectoroutline import DetectorOutline
+    return DetectorOutline().get_lines(color=(0, 0, 0))
+
+def _make_crt_outline() -> List[Dict[str, Any]]:
+    from lardly.ubdl.utils.detectoroutline import CRTOutline
+    return CRTOutline().get_lines()
+
+def _make_pmt_outline() -> List[Any]:
+    from lardly.ubdl.pmtmesh import make_pmt_outline
+    return [make_pmt_outline(radius=15.24, use_v4_geom=True, color="rgb(0,0,0)", name="PMTs")]
+
+def _make_cryostat(level: int) -> List[Dict[str, Any]]:
+    detdisplay = get_detector_display()
+    if detdisplay is None:
+        return []
+    lines = detdisplay.get_lines(level)
+    return [{
+        "type": "scatter3d",
+        "x": lines["x"],
+        "y": lines["y"],
+        "z": lines["z"],
+        "mode": "lines",
+        "name": "cryostat",
+        "hoverinfo": "skip",
+        "line": {"color": "rgb(200,200,200)", "width": 1},
+    }]
+
+def cryostat_asset_name(level: int) -> str:
+    """
+    Get the asset name of a cryostat level of detail
+
+    Args:
+        level: Level of detail
+
+    Returns:
+        Asset name
+    """
+    return f"cryostat_lod{level}"
+
+def _register_default_assets(registry: GeometryAssetRegistry) -> None:
+    registry.register("tpc_outline", _make_tpc_outline)
+    registry.register("crt_outline", _make_crt_outline)
+    registry.register("pmt_outline", _make_pmt_outline)
+    nlevels = len(config.get("plot", "detector_mesh", "lod_cell_sizes", default=[0.0, 20.0, 60.0, 150.0]))
+    for level in range(nlevels):
+        registry.register(cryostat_asset_name(level), lambda level=level: _make_cryostat(level))
+
+# Global registry
+geometry_assets = GeometryAssetRegistry()
+_register_default_assets(geometry_assets)
+
+def get_geometry_traces(name: str) -> List[Dict[str, Any]]:
+    """
+    Get the traces of a geometry asset from the global registry
+
+    Args:
+        name: Asset name
+
+    Returns:
+        New list of trace dictionaries
+    """
+    return geometry_assets.get_traces(name)
@@ -0,0 +1,194 @@
+"""
+Multi-resolution image pyramid
+
+This module provides a pyramid of pooled copies of a wire-plane image. Coarse
+levels are used to show the whole plane with a small payload; when the user
+zooms in, only the visible window is cut out of the finest level that keeps the
+number of pixels under a budget.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+class ImagePyramid:
+    """
+    Pooled levels of a 2D image with a regular axis calibration
+
+    Level 0 is the image itself. Level n is level n-1 pooled over
+    `factor` x `factor` blocks, with the max (keeps isolated hits visible)
+    or the sum (keeps total charge) of each block.
+
+    The image may hold quantized integers; `values` turns pixels of any level
+    back into floats with the value scale and offset.
+    """
+
+    def __init__(self, image: np.ndarray, x0: float = 0.0, dx: float = 1.0,
+                 y0: float = 0.0, dy: float = 1.0, mode: str = "max",
+                 factor: int = 2, min_size: int = 128,
+                 value_scale: float = 1.0, value_offset: float = 0.0):
+        """
+        Build all levels of the pyramid
+
+        Args:
+            image: 2D array with shape (rows, cols), rows along y
+            x0: x coordinate of the first column
+            dx: x width of a column
+            y0: y coordinate of the first row
+            dy: y height of a row
+            mode: "max" or "sum" pooling
+            factor: Pooling factor between levels
+            min_size: Levels stop once both dimensions are at most this size
+            value_scale: Pixel value = pixel * value_scale + value_offset
+            value_offset: See value_scale. Must be 0 for "sum" pooling.
+        """
+        if mode not in ("max", "sum"):
+            raise ValueError(f"Unknown pooling mode: {mode}")
+        if mode == "sum" and value_offset != 0.0:
+            raise ValueError("Sum pooling needs a value offset of 0")
+        self.value_scale = float(value_scale)
+        self.value_offset = float(value_offset)
+        self.mode = mode
+        self.factor = factor
+        self.x0 = float(x0)
+        self.dx = float(dx)
+        self.y0 = float(y0)
+        self.dy = float(dy)
+
+        image = np.asarray(image)
+        self.levels: List[np.ndarray] = [image]
+        while max(self.levels[-1].shape) > min_size:
+            self.levels.append(self._pool(self.levels[-1]))
+
+    def _pool(self, z: np.ndarray) -> np.ndarray:
+        f = self.factor
+        rows = -(-z.shape[0] // f)
+        cols = -(-z.shape[1] // f)
+        # pad to a multiple of the factor with a value that does not change the pooled result
+        padval = 0.0 if self.mode == "sum" else (z.min() if z.size > 0 else 0.0)
+        padded = np.full((rows * f, cols * f), padval, dtype=z.dtype)
+        padded[:z.shape[0], :z.shape[1]] = z
+        blocks = padded.reshape(rows, f, cols, f)
+        if self.mode == "sum":
+            return blocks.sum(axis=(1, 3))
+        return blocks.max(axis=(1, 3))
+
+    def values(self, z: np.ndarray) -> np.ndarray:
+        """
+        Get the values of pixels cut from a level
+
+        Args:
+            z: Pixels of any level
+
+        Returns:
+            z itself if the image holds plain values, else a float32 array
+        """
+        if self.value_scale == 1.0 and self.value_offset == 0.0:
+            return z
+        return z.astype(np.float32) * np.float32(self.value_scale) + np.float32(self.value_offset)
+
+    @property
+    def zero(self) -> float:
+        """Stored pixel value closest to a value of 0"""
+        if self.value_scale == 1.0 and self.value_offset == 0.0:
+            return 0
+        return np.rint(-self.value_offset / self.value_scale)
+
+    @property
+    def nlevels(self) -> int:
+        return len(self.levels)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.levels[0].shape
+
+    def calibration(self, level: int) -> Dict[str, float]:
+        """
+        Get the axis calibration of a level
+
+        Args:
+            level: Pyramid level
+
+        Returns:
+            Dictionary with x0, dx, y0, dy of the level's pixels
+        """
+        scale = self.factor ** level
+        return {
+            "x0": self.x0 + 0.5 * (scale - 1) * self.dx,
+            "dx": self.dx * scale,
+            "y0": self.y0 + 0.5 * (scale - 1) * self.dy,
+            "dy": self.dy * scale,
+        }
+
+    def _pixel_range(self, level: int, lo: float, hi: float, axis: int) -> Tuple[int, int]:
+        scale = self.factor ** level
+        if axis == 1:
+            origin, width = self.x0, self.dx * scale
+        else:
+            origin, width = self.y0, self.dy * scale
+        n = self.levels[level].shape[axis]
+        lo, hi = min(lo, hi), max(lo, hi)
+        start = int(np.clip(np.floor((lo - origin) / width), 0, n))
+        stop = int(np.clip(np.ceil((hi - origin) / width) + 1, 0, n))
+        return start, max(stop, start)
+
+    def choose_level(self, max_pixels: int, xrange: Optional[Sequence[float]] = None,
+                     yrange: Optional[Sequence[float]] = None) -> int:
+        """
+        Get the finest level whose visible window fits in a pixel budget
+
+        Args:
+            max_pixels: Maximum number of pixels to send
+            xrange: Visible x range, or None for the full image
+            yrange: Visible y range, or None for the full image
+
+        Returns:
+            Level index (the coarsest level if none fits)
+        """
+        for level in range(self.nlevels):
+            rows, cols = self.levels[level].shape
+            if xrange is not None:
+                start, stop = self._pixel_range(level, xrange[0], xrange[1], axis=1)
+                cols = stop - start
+            if yrange is not None:
+                start, stop = self._pixel_range(level, yrange[0], yrange[1], axis=0)
+                rows = stop - start
+            if rows * cols <= max_pixels:
+                return level
+        return self.nlevels - 1
+
+    def window(self, level: int, xrange: Optional[Sequence[float]] = None,
+               yrange: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, Dict[str, float]]:
+        """
+        Cut the visible window out of a level
+
+        Args:
+            level: Pyramid level
+            xrange: Visible x range, or None for the full image
+            yrange: Visible y range, or None for the full image
+
+        Returns:
+            Tuple of (pixels (a view, do not modify), calibration of the window)
+        """
+        z = self.levels[level]
+        calib = self.calibration(level)
+        col0, col1 = (0, z.shape[1]) if xrange is None else self._pixel_range(level, xrange[0], xrange[1], axis=1)
+        row0, row1 = (0, z.shape[0]) if yrange is None else self._pixel_range(level, yrange[0], yrange[1], axis=0)
+        calib["x0"] += col0 * calib["dx"]
+        calib["y0"] += row0 * calib["dy"]
+        return z[row0:row1, col0:col1], calib
+
+    def get_window(self, max_pixels: int, xrange: Optional[Sequence[float]] = None,
+                   yrange: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, Dict[str, float], int]:
+        """
+        Cut the visible window out of the finest level that fits the budget
+
+        Args:
+            max_pixels: Maximum number of pixels to send
+            xrange: Visible x range, or None for the full image
+            yrange: Visible y range, or None for the full image
+
+        Returns:
+            Tuple of (pixels (a view, do not modify), calibration of the window, level)
+        """
+        level = self.choose_level(max_pixels, xrange, yrange)
+        z, calib = self.window(level, xrange, yrange)
+        return z, calib, level
@@ -0,0 +1,125 @@
+"""
+Server-side rendering of wire-plane images
+
+This module turns a 2D array into a PNG with a colorscale lookup table, so a
+plane can be sent to the browser as a compressed image trace instead of a
+heatmap carrying every pixel as a JSON number.
+"""
+from typing import Any, Dict, List, Sequence, Union
+from functools import lru_cache
+import base64
+import struct
+import zlib
+import numpy as np
+
+import plotly.colors
+
+def _parse_color(color: str) -> List[float]:
+    if color.startswith("#"):
+        return list(plotly.colors.hex_to_rgb(color))
+    return list(plotly.colors.unlabel_rgb(color))
+
+@lru_cache(maxsize=32)
+def _named_colorscale_lut(name: str, ncolors: int) -> np.ndarray:
+    # plotly.js built-in scales first, so colors match a heatmap with the same colorscale name
+    scale = plotly.colors.PLOTLY_SCALES.get(name)
+    if scale is None:
+        scale = plotly.colors.get_colorscale(name)
+    return _colorscale_lut([(float(v), c) for v, c in scale], ncolors)
+
+def _colorscale_lut(scale: Sequence, ncolors: int) -> np.ndarray:
+    values = np.array([float(v) for v, _ in scale])
+    rgb = np.array([_parse_color(c) for _, c in scale], dtype=np.float64)
+    t = np.linspace(0.0, 1.0, ncolors)
+    lut = np.stack([np.interp(t, values, rgb[:, i]) for i in range(3)], axis=1)
+    lut = np.clip(np.round(lut), 0, 255).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+def colorscale_lut(colorscale: Union[str, Sequence], ncolors: int = 256) -> np.ndarray:
+    """
+    Get a lookup table for a plotly colorscale
+
+    Args:
+        colorscale: Name of a plotly colorscale, or a list of [value, color] pairs
+        ncolors: Number of entries
+
+    Returns:
+        Read-only uint8 array with shape (ncolors, 3)
+    """
+    if isinstance(colorscale, str):
+        return _named_colorscale_lut(colorscale, ncolors)
+    return _colorscale_lut(colorscale, ncolors)
+
+def apply_colorscale(z: np.ndarray, zmin: float, zmax: float, colorscale: Union[str, Sequence] = "Jet") -> np.ndarray:
+    """
+    Map values to colors
+
+    Args:
+        z: 2D array of values
+        zmin: Value mapped to the first color
+        zmax: Value mapped to the last color
+        colorscale: Plotly colorscale
+
+    Returns:
+        uint8 array with shape z.shape + (3,)
+    """
+    lut = colorscale_lut(colorscale)
+    span = zmax - zmin if zmax > zmin else 1.0
+    index = np.clip((np.asarray(z, dtype=np.float32) - zmin) * ((lut.shape[0] - 1) / span), 0, lut.shape[0] - 1)
+    return lut[index.astype(np.intp)]
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+def encode_png(rgb: np.ndarray, compress_level: int = 6) -> bytes:
+    """
+    Encode an RGB image as PNG
+
+    Args:
+        rgb: uint8 array with shape (rows, cols, 3); row 0 is the top of the PNG
+        compress_level: zlib compression level
+
+    Returns:
+        PNG file contents
+    """
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    rows, cols = rgb.shape[:2]
+    # every scanline starts with its filter type, 0 (none)
+    raw = np.zeros((rows, cols * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(rows, cols * 3)
+    header = struct.pack(">IIBBBBB", cols, rows, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), compress_level))
+            + _png_chunk(b"IEND", b""))
+
+def make_image_trace(z: np.ndarray, calib: Dict[str, float], zmin: float, zmax: float,
+                     colorscale: Union[str, Sequence] = "Jet", compress_level: int = 6) -> Dict[str, Any]:
+    """
+    Create an image trace showing a 2D array with a colorscale
+
+    Row 0 of `z` is at y0, like a heatmap. With the y axis not reversed it is
+    drawn at the bottom. Hover shows the wire (x) and tick (y) of each pixel.
+
+    Args:
+        z: 2D array with shape (rows, cols)
+        calib: Dictionary with x0, dx, y0, dy of the pixels
+        zmin: Value mapped to the first color
+        zmax: Value mapped to the last color
+        colorscale: Plotly colorscale
+        compress_level: zlib compression level
+
+    Returns:
+        Plotly image trace dictionary
+    """
+    png = encode_png(apply_colorscale(z, zmin, zmax, colorscale), compress_level=compress_level)
+    return {
+        "type": "image",
+        "source": "data:image/png;base64," + base64.b64encode(png).decode("ascii"),
+        "x0": calib["x0"],
+        "dx": calib["dx"],
+        "y0": calib["y0"],
+        "dy": calib["dy"],
+        "hovertemplate": "wire: %{x}<br>tick: %{y}<extra></extra>",
+    }
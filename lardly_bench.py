@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Lardly - end-to-end throughput benchmark
+
+Runs load_files, load_entry, the plotters and the figure serialization as the
+app does, and reports events/s, latency percentiles, cold/warm figure cache
+behavior and RSS growth. See lardly/ubdl/bench/cli.py for the options.
+"""
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path if needed
+project_root = Path(__file__).parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from lardly.ubdl.bench.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -41,6 +41,8 @@ def main():
                    choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
                    default='INFO', 
                    help='Set the logging level')
+    parser.add_argument('--memory-diagnostics', action='store_true',
+                        help='Measure memory growth per entry and plotter (slower)')
     parser.add_argument('--batch', action='store_true',
                         help='Run in batch mode (no interactive server)')
     parser.add_argument('--plot-config', type=str,
@@ -70,6 +72,10 @@ def main():
             logger.error(f"Error importing batch runner: {e}")
             sys.exit(1)
         
+        if args.memory_diagnostics:
+            from lardly.ubdl.config.settings import config
+            config.set(True, 'memory', 'enabled')
+        
         # Run batch processing
         logger.info(f"Running in batch mode with config: {args.plot_config}")
         success = run_batch(args.plot_config)
@@ -101,6 +107,9 @@ def main():
     if args.debug:
         config.set(True, 'ui', 'debug_mode')
         logging.getLogger().setLevel(logging.DEBUG)
+    
+    if args.memory_diagnostics:
+        config.set(True, 'memory', 'enabled')
 
     # Create the application
     app = create_app()
@@ -0,0 +1,23 @@
+"""
+Shared fixtures of the lardly tests
+
+The tests run on the synthetic events of the mock IO backend and do not need
+ROOT, larlite, larcv or input files.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lardly.ubdl.io.mock_backend import MockIOManager
+
+
+@pytest.fixture
+def mock_backend():
+    """Mock IO manager with entry 0 loaded"""
+    backend = MockIOManager(nentries=3)
+    backend.load_files()
+    backend.load_entry(0)
+    return backend
@@ -0,0 +1,21 @@
+"""Tests of the default figure of lardly.ubdl.ui.det3d_viewer"""
+import pytest
+
+pytest.importorskip("dash")
+
+from lardly.ubdl.ui.det3d_viewer import get_default_det3d_layout, make_default_plot
+
+
+def test_default_layout():
+    layout = get_default_det3d_layout()
+    assert layout["scene"]["camera"]["up"] == {"x": 0, "y": 1, "z": 0}
+    # a fresh dictionary every time, so callers can change it
+    layout["title"] = "changed"
+    assert get_default_det3d_layout()["title"] == "Detector View"
+
+
+def test_default_plot():
+    # regression: make_default_plot raised NameError on get_default_det3d_layout
+    fig = make_default_plot()
+    assert len(fig.data) > 0
+    assert fig.layout.scene.camera.eye.x == -4.0
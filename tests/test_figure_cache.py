@@ -0,0 +1,66 @@
+"""Tests of lardly.ubdl.core.figure_cache"""
+import os
+
+import numpy as np
+
+from lardly.ubdl.core.figure_cache import FigureCache, make_cache_key
+
+
+def _traces(n=10):
+    return [{"type": "scatter3d", "x": np.arange(n, dtype=np.float32), "name": "hits",
+             "customdata": np.zeros((n, 2)), "marker": {"size": 2}}]
+
+
+def test_keys_do_not_depend_on_option_order():
+    key = make_cache_key(entry=1, plotter="Hits", options={"a": 1, "b": 2})
+    assert key == make_cache_key(options={"b": 2, "a": 1}, plotter="Hits", entry=1)
+    assert key != make_cache_key(entry=2, plotter="Hits", options={"a": 1, "b": 2})
+
+
+def test_memory_cache_returns_copies():
+    cache = FigureCache(max_entries=2)
+    assert cache.get("a") is None
+    cache.put("a", _traces())
+    traces = cache.get("a")
+    traces[0]["name"] = "restyled"
+    assert cache.get("a")[0]["name"] == "hits"
+    assert cache.stats() == {"hits": 2, "disk_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_memory_cache_is_lru():
+    cache = FigureCache(max_entries=2)
+    cache.put("a", _traces())
+    cache.put("b", _traces())
+    cache.get("a")
+    cache.put("c", _traces())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_disk_store_round_trips_arrays_as_json(tmp_path):
+    cache = FigureCache(cache_dir=str(tmp_path))
+    cache.put("ab12", _traces())
+    path = tmp_path / "ab" / "ab12.json"
+    assert path.exists()
+    assert path.read_text().startswith("[")
+
+    # another worker reads it from disk
+    other = FigureCache(cache_dir=str(tmp_path))
+    traces = other.get("ab12")
+    assert other.stats()["disk_hits"] == 1
+    np.testing.assert_array_equal(traces[0]["x"], np.arange(10, dtype=np.float32))
+    assert traces[0]["x"].dtype == np.float32
+    assert traces[0]["customdata"].shape == (10, 2)
+
+
+def test_disk_store_evicts_the_oldest_files(tmp_path):
+    cache = FigureCache(cache_dir=str(tmp_path), max_disk_mb=0.05)
+    for i in range(4):
+        key = f"{i:02d}" + "0"*8
+        cache.put(key, _traces(1000))
+        os.utime(tmp_path / key[:2] / (key + ".json"), (i, i))
+    files = sorted(p.name for p in tmp_path.rglob("*.json"))
+    total = sum(p.stat().st_size for p in tmp_path.rglob("*.json"))
+    assert total <= 0.05*1024*1024
+    assert "0300000000.json" in files
+    assert "0000000000.json" not in files
@@ -0,0 +1,56 @@
+"""Tests of lardly.ubdl.utils.image_pyramid"""
+import numpy as np
+import pytest
+
+from lardly.ubdl.utils.image_pyramid import ImagePyramid
+
+
+def _image():
+    image = np.zeros((300, 500), dtype=np.float32)
+    image[10, 20] = 50.0
+    image[299, 499] = 7.0
+    return image
+
+
+def test_levels_are_pooled_down_to_min_size():
+    pyramid = ImagePyramid(_image(), factor=2, min_size=128)
+    assert [level.shape for level in pyramid.levels] == [(300, 500), (150, 250), (75, 125)]
+    # max pooling keeps isolated hits, including the ones in a padded edge block
+    assert pyramid.levels[2].max() == 50.0
+    assert pyramid.levels[2][-1, -1] == 7.0
+
+
+def test_sum_pooling_keeps_the_total():
+    pyramid = ImagePyramid(_image(), mode="sum", min_size=64)
+    for level in pyramid.levels:
+        assert level.sum() == pytest.approx(57.0)
+
+
+def test_invalid_modes():
+    with pytest.raises(ValueError):
+        ImagePyramid(_image(), mode="mean")
+    with pytest.raises(ValueError):
+        ImagePyramid(_image(), mode="sum", value_offset=1.0)
+
+
+def test_calibration_centers_pooled_pixels():
+    pyramid = ImagePyramid(_image(), x0=0.0, dx=1.0, y0=2400.0, dy=6.0)
+    assert pyramid.calibration(1) == {"x0": 0.5, "dx": 2.0, "y0": 2403.0, "dy": 12.0}
+
+
+def test_window_fits_the_budget():
+    pyramid = ImagePyramid(_image(), min_size=128)
+    z, calib, level = pyramid.get_window(max_pixels=100*100)
+    assert level == 2
+    assert z.size <= 100*100
+    # zoomed in, the full resolution fits
+    z, calib, level = pyramid.get_window(max_pixels=100*100, xrange=[10, 40], yrange=[0, 30])
+    assert level == 0
+    assert z[10 - int(calib["y0"]), 20 - int(calib["x0"])] == 50.0
+
+
+def test_quantized_values():
+    quantized = np.array([[0, 255]], dtype=np.uint8)
+    pyramid = ImagePyramid(quantized, value_scale=0.5, value_offset=-10.0, min_size=1)
+    np.testing.assert_allclose(pyramid.values(pyramid.levels[0]), [[-10.0, 117.5]])
+    assert pyramid.zero == 20
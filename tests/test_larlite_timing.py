@@ -0,0 +1,92 @@
+"""Tests of lardly.data.larlite_timing"""
+import numpy as np
+
+from lardly.data.larlite_timing import TimingIndex, get_timing_index
+from lardly.ubdl.io.entry_cache import EntryCache
+
+
+class _Container(list):
+    def size(self):
+        return len(self)
+
+    def at(self, i):
+        return self[i]
+
+
+class _Flash:
+    def __init__(self, t):
+        self.t = t
+
+    def Time(self):
+        return self.t
+
+
+class _CRTHit:
+    def __init__(self, ts2_ns):
+        self.ts2_ns = ts2_ns
+        self.x_pos, self.y_pos, self.z_pos, self.plane = 1.0, 2.0, 3.0, 1
+
+
+class _CRTTrack:
+    def __init__(self, ts2_ns_h1):
+        self.ts2_ns_h1 = ts2_ns_h1
+
+
+class _StorageManager:
+    """Stand-in for a larlite storage_manager that counts the reads"""
+
+    def __init__(self):
+        self.reads = []
+        self.products = {
+            "opflash": _Container([_Flash(4.0), _Flash(1.0), _Flash(20.0)]),
+            "crthit": _Container([_CRTHit(1500.0), _CRTHit(10000.0), _CRTHit(19800.0)]),
+            "crttrack": _Container([_CRTTrack(3900.0), _CRTTrack(50000.0)]),
+        }
+
+    def get_data(self, product, producer):
+        self.reads.append((product, producer))
+        return self.products[product]
+
+
+def test_nearest_flash_over_producers():
+    index = TimingIndex()
+    index.add_flashes("beam", [10.0, 2.0])
+    index.add_flashes("cosmic", [5.0])
+    dt, slot, flash = index.nearest_flash(np.array([1.0, 4.0, 9.0]), ["beam", "cosmic"])
+    np.testing.assert_allclose(dt, [1.0, 1.0, 1.0])
+    np.testing.assert_array_equal(slot, [0, 1, 0])
+    np.testing.assert_array_equal(flash, [1, 0, 0])
+
+
+def test_no_flashes():
+    index = TimingIndex()
+    index.add_flashes("beam", [])
+    dt, slot, flash = index.nearest_flash(np.array([1.0, 2.0]), "beam")
+    assert np.isinf(dt).all()
+    np.testing.assert_array_equal(slot, [-1, -1])
+    np.testing.assert_array_equal(flash, [-1, -1])
+
+
+def test_flashes_in_window_in_container_order():
+    index = TimingIndex()
+    index.add_flashes("beam", [5.0, 1.0, 3.0, 8.0])
+    np.testing.assert_array_equal(index.flashes_in_window("beam", 1.0, 5.0), [0, 1, 2])
+
+
+def test_crt_matching_reads_each_container_once():
+    ioll = _StorageManager()
+    cache = EntryCache()
+    index = get_timing_index(ioll, entry_cache=cache)
+    # one index per entry
+    assert get_timing_index(ioll, entry_cache=cache) is index
+
+    dt, _, flash = index.crthit_flash_match("crthitcorr", "simpleFlashBeam")
+    np.testing.assert_allclose(dt, [0.5, 6.0, 0.2])
+    np.testing.assert_array_equal(flash, [1, 0, 2])
+    np.testing.assert_array_equal(index.crthits_near_flash("crthitcorr", "simpleFlashBeam", 1.0),
+                                  [True, False, True])
+    np.testing.assert_array_equal(index.crttracks_near_flash("crttrack", "simpleFlashBeam", 1.0),
+                                  [True, False])
+    index.crthits_near_flash("crthitcorr", "simpleFlashBeam", 10.0)
+    assert sorted(ioll.reads) == [("crthit", "crthitcorr"), ("crttrack", "crttrack"),
+                                  ("opflash", "simpleFlashBeam")]
@@ -0,0 +1,75 @@
+"""Tests of lardly.ubdl.core.perf"""
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+from lardly.ubdl.core.perf import PerfRecorder, count_points, estimate_bytes, timed_io
+
+
+def test_count_points():
+    traces = [{"type": "scatter3d", "x": np.zeros(10)},
+              go.Scatter(x=[1, 2, 3]),
+              {"type": "heatmap", "z": np.zeros((4, 5))},
+              {"type": "heatmap", "z": [[1, 2], [3, 4]]},
+              {"type": "heatmap", "x": np.arange(5), "y": np.arange(4), "z": np.zeros((4, 5))},
+              go.Scatter3d(x=[1, 2], y=[1, 2], z=[1, 2]),
+              {"type": "mesh3d"}]
+    assert count_points(traces) == 10 + 3 + 20 + 4 + 20 + 2
+
+
+def test_estimate_bytes_counts_array_buffers():
+    traces = [{"type": "scatter3d", "x": np.zeros(1000), "name": "hits"},
+              go.Scatter(y=np.zeros(100, dtype=np.float32))]
+    estimate = estimate_bytes(traces)
+    assert 8000 + 400 < estimate < 8000 + 400 + 200
+    assert estimate_bytes({"bdata": "a"*100}) >= 100
+
+
+def test_measure_splits_the_stages():
+    recorder = PerfRecorder(max_entries=2)
+    with recorder.measure(3, "Hits"):
+        with recorder.stage("style"):
+            time.sleep(0.01)
+    recorder.add(3, "Hits", traces=2, points=100)
+    row, = recorder.rows()
+    assert row["entry"] == 3 and row["component"] == "Hits"
+    assert row["style"] >= 0.01
+    assert row["total"] >= row["style"] + row["extract"]
+    assert (row["traces"], row["points"]) == (2, 100)
+
+
+def test_measure_replaces_the_previous_record():
+    recorder = PerfRecorder()
+    for _ in range(2):
+        with recorder.measure(0, "Hits"):
+            pass
+        recorder.add(0, "Hits", traces=1)
+    assert recorder.rows()[0]["traces"] == 1
+
+
+def test_only_recent_entries_are_kept():
+    recorder = PerfRecorder(max_entries=2)
+    for entry in range(3):
+        recorder.add(entry, "Hits", "extract", 0.1)
+    assert [row["entry"] for row in recorder.rows()] == [2, 1]
+
+
+def test_slow_rows():
+    recorder = PerfRecorder()
+    recorder.add(0, "Fast", "extract", 0.1)
+    recorder.add(0, "Slow", "read", 2.0)
+    assert [row["component"] for row in recorder.slow_rows(threshold=1.0)] == ["Slow"]
+
+
+def test_timed_io_marks_reads():
+    class Storage:
+        def get_data(self, product, producer):
+            time.sleep(0.01)
+            return []
+
+    recorder = PerfRecorder()
+    tree_dict = timed_io({"iolarlite": Storage(), "entry": 0}, recorder)
+    with recorder.measure(0, "Hits"):
+        tree_dict["iolarlite"].get_data("track", "trackreco")
+    assert recorder.rows()[0]["read"] >= 0.01
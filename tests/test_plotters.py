@@ -0,0 +1,274 @@
+"""Tests of the plotter implementations and the registry on the mock IO backend"""
+import importlib
+import inspect
+import pkgutil
+import threading
+import time
+
+import pytest
+
+from lardly.ubdl.config.settings import config
+from lardly.ubdl.plotters.base import BasePlotter
+from lardly.ubdl.plotters.registry import PlotterRegistry
+from lardly.ubdl.core.perf import count_points, perf_recorder
+
+
+def _plotter_classes():
+    import lardly.ubdl.plotters.implementations as implementations
+    classes = []
+    for module_info in pkgutil.iter_modules(implementations.__path__):
+        module_name = f"{implementations.__name__}.{module_info.name}"
+        try:
+            module = importlib.import_module(module_name)
+        except Exception:
+            continue
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, BasePlotter) and cls is not BasePlotter and cls.__module__ == module_name:
+                classes.append(cls)
+    return classes
+
+PLOTTER_CLASSES = _plotter_classes()
+
+
+@pytest.fixture
+def concurrency():
+    """Restore the plotter concurrency settings after a test, and run the plotters uncached"""
+    saved = dict(config.get("plotters", "concurrency", default={}))
+    cache_enabled = config.get("figure_cache", "enabled", default=True)
+    config.set(False, "figure_cache", "enabled")
+    yield
+    for key, value in saved.items():
+        config.set(value, "plotters", "concurrency", key)
+    config.set(cache_enabled, "figure_cache", "enabled")
+
+
+@pytest.mark.parametrize("plotter_class", PLOTTER_CLASSES, ids=lambda cls: cls.__name__)
+def test_plotter_makes_traces(plotter_class, mock_backend):
+    plotter = plotter_class()
+    if not plotter.is_applicable(mock_backend.get_available_trees()):
+        pytest.skip(f"{plotter.name} is not applicable to the mock event")
+    traces = plotter.make_traces(mock_backend.get_tree_dict(), plotter.get_effective_options(None))
+    assert isinstance(traces, list)
+    assert len(traces) > 0
+    assert count_points(traces) > 0
+    for widget in plotter.make_option_widgets():
+        assert widget is not None
+
+
+def test_entries_are_deterministic(mock_backend):
+    first = mock_backend.get_tree_dict()["iolarlite"].get_data("larflow3dhit", "larmatch")
+    mock_backend.load_entry(1)
+    mock_backend.load_entry(0)
+    again = mock_backend.get_tree_dict()["iolarlite"].get_data("larflow3dhit", "larmatch")
+    assert first is not again
+    assert len(first) == len(again)
+    assert [list(hit) for hit in first[:10]] == [list(hit) for hit in again[:10]]
+
+
+@pytest.mark.parametrize("name", ["LArFlowHits", "NuInputClusters", "KeypointHits"])
+def test_style_stage_is_recorded(name, mock_backend, concurrency):
+    registry = _registry(mock_backend)
+    plotter = registry.get_plotter(name)
+    tree_dict = mock_backend.get_tree_dict()
+    perf_recorder.reset(tree_dict["entry"], name)
+    registry.make_plotter_traces(plotter, tree_dict, plotter.get_effective_options(None))
+    row = next(row for row in perf_recorder.rows()
+               if row["entry"] == tree_dict["entry"] and row["component"] == name)
+    assert row["style"] > 0
+    assert row["extract"] > 0
+
+
+def _registry(mock_backend):
+    registry = PlotterRegistry()
+    for cls in PLOTTER_CLASSES:
+        plotter = cls()
+        if plotter.is_applicable(mock_backend.get_available_trees()):
+            registry.register(plotter)
+    return registry
+
+
+def _label(trace):
+    if isinstance(trace, dict):
+        return trace.get("type"), trace.get("name")
+    return trace.type, trace.name
+
+
+def _record_threads(plotter, threads):
+    make_traces = plotter.make_traces
+
+    def recorded(tree_dict, options=None):
+        threads[plotter.name] = threading.current_thread()
+        return make_traces(tree_dict, options)
+    plotter.make_traces = recorded
+
+
+def test_concurrent_traces_match_serial(mock_backend, concurrency):
+    registry = _registry(mock_backend)
+    plotters = registry.get_all_plotters()
+    names = [plotter.name for plotter in plotters]
+    options = {plotter.name: plotter.get_effective_options(None) for plotter in plotters}
+    tree_dict = mock_backend.get_tree_dict()
+    threads = {}
+    for plotter in plotters:
+        _record_threads(plotter, threads)
+
+    config.set(0, "plotters", "concurrency", "max_workers")
+    serial = {name: registry.make_traces([name], tree_dict, options) for name in names}
+    for name, traces in serial.items():
+        assert len(traces) > 0, f"{name} made no traces"
+    assert all(thread is threading.main_thread() for thread in threads.values())
+
+    threads.clear()
+    config.set(4, "plotters", "concurrency", "max_workers")
+    concurrent = registry.make_traces(names, tree_dict, options)
+    # every plotter ran, in the pool
+    assert sorted(threads) == sorted(names)
+    assert all(thread is not threading.main_thread() for thread in threads.values())
+    expected = [trace for name in names for trace in serial[name]]
+    assert [_label(trace) for trace in concurrent] == [_label(trace) for trace in expected]
+    assert count_points(concurrent) == count_points(expected)
+
+
+class SlowPlotter(BasePlotter):
+    """Plotter that takes longer than the concurrency timeout"""
+
+    cacheable = False
+
+    def __init__(self, seconds):
+        super().__init__("Slow")
+        self.seconds = seconds
+        self.finished = threading.Event()
+
+    def is_applicable(self, tree_keys):
+        return True
+
+    def make_traces(self, tree_dict, options=None):
+        time.sleep(self.seconds)
+        self.finished.set()
+        return [{"type": "scatter", "x": [0.0]}]
+
+    def make_option_widgets(self):
+        return []
+
+
+def test_entry_load_waits_for_timed_out_plotters(mock_backend, concurrency):
+    registry = PlotterRegistry()
+    slow = SlowPlotter(1.0)
+    registry.register(slow)
+    config.set(2, "plotters", "concurrency", "max_workers")
+    config.set(0.1, "plotters", "concurrency", "timeout")
+
+    # the timed-out plotter is left out, but the next entry is not loaded under it
+    assert registry.make_traces(["Slow", "Slow"], mock_backend.get_tree_dict()) == []
+    assert not slow.finished.is_set()
+    assert mock_backend.load_entry(1)
+    assert slow.finished.is_set()
+    assert mock_backend.get_current_entry() == 1
+
+
+def test_entry_load_gives_up_after_load_wait(mock_backend, concurrency):
+    registry = PlotterRegistry()
+    slow = SlowPlotter(1.0)
+    registry.register(slow)
+    config.set(2, "plotters", "concurrency", "max_workers")
+    config.set(0.1, "plotters", "concurrency", "timeout")
+    config.set(0.1, "plotters", "concurrency", "load_wait")
+
+    registry.make_traces(["Slow", "Slow"], mock_backend.get_tree_dict())
+    assert not mock_backend.load_entry(1)
+    assert mock_backend.get_current_entry() == 0
+    slow.finished.wait()
+
+
+class EntryPlotter(BasePlotter):
+    """Plotter that records the entry loaded while it runs"""
+
+    cacheable = False
+
+    def __init__(self, name, backend, seconds=0.0, started=None):
+        super().__init__(name)
+        self.backend = backend
+        self.seconds = seconds
+        self.started = started
+        self.entries = []
+
+    def is_applicable(self, tree_keys):
+        return True
+
+    def make_traces(self, tree_dict, options=None):
+        if self.started is not None:
+            self.started.set()
+        time.sleep(self.seconds)
+        self.entries.append(self.backend.get_current_entry())
+        return [{"type": "scatter", "x": [0.0], "name": self.name}]
+
+    def make_option_widgets(self):
+        return []
+
+
+def _load_in_thread(backend, entry):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(ok=backend.load_entry(entry)))
+    thread.start()
+    return thread, result
+
+
+def test_entry_is_not_replaced_between_plotters(mock_backend, concurrency):
+    config.set(0, "plotters", "concurrency", "max_workers")
+    started = threading.Event()
+    first = EntryPlotter("First", mock_backend, seconds=0.2, started=started)
+    second = EntryPlotter("Second", mock_backend)
+    registry = PlotterRegistry()
+    registry.register(first)
+    registry.register(second)
+
+    loader = {}
+    def load_when_started():
+        started.wait()
+        loader["thread"], loader["result"] = _load_in_thread(mock_backend, 1)
+    threading.Thread(target=load_when_started).start()
+    traces = registry.make_traces(["First", "Second"], mock_backend.get_tree_dict())
+    assert len(traces) == 2
+    assert first.entries == [0] and second.entries == [0]
+    loader["thread"].join()
+    assert loader["result"]["ok"] and mock_backend.get_current_entry() == 1
+
+
+def test_queued_plotters_run_while_a_load_waits(mock_backend, concurrency):
+    config.set(2, "plotters", "concurrency", "max_workers")
+    config.set(10.0, "plotters", "concurrency", "load_wait")
+    started = threading.Event()
+    registry = PlotterRegistry()
+    registry.register(EntryPlotter("Slow", mock_backend, seconds=0.3, started=started))
+    for name in ("A", "B", "C"):
+        registry.register(EntryPlotter(name, mock_backend, seconds=0.1))
+
+    loader = {}
+    def load_when_started():
+        started.wait()
+        loader["thread"], loader["result"] = _load_in_thread(mock_backend, 1)
+    threading.Thread(target=load_when_started).start()
+    start = time.monotonic()
+    traces = registry.make_traces(["Slow", "A", "B", "C"], mock_backend.get_tree_dict())
+    # the queued plotters do not wait behind the pending load
+    assert time.monotonic() - start < 2.0
+    assert [trace["name"] for trace in traces] == ["Slow", "A", "B", "C"]
+    loader["thread"].join()
+    assert loader["result"]["ok"]
+
+
+def test_stale_tree_dict_is_not_cached(mock_backend, concurrency, caplog):
+    from lardly.ubdl.core.figure_cache import get_figure_cache
+    config.set(True, "figure_cache", "enabled")
+    config.set(0, "plotters", "concurrency", "max_workers")
+    plotter = EntryPlotter("Stale", mock_backend)
+    plotter.cacheable = True
+    registry = PlotterRegistry()
+    registry.register(plotter)
+
+    tree_dict = mock_backend.get_tree_dict()
+    mock_backend.load_entry(1)
+    entries = get_figure_cache().stats()["entries"]
+    registry.make_traces(["Stale"], tree_dict)
+    assert get_figure_cache().stats()["entries"] == entries
+    assert "not cached" in caplog.text
@@ -0,0 +1,49 @@
+"""Tests of lardly.data.polyline"""
+import numpy as np
+
+from lardly.data.polyline import make_polyline_trace
+
+
+def _segments():
+    return [np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]]),
+            np.zeros((0, 3)),
+            np.array([[2.0, 2.0, 2.0], [3.0, 3.0, 3.0], [4.0, 4.0, 4.0]])]
+
+
+def test_segments_are_separated_by_nan_rows():
+    trace = make_polyline_trace(_segments())
+    assert trace["type"] == "scatter3d"
+    # 5 points and one separator; the empty segment is skipped
+    assert trace["x"].shape == (6,)
+    assert np.isnan(trace["x"][2])
+    np.testing.assert_array_equal(trace["x"][[0, 1, 3, 4, 5]], [0, 1, 2, 3, 4])
+
+
+def test_customdata_holds_segment_ids_and_extra_columns():
+    extra = [np.full((2, 1), 7.0), np.zeros((0, 1)), np.full((3, 1), 9.0)]
+    trace = make_polyline_trace(_segments(), segment_ids=[10, 11, 12], customdata=extra)
+    cdata = trace["customdata"]
+    assert cdata.shape == (6, 2)
+    np.testing.assert_array_equal(cdata[[0, 1, 3, 4, 5], 0], [10, 10, 12, 12, 12])
+    np.testing.assert_array_equal(cdata[[0, 1, 3, 4, 5], 1], [7, 7, 9, 9, 9])
+    assert np.isnan(cdata[2]).all()
+
+
+def test_per_segment_colors_and_labels():
+    trace = make_polyline_trace(_segments(), colors=["red", "green", "blue"], segment_labels=["a", "b", "c"])
+    assert trace["line"]["color"] == ["red", "red", "red", "blue", "blue", "blue"]
+    assert trace["text"] == ["a", "a", "", "c", "c", "c"]
+    assert trace["hovertemplate"].startswith("<b>%{text}</b>")
+
+
+def test_per_vertex_values_use_the_colorscale():
+    values = [np.array([1.0, 2.0]), np.zeros(0), np.array([3.0, 4.0, 5.0])]
+    trace = make_polyline_trace(_segments(), colors=values, colorscale="Viridis", mode="lines+markers")
+    np.testing.assert_array_equal(trace["line"]["color"][[0, 1, 3, 4, 5]], [1, 2, 3, 4, 5])
+    assert trace["line"]["colorscale"] == "Viridis"
+    assert trace["marker"]["colorscale"] == "Viridis"
+
+
+def test_no_points_gives_none():
+    assert make_polyline_trace([]) is None
+    assert make_polyline_trace([np.zeros((0, 3)), None]) is None
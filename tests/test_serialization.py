@@ -0,0 +1,76 @@
+"""Tests of lardly.ubdl.core.serialization"""
+import base64
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from lardly.ubdl.core.serialization import (encode_typed_array, encode_arrays, dumps,
+                                            enable_compression, response_stats)
+
+
+def _decode(encoded):
+    data = np.frombuffer(base64.b64decode(encoded["bdata"]), dtype=np.dtype(encoded["dtype"]).newbyteorder("<"))
+    if "shape" in encoded:
+        data = data.reshape([int(n) for n in encoded["shape"].split(",")])
+    return data
+
+
+def test_integers_use_the_smallest_type():
+    assert encode_typed_array(np.array([0, 255], dtype=np.int64))["dtype"] == "u1"
+    assert encode_typed_array(np.array([-1, 1000]))["dtype"] == "i2"
+    assert encode_typed_array(np.array([0, 1 << 40])) is None
+
+
+def test_doubles_go_to_float32_only_if_exact_enough():
+    exact = np.array([0.5, 1.25, 3.0])
+    assert encode_typed_array(exact)["dtype"] == "f4"
+    precise = np.array([1.0 + 1e-12, 2.0])
+    assert encode_typed_array(precise, float32_rtol=1e-15)["dtype"] == "f8"
+    np.testing.assert_array_equal(_decode(encode_typed_array(precise, float32_rtol=1e-15)), precise)
+
+
+def test_2d_arrays_keep_their_shape():
+    z = np.arange(6, dtype=np.float32).reshape(2, 3)
+    encoded = encode_typed_array(z)
+    assert encoded["shape"] == "2, 3"
+    np.testing.assert_array_equal(_decode(encoded), z)
+
+
+def test_encode_arrays_leaves_small_and_text_arrays():
+    trace = {"type": "scatter", "x": np.arange(100.0), "y": np.arange(3.0),
+             "text": np.array(["a"]*100), "marker": {"color": np.zeros(100, dtype=np.int32)}}
+    encoded = encode_arrays(trace, min_size=16, enabled=True)
+    assert encoded["x"]["dtype"] == "f4"
+    assert isinstance(encoded["y"], np.ndarray)
+    assert isinstance(encoded["text"], np.ndarray)
+    assert encoded["marker"]["color"]["dtype"] == "u1"
+    # the input is not modified
+    assert isinstance(trace["x"], np.ndarray)
+    assert encode_arrays(trace, enabled=False) is trace
+
+
+def test_dumps_writes_typed_arrays():
+    payload = json.loads(dumps(encode_arrays({"x": np.arange(20)}, enabled=True)))
+    np.testing.assert_array_equal(_decode(payload["x"]), np.arange(20))
+
+
+def test_compressed_responses_are_recorded():
+    flask = pytest.importorskip("flask")
+    server = flask.Flask(__name__)
+
+    @server.route("/_dash-update-component", methods=["POST"])
+    def update():
+        return flask.jsonify({"response": list(range(2000))})
+
+    enable_compression(server, min_size=100)
+    before = response_stats.summary().get("plot.figure", {"calls": 0})["calls"]
+    response = server.test_client().post("/_dash-update-component", json={"output": "plot.figure"},
+                                         headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get("Content-Encoding") in ("gzip", "br")
+    if response.headers["Content-Encoding"] == "gzip":
+        assert json.loads(gzip.decompress(response.get_data()))["response"][-1] == 1999
+    stats = response_stats.summary()["plot.figure"]
+    assert stats["calls"] == before + 1
+    assert stats["sent_bytes"] < stats["raw_bytes"]
@@ -0,0 +1,48 @@
+"""Tests of lardly.data.voxelize"""
+import numpy as np
+
+from lardly.data.voxelize import voxelize_points, voxel_average, voxel_sum
+
+
+def test_points_are_merged_per_voxel():
+    xyz = np.array([[0.1, 0.1, 0.1], [0.2, 0.2, 0.2], [1.5, 0.1, 0.1]])
+    voxels = voxelize_points(xyz, weights=np.array([1.0, 3.0, 2.0]), voxel_size=1.0)
+    assert voxels["xyz"].shape == (2, 3)
+    np.testing.assert_array_equal(voxels["count"], [2, 1])
+    np.testing.assert_allclose(voxels["weight"], [4.0, 2.0])
+    # weighted centroid
+    np.testing.assert_allclose(voxels["xyz"][0], [0.175, 0.175, 0.175])
+    np.testing.assert_array_equal(voxels["inverse"], [0, 0, 1])
+
+
+def test_zero_weight_voxels_use_the_plain_mean():
+    xyz = np.array([[0.2, 0.0, 0.0], [0.4, 0.0, 0.0]])
+    voxels = voxelize_points(xyz, weights=np.zeros(2), voxel_size=1.0)
+    np.testing.assert_allclose(voxels["xyz"][0], [0.3, 0.0, 0.0])
+
+
+def test_dominant_label_and_representative():
+    xyz = np.array([[0.1, 0.1, 0.1], [0.2, 0.2, 0.2], [0.3, 0.3, 0.3], [5.0, 5.0, 5.0]])
+    labels = np.array([7, 8, 8, 9])
+    voxels = voxelize_points(xyz, weights=np.array([5.0, 1.0, 1.0, 1.0]), voxel_size=1.0, labels=labels)
+    np.testing.assert_array_equal(voxels["label"], [7, 9])
+    np.testing.assert_array_equal(labels[voxels["representative"]], voxels["label"])
+
+
+def test_empty_points_with_labels():
+    # regression: labels on an empty point set used to raise IndexError
+    voxels = voxelize_points(np.zeros((0, 3)), weights=np.zeros(0), labels=np.zeros(0, dtype=np.int64))
+    assert voxels["xyz"].shape == (0, 3)
+    assert voxels["label"].shape == (0,)
+    assert voxels["representative"].shape == (0,)
+    assert voxel_sum(np.zeros((0, 3)), voxels).shape == (0, 3)
+    assert voxel_average(np.zeros(0), voxels).shape == (0,)
+
+
+def test_voxel_average_and_sum():
+    xyz = np.array([[0.1, 0.1, 0.1], [0.2, 0.2, 0.2], [1.5, 0.1, 0.1]])
+    voxels = voxelize_points(xyz, voxel_size=1.0)
+    values = np.array([[1.0, 10.0], [3.0, 30.0], [5.0, 50.0]])
+    np.testing.assert_allclose(voxel_average(values, voxels), [[2.0, 20.0], [5.0, 50.0]])
+    np.testing.assert_allclose(voxel_average(values[:, 0], voxels, weights=np.array([1.0, 3.0, 1.0])), [2.5, 5.0])
+    np.testing.assert_allclose(voxel_sum(values, voxels), [[4.0, 40.0], [5.0, 50.0]])